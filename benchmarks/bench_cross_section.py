@@ -0,0 +1,96 @@
+"""
+截面指标基准：stocks × bars 矩阵上的向量化内核 vs 逐股 calculate_td_sequential / detect_divergence
+用法: python -m benchmarks.bench_cross_section [--stocks 5000] [--bars 250] [--repeat 3]
+"""
+import time
+import argparse
+import numpy as np
+from typing import Dict
+from src.data.bar_store import BarView
+from src.indicators import jit
+from src.indicators.cross_section import td_setup_counts_2d, macd_2d, dea_turns, td_last, divergence_last
+from src.indicators.td_sequential import calculate_td_sequential
+from src.indicators.divergence import detect_divergence
+
+
+def _market(stocks: int, bars: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, (stocks, bars)), axis=1))
+    open_ = close * (1 + rng.normal(0, 0.005, (stocks, bars)))
+    # 约 5% 的股票为次新股，左侧不足
+    short = rng.random(stocks) < 0.05
+    start = np.where(short, rng.integers(bars // 2, bars - 13, stocks), 0)
+    mask = np.arange(bars)[None, :] < start[:, None]
+    close[mask] = np.nan
+    open_[mask] = np.nan
+    return close, open_
+
+
+def _best(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_benchmark(stocks: int = 5000, bars: int = 250, repeat: int = 3) -> Dict:
+    close, open_ = _market(stocks, bars)
+    # 逐股基线：与监控扫描相同，在 BarStore 视图上调用单股指标
+    views = []
+    for r in range(stocks):
+        valid = ~np.isnan(close[r])
+        c, o = close[r, valid], open_[r, valid]
+        views.append(BarView(np.arange(len(c)), o, c, c, c, c, False))
+
+    def per_stock():
+        return [(calculate_td_sequential(view), detect_divergence(view)) for view in views]
+
+    def kernels(backend):
+        return td_last(close, backend=backend), divergence_last(close, open_, backend=backend)
+
+    result = {'stocks': stocks, 'bars': bars, 'backend': jit.backend()}
+    result['per_stock_s'] = _best(per_stock, 1)
+    backends = ['numpy'] + (['numba'] if jit.backend() == 'numba' else [])
+    for backend in backends:
+        kernels(backend)  # 首次调用包含 JIT 编译 (或读取磁盘缓存)
+        result[f'{backend}_s'] = _best(lambda: kernels(backend), repeat)
+        dea = macd_2d(close, backend=backend)[1]
+        result[f'{backend}_stages'] = {
+            'td_counts': round(_best(lambda: td_setup_counts_2d(close, backend=backend), repeat), 4),
+            'macd': round(_best(lambda: macd_2d(close, backend=backend), repeat), 4),
+            'dea_turns': round(_best(lambda: dea_turns(dea), repeat), 4),
+        }
+
+    # 一致性：内核结果与逐股结果逐只相同
+    expected = per_stock()
+    td, div = kernels(None)
+    mismatches = sum(
+        td['buy_9'][r] != e_td['buy_9'] or td['sell_9'][r] != e_td['sell_9'] or
+        div['bull_div'][r] != e_div['bull_div'] or div['bear_div'][r] != e_div['bear_div']
+        for r, (e_td, e_div) in enumerate(expected)
+    )
+    result['mismatches'] = int(mismatches)
+    result['hits'] = int(sum(v.sum() for v in list(td.values()) + list(div.values())))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="截面向量化指标基准测试")
+    parser.add_argument('--stocks', type=int, default=5000)
+    parser.add_argument('--bars', type=int, default=250)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    r = run_benchmark(args.stocks, args.bars, args.repeat)
+    print(f"{r['stocks']} × {r['bars']}  (默认后端 {r['backend']})")
+    print(f"逐股循环        {r['per_stock_s']:.3f}s")
+    for backend in ('numpy', 'numba'):
+        if f'{backend}_s' in r:
+            print(f"截面内核 {backend:<6} {r[f'{backend}_s']:.3f}s  ({r['per_stock_s'] / r[f'{backend}_s']:.0f}x)  "
+                  f"分阶段 {r[f'{backend}_stages']}")
+    print(f"命中 {r['hits']}  不一致 {r['mismatches']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+指标后端基准：纯 NumPy 与 Numba 编译版本在不同序列长度上的单次调用耗时，以及冷启动编译 / 磁盘缓存加载耗时
+用法: python -m benchmarks.bench_jit [--lengths 200,1000,4500] [--number 200]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from typing import Dict, List
+from src.data.bar_store import BarView
+from src.indicators import jit
+from src.indicators.td_sequential import calculate_td_sequential, td_setup_counts, _td_last_loop
+from src.indicators.divergence import detect_divergence, ema, _ema_loop
+
+# 子进程：导入指标模块并完成首次调用 (触发编译或读取磁盘缓存)
+_COLD_START = """
+import time, json
+started = time.perf_counter()
+from src.indicators import jit
+imported = time.perf_counter() - started
+timings = jit.warmup()
+print(json.dumps({'import_s': round(imported, 4), 'warmup_s': round(time.perf_counter() - started - imported, 4),
+                  'stages': timings}))
+"""
+
+
+def _per_call_us(fn, number: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - started) / number * 1e6
+
+
+def _view(n: int, seed: int = 0) -> BarView:
+    rng = np.random.default_rng(seed)
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), 2)
+    open_ = np.round(close * (1 + rng.normal(0, 0.003, n)), 2)
+    return BarView(np.arange(n), open_, close, close, close, close, False)
+
+
+def run_benchmark(lengths: List[int], number: int = 200) -> List[Dict]:
+    rows = []
+    previous = jit.backend()
+    backends = ['numpy'] + (['numba'] if jit.available() else [])
+    try:
+        for n in lengths:
+            view = _view(n)
+            row = {'bars': n,
+                   # 原始解释执行循环，作为参照
+                   'python': {'td_last': _per_call_us(lambda: _td_last_loop(view.close, 4), number),
+                              'ema': _per_call_us(lambda: _ema_loop(view.close, 2 / 13), number)}}
+            for backend in backends:
+                jit.set_backend(backend)
+                row[backend] = {
+                    'td_last': _per_call_us(lambda: calculate_td_sequential(view), number),
+                    'td_counts': _per_call_us(lambda: td_setup_counts(view.close), number),
+                    'ema': _per_call_us(lambda: ema(view.close, 12), number),
+                    'divergence': _per_call_us(lambda: detect_divergence(view), number),
+                }
+            rows.append(row)
+    finally:
+        jit.set_backend(previous)
+    return rows
+
+
+def cold_start() -> List[Dict]:
+    """空缓存目录下连续启动两次：第一次编译并写盘，第二次从磁盘缓存加载"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+        for label in ('编译', '磁盘缓存'):
+            out = subprocess.run([sys.executable, '-c', _COLD_START], cwd=root, env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            results.append(dict(json.loads(out.strip().splitlines()[-1]), run=label))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="指标 Numba / NumPy 后端基准测试")
+    parser.add_argument('--lengths', default='200,1000,4500', help="序列长度 (K 线根数)，逗号分隔")
+    parser.add_argument('--number', type=int, default=200, help="每项调用次数")
+    args = parser.parse_args()
+    print(f"numba 可用: {jit.available()}  默认后端: {jit.backend()}  (单位: 微秒/次)")
+    for row in run_benchmark([int(x) for x in args.lengths.split(',')], args.number):
+        for backend in ('python', 'numpy', 'numba'):
+            if backend in row:
+                cells = '  '.join(f"{k} {v:8.1f}" for k, v in row[backend].items())
+                print(f"{row['bars']:>5} 根  {backend:<6} {cells}")
+    if jit.available():
+        for r in cold_start():
+            print(f"冷启动 ({r['run']}): 导入 {r['import_s']:.3f}s  首次调用 {r['warmup_s']:.3f}s  {r['stages']}")
+
+
+if __name__ == "__main__":
+    main()
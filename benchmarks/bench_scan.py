@@ -0,0 +1,124 @@
+"""
+端到端基准：在进程内 FakeXtData + SQLite 上运行 MonitorService 扫描轮次与 MarketStatsService.update_stats
+用法: python -m benchmarks.bench_scan --market 5300 --watch 50 --cycles 3 [--latency 0.002] [--trace-alloc]
+"""
+import io
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from functools import partial
+from typing import Dict, List
+from src.data import database
+from src.data.database import connect_to_db
+from src.data.fake_xtdata import FakeXtData
+from src.data.qmt_client import QMTClient
+from src.data.sqlite_db import SQLiteConnection
+from src.services.monitor import MonitorService
+from src.services.market_stats import MarketStatsService
+from src.services.metrics import metrics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(BASE_DIR, 'config.yaml')
+
+
+def build_env(market_size: int, watch: int, latency: float, db_path: str, timeframes: List[str] = None,
+              workers: int = 0, schedule: str = 'interval'):
+    """
+    构造离线环境：合成市场、SQLite 数据库与注入替身的服务实例 (workers > 0 时启用分片扫描)
+    默认按固定间隔全量扫描，便于逐轮比较耗时
+    """
+    database.set_db_config({'backend': 'sqlite', 'path': db_path})
+    xt = FakeXtData(n_stocks=market_size, latency=latency)
+    client = QMTClient(CONFIG_PATH, xt_data=xt)
+    client.config.pop('recorder', None)
+    if timeframes:
+        client.config['monitor']['timeframes'] = timeframes
+    client.config['monitor']['workers'] = workers
+    client.config['monitor']['schedule'] = schedule
+    monitor = MonitorService(CONFIG_PATH, db_path, client=client,
+                             xt_factory=partial(FakeXtData, n_stocks=market_size, latency=latency, now=xt.now))
+    monitor.running = True
+
+    codes = xt.get_stock_list_in_sector('沪深A股')[:watch]
+    mydb, cursor = connect_to_db()
+    for code in codes:
+        cursor.execute("INSERT OR IGNORE INTO monitored_stocks (code, name) VALUES (%s, %s)",
+                       (code, xt.instruments[code]['InstrumentName']))
+    mydb.commit()
+    cursor.close()
+    mydb.close()
+    return xt, monitor, MarketStatsService(client)
+
+
+def _measure(fn, xt: FakeXtData, trace_alloc: bool) -> Dict:
+    calls_before = xt.calls.copy()
+    db_before = SQLiteConnection.connects
+    if trace_alloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        fn()
+    elapsed = time.perf_counter() - started
+    result = {
+        'seconds': round(elapsed, 4),
+        'xt_calls': dict(xt.calls - calls_before),
+        'db_connects': SQLiteConnection.connects - db_before,
+    }
+    if trace_alloc:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak_alloc_kb'] = round(peak / 1024, 1)
+    return result
+
+
+def run_benchmark(market_size: int = 5300, watch: int = 50, cycles: int = 3, latency: float = 0.0,
+                  timeframes: List[str] = None, trace_alloc: bool = False) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        xt, monitor, stats = build_env(market_size, watch, latency, os.path.join(tmp, 'bench.db'), timeframes)
+        metrics.reset()
+        report = {'monitor': [], 'market_stats': []}
+        for i in range(cycles):
+            report['monitor'].append(_measure(monitor.run_cycle, xt, trace_alloc))
+            report['market_stats'].append(_measure(stats.update_stats, xt, trace_alloc))
+            xt.advance(1)
+        database.set_db_config(None)
+        report['stages'] = metrics.summary()
+        report['bar_store'] = monitor.client.bar_store.stats()
+        return report
+
+
+def _print_report(report: Dict):
+    for name in ('monitor', 'market_stats'):
+        rows = report[name]
+        print(f"\n== {name} ==")
+        for i, r in enumerate(rows):
+            calls = ', '.join(f"{k}={v}" for k, v in sorted(r['xt_calls'].items()))
+            alloc = f"  峰值分配 {r['peak_alloc_kb']} KB" if 'peak_alloc_kb' in r else ''
+            print(f"第 {i + 1} 轮: {r['seconds']:.3f}s  DB 连接 {r['db_connects']}{alloc}\n    xtdata 调用: {calls}")
+    store = report['bar_store']
+    print(f"\n== K 线存储 == 占用 {store['bytes'] / 1024:.1f} KB  写入 {store['writes']} 次  扩容 {store['grows']} 次")
+    for period, p in store['periods'].items():
+        print(f"{period:<6} 股票 {p['stocks']:<5} 容量 {p['capacity'][0]}×{p['capacity'][1]}  {p['bytes'] / 1024:.1f} KB")
+    print("\n== 分阶段耗时 ==")
+    for s in report['stages']:
+        print(f"{s['stage']:<22} 次数 {s['count']:<6} 平均 {s['avg_ms']}ms  P95 {s['p95_ms']}ms  合计 {s['total_s']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="监控扫描与全市场统计基准测试 (离线替身)")
+    parser.add_argument('--market', type=int, default=5300, help="合成市场股票数")
+    parser.add_argument('--watch', type=int, default=50, help="监控股票数")
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.0, help="每次 xtdata 调用的模拟延迟 (秒)")
+    parser.add_argument('--timeframes', help="覆盖监控周期，如 1m,5m,1d")
+    parser.add_argument('--trace-alloc', action='store_true', help="统计内存分配峰值 (会显著变慢)")
+    args = parser.parse_args()
+    timeframes = args.timeframes.split(',') if args.timeframes else None
+    _print_report(run_benchmark(args.market, args.watch, args.cycles, args.latency, timeframes, args.trace_alloc))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+分片扫描基准：不同工作进程数下一轮扫描的耗时 (FakeXtData + SQLite)
+用法: python -m benchmarks.bench_sharding --stocks 500,2000 --workers 0,2,4,8 [--timeframes 1m,5m,1d] [--latency 0.001]
+workers=0 为单进程基线
+"""
+import io
+import os
+import time
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from typing import Dict, List
+from src.data import database
+from benchmarks.bench_scan import build_env
+
+
+def run_benchmark(stock_counts: List[int], worker_counts: List[int], cycles: int = 2, latency: float = 0.0,
+                  timeframes: List[str] = None) -> List[Dict]:
+    rows = []
+    for n in stock_counts:
+        for workers in worker_counts:
+            with tempfile.TemporaryDirectory() as tmp:
+                xt, monitor, _ = build_env(n, n, latency, os.path.join(tmp, 'bench.db'), timeframes, workers)
+                try:
+                    with redirect_stdout(io.StringIO()):
+                        # 首轮包含进程启动、历史拉取与缓存预热，单独记录
+                        started = time.perf_counter()
+                        monitor.run_cycle()
+                        warmup = time.perf_counter() - started
+                        times = []
+                        for _ in range(cycles):
+                            started = time.perf_counter()
+                            monitor.run_cycle()
+                            times.append(time.perf_counter() - started)
+                finally:
+                    monitor.stop()
+                    database.set_db_config(None)
+            rows.append({
+                'stocks': n, 'workers': workers, 'warmup_s': round(warmup, 3),
+                'cycle_s': round(sum(times) / len(times), 3), 'alerts': len(monitor.alerts),
+            })
+            print(f"股票 {n:<5} 进程 {workers:<3} 首轮 {rows[-1]['warmup_s']:.3f}s  "
+                  f"每轮 {rows[-1]['cycle_s']:.3f}s  信号 {rows[-1]['alerts']}", flush=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程分片扫描基准测试 (离线替身)")
+    parser.add_argument('--stocks', default='500,2000', help="监控股票数，逗号分隔")
+    parser.add_argument('--workers', default='0,2,4,8', help="工作进程数，逗号分隔 (0 为单进程)")
+    parser.add_argument('--cycles', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.0, help="每次 xtdata 调用的模拟延迟 (秒)")
+    parser.add_argument('--timeframes', help="覆盖监控周期，如 1m,5m,1d")
+    args = parser.parse_args()
+    run_benchmark([int(x) for x in args.stocks.split(',')], [int(x) for x in args.workers.split(',')],
+                  args.cycles, args.latency, args.timeframes.split(',') if args.timeframes else None)
+
+
+if __name__ == "__main__":
+    main()
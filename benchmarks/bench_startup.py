@@ -0,0 +1,113 @@
+"""
+Web 进程启动基准：导入 src.web.app 的耗时、进程启动到首页可访问、到后台服务就绪的时间
+子进程中以 uvicorn 启动应用 (监控服务使用 FakeXtData + SQLite 离线替身)，父进程轮询 / 与 /api/status
+用法: python -m benchmarks.bench_startup [--market 5300] [--watch 50] [--runs 3]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SERVE = """
+import sys, time, json
+started = time.perf_counter()
+from src.web.app import create_app
+imported = time.perf_counter() - started
+import uvicorn
+market, watch, db_path, port = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3], int(sys.argv[4])
+
+def factory():
+    from benchmarks.bench_scan import build_env
+    _, monitor, _ = build_env(market, watch, 0.0, db_path)
+    monitor.running = False
+    monitor.config['warm_start'] = {'enabled': False}
+    return monitor
+
+print(json.dumps({'import_s': round(imported, 4)}), flush=True)
+uvicorn.run(create_app(monitor_factory=factory), host='127.0.0.1', port=port, log_level='warning')
+"""
+
+# 对照：改造前导入 src.web.app 时会同步导入并构造的服务模块
+_EAGER_IMPORT = """
+import time
+started = time.perf_counter()
+import src.services.monitor, src.services.market_stats, src.services.universe_scan, src.services.watchlist_io
+print(round(time.perf_counter() - started, 4))
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            return resp.status, resp.read()
+    except Exception:
+        return None, None
+
+
+def measure_once(market_size: int, watch: int, timeout: float = 120) -> Dict:
+    port = _free_port()
+    base = f'http://127.0.0.1:{port}'
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, '-c', _SERVE, str(market_size), str(watch),
+                                 os.path.join(tmp, 'bench.db'), str(port)],
+                                cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            result = json.loads(proc.stdout.readline())
+            deadline = started + timeout
+            while _get(base + '/')[0] != 200:
+                if time.perf_counter() > deadline or proc.poll() is not None:
+                    raise RuntimeError("服务未能启动")
+                time.sleep(0.01)
+            result['first_response_s'] = round(time.perf_counter() - started, 3)
+            while True:
+                status, body = _get(base + '/api/status')
+                if status == 200 and not json.loads(body).get('starting'):
+                    result['services_ready_s'] = round(time.perf_counter() - started, 3)
+                    result['build_s'] = json.loads(body)['startup']['seconds']
+                    break
+                if time.perf_counter() > deadline or proc.poll() is not None:
+                    raise RuntimeError("后台服务未能就绪")
+                time.sleep(0.02)
+        finally:
+            proc.terminate()
+            proc.wait(10)
+    return result
+
+
+def run_benchmark(market_size: int = 5300, watch: int = 50, runs: int = 3) -> Dict:
+    eager = subprocess.run([sys.executable, '-c', _EAGER_IMPORT], cwd=ROOT, capture_output=True,
+                           text=True, check=True).stdout
+    return {'eager_service_import_s': float(eager.strip().splitlines()[-1]),
+            'runs': [measure_once(market_size, watch) for _ in range(runs)]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Web 进程启动耗时基准 (离线替身)")
+    parser.add_argument('--market', type=int, default=5300, help="合成市场股票数")
+    parser.add_argument('--watch', type=int, default=50, help="监控股票数")
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+    report = run_benchmark(args.market, args.watch, args.runs)
+    print(f"对照：同步导入服务模块 {report['eager_service_import_s']}s (改造前导入 src.web.app 时还需构造服务)")
+    for i, r in enumerate(report['runs']):
+        print(f"第 {i + 1} 次: 导入 src.web.app {r['import_s']}s  首页可访问 {r['first_response_s']}s  "
+              f"后台服务就绪 {r['services_ready_s']}s (构造 {r['build_s']}s)")
+
+
+if __name__ == "__main__":
+    main()
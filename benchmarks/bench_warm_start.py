@@ -0,0 +1,80 @@
+"""
+热启动基准：冷启动与载入快照后的首轮扫描耗时 (time-to-first-scan)
+每次启动都使用新的 FakeXtData 实例 (内部无缓存)，合成 K 线的开销与拉取根数成正比，模拟 QMT 的整段读取
+用法: python -m benchmarks.bench_warm_start --market 2000 --watch 50 [--latency 0.002] [--timeframes 1m,5m,1d]
+"""
+import io
+import os
+import time
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from typing import Dict, List
+from src.data import database
+from src.services.warm_start import WarmStart
+from benchmarks.bench_scan import build_env
+
+
+def _start(market_size: int, watch: int, latency: float, db_path: str, timeframes: List[str],
+           snapshot_path: str, warm: bool) -> Dict:
+    """模拟一次进程启动：构造服务 -> (可选) 载入快照 -> 首轮扫描 + 首次全市场统计"""
+    started = time.perf_counter()
+    xt, monitor, stats = build_env(market_size, watch, latency, db_path, timeframes)
+    store = WarmStart(snapshot_path, {'client': monitor.client, 'monitor': monitor, 'market': stats})
+    loaded = store.load() if warm else {'loaded': False}
+    with redirect_stdout(io.StringIO()):
+        first_stats = dict(stats.last_stats)
+        scan_started = time.perf_counter()
+        monitor.run_cycle()
+        scan_done = time.perf_counter()
+        stats.update_stats()
+    result = {
+        'time_to_first_scan_s': round(scan_done - started, 3),
+        'first_scan_s': round(scan_done - scan_started, 3),
+        'snapshot_load_s': loaded.get('seconds', 0.0),
+        'stats_before_first_update': bool(first_stats),
+        'get_market_data_calls': xt.calls['get_market_data'],
+    }
+    if not warm:
+        # 等后台历史下载完成并再扫描一轮，基础 K 线整段重新拉取后再保存 (否则热启动时仍需整段拉取)
+        while monitor.client.downloader.stats()['queue_depth'] or monitor.client.downloader.in_flight:
+            time.sleep(0.01)
+        with redirect_stdout(io.StringIO()):
+            monitor.run_cycle()
+        result['snapshot'] = store.save()
+    return result
+
+
+def run_benchmark(market_size: int = 2000, watch: int = 50, latency: float = 0.0,
+                  timeframes: List[str] = None) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        snapshot_path = os.path.join(tmp, 'warm_start.pkl')
+        try:
+            cold = _start(market_size, watch, latency, db_path, timeframes, snapshot_path, warm=False)
+            warm = _start(market_size, watch, latency, db_path, timeframes, snapshot_path, warm=True)
+        finally:
+            database.set_db_config(None)
+    return {'cold': cold, 'warm': warm}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热启动快照基准测试 (离线替身)")
+    parser.add_argument('--market', type=int, default=2000, help="合成市场股票数")
+    parser.add_argument('--watch', type=int, default=50, help="监控股票数")
+    parser.add_argument('--latency', type=float, default=0.0, help="每次 xtdata 调用的模拟延迟 (秒)")
+    parser.add_argument('--timeframes', help="覆盖监控周期，如 1m,5m,1d")
+    args = parser.parse_args()
+    report = run_benchmark(args.market, args.watch, args.latency,
+                           args.timeframes.split(',') if args.timeframes else None)
+    snap = report['cold']['snapshot']
+    print(f"快照: {snap['bytes'] / 1024 / 1024:.1f} MB  写入 {snap['seconds']}s")
+    for name in ('cold', 'warm'):
+        r = report[name]
+        print(f"{'冷启动' if name == 'cold' else '热启动'}: 首轮扫描完成 {r['time_to_first_scan_s']}s "
+              f"(扫描 {r['first_scan_s']}s, 载入快照 {r['snapshot_load_s']}s)  "
+              f"get_market_data {r['get_market_data_calls']} 次  启动即有统计结果: {r['stats_before_first_update']}")
+
+
+if __name__ == "__main__":
+    main()
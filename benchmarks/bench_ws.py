@@ -0,0 +1,122 @@
+"""
+WebSocket 推送流量基准：500 只监控股票时，每个客户端每分钟收到的字节数 (旧轮询/逐条推送 vs 协议 v2)
+- 旧方式：页面每 5 秒轮询 /api/stocks 与 /api/market_stats (完整 JSON)，预警逐条推送
+- v2：行情与全市场统计按频道推送增量 (定期关键帧)，监控列表每分钟刷新一次，预警按轮合并
+- 压缩后字节数按 permessage-deflate 的方式估算 (同一连接共享压缩上下文，每条消息 SYNC_FLUSH 并去掉末尾 4 字节)
+不含 HTTP/WebSocket 帧头
+用法: python -m benchmarks.bench_ws --stocks 500 --minutes 10 [--changed 0.4] [--alerts 6]
+"""
+import json
+import zlib
+import random
+import argparse
+from typing import Dict
+from src.web.ws_protocol import SnapshotChannel, encode, alerts_message, market_snapshot, quotes_snapshot
+
+DIST_KEYS = ['up_limit', 'up_7_10', 'up_5_7', 'up_2_5', 'up_0_2', 'zero',
+             'down_0_2', 'down_2_5', 'down_5_7', 'down_7_10', 'down_limit']
+INDEX_NAMES = ['上证指数', '深证成指', '创业板指', '科创50', '北证50']
+
+
+class Deflater:
+    """模拟一个连接上的 permessage-deflate (context takeover)"""
+    def __init__(self):
+        self._z = zlib.compressobj(6, zlib.DEFLATED, -15)
+
+    def size(self, text: str) -> int:
+        data = self._z.compress(text.encode('utf-8')) + self._z.flush(zlib.Z_SYNC_FLUSH)
+        return len(data) - 4
+
+
+class Stream:
+    """统计一个客户端收到的消息：原始字节与压缩后字节"""
+    def __init__(self):
+        self.deflater = Deflater()
+        self.messages = 0
+        self.raw = 0
+        self.compressed = 0
+
+    def send(self, text: str):
+        self.messages += 1
+        self.raw += len(text.encode('utf-8'))
+        self.compressed += self.deflater.size(text)
+
+
+def _market(rng: random.Random, second: int) -> Dict:
+    counts = {'up': rng.randint(1500, 3500), 'flat': rng.randint(100, 400)}
+    counts['down'] = 5300 - counts['up'] - counts['flat']
+    return {
+        'timestamp': f"10:{second // 60 % 60:02d}:{second % 60:02d}",
+        'distribution': {k: rng.randint(0, 1200) for k in DIST_KEYS},
+        'counts': counts,
+        'leading': [{'name': name, 'white': round(rng.uniform(-3, 3), 2), 'yellow': round(rng.uniform(-3, 3), 2),
+                     'dir': rng.choice(['up', 'down']), 'diff_pct': round(rng.uniform(-1, 1), 2),
+                     'signals': rng.choice([[], [], ['TD低9']])} for name in INDEX_NAMES],
+    }
+
+
+def run_benchmark(n_stocks: int = 500, minutes: int = 10, changed: float = 0.4, alerts_per_min: int = 6,
+                  keyframe_every: int = 20, seed: int = 7) -> Dict[str, Dict]:
+    rng = random.Random(seed)
+    stocks = [{'id': i + 1, 'code': f"{600000 + i}.SH", 'name': f"样本股票{i}", 'added_at': '2026-10-19 09:30:00',
+               'price': round(rng.uniform(5, 80), 2), 'change_pct': 0.0} for i in range(n_stocks)]
+    before, after = Stream(), Stream()
+    quotes, market = SnapshotChannel('quotes', keyframe_every), SnapshotChannel('market', keyframe_every)
+    stats = _market(rng, 0)
+    for second in range(0, minutes * 60, 5):
+        # 每 5 秒约 changed 比例的股票价格变动
+        for s in stocks:
+            if rng.random() < changed:
+                s['price'] = round(s['price'] * (1 + rng.uniform(-0.003, 0.003)), 2)
+                s['change_pct'] = round(rng.uniform(-10, 10), 2)
+        if second % 15 == 0:
+            stats = _market(rng, second)
+        batch = [{'id': second * 10 + k, 'stock_code': rng.choice(stocks)['code'], 'name': '样本', 'timeframe': '5m',
+                  'signal_type': 'TD9_BUY', 'price': 10.0, 'bar_time': '2026-10-19 10:00:00',
+                  'timestamp': '2026-10-19 10:00:03'} for k in range(alerts_per_min // 12 + (second % 60 == 0) * (alerts_per_min % 12))]
+
+        # 旧方式：两次轮询 (完整 JSON) + 逐条预警
+        before.send(json.dumps(stocks, default=str))
+        before.send(json.dumps(stats))
+        for alert in batch:
+            before.send(json.dumps(alert))
+
+        # v2：增量频道 + 每分钟一次监控列表 + 合并的预警帧
+        if second % 60 == 0:
+            after.send(json.dumps(stocks, default=str))
+        for channel, snapshot in ((quotes, quotes_snapshot({s['code']: s for s in stocks})),
+                                  (market, market_snapshot(stats))):
+            message = channel.update(snapshot)
+            if message:
+                after.send(encode(message))
+        if batch:
+            after.send(encode(alerts_message(batch)))
+
+    result = {}
+    for label, stream in (('before', before), ('after', after)):
+        result[label] = {
+            'messages_per_min': round(stream.messages / minutes, 1),
+            'raw_kb_per_min': round(stream.raw / minutes / 1024, 1),
+            'deflate_kb_per_min': round(stream.compressed / minutes / 1024, 1),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket 推送流量基准测试")
+    parser.add_argument('--stocks', type=int, default=500)
+    parser.add_argument('--minutes', type=int, default=10)
+    parser.add_argument('--changed', type=float, default=0.4, help="每 5 秒价格变动的股票比例")
+    parser.add_argument('--alerts', type=int, default=6, help="每分钟预警条数")
+    parser.add_argument('--keyframe', type=int, default=20)
+    args = parser.parse_args()
+    result = run_benchmark(args.stocks, args.minutes, args.changed, args.alerts, args.keyframe)
+    for label, row in result.items():
+        print(f"{label:<7} 消息 {row['messages_per_min']:>6}/分钟  原始 {row['raw_kb_per_min']:>7} KB/分钟  "
+              f"压缩后 {row['deflate_kb_per_min']:>7} KB/分钟")
+    ratio = result['before']['raw_kb_per_min'] / max(result['after']['deflate_kb_per_min'], 0.1)
+    print(f"每客户端流量降至原来的 1/{ratio:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,4 +3,5 @@ from src.web.app import app
 
 if __name__ == "__main__":
     print("正在启动 QMT 股票监控系统...")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # permessage-deflate：客户端支持时压缩 WebSocket 消息 (浏览器默认支持)
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_per_message_deflate=True)
@@ -0,0 +1,220 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import Any, Callable, Dict, Hashable, Optional
+from src.services.metrics import metrics
+
+# 单个方法的默认并发上限：下载占用 QMT 带宽最久，不能挤占行情查询
+DEFAULT_LIMITS = {'download_history_data': 2, 'download_history_data2': 1, 'get_market_data': 4}
+
+
+class XtdataTimeout(TimeoutError):
+    """xtdata 调用超时 (等待结果或等待并发名额)"""
+
+
+def _freeze(value) -> Hashable:
+    """把参数转成可哈希的合并键 (列表/字典按内容比较)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class AsyncQMTClient:
+    """
+    QMTClient / xtdata 调用的异步门面
+    - 所有调用在专用线程池中执行，调用方按方法设置超时：QMT 卡死时调用方按时返回，不会无限阻塞
+    - 线程池大小即总并发上限，limits 再按方法限流 (例如下载最多 1~2 个)
+    - 参数相同且仍在执行中的调用合并为一次，共享结果
+    - 统计各方法的调用数、合并数、超时数、异常数与延迟
+    同一个实例同时服务监控线程 (call_sync) 与 Web 事件循环 (await call)
+    """
+    def __init__(self, client, workers: int = 8, timeout: float = 10.0,
+                 timeouts: Optional[Dict[str, float]] = None, limits: Optional[Dict[str, int]] = None):
+        self.client = client
+        self.workers = workers
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='xtdata')
+        self._limits = {name: threading.BoundedSemaphore(n)
+                        for name, n in dict(DEFAULT_LIMITS, **(limits or {})).items()}
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._stats: Dict[str, Dict] = {}
+
+    @classmethod
+    def from_config(cls, client) -> 'AsyncQMTClient':
+        cfg = client.config.get('xtdata', {}) or {}
+        return cls(client, workers=cfg.get('workers', 8), timeout=cfg.get('timeout', 10.0),
+                   timeouts=cfg.get('timeouts'), limits=cfg.get('limits'))
+
+    # --- 执行 ---
+    def _resolve(self, name: str) -> Callable:
+        """QMTClient 的方法优先，其余按 xtdata 接口 (get_full_tick、download_history_data 等) 处理"""
+        target = getattr(self.client, name, None)
+        if target is None:
+            if self.client.xt_data is None:
+                raise RuntimeError("QMT 未连接")
+            target = getattr(self.client.xt_data, name)
+        return target
+
+    def _stat(self, name: str) -> Dict:
+        s = self._stats.get(name)
+        if s is None:
+            s = self._stats[name] = {'calls': 0, 'coalesced': 0, 'timeouts': 0, 'errors': 0,
+                                     'in_flight': 0, 'total_s': 0.0, 'max_s': 0.0}
+        return s
+
+    def _execute(self, name: str, fn: Callable, args: tuple, kwargs: dict):
+        slot = self._limits.get(name)
+        # 等待限流名额也有上限：某个方法卡死时，排队的同类调用按时失败，不会占满线程池
+        # (超时数由等待方统计，这里只负责让出线程)
+        wait_s = self._timeout_for(name, None)
+        if slot is not None and not slot.acquire(timeout=wait_s):
+            with self._lock:
+                self._stat(name)['in_flight'] -= 1
+            raise XtdataTimeout(f"xtdata 调用 {name} 等待并发名额超过 {wait_s}s")
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._stat(name)['errors'] += 1
+            raise
+        finally:
+            if slot is not None:
+                slot.release()
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                s = self._stat(name)
+                s['in_flight'] -= 1
+                s['total_s'] += elapsed
+                s['max_s'] = max(s['max_s'], elapsed)
+            if metrics.enabled:
+                metrics.observe('xtdata_call', elapsed, name)
+
+    def submit(self, name: str, *args, fn: Optional[Callable] = None, key: Optional[Hashable] = None,
+               coalesce: bool = True, **kwargs) -> Future:
+        """
+        提交调用，返回 concurrent.futures.Future
+        - fn 为空时按 name 解析 QMTClient / xtdata 方法；传入 fn 时 name 只用于统计与限流
+        - key 为空时按 (name, 参数) 合并；coalesce=False 不合并
+        """
+        if key is None and coalesce:
+            key = (name, _freeze(args), _freeze(kwargs)) if fn is None else None
+        with self._lock:
+            if key is not None:
+                running = self._inflight.get(key)
+                if running is not None:
+                    self._stat(name)['coalesced'] += 1
+                    return running
+            s = self._stat(name)
+            s['calls'] += 1
+            s['in_flight'] += 1
+            future = self.executor.submit(self._execute, name, fn or self._resolve(name), args, kwargs)
+            if key is not None:
+                self._inflight[key] = future
+        if key is not None:
+            future.add_done_callback(lambda f, k=key: self._forget(k, f))
+        return future
+
+    def _forget(self, key: Hashable, future: Future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _timeout_for(self, name: str, timeout: Optional[float]) -> float:
+        return timeout if timeout is not None else self.timeouts.get(name, self.timeout)
+
+    def _timed_out(self, name: str, timeout: float):
+        with self._lock:
+            self._stat(name)['timeouts'] += 1
+        return XtdataTimeout(f"xtdata 调用 {name} 超过 {timeout}s 未返回")
+
+    def _result(self, name: str, future) -> Any:
+        """取已完成调用的结果；等待名额超时同样计入超时数"""
+        error = future.exception()
+        if isinstance(error, XtdataTimeout):
+            with self._lock:
+                self._stat(name)['timeouts'] += 1
+        return future.result()
+
+    def call_sync(self, name: str, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """同步调用 (监控线程使用)：超时抛出 TimeoutError，底层调用仍在线程池中继续"""
+        timeout = self._timeout_for(name, timeout)
+        future = self.submit(name, *args, **kwargs)
+        # 用 wait 判断是否完成：调用本身抛出的 TimeoutError 不计为等待超时
+        if not wait([future], timeout=timeout).done:
+            raise self._timed_out(name, timeout)
+        return self._result(name, future)
+
+    async def _await(self, name: str, future: Future, timeout: float) -> Any:
+        # shield：单个等待方超时/取消不影响合并在同一调用上的其他等待方
+        waiter = asyncio.shield(asyncio.wrap_future(future))
+        done, _ = await asyncio.wait({waiter}, timeout=timeout)
+        if not done:
+            # 超时后仍由 shield 接收底层结果，取走异常以免事件循环报 "never retrieved"
+            waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise self._timed_out(name, timeout)
+        return self._result(name, waiter)
+
+    async def call(self, name: str, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """异步调用：不阻塞事件循环，超时抛出 TimeoutError"""
+        timeout = self._timeout_for(name, timeout)
+        return await self._await(name, self.submit(name, *args, **kwargs), timeout)
+
+    async def run(self, name: str, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """在同一线程池中执行任意同步函数 (如全市场统计)，name 与参数都相同的调用合并"""
+        timeout = self._timeout_for(name, timeout)
+        key = ('run', name, _freeze(args), _freeze(kwargs))
+        return await self._await(name, self.submit(name, *args, fn=fn, key=key, **kwargs), timeout)
+
+    # --- 常用接口 ---
+    async def get_realtime_data(self, stock_list, timeout: Optional[float] = None) -> Dict[str, Dict]:
+        try:
+            return await self.call('get_realtime_data', list(stock_list), timeout=timeout)
+        except TimeoutError as e:
+            print(e)
+            return {}
+
+    async def resolve_stock_code(self, input_str: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        return await self.call('resolve_stock_code', input_str, timeout=timeout)
+
+    async def get_full_tick(self, code_list, timeout: Optional[float] = None) -> Dict[str, Dict]:
+        return await self.call('get_full_tick', list(code_list), timeout=timeout)
+
+    async def get_bars(self, stock_code: str, period: str, count: int = 200, timeout: Optional[float] = None):
+        return await self.call('get_bars', stock_code, period, count, timeout=timeout)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    # --- 统计 ---
+    def stats(self) -> Dict:
+        with self._lock:
+            methods = {}
+            for name, s in sorted(self._stats.items()):
+                done = s['calls'] - s['in_flight']
+                methods[name] = {
+                    'calls': s['calls'], 'coalesced': s['coalesced'], 'timeouts': s['timeouts'],
+                    'errors': s['errors'], 'in_flight': s['in_flight'],
+                    'avg_ms': round(s['total_s'] / done * 1000, 2) if done else None,
+                    'max_ms': round(s['max_s'] * 1000, 2),
+                }
+            return {'workers': self.workers, 'timeout': self.timeout, 'methods': methods}
+
+    def render_prometheus(self) -> str:
+        methods = self.stats()['methods']
+        lines = []
+        for metric, field, kind in (('qmt_xtdata_calls_total', 'calls', 'counter'),
+                                    ('qmt_xtdata_coalesced_total', 'coalesced', 'counter'),
+                                    ('qmt_xtdata_timeouts_total', 'timeouts', 'counter'),
+                                    ('qmt_xtdata_errors_total', 'errors', 'counter'),
+                                    ('qmt_xtdata_in_flight', 'in_flight', 'gauge')):
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(f'{metric}{{method="{name}"}} {s[field]}' for name, s in methods.items())
+        return '\n'.join(lines) + '\n'
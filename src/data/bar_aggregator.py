@@ -0,0 +1,272 @@
+import time
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import numpy as np
+import pandas as pd
+
+# 可由基础周期合成的周期：周期 -> (基础周期, 分钟数 或 日历规则)
+DERIVED_PERIODS = {
+    '5m': ('1m', 5),
+    '15m': ('1m', 15),
+    '30m': ('1m', 30),
+    '1h': ('1m', 60),
+    '1w': ('1d', 'week'),
+    '1mon': ('1d', 'month'),
+}
+
+MORNING_OPEN = 9 * 60 + 30     # 09:30
+MORNING_CLOSE = 11 * 60 + 30   # 11:30
+AFTERNOON_OPEN = 13 * 60       # 13:00
+SESSION_MINUTES = 240          # 上午 120 + 下午 120
+
+
+def _local_offset_seconds() -> int:
+    """本机时区偏移 (A 股所在时区无夏令时，取当前偏移即可)"""
+    return int(datetime.now().astimezone().utcoffset().total_seconds())
+
+
+def _split_times(values):
+    """
+    把 QMT 时间列拆成 (交易日序号, 当日分钟数, 格式)，全程整数运算、不解析字符串
+    - 'YYYYMMDDHHMMSS' 字符串: 交易日序号为 YYYYMMDD
+    - (毫)秒时间戳: 交易日序号为本地自然日 (自 1970-01-01 起的天数)
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'iuf':
+        ms = len(values) and values.max() > 1e11
+        local = values.astype(np.int64) // (1000 if ms else 1) + _local_offset_seconds()
+        return local // 86400, local % 86400 // 60, 'ms' if ms else 's'
+    n = values.astype(np.int64)
+    if len(n) and n.max() < 10 ** 8:
+        n = n * 10 ** 6  # 仅有日期的 'YYYYMMDD'
+    return n // 10 ** 6, (n // 10 ** 4 % 100) * 60 + n // 100 % 100, 'text'
+
+
+def _join_times(day: np.ndarray, clock: np.ndarray, kind: str):
+    """_split_times 的逆运算：按输入格式输出时间列"""
+    if kind == 'text':
+        return (day * 10 ** 6 + (clock // 60) * 10 ** 4 + (clock % 60) * 100).astype(str)
+    epoch = day * 86400 + clock * 60 - _local_offset_seconds()
+    return epoch * 1000 if kind == 'ms' else epoch
+
+
+def _day_number(day: np.ndarray, kind: str) -> np.ndarray:
+    """交易日序号 -> 自 1970-01-01 起的天数"""
+    if kind != 'text':
+        return day
+    months = ((day // 10000 - 1970) * 12 + day // 100 % 100 - 1).astype('datetime64[M]')
+    return months.astype('datetime64[D]').astype(np.int64) + day % 100 - 1
+
+
+def session_minute_index(minutes: np.ndarray) -> np.ndarray:
+    """
+    K 线 (按结束时间标记) 在当日交易时段中的分钟序号：09:31 -> 1 ... 11:30 -> 120, 13:01 -> 121 ... 15:00 -> 240
+    minutes 为当日分钟数；集合竞价等时段外的 K 线归入首根
+    """
+    idx = np.where(minutes <= MORNING_CLOSE, minutes - MORNING_OPEN, SESSION_MINUTES // 2 + minutes - AFTERNOON_OPEN)
+    return np.clip(idx, 1, SESSION_MINUTES)
+
+
+def _minute_to_clock(idx: np.ndarray) -> np.ndarray:
+    """分钟序号 -> 当日分钟数 (与 session_minute_index 互逆)"""
+    return np.where(idx <= SESSION_MINUTES // 2, MORNING_OPEN + idx, AFTERNOON_OPEN + idx - SESSION_MINUTES // 2)
+
+
+def _ohlcv(df: pd.DataFrame, keys: np.ndarray):
+    """
+    按分组键合并 K 线 (输入按时间升序，同组连续)，用 reduceat 一次完成
+    返回 (各组起始行, 各组结束行, OHLCV 字典)
+    """
+    starts = np.r_[0, np.flatnonzero(keys[1:] != keys[:-1]) + 1]
+    ends = np.r_[starts[1:], len(keys)] - 1
+    return starts, ends, {
+        'open': df['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+        'close': df['close'].to_numpy()[ends],
+        'volume': np.add.reduceat(df['volume'].to_numpy(), starts),
+    }
+
+
+def aggregate_intraday(df_1m: pd.DataFrame, minutes: int) -> pd.DataFrame:
+    """
+    由 1 分钟 K 线合成 N 分钟 K 线 (A 股 09:30-11:30 / 13:00-15:00，不跨午休、不跨日)
+    与 QMT 一致按结束时间标记，如 5m 首根为 09:35，1h 为 10:30/11:30/14:00/15:00
+    """
+    if df_1m.empty:
+        return df_1m.copy()
+    day, minute, kind = _split_times(df_1m['time'].to_numpy())
+    idx = session_minute_index(minute)
+    bucket_end = ((idx - 1) // minutes + 1) * minutes
+    starts, ends, cols = _ohlcv(df_1m, day * SESSION_MINUTES + bucket_end)
+    out = pd.DataFrame(cols)
+    out.insert(0, 'time', _join_times(day[starts], _minute_to_clock(bucket_end[starts]), kind))
+    return out
+
+
+def aggregate_calendar(df_1d: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """由日线合成周线 ('week'，周一至周日) 或月线 ('month')，以区间内最后一个交易日标记"""
+    if df_1d.empty:
+        return df_1d.copy()
+    times = df_1d['time'].to_numpy()
+    day, _, kind = _split_times(times)
+    days = _day_number(day, kind)
+    if rule == 'week':
+        keys = (days + 3) // 7  # 1970-01-01 为周四，+3 后按周一切分
+    else:
+        keys = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    _, ends, cols = _ohlcv(df_1d, keys)
+    out = pd.DataFrame(cols)
+    out.insert(0, 'time', times[ends])
+    return out
+
+
+def aggregate(df_base: pd.DataFrame, period: str) -> pd.DataFrame:
+    _, rule = DERIVED_PERIODS[period]
+    if isinstance(rule, int):
+        return aggregate_intraday(df_base, rule)
+    return aggregate_calendar(df_base, rule)
+
+
+class BarCache:
+    """
+    每只股票只维护 1m 与 1d 两路基础 K 线，其余周期在本地合成
+    - 首次整段拉取，之后只拉取自上次刷新以来的增量并合并
+    - 整段拉取早于后台历史下载完成时序列不完整：下载完成 (has_history) 后再整段拉取一次
+    - 同一扫描内多个周期共享一次刷新 (ttl 秒内不重复拉取)
+    - 最多缓存 max_stocks 只股票，超过时淘汰最久未使用的股票
+    """
+    def __init__(self, fetch: Callable[[str, str, int], pd.DataFrame],
+                 minute_bars: int = 12000, daily_bars: int = 4500, ttl: float = 1.0, max_stocks: int = 1000):
+        self.fetch = fetch
+        self.max_bars = {'1m': minute_bars, '1d': daily_bars}
+        self.ttl = ttl
+        self.max_stocks = max_stocks
+        self._recent: 'OrderedDict[str, None]' = OrderedDict()   # 股票的最近使用顺序
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._base = {}        # Key: (stock_code, base), Value: DataFrame
+        self._refreshed = {}   # Key: (stock_code, base), Value: 刷新时间戳
+        self._derived = {}     # Key: (stock_code, period), Value: (基础周期状态标记, 合成结果)
+        self._complete = set() # 历史下载完成后整段拉取过的 (stock_code, base)
+        self.has_history: Optional[Callable[[str, str], bool]] = None  # DownloadScheduler.has_history；None 视为已下载
+        self.fetches = 0
+        self.calendar = None   # TradingCalendar：休市且收盘后已刷新过则不再拉取
+        self.close_settle = 60 # 收盘后等待最后一根 K 线落定的秒数
+
+    def _incremental_count(self, base: str, elapsed: float) -> int:
+        unit = 60 if base == '1m' else 86400
+        return int(min(self.max_bars[base], elapsed // unit + 3))
+
+    def base(self, stock_code: str, base: str) -> pd.DataFrame:
+        key = (stock_code, base)
+        now = time.time()
+        with self._lock:
+            cached = self._base.get(key)
+            last = self._refreshed.get(key, 0)
+            complete = key in self._complete
+            if stock_code in self._recent:
+                self._recent.move_to_end(stock_code)
+        downloaded = self.has_history is None or self.has_history(stock_code, base)
+        previous = cached
+        if cached is not None and not complete and downloaded:
+            # 缓存取自历史下载完成之前 (或来自这样的快照)，按冷启动整段重新拉取
+            cached = None
+        if cached is not None and now - last < self.ttl:
+            return cached
+        if cached is not None and self.calendar is not None:
+            now_dt = datetime.fromtimestamp(now)
+            if not self.calendar.is_trading_time(now_dt) and \
+                    last >= self.calendar.last_session_end(now_dt).timestamp() + self.close_settle:
+                return cached
+
+        count = self.max_bars[base] if cached is None else self._incremental_count(base, now - last)
+        fresh = self.fetch(stock_code, base, count)
+        self.fetches += 1
+        if fresh.empty:
+            return previous if previous is not None else fresh
+        if cached is not None and not cached.empty:
+            # 新数据覆盖缓存中同一时间及之后的 K 线 (最后一根在途 K 线会被更新)
+            head = cached[cached['time'] < fresh['time'].iloc[0]]
+            fresh = pd.concat([head, fresh], ignore_index=True).iloc[-self.max_bars[base]:].reset_index(drop=True)
+        with self._lock:
+            self._base[key] = fresh
+            self._refreshed[key] = now
+            if cached is None and downloaded:
+                self._complete.add(key)
+            self._recent[stock_code] = None
+            self._recent.move_to_end(stock_code)
+            stale = []
+            while len(self._recent) > self.max_stocks:
+                stale.append(self._recent.popitem(last=False)[0])
+        for code in stale:
+            self.drop(code)
+            self.evicted += 1
+        return fresh
+
+    def get(self, stock_code: str, period: str, count: int = 200) -> pd.DataFrame:
+        return self.frame(stock_code, period).iloc[-count:].reset_index(drop=True)
+
+    def frame(self, stock_code: str, period: str) -> pd.DataFrame:
+        """某周期的完整缓存序列 (只读，调用方不应修改)"""
+        if period in self.max_bars:
+            return self.base(stock_code, period)
+        base, _ = DERIVED_PERIODS[period]
+        df_base = self.base(stock_code, base)
+        if df_base.empty:
+            return df_base
+        marker = (df_base['time'].iloc[0], df_base['time'].iloc[-1], len(df_base), df_base['close'].iloc[-1])
+        key = (stock_code, period)
+        with self._lock:
+            memo = self._derived.get(key)
+        if memo is not None and memo[0] == marker:
+            return memo[1]
+        out = aggregate(df_base, period)
+        with self._lock:
+            # 合成期间股票被淘汰 / 释放时不再写回
+            if (stock_code, base) in self._base:
+                self._derived[key] = (marker, out)
+        return out
+
+    def drop(self, stock_code: str):
+        with self._lock:
+            self._recent.pop(stock_code, None)
+            for store in (self._base, self._refreshed, self._derived):
+                for key in [k for k in store if k[0] == stock_code]:
+                    store.pop(key, None)
+            self._complete = {k for k in self._complete if k[0] != stock_code}
+
+    def snapshot(self) -> Dict:
+        """基础周期 K 线与刷新时间 (热启动快照，合成周期启动后按需重算)"""
+        with self._lock:
+            return {'base': dict(self._base), 'refreshed': dict(self._refreshed), 'recent': list(self._recent),
+                    'complete': set(self._complete)}
+
+    def restore(self, state: Dict):
+        """
+        载入快照：首轮扫描只增量拉取自快照以来的 K 线
+        (保存时尚未在历史下载完成后整段拉取过的序列不记为完整，下载完成后仍会整段重新拉取)
+        """
+        recent = state.get('recent', [])[-self.max_stocks:]
+        keep = set(recent)
+        with self._lock:
+            for key, df in state.get('base', {}).items():
+                if key[0] in keep and key[1] in self.max_bars and key not in self._base:
+                    self._base[key] = df.iloc[-self.max_bars[key[1]]:].reset_index(drop=True)
+                    self._refreshed[key] = state['refreshed'].get(key, 0)
+                    if key in state.get('complete', ()):
+                        self._complete.add(key)
+            for code in recent:
+                self._recent[code] = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            frames = list(self._base.values()) + [memo[1] for memo in self._derived.values()]
+            return {
+                'stocks': len(self._recent), 'max_stocks': self.max_stocks,
+                'base_series': len(self._base), 'derived_series': len(self._derived),
+                'bytes': int(sum(df.memory_usage(index=False).sum() for df in frames)),
+                'fetches': self.fetches, 'evicted': self.evicted,
+            }
@@ -0,0 +1,171 @@
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class BarView:
+    """
+    单只股票单个周期的 K 线视图：各列均为 BarStore 内存块上的切片 (不复制)
+    支持 len()、view['close'] 取列，可直接交给指标函数
+    """
+    __slots__ = ('time', 'open', 'high', 'low', 'close', 'volume', 'text_time')
+
+    def __init__(self, time, open_, high, low, close, volume, text_time: bool):
+        self.time = time
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.text_time = text_time
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.close) == 0
+
+    def __getitem__(self, col: str) -> np.ndarray:
+        if col == 'time' and self.text_time:
+            # QMT 原始时间为 'YYYYMMDDHHMMSS' 字符串，按需还原 (仅录制等场景使用)
+            return self.time.astype(str)
+        return getattr(self, col)
+
+    def head(self, n: int) -> 'BarView':
+        """前 n 根 (如丢弃最后一根未收盘 K 线)，仍为视图"""
+        return BarView(self.time[:n], self.open[:n], self.high[:n], self.low[:n],
+                       self.close[:n], self.volume[:n], self.text_time)
+
+    def bar_time(self, i: int = -1) -> str:
+        """与原 DataFrame 流程一致的 K 线时间标记 (信号去重依赖此格式)"""
+        raw = int(self.time[i])
+        if self.text_time:
+            return str(raw)
+        ts = raw / 1000 if raw > 1e11 else raw
+        return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+    def to_frame(self) -> pd.DataFrame:
+        data = {'time': self['time']}
+        data.update({f: getattr(self, f) for f in PRICE_FIELDS})
+        return pd.DataFrame(data)
+
+
+class _PeriodBlock:
+    """一个周期的预分配内存块：stocks × bars 的 float64 价格/成交量与 int64 时间"""
+    def __init__(self, rows: int, bars: int):
+        self.rows = {}          # Key: stock_code, Value: 行号
+        self.free = []          # 移出监控后回收的行号，新股票优先复用
+        self.next_row = 0
+        self._alloc(rows, bars)
+
+    def _alloc(self, rows: int, bars: int):
+        self.time = np.zeros((rows, bars), dtype=np.int64)
+        self.data = np.zeros((len(PRICE_FIELDS), rows, bars), dtype=np.float64)
+        self.length = np.zeros(rows, dtype=np.int64)
+        self.text_time = np.zeros(rows, dtype=bool)
+
+    @property
+    def capacity(self):
+        return self.time.shape
+
+    def grow(self, rows: int, bars: int):
+        """扩容 (行数/列数取两倍增长)；已发出的旧视图仍指向旧内存，不受影响"""
+        old_rows, old_bars = self.capacity
+        time, data, length, text_time = self.time, self.data, self.length, self.text_time
+        self._alloc(max(rows, old_rows), max(bars, old_bars))
+        self.time[:old_rows, :old_bars] = time
+        self.data[:, :old_rows, :old_bars] = data
+        self.length[:old_rows] = length
+        self.text_time[:old_rows] = text_time
+
+    def nbytes(self) -> int:
+        return self.time.nbytes + self.data.nbytes + self.length.nbytes + self.text_time.nbytes
+
+
+class BarStore:
+    """
+    紧凑的 K 线存储：每个周期一块预分配的连续 NumPy 数组 (stocks × bars)
+    - put() 把最新一段 K 线原地写入该股票所在行，不构建 DataFrame
+    - view() 返回行切片视图，指标直接在视图上计算
+    """
+    def __init__(self, stocks: int = 256, bars: int = 256):
+        self.initial_rows = stocks
+        self.initial_bars = bars
+        self._blocks: Dict[str, _PeriodBlock] = {}
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.grows = 0
+
+    def _row(self, stock_code: str, period: str, n: int):
+        block = self._blocks.get(period)
+        if block is None:
+            block = self._blocks[period] = _PeriodBlock(self.initial_rows, max(self.initial_bars, n))
+        row = block.rows.get(stock_code)
+        rows, bars = block.capacity
+        if row is None:
+            if block.free:
+                row = block.free.pop()
+            else:
+                row = block.next_row
+                block.next_row += 1
+            block.rows[stock_code] = row
+        if row >= rows or n > bars:
+            block.grow(rows * 2 if row >= rows else rows, max(bars, n))
+            self.grows += 1
+        return block, row
+
+    def put(self, stock_code: str, period: str, times, open_, high, low, close, volume) -> BarView:
+        """写入某只股票某周期的最新 n 根 K 线 (整段覆盖该行)"""
+        times = np.asarray(times)
+        n = len(times)
+        text_time = times.dtype.kind in 'USO'
+        with self._lock:
+            block, row = self._row(stock_code, period, n)
+            block.time[row, :n] = times.astype(np.int64) if text_time else times
+            for i, values in enumerate((open_, high, low, close, volume)):
+                block.data[i, row, :n] = values
+            block.length[row] = n
+            block.text_time[row] = text_time
+            self.writes += 1
+            return self._view(block, row)
+
+    def _view(self, block: _PeriodBlock, row: int, count: Optional[int] = None) -> BarView:
+        n = int(block.length[row])
+        start = 0 if count is None else max(0, n - count)
+        d = block.data[:, row, start:n]
+        return BarView(block.time[row, start:n], d[0], d[1], d[2], d[3], d[4], bool(block.text_time[row]))
+
+    def view(self, stock_code: str, period: str, count: Optional[int] = None) -> Optional[BarView]:
+        with self._lock:
+            block = self._blocks.get(period)
+            if block is None or stock_code not in block.rows:
+                return None
+            return self._view(block, block.rows[stock_code], count)
+
+    def drop(self, stock_code: str):
+        """移出监控的股票：清空长度并回收行号 (内存块不缩小，由后加入的股票复用)"""
+        with self._lock:
+            for block in self._blocks.values():
+                row = block.rows.pop(stock_code, None)
+                if row is not None:
+                    block.length[row] = 0
+                    block.free.append(row)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            periods = {
+                period: {'stocks': len(block.rows), 'free_rows': len(block.free), 'capacity': list(block.capacity),
+                         'bytes': block.nbytes()}
+                for period, block in self._blocks.items()
+            }
+            return {
+                'periods': periods,
+                'bytes': sum(p['bytes'] for p in periods.values()),
+                'writes': self.writes,
+                'grows': self.grows,
+            }
@@ -1,8 +1,17 @@
-import mysql.connector
 import yaml
 import os
+from src.data.sqlite_db import SQLiteConnection, init_sqlite_tables
+
+# 运行时覆盖的数据库配置 (基准测试/离线环境使用，None 表示读取 config.yaml)
+_config_override = None
+
+def set_db_config(config):
+    global _config_override
+    _config_override = config
 
 def get_db_config():
+    if _config_override is not None:
+        return _config_override
     # 获取项目根目录下的 config.yaml
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(os.path.dirname(current_dir))
@@ -15,6 +24,13 @@ def get_db_config():
 def connect_to_db():
     try:
         config = get_db_config()
+        if config.get('backend') == 'sqlite':
+            # 本地 SQLite 替身：无需 MySQL 服务即可运行
+            conn = SQLiteConnection(config['path'])
+            cursor = conn.cursor(dictionary=True)
+            init_sqlite_tables(conn, cursor)
+            return conn, cursor
+        import mysql.connector  # 只有 MySQL 后端用到，首次连接时再导入
         conn = mysql.connector.connect(
             host=config['host'],
             port=config['port'],
@@ -58,6 +74,28 @@ def _init_db_tables(conn, cursor):
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
         """)
         
+        # 3. 命名监控列表 (周期、检测器逗号分隔) 及其成员
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS watchlists (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(50) NOT NULL UNIQUE,
+                timeframes VARCHAR(100),
+                detectors VARCHAR(100),
+                priority INT DEFAULT 0,
+                enabled TINYINT DEFAULT 1,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS watchlist_stocks (
+                watchlist_id INT NOT NULL,
+                code VARCHAR(20) NOT NULL,
+                added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (watchlist_id, code),
+                INDEX idx_code (code)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+
         # 尝试为可能已经存在的旧表增加 bar_time 字段
         try:
             cursor.execute("SHOW COLUMNS FROM signal_history LIKE 'bar_time'")
@@ -106,5 +144,67 @@ def init_db():
         cursor.close()
         mydb.close()
 
+# 信号历史分页上限 (前端按页懒加载更早的信号)
+MAX_SIGNAL_PAGE = 500
+
+def fetch_signal_page(before_id=None, limit: int = 100):
+    """
+    按 id 倒序取一页信号历史 (键集分页)：before_id 为上一页最小的 id，None 表示最新一页
+    返回 [] 表示没有更早的记录
+    """
+    limit = max(1, min(int(limit), MAX_SIGNAL_PAGE))
+    mydb, cursor = connect_to_db()
+    if not mydb:
+        return []
+    try:
+        # 关联监控表以获取名称
+        where = "WHERE s.id < %s" if before_id is not None else ""
+        params = (int(before_id), limit) if before_id is not None else (limit,)
+        cursor.execute(f"""
+            SELECT s.*, m.name 
+            FROM signal_history s
+            LEFT JOIN monitored_stocks m ON s.stock_code = m.code 
+            {where}
+            ORDER BY s.id DESC 
+            LIMIT %s
+        """, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        mydb.close()
+
+# 单条 INSERT 语句的最大行数 (控制 SQL 长度)
+UPSERT_CHUNK = 500
+
+def upsert_monitored_stocks(rows):
+    """
+    批量加入监控列表 (多行 INSERT ... ON DUPLICATE KEY UPDATE)，已存在的代码只更新名称
+    rows: [{code, name}]；返回 (新增的代码列表, 已存在的代码列表)，数据库不可用时返回 None
+    """
+    if not rows:
+        return [], []
+    mydb, cursor = connect_to_db()
+    if not mydb:
+        return None
+    try:
+        codes = [r['code'] for r in rows]
+        existing = set()
+        for i in range(0, len(codes), UPSERT_CHUNK):
+            chunk = codes[i:i + UPSERT_CHUNK]
+            cursor.execute(f"SELECT code FROM monitored_stocks WHERE code IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            existing.update(row['code'] for row in cursor.fetchall())
+        for i in range(0, len(rows), UPSERT_CHUNK):
+            chunk = rows[i:i + UPSERT_CHUNK]
+            params = [v for r in chunk for v in (r['code'], r.get('name', ''))]
+            cursor.execute(f"""
+                INSERT INTO monitored_stocks (code, name) VALUES {', '.join(['(%s, %s)'] * len(chunk))}
+                ON DUPLICATE KEY UPDATE name = VALUES(name)
+            """, params)
+        mydb.commit()
+        return [c for c in codes if c not in existing], [c for c in codes if c in existing]
+    finally:
+        cursor.close()
+        mydb.close()
+
 if __name__ == "__main__":
     init_db()
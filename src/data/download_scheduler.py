@@ -0,0 +1,225 @@
+import time
+import heapq
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from src.services.metrics import metrics
+
+# 优先级：新加入的 (从未下载过) 优先于定期刷新，全市场扫描等后台批量需求排在最后
+PRIORITY_NEW = 0
+PRIORITY_REFRESH = 1
+PRIORITY_BACKGROUND = 2
+
+
+def refresh_interval(period: str) -> int:
+    """分钟线(及tick)每 2 分钟补一次，日线以上每 1 小时补一次"""
+    return 120 if (period.endswith('m') or period == 'tick' or period == '1h') else 3600
+
+
+def full_history_start(period: str, now: datetime, history_days: Optional[Dict[str, int]] = None) -> str:
+    """首次下载的起始日期：保证能取到 200 根以上"""
+    if history_days and period in history_days:
+        days = history_days[period]
+    elif period.endswith('m') or period == '1h':
+        days = 30  # 分钟线下载最近 30 天足以满足 200 根
+    elif period == '1d':
+        days = 365 * 2 # 日线下载 2 年
+    elif period == '1w':
+        days = 365 * 10 # 周线下载 10 年
+    elif period == '1mon':
+        days = 365 * 20 # 月线下载 20 年
+    else:
+        days = 5
+    return (now - timedelta(days=days)).strftime('%Y%m%d')
+
+
+class DownloadScheduler:
+    """
+    历史数据后台下载调度器
+    - request() 只负责入队，从不阻塞扫描线程
+    - 后台线程按 (周期, 起始日期) 合并成批，优先使用 download_history_data2 批量接口
+    - 仅下载自上次成功以来缺失的区间；新股票优先
+    """
+    def __init__(self, client, batch_size: int = 200, linger: float = 0.2):
+        self.client = client
+        self.batch_size = batch_size
+        self.linger = linger
+        self.history_days = {}      # 各周期首次下载天数的覆盖值
+        self._cond = threading.Condition()
+        self._heap = []             # (优先级, 入队时间, stock_code, period)
+        self._queued = set()
+        self._last_attempt = {}     # Key: (stock_code, period), Value: 上次入队时间戳
+        self._last_success = {}     # Key: (stock_code, period), Value: 上次成功下载时间
+        self._thread = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failures = 0
+        self.batches = 0
+        self.last_batch = None
+
+    # --- 扫描线程调用 ---
+    def request(self, stock_code: str, period: str, now_ts: Optional[float] = None, background: bool = False):
+        """
+        登记 (股票, 周期) 的下载需求；未到刷新时间或已在队列中则忽略
+        background: 后台批量需求 (全市场扫描)，排在监控股票的下载之后
+        """
+        now_ts = now_ts or time.time()
+        key = (stock_code, period)
+        last = self._last_attempt.get(key)
+        if last is not None and now_ts - last <= refresh_interval(period):
+            return
+        with self._cond:
+            if key in self._queued:
+                return
+            self._last_attempt[key] = now_ts
+            if background:
+                priority = PRIORITY_BACKGROUND
+            else:
+                priority = PRIORITY_REFRESH if key in self._last_success else PRIORITY_NEW
+            heapq.heappush(self._heap, (priority, now_ts, stock_code, period))
+            self._queued.add(key)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def has_history(self, stock_code: str, period: str) -> bool:
+        return (stock_code, period) in self._last_success
+
+    def forget(self, stock_code: str, period: Optional[str] = None):
+        """股票 (或其某个周期) 移出监控后清理下载记录，并撤下仍在队列中的下载任务"""
+        def match(key) -> bool:
+            return key[0] == stock_code and (period is None or key[1] == period)
+
+        with self._cond:
+            for key in [k for k in self._last_attempt if match(k)]:
+                self._last_attempt.pop(key, None)
+                self._last_success.pop(key, None)
+            if any(match(k) for k in self._queued):
+                self._queued = {k for k in self._queued if not match(k)}
+                self._heap = [item for item in self._heap if not match((item[2], item[3]))]
+                heapq.heapify(self._heap)
+
+    def download_now(self, stock_list: List[str], period: str):
+        """同步下载 (导出/回测等离线场景使用)"""
+        self._download_batch(period, self._start_for(stock_list[0], period), stock_list)
+
+    # --- 后台线程 ---
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='history-downloader', daemon=True)
+            self._thread.start()
+
+    def _start_for(self, stock_code: str, period: str) -> str:
+        last = self._last_success.get((stock_code, period))
+        if last is None:
+            return full_history_start(period, datetime.now(), self.history_days)
+        # 从上次成功的当日开始补，覆盖当日未完整的 K 线
+        return last.strftime('%Y%m%d')
+
+    def _take_batch(self):
+        """取出队首任务所在 (周期, 起始日期) 组的一批股票"""
+        with self._cond:
+            priority, _, code, period = heapq.heappop(self._heap)
+            start = self._start_for(code, period)
+            batch = [code]
+            rest = []
+            while self._heap and len(batch) < self.batch_size:
+                item = heapq.heappop(self._heap)
+                if item[3] == period and item[0] == priority and self._start_for(item[2], period) == start:
+                    batch.append(item[2])
+                else:
+                    rest.append(item)
+            for item in rest:
+                heapq.heappush(self._heap, item)
+            for c in batch:
+                self._queued.discard((c, period))
+            self.in_flight = len(batch)
+            return period, start, batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+            # 稍作等待，让同一轮扫描陆续发出的请求攒成一批
+            time.sleep(self.linger)
+            period, start, batch = self._take_batch()
+            try:
+                self._download_batch(period, start, batch)
+            finally:
+                self.in_flight = 0
+
+    def _download_batch(self, period: str, start: str, batch: List[str]):
+        xt = self.client.xt_data
+        if not xt:
+            return
+        started = time.perf_counter()
+        try:
+            with metrics.timer('history_download', period):
+                if hasattr(xt, 'download_history_data2') and len(batch) > 1:
+                    xt.download_history_data2(batch, period, start, '')
+                else:
+                    for code in batch:
+                        xt.download_history_data(code, period, start)
+            finished = datetime.now()
+            with self._cond:
+                for code in batch:
+                    self._last_success[(code, period)] = finished
+            self.completed += len(batch)
+        except Exception as e:
+            self.failures += len(batch)
+            # 失败后允许下一次扫描立即重新入队 (与 request / forget 在同一把锁下修改记录)
+            with self._cond:
+                for code in batch:
+                    self._last_attempt.pop((code, period), None)
+            print(f"下载 {period} 历史数据失败 ({len(batch)} 只): {e}")
+        self.batches += 1
+        self.last_batch = {
+            'period': period, 'start': start, 'size': len(batch),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+
+    # --- 观测 ---
+    def stats(self) -> Dict:
+        with self._cond:
+            by_period = {}
+            for _, _, _, period in self._heap:
+                by_period[period] = by_period.get(period, 0) + 1
+            return {
+                'queue_depth': len(self._heap),
+                'queue_by_period': by_period,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'failures': self.failures,
+                'batches': self.batches,
+                'last_batch': self.last_batch,
+            }
+
+    def snapshot(self) -> Dict:
+        """各 (股票, 周期) 上次成功下载的时间 (热启动后只补缺失区间)"""
+        with self._cond:
+            return {'last_success': dict(self._last_success)}
+
+    def restore(self, state: Dict):
+        with self._cond:
+            for key, finished in state.get('last_success', {}).items():
+                self._last_success.setdefault(key, finished)
+
+    def memory_stats(self) -> Dict:
+        """按 (股票, 周期) 记录的下载状态条目数 (股票移出监控后由 forget 清理)"""
+        with self._cond:
+            return {'tracked': len(self._last_attempt), 'with_history': len(self._last_success),
+                    'queued': len(self._queued)}
+
+    def render_prometheus(self) -> str:
+        s = self.stats()
+        lines = [
+            "# TYPE qmt_download_queue_depth gauge",
+            f"qmt_download_queue_depth {s['queue_depth']}",
+            "# TYPE qmt_download_in_flight gauge",
+            f"qmt_download_in_flight {s['in_flight']}",
+            "# TYPE qmt_download_completed_total counter",
+            f"qmt_download_completed_total {s['completed']}",
+            "# TYPE qmt_download_failures_total counter",
+            f"qmt_download_failures_total {s['failures']}",
+        ]
+        return '\n'.join(lines) + '\n'
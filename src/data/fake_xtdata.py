@@ -0,0 +1,230 @@
+import time
+import zlib
+import threading
+from collections import Counter
+from functools import lru_cache
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+from src.data.bar_aggregator import SESSION_MINUTES, _minute_to_clock
+
+# 各周期的 K 线间隔 (秒)，用于生成时间轴
+PERIOD_SECONDS = {
+    '1m': 60, '5m': 300, '15m': 900, '30m': 1800, '1h': 3600,
+    '1d': 86400, '1w': 7 * 86400, '1mon': 30 * 86400,
+}
+
+# 合成市场的板块构成：板块名 -> (代码前缀, 起始编号, 后缀, 占全市场比例)
+_BOARDS = [
+    ('上证A股', '60', 0, '.SH', 0.38),
+    ('科创板', '688', 0, '.SH', 0.10),
+    ('深证A股', '00', 1, '.SZ', 0.27),
+    ('创业板', '300', 0, '.SZ', 0.20),
+    ('北证A股', '83', 0, '.BJ', 0.05),
+]
+
+INDICES = {
+    '000001.SH': '上证指数', '399001.SZ': '深证成指', '399006.SZ': '创业板指',
+    '000688.SH': '科创50', '899050.BJ': '北证50', '000300.SH': '沪深300',
+}
+
+
+def _seed(*parts) -> int:
+    return zlib.crc32('|'.join(str(p) for p in parts).encode('utf-8'))
+
+
+@lru_cache(maxsize=64)
+def _session_times(period: str, now: datetime, length: int) -> List[str]:
+    """
+    生成截至 now 的 length 个 K 线时间 (与 QMT 一致)
+    - 分钟线按交易时段的结束时间标记 (09:31..11:30, 13:01..15:00)，跳过周末
+    - 日线为交易日 00:00；周/月线按固定间隔
+    """
+    step = PERIOD_SECONDS.get(period, 86400)
+    if step >= 7 * 86400:
+        end = now.timestamp() // step * step
+        return [datetime.fromtimestamp(end - step * (length - 1 - i)).strftime('%Y%m%d%H%M%S') for i in range(length)]
+    today = pd.Timestamp(now).normalize()
+    if step >= 86400:
+        days = pd.bdate_range(end=today, periods=length)
+        return list(days.strftime('%Y%m%d%H%M%S'))
+    clock = _minute_to_clock(np.arange(step // 60, SESSION_MINUTES + 1, step // 60))
+    per_day = len(clock)
+    days = pd.bdate_range(end=today, periods=length // per_day + 2)
+    stamps = (days.values[:, None] + (clock * 60 * 10 ** 9).astype('timedelta64[ns]')[None, :]).ravel()
+    stamps = stamps[stamps <= np.datetime64(pd.Timestamp(now).floor('min'))]
+    return list(pd.DatetimeIndex(stamps[-length:]).strftime('%Y%m%d%H%M%S'))
+
+
+class FakeXtData:
+    """
+    确定性的进程内 xtdata 替身 (脱离 Windows QMT 环境运行监控、统计与基准测试)
+    - n_stocks: 合成市场的 A 股数量
+    - latency: 每次调用的模拟延迟 (秒)，可为统一数值或 {接口名: 秒} 字典
+    - calls: 各接口调用次数
+    """
+    def __init__(self, n_stocks: int = 500, latency: Union[float, Dict[str, float]] = 0.0,
+                 seed: int = 0, now: Optional[datetime] = None):
+        self.seed = seed
+        self.latency = latency
+        self.now = now or datetime.now().replace(second=0, microsecond=0)
+        self.calls = Counter()
+        self.subscriptions = set()      # 当前有效的 (代码, 周期) 订阅
+        self._sub_seq = {}              # Key: 订阅号, Value: (代码, 周期)
+        self._lock = threading.Lock()
+        self._series = {}
+        self._tick_seq = 0
+        self._build_market(n_stocks)
+
+    def _build_market(self, n_stocks: int):
+        self.sectors = {}
+        all_codes = []
+        for name, prefix, start, suffix, share in _BOARDS:
+            count = max(1, int(round(n_stocks * share)))
+            width = 6 - len(prefix)
+            codes = [f"{prefix}{start + i:0{width}d}{suffix}" for i in range(count)]
+            self.sectors[name] = codes
+            all_codes.extend(codes)
+        all_codes = all_codes[:n_stocks]
+        kept = set(all_codes)
+        self.sectors = {k: [c for c in v if c in kept] for k, v in self.sectors.items()}
+        self.sectors['沪深京A股'] = all_codes
+        self.sectors['沪深A股'] = [c for c in all_codes if not c.endswith('.BJ')]
+        self.instruments = {}
+        for code in all_codes + list(INDICES):
+            rng = np.random.default_rng(_seed(self.seed, code))
+            self.instruments[code] = {
+                'InstrumentID': code.split('.')[0],
+                'InstrumentName': INDICES.get(code, f"股票{code.split('.')[0]}"),
+                'PreClose': round(float(rng.uniform(5, 80) if code not in INDICES else rng.uniform(1000, 5000)), 2),
+            }
+
+    def _call(self, name: str):
+        self.calls[name] += 1
+        delay = self.latency.get(name, 0.0) if isinstance(self.latency, dict) else self.latency
+        if delay:
+            time.sleep(delay)
+
+    # --- 行情订阅 / 下载 ---
+    def download_history_data(self, stock_code, period, start_time='', end_time='', **kwargs):
+        self._call('download_history_data')
+
+    def download_history_data2(self, stock_list, period, start_time='', end_time='', callback=None, **kwargs):
+        self._call('download_history_data2')
+
+    def subscribe_quote(self, stock_code, period='1d', start_time='', end_time='', count=0, callback=None):
+        self._call('subscribe_quote')
+        with self._lock:
+            self.subscriptions.add((stock_code, period))
+            seq = len(self._sub_seq) + 1
+            self._sub_seq[seq] = (stock_code, period)
+            return seq
+
+    def subscribe_whole_quote(self, code_list, callback=None):
+        self._call('subscribe_whole_quote')
+        return 1
+
+    def unsubscribe_quote(self, seq):
+        self._call('unsubscribe_quote')
+        with self._lock:
+            self.subscriptions.discard(self._sub_seq.get(seq))
+
+    # --- 基础信息 ---
+    def get_instrument_detail(self, stock_code, iscomplete=False):
+        self._call('get_instrument_detail')
+        return self.instruments.get(stock_code)
+
+    def get_trading_dates(self, market, start_time='', end_time='', count=-1):
+        """合成日历：周一至周五，毫秒时间戳 (与 xtdata 一致只到当日)"""
+        self._call('get_trading_dates')
+        end = pd.Timestamp(end_time) if end_time else pd.Timestamp(self.now).normalize()
+        start = pd.Timestamp(start_time) if start_time else end - pd.Timedelta(days=365)
+        return [int(d.timestamp() * 1000) for d in pd.bdate_range(start, end)]
+
+    def get_stock_list_in_sector(self, sector_name):
+        self._call('get_stock_list_in_sector')
+        return list(self.sectors.get(sector_name, []))
+
+    # --- K 线 ---
+    def _bars(self, stock_code: str, period: str, count: int) -> pd.DataFrame:
+        """按 (代码, 周期) 生成确定性随机游走，结尾对齐到 self.now"""
+        key = (stock_code, period)
+        cached = self._series.get(key)
+        if cached is not None and len(cached) >= count:
+            return cached.iloc[-count:]
+        length = max(count, 500)
+        step = PERIOD_SECONDS.get(period, 86400)
+        rng = np.random.default_rng(_seed(self.seed, stock_code, period))
+        base = self.instruments.get(stock_code, {}).get('PreClose', 10.0)
+        rets = rng.normal(0, 0.004 * (step / 60) ** 0.25, length)
+        close = base * np.exp(np.cumsum(rets) - np.sum(rets))
+        open_ = np.r_[close[0], close[:-1]]
+        spread = np.abs(rng.normal(0, 0.002, length)) * close
+        times = _session_times(period, self.now, length)
+        df = pd.DataFrame({
+            'open': open_, 'high': np.maximum(open_, close) + spread,
+            'low': np.minimum(open_, close) - spread, 'close': close,
+            'volume': rng.integers(100, 100000, length).astype(float),
+        }, index=times)
+        self._series[key] = df
+        return df.iloc[-count:]
+
+    def get_market_data(self, field_list=None, stock_list=None, period='1d', start_time='', end_time='',
+                        count=-1, dividend_type='none', fill_data=True):
+        self._call('get_market_data')
+        field_list = field_list or ['open', 'high', 'low', 'close', 'volume']
+        count = 200 if not count or count < 0 else count
+        frames = {code: self._bars(code, period, count) for code in (stock_list or [])}
+        # 与 QMT 保持一致：{字段: DataFrame(Index=股票代码, Columns=时间)}
+        indexes = [df.index for df in frames.values()]
+        if indexes and all(ix.equals(indexes[0]) for ix in indexes):
+            # 同一时间轴 (合成行情的常见情况)：直接拼矩阵，省去逐列对齐
+            codes = list(frames)
+            return {
+                f: pd.DataFrame(np.vstack([df[f].to_numpy() for df in frames.values()]), index=codes, columns=indexes[0])
+                for f in field_list
+            }
+        return {
+            f: pd.DataFrame({code: df[f] for code, df in frames.items()}).T
+            for f in field_list
+        }
+
+    # --- 快照 ---
+    def _tick(self, code: str, seq: int) -> Dict:
+        detail = self.instruments.get(code)
+        if detail is None:
+            return None
+        pre_close = detail['PreClose']
+        phase = (_seed(code) % 1000) / 1000.0
+        change = 0.08 * np.sin(seq * 0.1 + phase * 6.283)
+        price = round(pre_close * (1 + change), 2)
+        # 盘口：买卖各 5 档，按代码与序号偶尔出现特殊数字挂单
+        vols = [float((_seed(code, seq, i) % 5000) + 1) for i in range(10)]
+        if (_seed(code, seq) % 97) == 0:
+            vols[1] = 888.0
+        return {
+            'time': int(self.now.timestamp() * 1000) + seq,
+            'lastPrice': price, 'lastClose': pre_close, 'open': pre_close,
+            'high': max(price, pre_close), 'low': min(price, pre_close),
+            'volume': float(vols[0] * 100), 'amount': float(vols[0] * 100 * price), 'lastVol': vols[9],
+            'bidPrice': [round(price - 0.01 * (i + 1), 2) for i in range(5)], 'bidVol': vols[:5],
+            'askPrice': [round(price + 0.01 * (i + 1), 2) for i in range(5)], 'askVol': vols[5:],
+        }
+
+    def get_full_tick(self, code_list: List[str]) -> Dict[str, Dict]:
+        self._call('get_full_tick')
+        with self._lock:
+            self._tick_seq += 1
+            seq = self._tick_seq
+        res = {}
+        for code in code_list:
+            tick = self._tick(code, seq)
+            if tick is not None:
+                res[code] = tick
+        return res
+
+    def advance(self, minutes: int = 1):
+        """推进合成时钟 (K 线会在新的时间轴上重新生成)"""
+        self.now += timedelta(minutes=minutes)
+        self._series.clear()
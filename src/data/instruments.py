@@ -0,0 +1,154 @@
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+INSTRUMENT_SECTOR = '沪深京A股'
+SUFFIXES = ('.SH', '.SZ', '.BJ')
+_SUFFIX_RANK = {s: i for i, s in enumerate(SUFFIXES)}
+
+
+def _suffix_rank(code: str) -> int:
+    return _SUFFIX_RANK.get(code[code.find('.'):], len(SUFFIXES))
+
+
+class InstrumentCache:
+    """
+    全市场代码 / 名称对照表 (每个交易日加载一次)
+    - 批量解析 (导入监控列表、按名称添加) 只查内存字典，不再逐个调用 get_instrument_detail 或遍历全市场
+    - 不在 A 股列表中的代码 (指数、ETF 等) 回退到 get_instrument_detail 并记入缓存
+    - 单个代码直接查询 get_instrument_detail，对照表在后台线程加载；加载由一把锁串行化，同一天只遍历一次全市场
+    """
+    def __init__(self, client):
+        self.client = client
+        self._lock = threading.Lock()
+        self._names: Dict[str, str] = {}        # Key: 代码, Value: 名称
+        self._by_name: Dict[str, str] = {}      # Key: 名称, Value: 代码
+        self._by_digits: Dict[str, str] = {}    # Key: 6 位数字, Value: 代码 (按 SUFFIXES 顺序优先)
+        self._load_lock = threading.Lock()
+        self._loader: Optional[threading.Thread] = None
+        self.loaded_on: Optional[date] = None
+
+    def _ensure_loaded(self, wait: bool = True):
+        """确保当日对照表已加载；wait=False 时只在后台启动加载并立即返回"""
+        if self.loaded_on == date.today() or self.client.xt_data is None:
+            return
+        if wait:
+            self._load()
+            return
+        with self._lock:
+            if self._loader is not None and self._loader.is_alive():
+                return
+            self._loader = threading.Thread(target=self._load, name='instrument-load', daemon=True)
+            self._loader.start()
+
+    def _load(self):
+        """遍历全市场加载对照表；并发调用方等待正在进行的那次加载，不再各自遍历"""
+        with self._load_lock:
+            if self.loaded_on == date.today():
+                return
+            xt = self.client.xt_data
+            if xt is None:
+                return
+            try:
+                names = {}
+                for code in xt.get_stock_list_in_sector(INSTRUMENT_SECTOR) or []:
+                    detail = xt.get_instrument_detail(code) or {}
+                    names[code] = detail.get('InstrumentName', '')
+            except Exception as e:
+                print(f"加载全市场代码对照表失败: {e}")
+                return
+            self._install(names)
+
+    def _install(self, names: Dict[str, str]):
+        with self._lock:
+            # 保留已单独查询过的代码 (指数、ETF 等)
+            self._names = dict(self._names, **names)
+            self._by_name = {}
+            self._by_digits = {}
+            for code, name in self._names.items():
+                self._index(code, name)
+            self.loaded_on = date.today()
+
+    def _index(self, code: str, name: str):
+        if name:
+            self._by_name.setdefault(name, code)
+        digits = code.partition('.')[0]
+        current = self._by_digits.get(digits)
+        if current is None or _suffix_rank(code) < _suffix_rank(current):
+            self._by_digits[digits] = code
+
+    def _detail(self, code: str) -> Optional[str]:
+        """对照表之外的代码：查询一次并记入缓存"""
+        xt = self.client.xt_data
+        detail = xt.get_instrument_detail(code) if xt is not None else None
+        if not detail:
+            return None
+        name = detail.get('InstrumentName', '')
+        with self._lock:
+            self._names[code] = name
+        return name
+
+    def resolve(self, text: str) -> Optional[Dict]:
+        """代码 (带或不带后缀) 或名称 -> {code, name}，无法识别返回 None"""
+        text = str(text).strip()
+        if not text:
+            return None
+        if '.' in text:
+            self._ensure_loaded(wait=False)
+            code = text.upper()
+            name = self._names.get(code)
+            if name is None:
+                name = self._detail(code)
+            return {'code': code, 'name': name} if name is not None else None
+        if text.isdigit():
+            # 对照表未加载时按 SUFFIXES 顺序逐个查询，不等待全市场遍历
+            self._ensure_loaded(wait=False)
+            code = self._by_digits.get(text)
+            if code:
+                return {'code': code, 'name': self._names[code]}
+            for suffix in SUFFIXES:
+                name = self._detail(text + suffix)
+                if name is not None:
+                    return {'code': text + suffix, 'name': name}
+            return None
+        # 名称只能查对照表
+        self._ensure_loaded()
+        code = self._by_name.get(text)
+        return {'code': code, 'name': text} if code else None
+
+    def resolve_many(self, inputs: List[str]) -> Tuple[List[Dict], List[str]]:
+        """批量解析 (一次遍历)，返回 (去重后的 {code, name} 列表, 无法识别的输入)"""
+        resolved: Dict[str, Dict] = {}
+        unresolved = []
+        self._ensure_loaded()
+        for text in inputs:
+            item = self.resolve(text)
+            if item is None:
+                unresolved.append(str(text).strip())
+            else:
+                resolved.setdefault(item['code'], item)
+        return list(resolved.values()), unresolved
+
+    def name(self, code: str) -> str:
+        self._ensure_loaded()
+        name = self._names.get(code)
+        return name if name is not None else (self._detail(code) or '')
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {'names': dict(self._names), 'loaded_on': self.loaded_on}
+
+    def restore(self, state: Dict):
+        """载入当日快照 (跨日的快照忽略，按需重新加载)"""
+        if state.get('loaded_on') != date.today() or self.loaded_on == date.today():
+            return
+        with self._lock:
+            self._names = dict(state['names'])
+            self._by_name = {}
+            self._by_digits = {}
+            for code, name in self._names.items():
+                self._index(code, name)
+            self.loaded_on = state['loaded_on']
+
+    def stats(self) -> Dict:
+        return {'instruments': len(self._names), 'loaded_on': str(self.loaded_on) if self.loaded_on else None}
@@ -1,20 +1,83 @@
 import sys
 import os
+import numpy as np
 import pandas as pd
 import yaml
-from typing import List, Dict, Optional
+from datetime import date
+from typing import Iterable, List, Dict, Optional, Set
+from src.services.metrics import metrics
+from src.data.download_scheduler import DownloadScheduler
+from src.data.bar_aggregator import BarCache, DERIVED_PERIODS
+from src.data.bar_store import BarStore, BarView, PRICE_FIELDS
+from src.data.tick_cache import TickCache
+from src.data.instruments import InstrumentCache
+from src.data.subscriptions import SubscriptionManager
+from src.indicators.features import FeatureCache
+from src.data.trading_calendar import TradingCalendar, DEFAULT_SESSIONS, DEFAULT_CALL_AUCTION
 
 class QMTClient:
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, xt_data=None):
         with open(config_path, 'r', encoding='utf-8') as f:
             self.config = yaml.safe_load(f)
         
         self.qmt_path = self.config['qmt']['path']
         self.xt_data = None
-        # 记录最后一次执行下载的时间，避免频繁下载导致拥堵
-        self._last_download_time = {} # Key: (stock_code, period), Value: timestamp
-        self._subscribed_klines = set() # 记录已订阅实时K线的股票周期
-        self._connect()
+        # 历史数据后台下载：按周期合并批量下载，只补缺失区间，不阻塞扫描
+        self.downloader = DownloadScheduler(self)
+        # 行情订阅按使用方引用计数，股票移出监控后退订 (见 forget)
+        self.subscriptions = SubscriptionManager(self)
+        # 扫描热路径使用的紧凑 K 线存储 (每周期一块 stocks × bars 数组)
+        store_cfg = self.config.get('bar_store') or {}
+        self.bar_store = BarStore(stocks=store_cfg.get('stocks', 256), bars=store_cfg.get('bars', 256))
+        # 本地合成周期：每只股票只拉取 1m / 1d 两路，5m~1h 与 1w/1mon 在本地合成
+        self.bar_cache = None
+        agg_cfg = self.config.get('aggregation') or {}
+        if agg_cfg.get('enabled'):
+            self.bar_cache = BarCache(self._fetch_kline,
+                                      minute_bars=agg_cfg.get('minute_bars', 12000),
+                                      daily_bars=agg_cfg.get('daily_bars', 4500),
+                                      max_stocks=agg_cfg.get('max_stocks', 1000))
+            # 合成 200 根 1h / 1mon 需要更长的基础周期历史
+            self.downloader.history_days.update({'1m': 80, '1d': 365 * 20})
+        # 行情快照：同时发生的相同/重叠请求合并为一次 get_full_tick，并短时缓存 (quotes.ttl 秒)
+        quote_cfg = self.config.get('quotes') or {}
+        # 等待他人在途调用的上限与 xtdata 的 get_full_tick 超时一致
+        xt_cfg = self.config.get('xtdata') or {}
+        wait_timeout = (xt_cfg.get('timeouts') or {}).get('get_full_tick', xt_cfg.get('timeout', 10.0))
+        self.ticks = TickCache(lambda codes: self.xt_data.get_full_tick(codes), ttl=quote_cfg.get('ttl', 1.0),
+                               max_entries=quote_cfg.get('max_entries', 8192), wait_timeout=wait_timeout)
+        # 代码 / 名称对照表：批量导入与按名称添加只查内存
+        self.instruments = InstrumentCache(self)
+        # 指标特征缓存：同一根 K 线上的 MACD / TD 计数等只算一次，监控扫描与全市场统计共用
+        self.features = FeatureCache((self.config.get('features') or {}).get('entries', 4096))
+        if xt_data is not None:
+            # 注入替身 (回放/离线测试)，不连接真实 QMT
+            self.xt_data = xt_data
+        else:
+            self._connect()
+        # 交易日历：监控循环、全市场统计与 K 线缓存据此在休市期间休眠
+        self.calendar = self._load_calendar()
+        if self.bar_cache is not None:
+            self.bar_cache.calendar = self.calendar
+            # 后台历史下载完成前取到的基础 K 线不完整，下载完成后整段重新拉取
+            self.bar_cache.has_history = self.downloader.has_history
+
+    def _load_calendar(self) -> TradingCalendar:
+        cal_cfg = self.config.get('calendar') or {}
+        return TradingCalendar.load(
+            self.xt_data,
+            path=cal_cfg.get('path'),
+            cache_path=cal_cfg.get('cache_path'),
+            sessions=self.config.get('monitor', {}).get('trading_sessions') or DEFAULT_SESSIONS,
+            call_auction=cal_cfg.get('call_auction', DEFAULT_CALL_AUCTION),
+        )
+
+    def refresh_calendar(self):
+        """跨日后重新加载交易日历 (每天一次)"""
+        if self.calendar.loaded_on != date.today():
+            self.calendar = self._load_calendar()
+            if self.bar_cache is not None:
+                self.bar_cache.calendar = self.calendar
 
     def _connect(self):
         try:
@@ -33,96 +96,131 @@ class QMTClient:
         except Exception as e:
             print(f"连接 QMT 失败: {e}")
 
+    VALID_PERIODS = ['tick', '1m', '5m', '15m', '30m', '1h', '1d', '1w', '1mon', '1q', '1hy', '1y']
+
+    def _check_period(self, period: str) -> bool:
+        # 预检合法周期，防止底层报错刷屏
+        if period not in self.VALID_PERIODS:
+            print(f"警告: 周期 '{period}' 不受 QMT 官方支持，已跳过。请使用: {', '.join(self.VALID_PERIODS)}")
+            return False
+        return True
+
+    def _use_bar_cache(self, period: str) -> bool:
+        return self.bar_cache is not None and (period in DERIVED_PERIODS or period in self.bar_cache.max_bars)
+
     def get_kline(self, stock_code: str, period: str, count: int = 200) -> pd.DataFrame:
         if not self.xt_data:
             return pd.DataFrame()
-            
-        # 预检合法周期，防止底层报错刷屏
-        valid_periods = ['tick', '1m', '5m', '15m', '30m', '1h', '1d', '1w', '1mon', '1q', '1hy', '1y']
-        if period not in valid_periods:
-            print(f"警告: 周期 '{period}' 不受 QMT 官方支持，已跳过。请使用: {', '.join(valid_periods)}")
+        if not self._check_period(period):
             return pd.DataFrame()
         
+        # 统一转为大写，防止大小写错误导致获取失败
+        stock_code = stock_code.upper()
+        if self._use_bar_cache(period):
+            try:
+                return self.bar_cache.get(stock_code, period, count)
+            except Exception as e:
+                print(f"合成 {stock_code} {period} K线异常: {e}")
+                return pd.DataFrame()
+        return self._fetch_kline(stock_code, period, count)
+
+    def get_bars(self, stock_code: str, period: str, count: int = 200) -> Optional[BarView]:
+        """
+        获取 K 线并写入紧凑存储，返回数组视图 (扫描热路径使用，不构建 DataFrame)
+        取不到数据时返回 None
+        """
+        if not self.xt_data or not self._check_period(period):
+            return None
+        stock_code = stock_code.upper()
         try:
-            # 统一转为大写，防止大小写错误导致获取失败
-            stock_code = stock_code.upper()
-            
-            # 冷启动/定期下载机制：避免每15秒扫一次就下载一次
-            import time
-            from datetime import datetime, timedelta
-            now_ts = time.time()
-            cache_key = (stock_code, period)
-            
-            # 动态调整下载间隔：分钟线(及tick)每 2 分钟更新一次，日线以上每 1 小时更新一次
-            update_interval = 120 if (period.endswith('m') or period == 'tick' or period == '1h') else 3600
-            
-            if cache_key not in self._last_download_time or (now_ts - self._last_download_time[cache_key] > update_interval):
-                now_dt = datetime.now()
-                if period.endswith('m') or period == '1h':
-                    days = 30  # 分钟线下载最近 30 天足以满足 200 根
-                elif period == '1d':
-                    days = 365 * 2 # 日线下载 2 年
-                elif period == '1w':
-                    days = 365 * 10 # 周线下载 10 年
-                elif period == '1mon':
-                    days = 365 * 20 # 月线下载 20 年
-                else:
-                    days = 5
-                    
-                start_date = (now_dt - timedelta(days=days)).strftime('%Y%m%d')
-                # 开启下载模式
-                self.xt_data.download_history_data(stock_code, period, start_date)
-                self._last_download_time[cache_key] = now_ts
-                # print(f"已触发 {stock_code} {period} 周期数据下载(间隔: {update_interval}s)")
-            
-            # 建立实时订阅：确保在下次下载前，K 线能通过 Tick 增量更新（这才是秒级准确的关键）
-            if cache_key not in self._subscribed_klines:
-                self.xt_data.subscribe_quote(stock_code, period=period, count=-1)
-                self._subscribed_klines.add(cache_key)
-            
-            # 获取市场数据
+            if self._use_bar_cache(period):
+                df = self.bar_cache.frame(stock_code, period)
+                if df.empty:
+                    return None
+                times = df['time'].to_numpy()[-count:]
+                cols = {f: df[f].to_numpy()[-count:] for f in PRICE_FIELDS}
+            else:
+                data = self._fetch_market_data(stock_code, period, count)
+                times, cols = self._extract_columns(data, stock_code)
+                if times is None or len(cols) < len(PRICE_FIELDS):
+                    return None
+            with metrics.timer('kline_build', period):
+                return self.bar_store.put(stock_code, period, times, *(cols[f] for f in PRICE_FIELDS))
+        except Exception as e:
+            print(f"获取 {stock_code} K线异常: {e}")
+            return None
+
+    def _fetch_market_data(self, stock_code: str, period: str, count: int):
+        """登记下载、建立订阅并调用 get_market_data，返回 QMT 原始结构"""
+        # 冷启动/定期下载机制：只登记需求，由后台调度器合并下载 (分钟线 2 分钟、日线以上 1 小时刷新一次)
+        self.downloader.request(stock_code, period)
+        
+        # 建立实时订阅：确保在下次下载前，K 线能通过 Tick 增量更新（这才是秒级准确的关键）
+        self.subscriptions.subscribe(stock_code, period)
+        
+        # 获取市场数据
+        with metrics.timer('kline_fetch', period):
             data = self.xt_data.get_market_data(
-                field_list=['open', 'high', 'low', 'close', 'volume'],
+                field_list=list(PRICE_FIELDS),
                 stock_list=[stock_code],
                 period=period,
                 count=count
             )
-            
-            if not data or not isinstance(data, dict):
-                print(f"未能获取到 {stock_code} 的市场数据")
-                return pd.DataFrame()
-            
-            # 格式转换 (QMT 返回的是 {field: DataFrame})
-            # DataFrame 的 Index 是时间戳，Columns 是股票代码
-            result_data = {}
-            for field in ['open', 'high', 'low', 'close', 'volume']:
-                if field in data:
-                    field_df = data[field]
-                    
-                    # 某些版本的 QMT 可能直接返回 Series 或数组，这里做健壮性处理
-                    if isinstance(field_df, pd.DataFrame):
-                        if stock_code in field_df.columns:
-                            result_data[field] = field_df[stock_code]
-                        elif stock_code in field_df.index: 
-                            result_data[field] = field_df.loc[stock_code]
-                    elif hasattr(field_df, '__getitem__') and stock_code in field_df:
-                        result_data[field] = field_df[stock_code]
-            
-            if not result_data:
-                # 尝试查找有没有类似的代码（比如大小写混合的）
-                available_cols = []
-                for f in data.values():
-                    if isinstance(f, pd.DataFrame):
-                        available_cols.extend(f.columns.tolist())
-                print(f"无法在返回数据中找到 {stock_code}。可用列: {list(set(available_cols))}")
+        
+        if not data or not isinstance(data, dict):
+            print(f"未能获取到 {stock_code} 的市场数据")
+            return None
+        return data
+
+    def _extract_columns(self, data, stock_code: str):
+        """
+        从 QMT 返回的 {field: DataFrame} 中取出单只股票的各列数组
+        DataFrame 的 Index 是股票代码，Columns 是时间 (部分版本相反)
+        返回 (times, {field: ndarray})，找不到时 times 为 None
+        """
+        if not data:
+            return None, {}
+        times = None
+        cols = {}
+        for field in PRICE_FIELDS:
+            if field not in data:
+                continue
+            field_df = data[field]
+            series = None
+            # 某些版本的 QMT 可能直接返回 Series 或数组，这里做健壮性处理
+            if isinstance(field_df, pd.DataFrame):
+                if stock_code in field_df.columns:
+                    series = field_df[stock_code]
+                elif stock_code in field_df.index:
+                    series = field_df.loc[stock_code]
+            elif hasattr(field_df, '__getitem__') and stock_code in field_df:
+                series = field_df[stock_code]
+            if series is None:
+                continue
+            if times is None:
+                times = series.index.to_numpy() if isinstance(series, pd.Series) else np.arange(len(series))
+            cols[field] = series.to_numpy(dtype=np.float64) if isinstance(series, pd.Series) else np.asarray(series, dtype=np.float64)
+
+        if not cols:
+            # 尝试查找有没有类似的代码（比如大小写混合的）
+            available_cols = []
+            for f in data.values():
+                if isinstance(f, pd.DataFrame):
+                    available_cols.extend(f.columns.tolist())
+            print(f"无法在返回数据中找到 {stock_code}。可用列: {list(set(available_cols))}")
+        return times, cols
+
+    def _fetch_kline(self, stock_code: str, period: str, count: int = 200) -> pd.DataFrame:
+        """直接从 xtdata 拉取单只股票单个周期的 K 线"""
+        try:
+            data = self._fetch_market_data(stock_code, period, count)
+            times, cols = self._extract_columns(data, stock_code)
+            if times is None or not len(times):
                 return pd.DataFrame()
-                
-            df = pd.DataFrame(result_data)
-            # 处理时间索引
-            if not df.empty:
-                df.index.name = 'time'
-                return df.reset_index()
-            return pd.DataFrame()
+            with metrics.timer('kline_build', period):
+                df = pd.DataFrame(cols)
+                df.insert(0, 'time', times)
+                return df
         except Exception as e:
             print(f"获取 {stock_code} K线异常: {e}")
             import traceback
@@ -138,44 +236,96 @@ class QMTClient:
 
     def resolve_stock_code(self, input_str: str) -> Optional[Dict]:
         """
-        解析输入的代码或名称，返回标准代码和名称
+        解析输入的代码或名称，返回标准代码和名称 (查全市场对照表，见 InstrumentCache)
         """
         if not self.xt_data:
             return None
-            
-        # 1. 如果输入已经是标准代码 (带后缀)
-        if '.' in input_str:
-            detail = self.xt_data.get_instrument_detail(input_str.upper())
-            if detail:
-                return {
-                    'code': input_str.upper(),
-                    'name': detail.get('InstrumentName', '')
-                }
-        
-        # 2. 如果输入是纯数字 (尝试补全后缀)
-        if input_str.isdigit():
-            for suffix in ['.SH', '.SZ', '.BJ']:
-                code = input_str + suffix
-                detail = self.xt_data.get_instrument_detail(code)
-                if detail:
-                    return {
-                        'code': code,
-                        'name': detail.get('InstrumentName', '')
-                    }
-        
-        # 3. 如果输入是名称 (尝试搜索)
-        # 注意：xtquant 没有直接的名称搜索 API，通常需要遍历全市场或使用本地缓存
-        # 这里简单处理：如果不是数字且不带点，尝试在全市场中匹配
-        all_stocks = self.xt_data.get_stock_list_in_sector('沪深A股')
-        for code in all_stocks:
-            detail = self.xt_data.get_instrument_detail(code)
-            if detail and detail.get('InstrumentName') == input_str:
-                return {
-                    'code': code,
-                    'name': input_str
-                }
-                
-        return None
+        return self.instruments.resolve(input_str)
+
+    def prefetch(self, stock_list: List[str], periods: List[str]):
+        """
+        新加入监控的股票：立即订阅 Tick 并登记各周期的历史下载 (后台合并批量下载)
+        本地合成的周期只登记其基础周期 (1m / 1d)
+        """
+        if not self.xt_data:
+            return
+        bases = []
+        for period in periods:
+            if period == 'tick':
+                continue
+            base = self._source_period(period)
+            if base not in bases:
+                bases.append(base)
+        for stock in stock_list:
+            self.subscriptions.subscribe(stock, 'tick')
+            for period in bases:
+                self.downloader.request(stock, period)
+
+    def _source_period(self, period: str) -> str:
+        """实际向 QMT 订阅 / 下载的周期：本地合成的周期取其基础周期"""
+        return DERIVED_PERIODS[period][0] if self._use_bar_cache(period) and period in DERIVED_PERIODS else period
+
+    def source_periods(self, periods: Iterable[str]) -> Set[str]:
+        """扫描这些周期需要保持的订阅周期 (含监控列表行情使用的 Tick)"""
+        return {'tick'} | {self._source_period(p) for p in periods if p != 'tick'}
+
+    def release_periods(self, stock_code: str, keep: Iterable[str], owner: str = 'monitor') -> List[str]:
+        """
+        扫描计划去掉了某些周期：释放使用方在 keep 之外的订阅，已退订的周期一并清理下载记录。
+        返回已退订的周期
+        """
+        dropped = self.subscriptions.release(stock_code, owner, keep=keep)
+        for period in dropped:
+            self.downloader.forget(stock_code, period)
+        return dropped
+
+    def forget(self, stock_code: str, owner: str = 'monitor') -> bool:
+        """
+        使用方不再需要某只股票：释放其订阅；没有其他使用方时一并退订并清理
+        K 线存储、合成缓存、特征缓存、行情快照与下载记录。返回是否已完全清理
+        """
+        self.subscriptions.release(stock_code, owner)
+        if self.subscriptions.holds(stock_code):
+            return False
+        self.bar_store.drop(stock_code)
+        if self.bar_cache is not None:
+            self.bar_cache.drop(stock_code)
+        self.features.drop(stock_code)
+        self.ticks.drop(stock_code)
+        self.downloader.forget(stock_code)
+        return True
+
+    def memory_stats(self) -> Dict:
+        """进程内各缓存的规模与订阅数 (内存报告)"""
+        return {
+            'subscriptions': self.subscriptions.stats(),
+            'bar_store': self.bar_store.stats(),
+            'bar_cache': self.bar_cache.stats() if self.bar_cache is not None else None,
+            'features': self.features.stats(),
+            'quotes': self.ticks.stats(),
+            'downloads': self.downloader.memory_stats(),
+            'instruments': self.instruments.stats(),
+        }
+
+    def snapshot(self) -> Dict:
+        """热启动快照：K 线合成缓存、代码对照表与下载记录"""
+        return {
+            'bar_cache': self.bar_cache.snapshot() if self.bar_cache is not None else None,
+            'instruments': self.instruments.snapshot(),
+            'downloads': self.downloader.snapshot(),
+        }
+
+    def restore(self, state: Dict):
+        if self.bar_cache is not None and state.get('bar_cache'):
+            self.bar_cache.restore(state['bar_cache'])
+        self.instruments.restore(state.get('instruments') or {})
+        self.downloader.restore(state.get('downloads') or {})
+
+    def get_full_tick(self, stock_list: List[str]) -> Dict[str, Dict]:
+        """行情快照 (经单飞与短时缓存，见 TickCache)"""
+        if not self.xt_data:
+            return {}
+        return self.ticks.get(stock_list)
 
     def get_realtime_data(self, stock_list: List[str]) -> Dict[str, Dict]:
         """
@@ -189,15 +339,12 @@ class QMTClient:
             return {}
             
         try:
-            # 订阅行情确保有实时数据流 (增加缓存判断，防止内存泄漏)
+            # 订阅行情确保有实时数据流 (引用计数，重复调用不会重复订阅)
             for stock in stock_list:
-                cache_key = (stock, 'tick')
-                if cache_key not in self._subscribed_klines:
-                    self.xt_data.subscribe_quote(stock, period='tick', count=-1)
-                    self._subscribed_klines.add(cache_key)
+                self.subscriptions.subscribe(stock, 'tick')
             
             res = {}
-            ticks = self.xt_data.get_full_tick(stock_list)
+            ticks = self.get_full_tick(stock_list)
             
             if not ticks:
                 print(f"未获取到股票行情快照: {stock_list}")
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+
+# 盘口档位数 (QMT 普通行情为 5 档，不足补 0)
+DEPTH_LEVELS = 5
+
+# 周期编码：落盘时以 int8 存储，回放时还原
+PERIODS = ['tick', '1m', '5m', '15m', '30m', '1h', '1d', '1w', '1mon', '1q', '1hy', '1y']
+
+# 列定义：列名 -> (dtype, 每行元素数)
+TICK_COLUMNS = {
+    'recv_ms': ('<i8', 1),      # 录制时刻 (毫秒时间戳)，回放按此排序
+    'time': ('<i8', 1),         # 行情自带时间 (毫秒)
+    'code': ('<i4', 1),         # 股票代码索引 (见 codes.txt)
+    'lastPrice': ('<f8', 1),
+    'lastClose': ('<f8', 1),
+    'lastVol': ('<f8', 1),
+    'volume': ('<f8', 1),
+    'amount': ('<f8', 1),
+    'bidPrice': ('<f8', DEPTH_LEVELS),
+    'bidVol': ('<f8', DEPTH_LEVELS),
+    'askPrice': ('<f8', DEPTH_LEVELS),
+    'askVol': ('<f8', DEPTH_LEVELS),
+}
+
+BAR_COLUMNS = {
+    'recv_ms': ('<i8', 1),      # 该 K 线被确认收盘的时刻
+    'code': ('<i4', 1),
+    'period': ('<i1', 1),
+    'time': ('<i8', 1),         # K 线时间 (毫秒)
+    'open': ('<f8', 1),
+    'high': ('<f8', 1),
+    'low': ('<f8', 1),
+    'close': ('<f8', 1),
+    'volume': ('<f8', 1),
+}
+
+
+def to_epoch_ms(raw_time) -> int:
+    """将 QMT 返回的各种 K 线时间格式统一为毫秒时间戳"""
+    if isinstance(raw_time, (int, float, np.integer, np.floating)):
+        return int(raw_time) if raw_time > 1e11 else int(raw_time * 1000)
+    if isinstance(raw_time, datetime):
+        return int(raw_time.timestamp() * 1000)
+    text = str(raw_time)
+    for fmt in ('%Y%m%d%H%M%S', '%Y%m%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return int(datetime.strptime(text, fmt).timestamp() * 1000)
+        except ValueError:
+            continue
+    raise ValueError(f"无法解析 K 线时间: {raw_time}")
+
+
+def _pad_levels(values) -> List[float]:
+    values = list(values or [])[:DEPTH_LEVELS]
+    return [float(v) for v in values] + [0.0] * (DEPTH_LEVELS - len(values))
+
+
+class _ColumnWriter:
+    """一组按列追加写入的文件 (每列一个原始二进制文件，可直接 memmap)"""
+    def __init__(self, directory: str, columns: Dict):
+        self.directory = directory
+        self.columns = columns
+        self.buffers = {name: [] for name in columns}
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, row: Dict):
+        for name, (_, width) in self.columns.items():
+            if width == 1:
+                self.buffers[name].append(row[name])
+            else:
+                self.buffers[name].extend(row[name])
+
+    def pending(self) -> int:
+        return len(self.buffers['recv_ms'])
+
+    def flush(self):
+        if not self.pending():
+            return
+        for name, (dtype, _) in self.columns.items():
+            with open(os.path.join(self.directory, f"{name}.bin"), 'ab') as f:
+                np.asarray(self.buffers[name], dtype=dtype).tofile(f)
+            self.buffers[name] = []
+
+
+class TickRecorder:
+    """
+    行情录制器：按交易日将 Tick 快照与已收盘 K 线追加写入列式 NumPy 文件
+    目录结构: <root>/<YYYYMMDD>/{ticks,bars}/<列名>.bin, codes.txt, meta.json
+    """
+    def __init__(self, root_dir: str, flush_rows: int = 512):
+        self.root_dir = root_dir
+        self.flush_rows = flush_rows
+        self._lock = threading.Lock()
+        self._day = None
+        self._codes = {}
+        self._last_bar_time = {}  # Key: (code, period), Value: 已录制的最新 K 线时间
+        self._ticks = None
+        self._bars = None
+
+    def _roll_day(self, now_ms: int):
+        """跨日时切换到新的日目录 (每个日文件自包含，便于单独回放)"""
+        day = datetime.fromtimestamp(now_ms / 1000).strftime('%Y%m%d')
+        if day == self._day:
+            return
+        self._flush_locked()
+        self._day = day
+        day_dir = os.path.join(self.root_dir, day)
+        self._ticks = _ColumnWriter(os.path.join(day_dir, 'ticks'), TICK_COLUMNS)
+        self._bars = _ColumnWriter(os.path.join(day_dir, 'bars'), BAR_COLUMNS)
+        self._codes = {}
+        self._last_bar_time = {}
+        codes_path = os.path.join(day_dir, 'codes.txt')
+        if os.path.exists(codes_path):
+            # 同日重启：沿用已有的代码索引
+            with open(codes_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._codes[line.strip()] = len(self._codes)
+        meta_path = os.path.join(day_dir, 'meta.json')
+        if not os.path.exists(meta_path):
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'depth_levels': DEPTH_LEVELS, 'periods': PERIODS,
+                           'ticks': TICK_COLUMNS, 'bars': BAR_COLUMNS}, f)
+
+    def _code_index(self, stock_code: str) -> int:
+        idx = self._codes.get(stock_code)
+        if idx is None:
+            idx = len(self._codes)
+            self._codes[stock_code] = idx
+            with open(os.path.join(self.root_dir, self._day, 'codes.txt'), 'a', encoding='utf-8') as f:
+                f.write(stock_code + '\n')
+        return idx
+
+    def record_tick(self, stock_code: str, tick: Dict):
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            self._roll_day(now_ms)
+            self._ticks.append({
+                'recv_ms': now_ms,
+                'time': int(tick.get('time') or now_ms),
+                'code': self._code_index(stock_code),
+                'lastPrice': float(tick.get('lastPrice', 0) or 0),
+                'lastClose': float(tick.get('lastClose', 0) or 0),
+                'lastVol': float(tick.get('lastVol', 0) or 0),
+                'volume': float(tick.get('volume', 0) or 0),
+                'amount': float(tick.get('amount', 0) or 0),
+                'bidPrice': _pad_levels(tick.get('bidPrice')),
+                'bidVol': _pad_levels(tick.get('bidVol')),
+                'askPrice': _pad_levels(tick.get('askPrice')),
+                'askVol': _pad_levels(tick.get('askVol')),
+            })
+            if self._ticks.pending() >= self.flush_rows:
+                self._ticks.flush()
+
+    def record_bars(self, stock_code: str, period: str, df):
+        """记录已收盘 K 线，只追加比上次录制更新的部分 (首次出现时整段写入作为回放预热历史)"""
+        if df is None or df.empty or period not in PERIODS:
+            return
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            self._roll_day(now_ms)
+            key = (stock_code, period)
+            last_time = self._last_bar_time.get(key, -1)
+            code_idx = self._code_index(stock_code)
+            period_idx = PERIODS.index(period)
+            cols = [np.asarray(df[c]) for c in ('time', 'open', 'high', 'low', 'close', 'volume')]
+            for t, o, h, l, c, v in zip(*cols):
+                bar_ms = to_epoch_ms(t)
+                if bar_ms <= last_time:
+                    continue
+                self._bars.append({
+                    'recv_ms': now_ms, 'code': code_idx, 'period': period_idx, 'time': bar_ms,
+                    'open': float(o), 'high': float(h), 'low': float(l),
+                    'close': float(c), 'volume': float(v),
+                })
+                last_time = bar_ms
+            self._last_bar_time[key] = last_time
+            if self._bars.pending() >= self.flush_rows:
+                self._bars.flush()
+
+    def _flush_locked(self):
+        if self._ticks:
+            self._ticks.flush()
+        if self._bars:
+            self._bars.flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+
+class RecordedDay:
+    """单日录制数据 (各列为只读 memmap 数组)"""
+    def __init__(self, codes: List[str], ticks: Dict[str, np.ndarray], bars: Dict[str, np.ndarray]):
+        self.codes = codes
+        self.ticks = ticks
+        self.bars = bars
+
+    @property
+    def tick_count(self) -> int:
+        return len(self.ticks['recv_ms'])
+
+    @property
+    def bar_count(self) -> int:
+        return len(self.bars['recv_ms'])
+
+
+def _load_columns(directory: str, columns: Dict) -> Dict[str, np.ndarray]:
+    result = {}
+    for name, (dtype, width) in columns.items():
+        path = os.path.join(directory, f"{name}.bin")
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            arr = np.memmap(path, dtype=dtype, mode='r')
+        else:
+            arr = np.empty(0, dtype=dtype)
+        result[name] = arr.reshape(-1, width) if width > 1 else arr
+    # 异常退出时各列可能长度不一，按最短列截齐
+    n = min(len(a) for a in result.values())
+    return {name: a[:n] for name, a in result.items()}
+
+
+def load_day(root_dir: str, day: str) -> Optional[RecordedDay]:
+    day_dir = os.path.join(root_dir, day)
+    codes_path = os.path.join(day_dir, 'codes.txt')
+    if not os.path.exists(codes_path):
+        return None
+    with open(codes_path, 'r', encoding='utf-8') as f:
+        codes = [line.strip() for line in f if line.strip()]
+    return RecordedDay(
+        codes,
+        _load_columns(os.path.join(day_dir, 'ticks'), TICK_COLUMNS),
+        _load_columns(os.path.join(day_dir, 'bars'), BAR_COLUMNS),
+    )
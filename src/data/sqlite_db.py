@@ -0,0 +1,125 @@
+import re
+import sqlite3
+import threading
+
+# MySQL 方言 -> SQLite 方言 (仅覆盖本项目用到的写法)
+_TRANSLATIONS = [
+    (re.compile(r"DATE_SUB\(NOW\(\),\s*INTERVAL\s+(\d+)\s+MINUTE\)", re.I), r"datetime('now', 'localtime', '-\1 minutes')"),
+    (re.compile(r"NOW\(\)", re.I), "datetime('now', 'localtime')"),
+    (re.compile(r"%s"), "?"),
+    # 批量 upsert：ON DUPLICATE KEY UPDATE col=VALUES(col) -> ON CONFLICT DO UPDATE SET col=excluded.col
+    (re.compile(r"ON DUPLICATE KEY UPDATE(.*)$", re.I | re.S),
+     lambda m: "ON CONFLICT DO UPDATE SET" + re.sub(r"VALUES\((\w+)\)", r"excluded.\1", m.group(1))),
+]
+
+def translate_sql(sql: str) -> str:
+    for pattern, repl in _TRANSLATIONS:
+        sql = pattern.sub(repl, sql)
+    return sql
+
+
+class SQLiteCursor:
+    """模拟 mysql.connector 的 cursor(dictionary=True) 行为"""
+    def __init__(self, conn: sqlite3.Connection, dictionary: bool = False):
+        self._cursor = conn.cursor()
+        self.dictionary = dictionary
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql: str, params=()):
+        self._cursor.execute(translate_sql(sql), tuple(params or ()))
+
+    def executemany(self, sql: str, seq_params):
+        self._cursor.executemany(translate_sql(sql), [tuple(p) for p in seq_params])
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {d[0]: v for d, v in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """模拟 mysql.connector 连接对象，供本地开发/基准测试替代 MySQL"""
+    # 统计连接次数，便于基准测试观察每轮扫描的数据库往返
+    connects = 0
+    _lock = threading.Lock()
+
+    def __init__(self, path: str):
+        with SQLiteConnection._lock:
+            SQLiteConnection.connects += 1
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+
+    def cursor(self, dictionary: bool = False) -> SQLiteCursor:
+        return SQLiteCursor(self._conn, dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def init_sqlite_tables(conn: SQLiteConnection, cursor: SQLiteCursor):
+    """初始化 SQLite 表结构 (字段与 MySQL 版本一致)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS monitored_stocks (
+            code TEXT PRIMARY KEY,
+            name TEXT,
+            added_at DATETIME DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS signal_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stock_code TEXT NOT NULL,
+            timeframe TEXT,
+            signal_type TEXT,
+            price REAL,
+            bar_time DATETIME,
+            timestamp DATETIME DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS watchlists (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            timeframes TEXT,
+            detectors TEXT,
+            priority INTEGER DEFAULT 0,
+            enabled INTEGER DEFAULT 1,
+            created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS watchlist_stocks (
+            watchlist_id INTEGER NOT NULL,
+            code TEXT NOT NULL,
+            added_at DATETIME DEFAULT (datetime('now', 'localtime')),
+            PRIMARY KEY (watchlist_id, code)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_watchlist_stocks_code ON watchlist_stocks (code)")
+    cursor.execute("PRAGMA table_info(signal_history)")
+    columns = [row['name'] if isinstance(row, dict) else row[1] for row in cursor.fetchall()]
+    if 'bar_time' not in columns:
+        cursor.execute("ALTER TABLE signal_history ADD COLUMN bar_time DATETIME")
+        print("已为 signal_history 表增加 bar_time 字段")
+    conn.commit()
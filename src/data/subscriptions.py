@@ -0,0 +1,100 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class SubscriptionManager:
+    """
+    xtdata 行情订阅的引用计数
+    - 每个 (代码, 周期) 只调用一次 subscribe_quote，记录返回的订阅号；使用方 (owner) 以集合登记
+    - 所有使用方都释放后调用 unsubscribe_quote，QMT 不再推送和缓存该股票的数据
+    - owner 约定：'monitor' 为监控扫描与监控列表行情，'market' 为全市场统计的指数快照
+    """
+    def __init__(self, client):
+        self.client = client
+        self._lock = threading.Lock()
+        self._subs: Dict[Tuple[str, str], Dict] = {}     # Key: (代码, 周期), Value: {seq, owners}
+        self.subscribed = 0
+        self.unsubscribed = 0
+
+    def subscribe(self, stock_code: str, period: str, owner: str = 'monitor') -> bool:
+        """登记订阅 (幂等)，返回是否新调用了 subscribe_quote"""
+        key = (stock_code, period)
+        with self._lock:
+            sub = self._subs.get(key)
+            if sub is not None:
+                sub['owners'].add(owner)
+                return False
+            # 先占位，避免并发重复订阅
+            sub = self._subs[key] = {'seq': None, 'owners': {owner}}
+        try:
+            seq = self.client.xt_data.subscribe_quote(stock_code, period=period, count=-1)
+        except Exception:
+            with self._lock:
+                self._subs.pop(key, None)
+            raise
+        with self._lock:
+            sub['seq'] = seq
+            self.subscribed += 1
+        return True
+
+    def is_subscribed(self, stock_code: str, period: str) -> bool:
+        return (stock_code, period) in self._subs
+
+    def release(self, stock_code: str, owner: Optional[str] = None, keep: Iterable[str] = ()) -> List[str]:
+        """释放某只股票 (owner 为 None 时释放全部使用方；keep 中的周期保留)，返回已退订的周期"""
+        keep = set(keep)
+        dropped = []
+        with self._lock:
+            for key in [k for k in self._subs if k[0] == stock_code and k[1] not in keep]:
+                owners = self._subs[key]['owners']
+                if owner is None:
+                    owners.clear()
+                else:
+                    owners.discard(owner)
+                if not owners:
+                    dropped.append((key, self._subs.pop(key)['seq']))
+        for (_, period), seq in dropped:
+            self._unsubscribe(seq)
+        return [period for (_, period), _ in dropped]
+
+    def holds(self, stock_code: str) -> bool:
+        """是否仍有任何使用方订阅该股票"""
+        with self._lock:
+            return any(k[0] == stock_code for k in self._subs)
+
+    def codes(self, owner: str) -> Set[str]:
+        """某使用方登记过的全部代码"""
+        with self._lock:
+            return {k[0] for k, sub in self._subs.items() if owner in sub['owners']}
+
+    def periods(self, owner: str) -> Dict[str, Set[str]]:
+        """某使用方登记过的 代码 -> 周期集合"""
+        with self._lock:
+            held: Dict[str, Set[str]] = {}
+            for (code, period), sub in self._subs.items():
+                if owner in sub['owners']:
+                    held.setdefault(code, set()).add(period)
+            return held
+
+    def _unsubscribe(self, seq):
+        if seq is None or self.client.xt_data is None:
+            return
+        try:
+            self.client.xt_data.unsubscribe_quote(seq)
+            self.unsubscribed += 1
+        except Exception as e:
+            print(f"退订行情失败 (seq={seq}): {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            owners: Dict[str, int] = {}
+            periods: Dict[str, int] = {}
+            for (_, period), sub in self._subs.items():
+                periods[period] = periods.get(period, 0) + 1
+                for owner in sub['owners']:
+                    owners[owner] = owners.get(owner, 0) + 1
+            return {
+                'active': len(self._subs), 'stocks': len({k[0] for k in self._subs}),
+                'periods': periods, 'owners': owners,
+                'subscribed': self.subscribed, 'unsubscribed': self.unsubscribed,
+            }
@@ -0,0 +1,115 @@
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class _Flight:
+    """一次在途的 get_full_tick 调用，供同时请求相同代码的调用方等待"""
+    __slots__ = ('event', 'ticks')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.ticks: Dict[str, Dict] = {}
+
+
+class TickCache:
+    """
+    行情快照 (get_full_tick) 的单飞 + 短时缓存，按股票代码粒度
+    - ttl 秒内取过的代码直接返回缓存
+    - 其他调用方正在取的代码不再重复请求，等待那次调用的结果 (重叠的代码列表也能合并)
+    - 其余代码合并成一次 xtdata 调用
+    ttl=0 时不缓存，只合并同时发生的请求；缓存最多 max_entries 个代码，超过时淘汰最早取到的
+    等待他人的在途调用最多 wait_timeout 秒 (QMT 卡住时)，超时后返回过期的缓存值，没有则不返回该代码
+    """
+    def __init__(self, fetch: Callable[[List[str]], Dict[str, Dict]], ttl: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic, max_entries: int = 8192, wait_timeout: float = 10.0):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._ticks: Dict[str, tuple] = {}        # Key: code, Value: (取到的时刻, tick)
+        self._inflight: Dict[str, _Flight] = {}
+        self.requests = 0
+        self.codes = 0
+        self.hits = 0           # 命中缓存的代码数
+        self.coalesced = 0      # 搭上其他在途调用的代码数
+        self.fetched = 0        # 实际向 xtdata 请求的代码数
+        self.calls = 0          # 实际 xtdata 调用次数
+        self.evicted = 0
+        self.wait_timeouts = 0  # 等待在途调用超时的代码数
+
+    def get(self, stock_list: List[str]) -> Dict[str, Dict]:
+        codes = list(dict.fromkeys(stock_list))
+        found: Dict[str, Dict] = {}
+        mine: List[str] = []
+        waits = []
+        flight: Optional[_Flight] = None
+        now = self.clock()
+        with self._lock:
+            self.requests += 1
+            self.codes += len(codes)
+            for code in codes:
+                cached = self._ticks.get(code)
+                if cached is not None and now - cached[0] < self.ttl:
+                    found[code] = cached[1]
+                    self.hits += 1
+                    continue
+                pending = self._inflight.get(code)
+                if pending is not None:
+                    waits.append((code, pending))
+                    self.coalesced += 1
+                else:
+                    mine.append(code)
+            if mine:
+                flight = _Flight()
+                for code in mine:
+                    self._inflight[code] = flight
+                self.calls += 1
+                self.fetched += len(mine)
+
+        if flight is not None:
+            try:
+                flight.ticks = self.fetch(mine) or {}
+            finally:
+                stamp = self.clock()
+                with self._lock:
+                    for code in mine:
+                        if self._inflight.get(code) is flight:
+                            del self._inflight[code]
+                        if code in flight.ticks:
+                            # 先删再插，字典顺序即取到的先后，便于淘汰最早的
+                            self._ticks.pop(code, None)
+                            self._ticks[code] = (stamp, flight.ticks[code])
+                    while len(self._ticks) > self.max_entries:
+                        del self._ticks[next(iter(self._ticks))]
+                        self.evicted += 1
+                flight.event.set()
+            found.update(flight.ticks)
+
+        deadline = time.monotonic() + self.wait_timeout
+        for code, pending in waits:
+            if not pending.event.wait(max(0.0, deadline - time.monotonic())):
+                with self._lock:
+                    self.wait_timeouts += 1
+                    stale = self._ticks.get(code)
+                if stale is not None:
+                    found[code] = stale[1]
+                continue
+            if code in pending.ticks:
+                found[code] = pending.ticks[code]
+        return {code: found[code] for code in codes if code in found}
+
+    def drop(self, stock_code: str):
+        with self._lock:
+            self._ticks.pop(stock_code, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'ttl': self.ttl, 'cached': len(self._ticks), 'max_entries': self.max_entries, 'evicted': self.evicted,
+                'wait_timeouts': self.wait_timeouts,
+                'requests': self.requests, 'codes': self.codes,
+                'hits': self.hits, 'coalesced': self.coalesced, 'fetched': self.fetched, 'calls': self.calls,
+            }
@@ -0,0 +1,189 @@
+import os
+import json
+import threading
+from datetime import datetime, date, time as dtime, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+
+DEFAULT_SESSIONS = [('09:15', '11:30'), ('13:00', '15:00')]
+DEFAULT_CALL_AUCTION = ('09:15', '09:25')
+CONTINUOUS_OPEN = dtime(9, 30)
+
+
+def _parse_clock(text) -> dtime:
+    if isinstance(text, int):
+        # YAML 1.1 会把未加引号的 9:15 解析为六十进制整数 555
+        return dtime(text // 60, text % 60)
+    text = str(text)
+    parts = [int(p) for p in text.split(':')]
+    return dtime(*parts)
+
+
+def _to_day(value) -> date:
+    """交易日可能是 'YYYYMMDD' 字符串、毫秒/秒时间戳或 date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)) and value > 1e9:
+        ts = value / 1000 if value > 1e11 else value
+        return datetime.fromtimestamp(ts).date()
+    return datetime.strptime(str(int(value)) if isinstance(value, (int, float)) else str(value), '%Y%m%d').date()
+
+
+class TradingCalendar:
+    """
+    A 股交易日历
+    - 交易日来自 xtdata (get_trading_calendar / get_trading_dates) 或本地文件，缓存到 data/trading_calendar.json
+    - 已知区间外的日期按周一至周五估算
+    - 交易时段 (含集合竞价) 来自 monitor.trading_sessions，精确到秒
+    """
+    def __init__(self, days: Optional[Iterable] = None, sessions: List[Tuple[str, str]] = None,
+                 call_auction: Tuple[str, str] = DEFAULT_CALL_AUCTION, source: str = 'weekday'):
+        self.sessions = [(_parse_clock(a), _parse_clock(b)) for a, b in (sessions or DEFAULT_SESSIONS)]
+        self.call_auction = (_parse_clock(call_auction[0]), _parse_clock(call_auction[1]))
+        self.source = source
+        self._lock = threading.Lock()
+        self._set_days(days or [])
+        self.loaded_on = date.today()
+
+    def _set_days(self, days: Iterable):
+        parsed: Set[date] = {_to_day(d) for d in days}
+        with self._lock:
+            self.days = parsed
+            self.first_day = min(parsed) if parsed else None
+            self.last_day = max(parsed) if parsed else None
+
+    # --- 加载 ---
+    @classmethod
+    def load(cls, xt_data=None, path: Optional[str] = None, cache_path: Optional[str] = None,
+             sessions: List[Tuple[str, str]] = None, call_auction: Tuple[str, str] = DEFAULT_CALL_AUCTION,
+             market: str = 'SH') -> 'TradingCalendar':
+        """
+        加载顺序：本地文件 (path) -> 当日缓存 (cache_path) -> xtdata -> 过期缓存 -> 周一至周五
+        """
+        kwargs = {'sessions': sessions, 'call_auction': call_auction}
+        if path and os.path.exists(path):
+            return cls(cls._read_file(path), source=f'file:{path}', **kwargs)
+
+        cached = None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('updated') == date.today().strftime('%Y%m%d') and cached.get('days'):
+                    return cls(cached['days'], source='cache', **kwargs)
+            except Exception as e:
+                print(f"读取交易日历缓存失败: {e}")
+
+        days = cls._fetch_xt(xt_data, market) if xt_data is not None else []
+        if days:
+            if cache_path:
+                try:
+                    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+                    with open(cache_path, 'w', encoding='utf-8') as f:
+                        json.dump({'updated': date.today().strftime('%Y%m%d'),
+                                   'days': sorted(d.strftime('%Y%m%d') for d in days)}, f)
+                except Exception as e:
+                    print(f"写入交易日历缓存失败: {e}")
+            return cls(days, source='xtdata', **kwargs)
+        if cached and cached.get('days'):
+            return cls(cached['days'], source='cache(stale)', **kwargs)
+        return cls(source='weekday', **kwargs)
+
+    @staticmethod
+    def _read_file(path: str) -> List[str]:
+        """本地日历文件：JSON ({"days": [...]} 或列表) 或每行一个 YYYYMMDD 的文本"""
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        if path.endswith('.json'):
+            data = json.loads(text)
+            return data['days'] if isinstance(data, dict) else data
+        return [line.strip() for line in text.splitlines() if line.strip() and not line.startswith('#')]
+
+    @staticmethod
+    def _fetch_xt(xt_data, market: str) -> Set[date]:
+        today = date.today()
+        start = (today - timedelta(days=400)).strftime('%Y%m%d')
+        end = (today + timedelta(days=400)).strftime('%Y%m%d')
+        try:
+            # get_trading_calendar 含未来交易日 (需先 download_holiday_data)，get_trading_dates 只到今天
+            if hasattr(xt_data, 'get_trading_calendar'):
+                if hasattr(xt_data, 'download_holiday_data'):
+                    xt_data.download_holiday_data()
+                days = xt_data.get_trading_calendar(market, start, end)
+                if days:
+                    return {_to_day(d) for d in days}
+            if hasattr(xt_data, 'get_trading_dates'):
+                return {_to_day(d) for d in xt_data.get_trading_dates(market, start, '')}
+        except Exception as e:
+            print(f"从 xtdata 获取交易日历失败: {e}")
+        return set()
+
+    # --- 查询 ---
+    def is_trading_day(self, day) -> bool:
+        d = _to_day(day)
+        with self._lock:
+            if self.first_day and self.first_day <= d <= self.last_day:
+                return d in self.days
+        return d.weekday() < 5
+
+    def next_trading_day(self, day) -> date:
+        d = _to_day(day) + timedelta(days=1)
+        while not self.is_trading_day(d):
+            d += timedelta(days=1)
+        return d
+
+    def is_trading_time(self, now: datetime) -> bool:
+        if not self.is_trading_day(now):
+            return False
+        t = now.time()
+        return any(start <= t <= end for start, end in self.sessions)
+
+    def phase(self, now: datetime) -> str:
+        """当前阶段: closed / call_auction / pre_open / continuous / break"""
+        if not self.is_trading_day(now):
+            return 'closed'
+        t = now.time()
+        if self.call_auction[0] <= t < self.call_auction[1]:
+            return 'call_auction'
+        if self.call_auction[1] <= t < CONTINUOUS_OPEN:
+            return 'pre_open'
+        if any(start <= t <= end for start, end in self.sessions):
+            return 'continuous'
+        if self.sessions[0][0] < t < self.sessions[-1][1]:
+            return 'break'
+        return 'closed'
+
+    def next_session_start(self, now: datetime) -> datetime:
+        """交易时段内返回 now，否则返回下一个时段的开始时间 (跨周末/节假日)"""
+        if self.is_trading_time(now):
+            return now
+        day = now.date()
+        if self.is_trading_day(day):
+            for start, _ in self.sessions:
+                if now.time() < start:
+                    return datetime.combine(day, start)
+        return datetime.combine(self.next_trading_day(day), self.sessions[0][0])
+
+    def seconds_until_open(self, now: datetime) -> float:
+        return max(0.0, (self.next_session_start(now) - now).total_seconds())
+
+    def last_session_end(self, now: datetime) -> datetime:
+        """最近一次已经结束的交易时段的收盘时间"""
+        day = now.date()
+        if self.is_trading_day(day):
+            for _, end in reversed(self.sessions):
+                if now.time() >= end:
+                    return datetime.combine(day, end)
+        d = day - timedelta(days=1)
+        while not self.is_trading_day(d):
+            d -= timedelta(days=1)
+        return datetime.combine(d, self.sessions[-1][1])
+
+    def stats(self) -> dict:
+        return {
+            'source': self.source,
+            'days': len(self.days),
+            'first_day': self.first_day.strftime('%Y%m%d') if self.first_day else None,
+            'last_day': self.last_day.strftime('%Y%m%d') if self.last_day else None,
+        }
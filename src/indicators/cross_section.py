@@ -0,0 +1,184 @@
+"""
+截面 (stocks × bars) 指标：一次计算所有股票的 TD 计数、MACD/DEA、DEA 拐点与信号
+- 每行右对齐，左侧 NaN 填充表示该股票历史不足
+- 结果与逐股的 calculate_td_sequential / detect_divergence 逐位一致
+- 安装了 Numba 时逐行递推 (TD 计数、EMA) 走编译版本 (见 jit.py)，否则按列向量化
+"""
+import numpy as np
+from typing import Dict, Tuple
+from src.indicators import jit
+
+
+def right_align(mat: np.ndarray) -> np.ndarray:
+    """把每行的 NaN 挪到左侧 (保持有效值的先后顺序)，使所有行的最后一列都是各自最新的 K 线"""
+    mat = np.asarray(mat, dtype=np.float64)
+    valid = ~np.isnan(mat)
+    if valid.all():
+        return mat
+    order = np.argsort(valid, axis=1, kind='stable')
+    return np.take_along_axis(mat, order, axis=1)
+
+
+def _td_counts_numpy(close: np.ndarray, lookback: int) -> Tuple[np.ndarray, np.ndarray]:
+    rows, n = close.shape
+    up = np.zeros((rows, n), dtype=np.int64)
+    down = np.zeros((rows, n), dtype=np.int64)
+    # 与 NaN 比较恒为 False，等价于逐股循环尚未开始计数
+    for i in range(lookback, n):
+        gt = close[:, i] > close[:, i - lookback]
+        lt = close[:, i] < close[:, i - lookback]
+        up[:, i] = np.where(gt, up[:, i - 1] + 1, 0)
+        down[:, i] = np.where(lt, down[:, i - 1] + 1, 0)
+    return up, down
+
+
+def _ema_rows_numpy(values: np.ndarray, alpha: float) -> np.ndarray:
+    old_wt = 1.0 - alpha
+    total_wt = old_wt + alpha
+    out = np.empty_like(values)
+    weighted = values[:, 0].copy()
+    out[:, 0] = weighted
+    for i in range(1, values.shape[1]):
+        cur = values[:, i]
+        blended = (old_wt * weighted + alpha * cur) / total_wt
+        weighted = np.where(np.isnan(weighted), cur, np.where(weighted != cur, blended, weighted))
+        out[:, i] = weighted
+    return out
+
+
+def _td_counts_loop(close, lookback):
+    rows, n = close.shape
+    up = np.zeros((rows, n), dtype=np.int64)
+    down = np.zeros((rows, n), dtype=np.int64)
+    for r in range(rows):
+        u = 0
+        d = 0
+        for i in range(lookback, n):
+            if close[r, i] > close[r, i - lookback]:
+                u += 1
+                d = 0
+            elif close[r, i] < close[r, i - lookback]:
+                d += 1
+                u = 0
+            else:
+                u = 0
+                d = 0
+            up[r, i] = u
+            down[r, i] = d
+    return up, down
+
+
+def _ema_rows_loop(values, alpha):
+    old_wt = 1.0 - alpha
+    total_wt = old_wt + alpha
+    rows, n = values.shape
+    out = np.empty_like(values)
+    for r in range(rows):
+        weighted = values[r, 0]
+        out[r, 0] = weighted
+        for i in range(1, n):
+            cur = values[r, i]
+            if np.isnan(weighted):
+                weighted = cur
+            elif weighted != cur:
+                weighted = (old_wt * weighted + alpha * cur) / total_wt
+            out[r, i] = weighted
+    return out
+
+
+# 逐行循环只在编译后才比按列向量化快，未安装 numba 时不使用
+_td_counts_jit = jit.optional_jit(_td_counts_loop)
+_ema_rows_jit = jit.optional_jit(_ema_rows_loop)
+
+
+def td_setup_counts_2d(close: np.ndarray, lookback: int = 4, backend: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """逐行逐根的 TD 上涨/下跌计数矩阵 (每行与 td_setup_counts 在有效区间上一致)"""
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    if jit.enabled(backend):
+        return _td_counts_jit(close, lookback)
+    return _td_counts_numpy(close, lookback)
+
+
+def td_last(close: np.ndarray, lookback: int = 4, setup_count: int = 9, min_bars: int = 13,
+            backend: str = None) -> Dict[str, np.ndarray]:
+    """各行最后一根 K 线的 TD9 信号 (buy_9 / sell_9 布尔向量)"""
+    close = np.asarray(close, dtype=np.float64)
+    rows, n = close.shape
+    if n <= lookback:
+        return {'buy_9': np.zeros(rows, dtype=bool), 'sell_9': np.zeros(rows, dtype=bool)}
+    up, down = td_setup_counts_2d(close, lookback, backend)
+    enough = (~np.isnan(close)).sum(axis=1) >= min_bars
+    return {
+        'buy_9': (down[:, -1] == setup_count) & enough,
+        'sell_9': (up[:, -1] == setup_count) & enough,
+    }
+
+
+def ema_rows(values: np.ndarray, span: int, backend: str = None) -> np.ndarray:
+    """逐行 EMA，浮点运算顺序与 pandas ewm(span, adjust=False) 相同；每行从第一个有效值开始"""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    alpha = 2.0 / (span + 1.0)
+    if jit.enabled(backend):
+        return _ema_rows_jit(values, alpha)
+    return _ema_rows_numpy(values, alpha)
+
+
+def macd_2d(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9,
+            backend: str = None) -> Tuple[np.ndarray, np.ndarray]:
+    """逐行 MACD 的 (DIFF, DEA) 矩阵，与 calculate_macd 逐位一致"""
+    diff = ema_rows(close, fast, backend) - ema_rows(close, slow, backend)
+    return diff, ema_rows(diff, signal, backend)
+
+
+def dea_turns(dea: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """DEA 拐点矩阵 (向上拐头, 向下拐头)，列号对齐原序列，前两列恒为 False"""
+    rows = dea.shape[0]
+    d0, d1, d2 = dea[:, 2:], dea[:, 1:-1], dea[:, :-2]
+    pad = np.zeros((rows, min(2, dea.shape[1])), dtype=bool)
+    return np.hstack([pad, (d0 > d1) & (d1 < d2)]), np.hstack([pad, (d0 < d1) & (d1 > d2)])
+
+
+def _last_two(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """各行最后两个 True 的列号 (不存在为 -1)"""
+    n = mask.shape[1]
+    cols = np.arange(n)
+    last = np.where(mask, cols, -1).max(axis=1)
+    prev = np.where(mask & (cols < last[:, None]), cols, -1).max(axis=1)
+    return last, prev
+
+
+def _window(gj: np.ndarray, idx: np.ndarray, fn) -> np.ndarray:
+    """gj 每行在 [idx-3, idx] 上的极值；窗口不足 4 根或含 NaN 时为 NaN (与 rolling(window=4) 一致)"""
+    offsets = idx[:, None] + np.arange(-3, 1)[None, :]
+    vals = np.take_along_axis(gj, np.clip(offsets, 0, None), axis=1)
+    vals[offsets < 0] = np.nan
+    return fn(vals, axis=1)
+
+
+def divergence_last(close: np.ndarray, open_: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9,
+                    backend: str = None) -> Dict[str, np.ndarray]:
+    """各行最后一根 K 线的 MACD 顶/底背离 (基于 DEA 拐头)"""
+    close = np.asarray(close, dtype=np.float64)
+    open_ = np.asarray(open_, dtype=np.float64)
+    rows, n = close.shape
+    if n < 3:
+        return {'bull_div': np.zeros(rows, dtype=bool), 'bear_div': np.zeros(rows, dtype=bool)}
+    diff, dea = macd_2d(close, fast, slow, signal, backend)
+    gt, gt2 = dea_turns(dea)
+    gj = np.fmax(close, open_)  # 与 DataFrame.max(axis=1) 一样跳过 NaN
+    row_idx = np.arange(rows)
+
+    def flags(turns, bullish: bool) -> np.ndarray:
+        last, prev = _last_two(turns)
+        ok = (prev >= 0) & (last >= n - 2)  # 至少两个拐点且最近发生
+        last_c, prev_c = np.maximum(last, 0), np.maximum(prev, 0)
+        with np.errstate(invalid='ignore'):
+            if bullish:
+                hit = (close[row_idx, last_c] < _window(gj, prev_c, np.min)) & \
+                      (diff[row_idx, last_c] > diff[row_idx, prev_c])
+            else:
+                hit = (close[row_idx, last_c] > _window(gj, prev_c, np.max)) & \
+                      (diff[row_idx, last_c] < diff[row_idx, prev_c])
+        return ok & hit
+
+    return {'bull_div': flags(gt, True), 'bear_div': flags(gt2, False)}
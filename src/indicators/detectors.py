@@ -0,0 +1,85 @@
+"""
+K 线信号检测器注册表
+- 检测器声明所需特征 (features) 与最少 K 线根数，detect 只读取 FeatureSet 中的特征，不自行重复计算
+- 新检测器继承 Detector 并用 register_detector 注册，即可在监控列表的 detectors 中使用
+- 注册顺序即检测与信号保存的顺序
+"""
+from typing import Dict, List, Tuple
+import pandas as pd
+from src.indicators.features import FEATURES, FeatureSet
+from src.indicators.divergence import divergence_at_turns, _detect_divergence_frame
+
+
+class Detector:
+    name = ''
+    features: Tuple[str, ...] = ()
+    min_bars = 13
+    # 信号类型 -> 指数面板上的简写 (可选)
+    short: Dict[str, str] = {}
+
+    def detect(self, fs: FeatureSet) -> List[str]:
+        """返回在最后一根 K 线上成立的信号类型"""
+        raise NotImplementedError
+
+    def run(self, fs: FeatureSet) -> List[str]:
+        if len(fs) < self.min_bars:
+            return []
+        return self.detect(fs)
+
+
+# Key: 检测器名称, Value: 检测器实例
+DETECTORS: Dict[str, Detector] = {}
+
+
+def register_detector(detector: Detector) -> Detector:
+    missing = [f for f in detector.features if f not in FEATURES]
+    if missing:
+        raise ValueError(f"检测器 {detector.name} 依赖未注册的特征: {', '.join(missing)}")
+    DETECTORS[detector.name] = detector
+    return detector
+
+
+class TD9Detector(Detector):
+    name = 'td9'
+    features = ('td_counts',)
+    short = {'TD低9': '低9', 'TD高9': '高9'}
+
+    def detect(self, fs: FeatureSet) -> List[str]:
+        up, down = fs['td_counts']
+        signals = []
+        if down == 9:
+            signals.append('TD低9')
+        if up == 9:
+            signals.append('TD高9')
+        return signals
+
+
+class DivergenceDetector(Detector):
+    name = 'divergence'
+    features = ('macd', 'dea_turns', 'gj')
+    min_bars = 3
+    short = {'MACD底背离': '底背离', 'MACD顶背离': '顶背离'}
+
+    def run(self, fs: FeatureSet) -> List[str]:
+        if len(fs) < self.min_bars:
+            return []
+        if fs['macd'] is None:
+            # 含 NaN 的序列：与 detect_divergence 相同，回退 pandas 实现
+            return self._signals(_detect_divergence_frame(pd.DataFrame({'close': fs['close'], 'open': fs['open']})))
+        return self.detect(fs)
+
+    def detect(self, fs: FeatureSet) -> List[str]:
+        return self._signals(divergence_at_turns(fs['close'], fs['gj'], fs['macd'][0], fs['dea_turns']))
+
+    @staticmethod
+    def _signals(result: Dict[str, bool]) -> List[str]:
+        signals = []
+        if result['bull_div']:
+            signals.append('MACD底背离')
+        if result['bear_div']:
+            signals.append('MACD顶背离')
+        return signals
+
+
+register_detector(TD9Detector())
+register_detector(DivergenceDetector())
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Tuple
+from src.indicators import jit
 
 def calculate_macd(df: pd.DataFrame, fast=12, slow=26, signal=9):
     close = df['close']
@@ -11,13 +12,130 @@ def calculate_macd(df: pd.DataFrame, fast=12, slow=26, signal=9):
     df['macd'] = (df['diff'] - df['dea']) * 2
     return df
 
-def detect_divergence(df: pd.DataFrame) -> Dict[str, bool]:
+def _ema_loop(values, alpha):
+    """EMA 递推循环 (安装 numba 时编译执行)"""
+    old_wt = 1.0 - alpha
+    total_wt = old_wt + alpha
+    out = np.empty(len(values))
+    if len(values) == 0:
+        return out
+    weighted = values[0]
+    out[0] = weighted
+    for i in range(1, len(values)):
+        cur = values[i]
+        if weighted != cur:
+            weighted = (old_wt * weighted + alpha * cur) / total_wt
+        out[i] = weighted
+    return out
+
+def _last_turns_loop(dea):
+    """
+    从后往前找 DEA 最后两个向上拐头与最后两个向下拐头的位置 (不存在为 -1)
+    返回 (上拐最后, 上拐倒数第二, 下拐最后, 下拐倒数第二)
+    """
+    up_last = up_prev = down_last = down_prev = -1
+    for k in range(len(dea) - 1, 1, -1):
+        if dea[k] > dea[k - 1] and dea[k - 1] < dea[k - 2]:
+            if up_last < 0:
+                up_last = k
+            elif up_prev < 0:
+                up_prev = k
+        elif dea[k] < dea[k - 1] and dea[k - 1] > dea[k - 2]:
+            if down_last < 0:
+                down_last = k
+            elif down_prev < 0:
+                down_prev = k
+        if up_prev >= 0 and down_prev >= 0:
+            break
+    return up_last, up_prev, down_last, down_prev
+
+_ema_loop_jit = jit.optional_jit(_ema_loop)
+_last_turns_loop_jit = jit.optional_jit(_last_turns_loop)
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    与 pandas ewm(span, adjust=False).mean() 逐位一致的 EMA (按相同的浮点运算顺序递推)
+    仅用于不含 NaN 的序列
+    """
+    alpha = 2.0 / (span + 1.0)
+    if jit.enabled():
+        return _ema_loop_jit(np.ascontiguousarray(values, dtype=np.float64), alpha)
+    return _ema_loop(values, alpha)
+
+def _last_turns(dea: np.ndarray) -> Tuple[int, int, int, int]:
+    """DEA 最后两个上拐 / 下拐的位置 (索引对齐原序列，不存在为 -1)"""
+    if jit.enabled():
+        return _last_turns_loop_jit(np.ascontiguousarray(dea, dtype=np.float64))
+    d0, d1, d2 = dea[2:], dea[1:-1], dea[:-2]
+    gt = np.flatnonzero((d0 > d1) & (d1 < d2)) + 2   # 向上拐头
+    gt2 = np.flatnonzero((d0 < d1) & (d1 > d2)) + 2  # 向下拐头
+    pick = lambda idx, k: int(idx[-k]) if len(idx) >= k else -1
+    return pick(gt, 1), pick(gt, 2), pick(gt2, 1), pick(gt2, 2)
+
+def _window_extreme(gj: np.ndarray, k: int, fn) -> float:
+    """gj 在 [k-3, k] 上的滚动极值 (不足 4 根为 NaN，与 rolling(window=4) 一致)"""
+    return fn(gj[k - 3:k + 1]) if k >= 3 else np.nan
+
+def divergence_from_arrays(close: np.ndarray, open_: np.ndarray, diff: np.ndarray = None, dea: np.ndarray = None,
+                           fast=12, slow=26, signal=9) -> Dict[str, bool]:
+    """
+    在数组上检测顶底背离 (基于 DEA 拐头)，结果与 detect_divergence 一致
+    不创建 DataFrame，只计算最后两个拐点处需要的辅助值
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if np.isnan(close).any():
+        # NaN 的 EMA 语义较复杂，交给 pandas 处理
+        return _detect_divergence_frame(pd.DataFrame({'close': close, 'open': np.asarray(open_, dtype=np.float64)}),
+                                        fast, slow, signal)
+    if diff is None or dea is None:
+        diff = ema(close, fast) - ema(close, slow)
+        dea = ema(diff, signal)
+    if len(close) < 3:
+        return {'bull_div': False, 'bear_div': False}
+    return divergence_at_turns(close, np.fmax(close, np.asarray(open_, dtype=np.float64)), diff, _last_turns(dea))
+
+def divergence_at_turns(close: np.ndarray, gj: np.ndarray, diff: np.ndarray,
+                        turns: Tuple[int, int, int, int]) -> Dict[str, bool]:
+    """
+    由 DEA 最后两个上拐 / 下拐位置判断顶底背离 (gj 为 max(close, open))
+    拆出以便检测器直接使用共享特征缓存中的 diff / 拐点
+    """
+    n = len(close)
+    last_gt, prev_gt, last_gt2, prev_gt2 = turns
+    bull_div = False
+    bear_div = False
+
+    # 底背离 (Bullish)
+    if prev_gt >= 0 and last_gt >= n - 2: # 至少两个拐点且最近发生
+        if close[last_gt] < _window_extreme(gj, prev_gt, np.min) and diff[last_gt] > diff[prev_gt]:
+            bull_div = True
+
+    # 顶背离 (Bearish)
+    if prev_gt2 >= 0 and last_gt2 >= n - 2: # 至少两个拐点且最近发生
+        if close[last_gt2] > _window_extreme(gj, prev_gt2, np.max) and diff[last_gt2] < diff[prev_gt2]:
+            bear_div = True
+
+    return {
+        'bull_div': bool(bull_div),
+        'bear_div': bool(bear_div)
+    }
+
+def detect_divergence(df, fast=12, slow=26, signal=9) -> Dict[str, bool]:
     """
     检测顶底背离 (基于 DEA 拐头)
+    df 可以是 DataFrame，也可以是 BarStore 返回的数组视图 (直接在数组上计算，不复制)
     """
+    columns = getattr(df, 'columns', ())
+    if 'diff' in columns:
+        return divergence_from_arrays(df['close'].values, df['open'].values,
+                                      df['diff'].values, df['dea'].values, fast, slow, signal)
+    return divergence_from_arrays(df['close'], df['open'], fast=fast, slow=slow, signal=signal)
+
+def _detect_divergence_frame(df: pd.DataFrame, fast=12, slow=26, signal=9) -> Dict[str, bool]:
+    """DataFrame 版本的背离检测 (原实现，作为含 NaN 序列的回退与对照)"""
     df = df.copy() # 显式复制以避免 SettingWithCopyWarning
     if 'diff' not in df.columns:
-        df = calculate_macd(df)
+        df = calculate_macd(df, fast, slow, signal)
     
     # 辅助指标
     df['gj'] = df[['close', 'open']].max(axis=1)
@@ -60,3 +178,39 @@ def detect_divergence(df: pd.DataFrame) -> Dict[str, bool]:
         'bull_div': bull_div,
         'bear_div': bear_div
     }
+
+def _turn_signals(turns: np.ndarray, confirmed: np.ndarray, n: int) -> np.ndarray:
+    """拐点 k 满足背离条件时，在拐点当根及下一根 (仍为最近拐点) 上给出信号"""
+    out = np.zeros(n, dtype=bool)
+    hits = turns[1:][confirmed]
+    out[hits] = True
+    nxt = hits + 1
+    out[nxt[nxt < n]] = True
+    return out
+
+def divergence_signal_series(close: np.ndarray, open_: np.ndarray, fast=12, slow=26, signal=9) -> Dict[str, np.ndarray]:
+    """
+    逐根K线的背离信号序列：第 t 位等于对前缀 [:t+1] 调用 detect_divergence 的结果
+    (EMA 与滚动窗口都只依赖历史数据，因此可一次性计算整段序列)
+    """
+    close = np.asarray(close, dtype=float)
+    df = calculate_macd(pd.DataFrame({'close': close}), fast, slow, signal)
+    diff = df['diff'].values
+    dea = df['dea'].values
+    gj = np.maximum(close, np.asarray(open_, dtype=float))
+    gj_s = pd.Series(gj)
+    l4 = gj_s.rolling(window=4).min().values
+    h4 = gj_s.rolling(window=4).max().values
+    n = len(dea)
+
+    d1 = np.r_[np.nan, dea[:-1]]
+    d2 = np.r_[np.nan, np.nan, dea[:-2]]
+    gt = np.flatnonzero((dea > d1) & (d1 < d2))
+    gt2 = np.flatnonzero((dea < d1) & (d1 > d2))
+
+    bull = _turn_signals(gt, (close[gt[1:]] < l4[gt[:-1]]) & (diff[gt[1:]] > diff[gt[:-1]]), n) if len(gt) >= 2 else np.zeros(n, dtype=bool)
+    bear = _turn_signals(gt2, (close[gt2[1:]] > h4[gt2[:-1]]) & (diff[gt2[1:]] < diff[gt2[:-1]]), n) if len(gt2) >= 2 else np.zeros(n, dtype=bool)
+    return {
+        'bull_div': bull,
+        'bear_div': bear
+    }
@@ -0,0 +1,146 @@
+"""
+指标特征与按 (股票, 周期, K 线) 共享的特征缓存
+- 特征 (MACD、DEA 拐点、TD 计数、gj 等) 通过 register_feature 注册，可依赖其他特征，按需计算
+- 同一根 K 线上每个特征只计算一次，被所有检测器、监控扫描与全市场统计共用
+- 每个 (股票, 周期) 只保留最新一根 K 线的特征，条目数超过上限时按最近最少使用淘汰
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+import numpy as np
+from src.indicators.td_sequential import _td_last_counts
+from src.indicators.divergence import ema, _last_turns
+
+# Key: 特征名, Value: 计算函数 (参数为 FeatureSet，可再取其他特征)
+FEATURES: Dict[str, Callable[['FeatureSet'], Any]] = {}
+
+
+def register_feature(name: str):
+    """注册特征计算函数 (装饰器)"""
+    def wrap(fn: Callable[['FeatureSet'], Any]):
+        FEATURES[name] = fn
+        return fn
+    return wrap
+
+
+def bar_key(bars) -> Tuple:
+    """
+    K 线身份：根数、首尾时间、最后收盘价与全部收盘价之和
+    (未收盘 K 线价格变化、或历史 K 线被修正 (复权、补数据) 时都视为新的一组)
+    """
+    n = len(bars)
+    if n == 0:
+        return (0, None, None, None, None)
+    columns = getattr(bars, 'columns', None)
+    if columns is None:
+        times = bars.time               # BarView
+    elif 'time' in columns:
+        times = bars['time'].to_numpy()
+    else:
+        times = bars.index
+    close = np.asarray(bars['close'], dtype=np.float64)
+    return (n, str(times[0]), str(times[-1]), float(close[-1]), float(np.nansum(close)))
+
+
+class FeatureSet:
+    """一根 K 线上的特征集合：fs['macd'] 首次访问时计算并记入缓存"""
+    __slots__ = ('bars', 'values', '_cache')
+
+    def __init__(self, bars, values: Dict[str, Any], cache: 'FeatureCache' = None):
+        self.bars = bars
+        self.values = values
+        self._cache = cache
+
+    def __len__(self) -> int:
+        return len(self.bars)
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return self.values[name]
+        except KeyError:
+            pass
+        value = FEATURES[name](self)
+        self.values[name] = value
+        if self._cache is not None:
+            self._cache.computed += 1
+        return value
+
+
+@register_feature('close')
+def _close(fs: FeatureSet) -> np.ndarray:
+    # 复制一份：BarStore 的视图会被后续追加 / 修正覆盖，缓存的特征不能随之变化
+    return np.array(fs.bars['close'], dtype=np.float64, copy=True)
+
+
+@register_feature('open')
+def _open(fs: FeatureSet) -> np.ndarray:
+    return np.array(fs.bars['open'], dtype=np.float64, copy=True)
+
+
+@register_feature('gj')
+def _gj(fs: FeatureSet) -> np.ndarray:
+    """max(close, open)，背离判断的滚动极值基于它"""
+    return np.fmax(fs['close'], fs['open'])
+
+
+@register_feature('td_counts')
+def _td_counts(fs: FeatureSet) -> Tuple[int, int]:
+    """最后一根 K 线的 TD (上涨计数, 下跌计数)，lookback=4"""
+    return _td_last_counts(fs['close'], 4)
+
+
+@register_feature('macd')
+def _macd(fs: FeatureSet):
+    """(diff, dea)，参数 12/26/9；含 NaN 的序列返回 None (交给 pandas 实现)"""
+    close = fs['close']
+    if np.isnan(close).any():
+        return None
+    diff = ema(close, 12) - ema(close, 26)
+    return diff, ema(diff, 9)
+
+
+@register_feature('dea_turns')
+def _dea_turns(fs: FeatureSet) -> Tuple[int, int, int, int]:
+    """DEA 最后两个上拐 / 下拐的位置"""
+    return _last_turns(fs['macd'][1])
+
+
+class FeatureCache:
+    """按 (股票, 周期) 缓存最新一根 K 线的特征，LRU 淘汰"""
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[Tuple, Dict]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.computed = 0       # 实际计算的特征次数
+        self.evicted = 0
+
+    def bind(self, stock_code: str, period: str, bars) -> FeatureSet:
+        """取 (股票, 周期) 在当前 K 线上的特征集合；K 线变化时换一组新的"""
+        key = (stock_code, period)
+        ident = bar_key(bars)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == ident:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return FeatureSet(bars, entry[1], self)
+            values: Dict[str, Any] = {}
+            self._entries[key] = (ident, values)
+            self._entries.move_to_end(key)
+            self.misses += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+        return FeatureSet(bars, values, self)
+
+    def drop(self, stock_code: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == stock_code]:
+                del self._entries[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                    'misses': self.misses, 'computed': self.computed, 'evicted': self.evicted}
@@ -0,0 +1,73 @@
+"""
+指标热点循环的可选 Numba 后端
+- 安装了 numba 时，optional_jit 装饰的逐根递推循环编译为机器码；否则走各模块的纯 NumPy 实现
+- 编译结果缓存到磁盘 (NUMBA_CACHE_DIR，默认 data/numba_cache)，进程重启后直接加载，不再重复编译
+- 环境变量 QMT_JK_JIT=0 可强制使用 NumPy 实现；运行中可用 set_backend 切换 (基准测试对比两种后端)
+"""
+import os
+import time
+from typing import Callable, Dict, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 必须在导入 numba 之前设置；源码目录不可写 (如打包部署) 时也能落盘
+os.environ.setdefault('NUMBA_CACHE_DIR', os.path.join(BASE_DIR, 'data', 'numba_cache'))
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+_backend = 'numba' if numba is not None and os.environ.get('QMT_JK_JIT', '1') != '0' else 'numpy'
+
+
+def available() -> bool:
+    return numba is not None
+
+
+def backend() -> str:
+    return _backend
+
+
+def set_backend(name: str) -> str:
+    """切换后端 ('numba' / 'numpy')，未安装 numba 时总是 'numpy'；返回实际生效的后端"""
+    global _backend
+    _backend = 'numba' if name == 'numba' and numba is not None else 'numpy'
+    return _backend
+
+
+def enabled(override: Optional[str] = None) -> bool:
+    """当前调用是否走编译版本；override 为单次调用指定的后端"""
+    return numba is not None and (override or _backend) == 'numba'
+
+
+def optional_jit(fn: Callable) -> Optional[Callable]:
+    """把纯 Python 循环编译为 nopython 函数；未安装 numba 时返回 None (调用方回退 NumPy)"""
+    if numba is None:
+        return None
+    return numba.njit(cache=True, nogil=True)(fn)
+
+
+def warmup() -> Dict[str, float]:
+    """
+    预先触发所有指标的编译 / 磁盘缓存加载，避免首轮扫描承担这部分耗时
+    返回各函数的耗时 (秒)
+    """
+    if not enabled():
+        return {}
+    import numpy as np
+    import pandas as pd
+    from src.indicators import td_sequential, divergence, cross_section
+    close = np.linspace(10.0, 11.0, 40)
+    frame = pd.DataFrame({'close': close, 'open': close})
+    matrix = close[None, :]
+    timings = {}
+    for name, call in (
+        ('td_sequential', lambda: td_sequential.calculate_td_sequential(frame)),
+        ('td_setup_counts', lambda: td_sequential.td_setup_counts(close)),
+        ('divergence', lambda: divergence.detect_divergence(frame)),
+        ('cross_section', lambda: (cross_section.td_last(matrix), cross_section.divergence_last(matrix, matrix))),
+    ):
+        started = time.perf_counter()
+        call()
+        timings[name] = round(time.perf_counter() - started, 4)
+    return timings
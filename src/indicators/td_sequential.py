@@ -1,34 +1,108 @@
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Tuple
+from src.indicators import jit
 
-def calculate_td_sequential(df: pd.DataFrame, price_col: str = 'close') -> Dict[str, bool]:
+def _td_loop(close, lookback):
+    """逐根计数的原始循环 (安装 numba 时编译执行)，返回整段计数序列"""
+    n = len(close)
+    up = np.zeros(n, dtype=np.int64)
+    down = np.zeros(n, dtype=np.int64)
+    up_count = 0
+    down_count = 0
+    for i in range(lookback, n):
+        if close[i] > close[i - lookback]:
+            up_count += 1
+            down_count = 0
+        elif close[i] < close[i - lookback]:
+            down_count += 1
+            up_count = 0
+        else:
+            up_count = 0
+            down_count = 0
+        up[i] = up_count
+        down[i] = down_count
+    return up, down
+
+def _td_last_loop(close, lookback):
+    """只求最后一根的计数 (不分配序列)"""
+    up_count = 0
+    down_count = 0
+    for i in range(lookback, len(close)):
+        if close[i] > close[i - lookback]:
+            up_count += 1
+            down_count = 0
+        elif close[i] < close[i - lookback]:
+            down_count += 1
+            up_count = 0
+        else:
+            up_count = 0
+            down_count = 0
+    return up_count, down_count
+
+_td_loop_jit = jit.optional_jit(_td_loop)
+_td_last_loop_jit = jit.optional_jit(_td_last_loop)
+
+def _run_lengths(mask: np.ndarray) -> np.ndarray:
+    """mask 中截至每一位的连续 True 个数 (遇 False 归零)"""
+    idx = np.arange(len(mask))
+    last_false = np.maximum.accumulate(np.where(mask, -1, idx))
+    return np.where(mask, idx - last_false, 0)
+
+def _trailing_run(mask: np.ndarray) -> int:
+    """mask 末尾连续 True 的个数"""
+    breaks = np.flatnonzero(~mask)
+    return len(mask) - 1 - breaks[-1] if len(breaks) else len(mask)
+
+def _td_last_counts(close: np.ndarray, lookback: int) -> Tuple[int, int]:
+    """
+    最后一根K线的 (上涨计数, 下跌计数)
+    上涨计数即 close[i] > close[i-lookback] 在末尾连续成立的次数 (下跌/持平都会清零)，下跌同理
+    """
+    if jit.enabled():
+        return _td_last_loop_jit(close, lookback)
+    if len(close) <= lookback:
+        return 0, 0
+    return (_trailing_run(close[lookback:] > close[:-lookback]),
+            _trailing_run(close[lookback:] < close[:-lookback]))
+
+def calculate_td_sequential(df: pd.DataFrame, price_col: str = 'close', lookback: int = 4, setup_count: int = 9) -> Dict[str, bool]:
     """
     计算TD序列信号 (TD9)
+    df 可以是 DataFrame，也可以是 BarStore 返回的数组视图
     """
     if len(df) < 13:
         return {'buy_9': False, 'sell_9': False}
         
-    close_prices = df[price_col].values
-    n = len(close_prices)
-    lookback = 4
-    
-    current_up_count = 0
-    current_down_count = 0
-    
+    close_prices = np.ascontiguousarray(df[price_col], dtype=np.float64)
     # 我们只关心最后一根K线的状态
-    for i in range(lookback, n):
-        if close_prices[i] > close_prices[i - lookback]:
-            current_up_count += 1
-            current_down_count = 0
-        elif close_prices[i] < close_prices[i - lookback]:
-            current_down_count += 1
-            current_up_count = 0
-        else:
-            current_up_count = 0
-            current_down_count = 0
+    current_up_count, current_down_count = _td_last_counts(close_prices, lookback)
             
     return {
-        'buy_9': current_down_count == 9,
-        'sell_9': current_up_count == 9
+        'buy_9': bool(current_down_count == setup_count),
+        'sell_9': bool(current_up_count == setup_count)
+    }
+
+def td_setup_counts(close: np.ndarray, lookback: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    逐根K线的 TD 上涨/下跌计数序列 (与 calculate_td_sequential 在每个前缀上的计数一致)
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    if jit.enabled():
+        return _td_loop_jit(close, lookback)
+    n = len(close)
+    up = np.zeros(n, dtype=np.int64)
+    down = np.zeros(n, dtype=np.int64)
+    if n > lookback:
+        up[lookback:] = _run_lengths(close[lookback:] > close[:-lookback])
+        down[lookback:] = _run_lengths(close[lookback:] < close[:-lookback])
+    return up, down
+
+def td_signal_series(close: np.ndarray, lookback: int = 4, setup_count: int = 9, min_bars: int = 13) -> Dict[str, np.ndarray]:
+    """逐根K线的 TD9 信号序列：第 t 位等于对 close[:t+1] 调用 calculate_td_sequential 的结果"""
+    up, down = td_setup_counts(close, lookback)
+    warm = np.arange(len(up)) >= (min_bars - 1)
+    return {
+        'buy_9': (down == setup_count) & warm,
+        'sell_9': (up == setup_count) & warm
     }
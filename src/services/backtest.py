@@ -0,0 +1,293 @@
+import os
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from src.indicators.td_sequential import td_signal_series
+from src.indicators.divergence import divergence_signal_series
+from src.indicators.depth_patterns import detect_depth_patterns
+from src.data.recorder import load_day
+
+HISTORY_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+# 信号键 -> (中文信号名, 方向)。方向为 +1 表示看涨 (前瞻收益 > 0 记为命中)
+BAR_SIGNALS = {
+    'buy_9': ('TD低9', 1),
+    'sell_9': ('TD高9', -1),
+    'bull_div': ('MACD底背离', 1),
+    'bear_div': ('MACD顶背离', -1),
+}
+
+
+def export_history(client, stocks: List[str], period: str, count: int, root_dir: str) -> str:
+    """
+    从 QMT 导出历史 K 线为 stocks × bars 矩阵 (.npy，右对齐，左侧 NaN 填充)
+    回测进程以只读 memmap 方式共享这些文件
+    """
+    series = []
+    codes = []
+    # 离线导出需要完整历史，先同步批量下载
+    for i in range(0, len(stocks), client.downloader.batch_size):
+        client.downloader.download_now(stocks[i:i + client.downloader.batch_size], period)
+    for code in stocks:
+        df = client.get_kline(code, period, count=count + 1)
+        if df.empty or len(df) < 2:
+            continue
+        series.append(df.iloc[:-1])  # 丢弃未收盘 K 线，与监控口径一致
+        codes.append(code)
+    if not series:
+        raise ValueError(f"未导出任何 {period} 历史数据")
+
+    width = max(len(df) for df in series)
+    out_dir = os.path.join(root_dir, period)
+    os.makedirs(out_dir, exist_ok=True)
+    for field in HISTORY_FIELDS:
+        mat = np.full((len(series), width), np.nan)
+        for row, df in enumerate(series):
+            mat[row, width - len(df):] = df[field].values
+        np.save(os.path.join(out_dir, f"{field}.npy"), mat)
+    with open(os.path.join(out_dir, 'codes.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(codes) + '\n')
+    print(f"已导出 {len(codes)} 只股票 {period} 历史 ({width} 根) 至 {out_dir}")
+    return out_dir
+
+
+def load_history(root_dir: str, period: str) -> Dict:
+    out_dir = os.path.join(root_dir, period)
+    with open(os.path.join(out_dir, 'codes.txt'), 'r', encoding='utf-8') as f:
+        codes = [line.strip() for line in f if line.strip()]
+    data = {field: np.load(os.path.join(out_dir, f"{field}.npy"), mmap_mode='r') for field in HISTORY_FIELDS}
+    data['codes'] = codes
+    return data
+
+
+def build_bar_grid(td_lookbacks=(4,), td_counts=(9,), macd_spans=((12, 26, 9),)) -> List[Dict]:
+    """TD 与 MACD 参数互不影响，分别展开，避免笛卡尔积重复计算"""
+    grid = [{'detector': 'td', 'lookback': lb, 'setup_count': sc} for lb, sc in itertools.product(td_lookbacks, td_counts)]
+    grid += [{'detector': 'macd', 'fast': f, 'slow': s, 'signal': g} for f, s, g in macd_spans]
+    return grid
+
+
+def _param_label(params: Dict) -> str:
+    return ' '.join(f"{k}={v}" for k, v in params.items() if k != 'detector')
+
+
+# --- 进程池工作函数 (每个进程只打开一次 memmap) ---
+_worker_history = None
+
+def _init_bar_worker(root_dir: str, period: str):
+    global _worker_history
+    _worker_history = load_history(root_dir, period)
+
+
+def _empty_stats(horizons):
+    h = len(horizons)
+    return {'count': 0, 'hits': np.zeros(h, dtype=np.int64), 'valid': np.zeros(h, dtype=np.int64), 'ret_sum': np.zeros(h)}
+
+
+def _run_bar_chunk(params: Dict, row_start: int, row_end: int, horizons: List[int]) -> Dict:
+    data = _worker_history
+    stats = {}
+    for row in range(row_start, row_end):
+        close_row = np.asarray(data['close'][row])
+        valid = np.flatnonzero(~np.isnan(close_row))
+        if len(valid) < 13:
+            continue
+        close = close_row[valid[0]:]
+        if params['detector'] == 'td':
+            signals = td_signal_series(close, params['lookback'], params['setup_count'])
+        else:
+            open_ = np.asarray(data['open'][row])[valid[0]:]
+            signals = divergence_signal_series(close, open_, params['fast'], params['slow'], params['signal'])
+
+        n = len(close)
+        for key, mask in signals.items():
+            idx = np.flatnonzero(mask)
+            if not len(idx):
+                continue
+            name, direction = BAR_SIGNALS[key]
+            s = stats.setdefault(name, _empty_stats(horizons))
+            s['count'] += len(idx)
+            for j, h in enumerate(horizons):
+                fwd = idx[idx + h < n]
+                if not len(fwd):
+                    continue
+                ret = close[fwd + h] / close[fwd] - 1
+                s['valid'][j] += len(fwd)
+                s['hits'][j] += int(np.sum(direction * ret > 0))
+                s['ret_sum'][j] += float(np.sum(ret))
+    return stats
+
+
+def _merge_stats(total: Dict, part: Dict, horizons):
+    for name, s in part.items():
+        t = total.setdefault(name, _empty_stats(horizons))
+        t['count'] += s['count']
+        t['hits'] += s['hits']
+        t['valid'] += s['valid']
+        t['ret_sum'] += s['ret_sum']
+
+
+def _finalize(params: Dict, stats: Dict, horizons) -> List[Dict]:
+    rows = []
+    for name, s in sorted(stats.items()):
+        row = {'params': _param_label(params), 'detector': params['detector'], 'signal': name, 'count': s['count']}
+        for j, h in enumerate(horizons):
+            v = s['valid'][j]
+            row[f'hit_{h}'] = round(s['hits'][j] / v, 4) if v else None
+            row[f'ret_{h}'] = round(s['ret_sum'][j] / v * 100, 3) if v else None
+        rows.append(row)
+    return rows
+
+
+def sweep_bars(root_dir: str, period: str, grid: List[Dict], horizons=(1, 5, 10), workers: Optional[int] = None) -> List[Dict]:
+    """在多进程中对历史 K 线矩阵执行参数网格回测，返回每组参数下各信号的命中率与平均前瞻收益(%)"""
+    horizons = list(horizons)
+    n_rows = len(load_history(root_dir, period)['codes'])
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, n_rows // (workers * 4))
+    tasks = [(i, start, min(start + chunk, n_rows)) for i in range(len(grid)) for start in range(0, n_rows, chunk)]
+
+    totals = [dict() for _ in grid]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_bar_worker, initargs=(root_dir, period)) as pool:
+        futures = [(i, pool.submit(_run_bar_chunk, grid[i], s, e, horizons)) for i, s, e in tasks]
+        for i, fut in futures:
+            _merge_stats(totals[i], fut.result(), horizons)
+
+    results = []
+    for params, stats in zip(grid, totals):
+        results.extend(_finalize(params, stats, horizons))
+    return results
+
+
+# --- 盘口参数回测 (基于录制的 Tick) ---
+_worker_day = None
+
+def _init_depth_worker(root_dir: str, day: str):
+    global _worker_day
+    _worker_day = load_day(root_dir, day)
+
+
+def _run_depth_params(params: Dict, horizons: List[int]) -> Dict:
+    """按监控口径 (同票同信号 60 秒去重) 回放 Tick，统计 horizons 秒后的价格变动"""
+    day = _worker_day
+    t = day.ticks
+    stats = {}
+    codes = np.asarray(t['code'])
+    recv = np.asarray(t['recv_ms'])
+    price = np.asarray(t['lastPrice'])
+    for code_idx in np.unique(codes):
+        rows = np.flatnonzero(codes == code_idx)
+        rows = rows[np.argsort(recv[rows], kind='stable')]
+        times = recv[rows]
+        last_seen = {}
+        for pos, row in enumerate(rows):
+            tick = {
+                'lastPrice': float(price[row]), 'lastVol': float(t['lastVol'][row]),
+                'bidPrice': t['bidPrice'][row].tolist(), 'bidVol': t['bidVol'][row].tolist(),
+                'askPrice': t['askPrice'][row].tolist(), 'askVol': t['askVol'][row].tolist(),
+            }
+            patterns = detect_depth_patterns(tick, params['special_numbers'],
+                                             gap_ratio_threshold=params['depth_gap_ratio'],
+                                             min_vol_threshold=params['depth_min_vol'])
+            for p in patterns:
+                name = p['desc'] if p['type'] == 'depth' else p['type']
+                if times[pos] - last_seen.get(name, -10 ** 12) < 60000:
+                    continue
+                last_seen[name] = times[pos]
+                direction = 1 if p['side'] == '买' else -1
+                s = stats.setdefault(name, _empty_stats(horizons))
+                s['count'] += 1
+                base = price[row]
+                if base <= 0:
+                    continue
+                for j, h in enumerate(horizons):
+                    k = int(np.searchsorted(times, times[pos] + h * 1000, side='left'))
+                    if k >= len(rows):
+                        continue
+                    ret = price[rows[k]] / base - 1
+                    s['valid'][j] += 1
+                    s['hits'][j] += int(direction * ret > 0)
+                    s['ret_sum'][j] += ret
+    return stats
+
+
+def sweep_depth(root_dir: str, day: str, grid: List[Dict], horizons=(60, 300), workers: Optional[int] = None) -> List[Dict]:
+    """对录制 Tick 执行盘口参数网格回测 (special_numbers / depth_gap_ratio / depth_min_vol)"""
+    horizons = list(horizons)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_depth_worker, initargs=(root_dir, day)) as pool:
+        parts = list(pool.map(_run_depth_params, grid, [horizons] * len(grid)))
+    results = []
+    for params, stats in zip(grid, parts):
+        label = {'detector': 'depth', 'gap': params['depth_gap_ratio'], 'min_vol': params['depth_min_vol']}
+        results.extend(_finalize(label, stats, horizons))
+    return results
+
+
+def _print_results(results: List[Dict], horizons):
+    for r in results:
+        cols = '  '.join(f"h{h}: 命中 {r[f'hit_{h}']} 收益 {r[f'ret_{h}']}%" for h in horizons)
+        print(f"[{r['detector']}] {r['params']:<30} {r['signal']:<16} 次数 {r['count']:<6} {cols}")
+
+
+def _floats(text: str) -> List[float]:
+    return [float(x) for x in text.split(',') if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TD9 / 背离 / 盘口参数网格回测")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p_exp = sub.add_parser('export', help="从 QMT 导出历史 K 线")
+    p_exp.add_argument('--config', default='config.yaml')
+    p_exp.add_argument('--period', default='1d')
+    p_exp.add_argument('--count', type=int, default=500)
+    p_exp.add_argument('--sector', default='沪深A股')
+    p_exp.add_argument('--root', default='data/history')
+
+    p_bar = sub.add_parser('sweep', help="K 线信号参数回测")
+    p_bar.add_argument('--period', default='1d')
+    p_bar.add_argument('--root', default='data/history')
+    p_bar.add_argument('--td-lookback', default='4', help="如 3,4,5")
+    p_bar.add_argument('--td-count', default='9', help="如 8,9")
+    p_bar.add_argument('--macd', action='append', help="fast,slow,signal，可重复指定")
+    p_bar.add_argument('--horizons', default='1,5,10', help="前瞻 K 线根数")
+    p_bar.add_argument('--workers', type=int)
+
+    p_dep = sub.add_parser('sweep-depth', help="盘口参数回测 (基于录制 Tick)")
+    p_dep.add_argument('day')
+    p_dep.add_argument('--config', default='config.yaml')
+    p_dep.add_argument('--root', default='data/recordings')
+    p_dep.add_argument('--gap-ratio', default='0.005,0.01,0.02')
+    p_dep.add_argument('--min-vol', default='500,1000,2000')
+    p_dep.add_argument('--horizons', default='60,300', help="前瞻秒数")
+    p_dep.add_argument('--workers', type=int)
+
+    args = parser.parse_args()
+    started = time.perf_counter()
+    if args.cmd == 'export':
+        from src.data.qmt_client import QMTClient
+        client = QMTClient(args.config)
+        stocks = client.xt_data.get_stock_list_in_sector(args.sector)
+        export_history(client, stocks, args.period, args.count, args.root)
+    elif args.cmd == 'sweep':
+        macd = [tuple(int(x) for x in m.split(',')) for m in (args.macd or ['12,26,9'])]
+        grid = build_bar_grid([int(x) for x in _floats(args.td_lookback)], [int(x) for x in _floats(args.td_count)], macd)
+        horizons = [int(x) for x in _floats(args.horizons)]
+        _print_results(sweep_bars(args.root, args.period, grid, horizons, args.workers), horizons)
+    else:
+        import yaml
+        with open(args.config, 'r', encoding='utf-8') as f:
+            special = yaml.safe_load(f).get('monitor', {}).get('special_numbers', [777, 888, 999])
+        grid = [{'special_numbers': special, 'depth_gap_ratio': g, 'depth_min_vol': v}
+                for g, v in itertools.product(_floats(args.gap_ratio), _floats(args.min_vol))]
+        horizons = [int(x) for x in _floats(args.horizons)]
+        _print_results(sweep_depth(args.root, args.day, grid, horizons, args.workers), horizons)
+    print(f"\n耗时 {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 import time
-from datetime import datetime
-from typing import Dict, List
-import pandas as pd
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+from src.services.metrics import metrics
+from src.indicators.detectors import DETECTORS
 
 class MarketStatsService:
-    def __init__(self, qmt_client):
+    def __init__(self, qmt_client, index_signals: Optional[Callable[[str], List[str]]] = None):
         self.client = qmt_client
+        # 指数信号来源 (MonitorService.index_signal_labels)：由监控扫描在 K 线收盘后计算并入库，这里只读取结果；
+        # 监控未在扫描指数时 (返回 None) 按 index_timeframes 自行计算 (共用 K 线缓存与特征缓存)
+        self.index_signals = index_signals
+        self.index_timeframes = (qmt_client.config.get('market_stats') or {}).get('index_timeframes', ['1m', '5m'])
         self.last_stats = {}
         # 板块定义
         self.sectors = {
@@ -26,11 +31,41 @@ class MarketStatsService:
         }
         # 内部状态记录
         self._market_subscribed = False
-        self._indices_subscribed = set()
         self._sector_cache = {} # 缓存各板块股票列表
 
+    def index_names(self) -> Dict[str, str]:
+        """领先指数 代码 -> 名称 (交给 MonitorService.track_indices)"""
+        return {code: info['name'] for code, info in self.indices.items()}
+
+    def _compute_index_signals(self, code: str) -> List[str]:
+        """自行计算指数在各周期已收盘 K 线上的信号 (与监控扫描的标签格式一致)"""
+        labels = []
+        for tf in self.index_timeframes:
+            bars = self.client.get_bars(code, tf)
+            if bars is None or len(bars) < 14:      # 丢弃未收盘的一根后 TD9 至少需要 13 根
+                continue
+            features = self.client.features.bind(code, tf, bars.head(len(bars) - 1))
+            for detector in DETECTORS.values():
+                labels += [f"{tf}{detector.short.get(t, t)}" for t in detector.run(features)]
+        return labels
+
+    def snapshot(self) -> Dict:
+        return {'date': date.today(), 'sectors': dict(self._sector_cache), 'last_stats': self.last_stats}
+
+    def restore(self, state: Dict):
+        """载入快照：最近一次统计结果直接展示；板块成分只沿用当日的"""
+        if state.get('date') == date.today():
+            for key, codes in state.get('sectors', {}).items():
+                self._sector_cache.setdefault(key, codes)
+        if not self.last_stats:
+            self.last_stats = state.get('last_stats') or {}
+
     def update_stats(self):
         """核心统计逻辑，每15秒调用一次"""
+        with metrics.timer('market_stats'):
+            return self._update_stats()
+
+    def _update_stats(self):
         try:
             results = {
                 'timestamp': datetime.now().strftime('%H:%M:%S'),
@@ -55,7 +90,8 @@ class MarketStatsService:
                 self.client.xt_data.subscribe_whole_quote(['SH', 'SZ', 'BJ'])
                 self._market_subscribed = True
                 
-            ticks = self.client.xt_data.get_full_tick(all_stocks)
+            with metrics.timer('market_stats_tick'):
+                ticks = self.client.get_full_tick(all_stocks)
             
             # 2. 统计分布
             for code, tick in ticks.items():
@@ -80,9 +116,6 @@ class MarketStatsService:
                 else: results['distribution']['down_limit'] += 1
 
             # 3. 计算多指数领先对比与信号
-            from src.indicators.td_sequential import calculate_td_sequential
-            from src.indicators.divergence import detect_divergence
-            
             for idx_code, info in self.indices.items():
                 s_key = info['sector']
                 if s_key not in self._sector_cache:
@@ -105,32 +138,21 @@ class MarketStatsService:
                         avg_chg = total_change / valid_count
                         idx_detail = self.client.xt_data.get_instrument_detail(idx_code)
                         
-                        if idx_code not in self._indices_subscribed:
-                            self.client.xt_data.subscribe_quote(idx_code)
-                            self._indices_subscribed.add(idx_code)
+                        # 经订阅管理器登记 (使用方 market)，指数不会因移出监控列表被退订
+                        self.client.subscriptions.subscribe(idx_code, '1d', owner='market')
                             
-                        idx_ticks = self.client.xt_data.get_full_tick([idx_code])
+                        idx_ticks = self.client.get_full_tick([idx_code])
                         
                         if idx_detail and idx_code in idx_ticks:
                             pre_close_idx = idx_detail['PreClose']
                             white_price = idx_ticks[idx_code]['lastPrice']
                             yellow_price = pre_close_idx * (1 + avg_chg)
                             
-                            # 指数信号探测 (探测 1m, 5m 两个主要活跃周期)
-                            idx_signals = []
-                            for tf in ['1m', '5m']:
-                                df = self.client.get_kline(idx_code, tf)
-                                if not df.empty and len(df) >= 13:
-                                    # 改用全量数据，确时信号实时展现（即使未完全收盘也提示）
-                                    td = calculate_td_sequential(df)
-                                    div = detect_divergence(df)
-                                    if td['buy_9']: idx_signals.append(f"{tf}低9")
-                                    if td['sell_9']: idx_signals.append(f"{tf}高9")
-                                    if div['bull_div']: idx_signals.append(f"{tf}底背离")
-                                    if div['bear_div']: idx_signals.append(f"{tf}顶背离")
-                            
-                            if idx_signals:
-                                print(f"【指数信号探测】{info['name']} ({idx_code}): {idx_signals}")
+                            # 指数信号：读取监控扫描在已收盘 K 线上的结果 (同一 K 线缓存与特征缓存)；监控未在扫描时自行计算
+                            idx_signals = self.index_signals(idx_code) if self.index_signals else None
+                            if idx_signals is None:
+                                with metrics.timer('market_stats_index'):
+                                    idx_signals = self._compute_index_signals(idx_code)
 
                             results['leading'].append({
                                 'name': info['name'],
@@ -0,0 +1,160 @@
+import time
+import random
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+# 直方图分桶上界 (秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _NullTimer:
+    """采样关闭时使用的空计时器，避免 perf_counter 与加锁开销"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'timeframe', 'started')
+
+    def __init__(self, metrics, stage: str, timeframe: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.timeframe = timeframe
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started, self.timeframe)
+        return False
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count', 'max')
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)  # 最后一格为 +Inf
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+
+class StageMetrics:
+    """
+    扫描各阶段耗时直方图 (按阶段 + 周期聚合)
+    - enabled=False 或 sample_rate=0 时 timer() 返回空计时器，几乎无开销
+    - render_prometheus() 输出 Prometheus 文本格式
+    """
+    def __init__(self, enabled: bool = True, sample_rate: float = 1.0, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._hist: Dict[Tuple[str, str], _Histogram] = {}
+        self.configure(enabled, sample_rate)
+
+    def configure(self, enabled: bool = True, sample_rate: float = 1.0):
+        self.enabled = bool(enabled) and sample_rate > 0
+        self.sample_rate = sample_rate
+
+    def timer(self, stage: str, timeframe: str = ''):
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return _NULL_TIMER
+        return _Timer(self, stage, timeframe)
+
+    def observe(self, stage: str, seconds: float, timeframe: str = ''):
+        key = (stage, timeframe)
+        with self._lock:
+            h = self._hist.get(key)
+            if h is None:
+                h = self._hist[key] = _Histogram(len(self.buckets))
+            h.counts[bisect_left(self.buckets, seconds)] += 1
+            h.total += seconds
+            h.count += 1
+            if seconds > h.max:
+                h.max = seconds
+
+    def reset(self):
+        with self._lock:
+            self._hist.clear()
+
+    def export(self, reset: bool = False) -> Dict:
+        """直方图原始数据 (分片进程回传给主进程合并)；reset=True 时导出后清零，只回传增量"""
+        with self._lock:
+            state = {key: (list(h.counts), h.total, h.count, h.max) for key, h in self._hist.items()}
+            if reset:
+                self._hist.clear()
+        return state
+
+    def merge(self, state: Dict):
+        """并入其他进程 export() 的数据 (分桶须相同)"""
+        with self._lock:
+            for key, (counts, total, count, max_) in state.items():
+                h = self._hist.get(key)
+                if h is None:
+                    h = self._hist[key] = _Histogram(len(self.buckets))
+                h.counts = [a + b for a, b in zip(h.counts, counts)]
+                h.total += total
+                h.count += count
+                h.max = max(h.max, max_)
+
+    def _quantile(self, h: _Histogram, q: float) -> float:
+        """基于分桶的分位数估算 (取所在桶上界)"""
+        target = q * h.count
+        running = 0
+        for i, c in enumerate(h.counts):
+            running += c
+            if running >= target:
+                return min(self.buckets[i], h.max) if i < len(self.buckets) else h.max
+        return h.max
+
+    def summary(self) -> List[Dict]:
+        """按阶段汇总 (合并所有周期)，供仪表盘展示"""
+        with self._lock:
+            merged: Dict[str, _Histogram] = {}
+            for (stage, _), h in self._hist.items():
+                m = merged.get(stage)
+                if m is None:
+                    m = merged[stage] = _Histogram(len(self.buckets))
+                m.counts = [a + b for a, b in zip(m.counts, h.counts)]
+                m.total += h.total
+                m.count += h.count
+                m.max = max(m.max, h.max)
+            rows = []
+            for stage, h in merged.items():
+                rows.append({
+                    'stage': stage,
+                    'count': h.count,
+                    'avg_ms': round(h.total / h.count * 1000, 2) if h.count else 0,
+                    'p95_ms': round(self._quantile(h, 0.95) * 1000, 2),
+                    'max_ms': round(h.max * 1000, 2),
+                    'total_s': round(h.total, 3),
+                })
+        return sorted(rows, key=lambda r: r['total_s'], reverse=True)
+
+    def render_prometheus(self, name: str = 'qmt_stage_seconds') -> str:
+        lines = [
+            f"# HELP {name} Duration of monitor scan stages in seconds.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for (stage, tf), h in sorted(self._hist.items()):
+                labels = f'stage="{stage}",timeframe="{tf}"'
+                running = 0
+                for bound, c in zip(self.buckets, h.counts):
+                    running += c
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{{labels}}} {h.total:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内共享的指标实例
+metrics = StageMetrics()
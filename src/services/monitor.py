@@ -1,26 +1,77 @@
 import time
 import threading
 from datetime import datetime
-import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 from src.data.qmt_client import QMTClient
-from src.indicators.td_sequential import calculate_td_sequential
-from src.indicators.divergence import detect_divergence
+from src.data.async_client import AsyncQMTClient
+from src.indicators.detectors import DETECTORS
 from src.indicators.depth_patterns import detect_depth_patterns
+from src.indicators import jit
 from src.data.database import connect_to_db
+from src.data.recorder import TickRecorder
+from src.services.metrics import metrics
+from src.services.sharding import ShardPool
+from src.services.scan_scheduler import ScanScheduler
+from src.services.watchlists import ScanPlan, load_plan
 
 class MonitorService:
-    def __init__(self, config_path: str, db_path: str):
-        self.client = QMTClient(config_path)
+    def __init__(self, config_path: str, db_path: str, client: QMTClient = None, xt_factory=None):
+        self.client = client or QMTClient(config_path)
         self.db_path = db_path
         self.config_path = config_path
         self.config = self.client.config
+        # xtdata 调用经专用线程池执行并带超时 (与 Web 端共用)，QMT 卡住时扫描按时跳过而不是一直阻塞
+        self.qmt = AsyncQMTClient.from_config(self.client)
         self.running = False
+        # 待推送告警队列：Web 端长时间不取时只保留最新 max_pending_alerts 条
+        self.max_alerts = (self.config.get('monitor') or {}).get('max_pending_alerts', 1000)
+        self.alerts_dropped = 0
         self.alerts = []
+        self._alerts_lock = threading.Lock()   # 监控线程追加与 Web 端取走互斥 (take_alerts 整体换出)
         self.last_scan_time = None
         self.status = "Stopped"
+        # 行情录制 (可选)：记录 Tick 快照与已收盘 K 线，供离线回放复现信号
+        self.recorder = None
+        rec_cfg = self.config.get('recorder') or {}
+        if rec_cfg.get('enabled'):
+            self.recorder = TickRecorder(rec_cfg.get('path', 'data/recordings'))
+        # 分阶段耗时统计 (关闭时几乎无开销)
+        metrics_cfg = self.config.get('metrics') or {}
+        metrics.configure(metrics_cfg.get('enabled', True), metrics_cfg.get('sample_rate', 1.0))
+        # 多进程分片扫描 (可选)：monitor.workers > 0 时由工作进程并行扫描
+        # xt_factory 为工作进程内构造 xtdata 替身的可序列化函数，None 表示各自连接 QMT
+        monitor_cfg = self.config.get('monitor', {})
+        self.shards = None
+        workers = monitor_cfg.get('workers', 0)
+        if workers and workers > 0:
+            self.shards = ShardPool(workers, config_path, db_path, self.config, xt_factory)
+        # 自适应调度 (schedule: adaptive)：每个 (股票, 周期) 在下一根 K 线收盘后才再次扫描
+        self.scheduler = None
+        if monitor_cfg.get('schedule', 'interval') == 'adaptive':
+            self.scheduler = ScanScheduler(settle=monitor_cfg.get('bar_settle_seconds', 3),
+                                           tick_interval=monitor_cfg.get('interval', 5),
+                                           is_trading=self.client.calendar.is_trading_day)
+        # 扫描计划 (命名监控列表决定每只股票扫描哪些周期与检测器)，每轮开始时从数据库刷新
+        self.plan = ScanPlan(monitor_cfg.get('timeframes', []))
+        self._planned_periods: Dict[str, set] = {}   # 上一轮计划中各股票需要的订阅周期
+        # 领先指数信号 (track_indices 登记后随扫描计划在 K 线收盘后计算，供全市场统计面板读取)
+        self.indices: Dict[str, str] = {}                      # Key: 指数代码, Value: 名称
+        stats_cfg = self.config.get('market_stats') or {}
+        self.index_timeframes = stats_cfg.get('index_timeframes', ['1m', '5m'])
+        self.index_signals: Dict[str, Dict[str, Dict]] = {}   # Key: 指数代码, Value: {周期: {bar_time, signals}}
+        # 最近一次把指数纳入扫描的时刻；超过 index_stale_after 秒 (监控停止、读取扫描计划失败) 时结果视为过期
+        self.indices_scanned_at: Optional[float] = None
+        self.index_stale_after = stats_cfg.get('index_stale_after', 120)
+
+    def _now(self) -> datetime:
+        """当前时间 (回放时由回放时钟覆盖)"""
+        return datetime.now()
 
     def _save_signal(self, stock_code: str, timeframe: str, signal_type: str, price: float, bar_time: str):
+        with metrics.timer('save_signal', timeframe):
+            self._persist_signal(stock_code, timeframe, signal_type, price, bar_time)
+
+    def _persist_signal(self, stock_code: str, timeframe: str, signal_type: str, price: float, bar_time: str):
         mydb, cursor = connect_to_db()
         if not mydb:
             return
@@ -45,11 +96,14 @@ class MonitorService:
             res = cursor.fetchone()
             if res:
                 stock_name = res['name']
+            else:
+                stock_name = self.indices.get(stock_code, "")
                 
             cursor.execute('''
                 INSERT INTO signal_history (stock_code, timeframe, signal_type, price, bar_time)
                 VALUES (%s, %s, %s, %s, %s)
             ''', (stock_code, timeframe, signal_type, price, bar_time))
+            signal_id = cursor.lastrowid
             mydb.commit()
         except Exception as e:
             print(f"保存信号异常: {e}")
@@ -59,16 +113,31 @@ class MonitorService:
             mydb.close()
         
         alert = {
+            'id': signal_id,
             'stock_code': stock_code,
             'name': stock_name,
             'timeframe': timeframe,
             'signal_type': signal_type,
             'price': float(price),
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'timestamp': self._now().strftime('%Y-%m-%d %H:%M:%S')
         }
-        self.alerts.append(alert)
+        self._push_alert(alert)
         print(f"【新信号】: {alert}")
 
+    def _push_alert(self, alert: Dict):
+        with self._alerts_lock:
+            self.alerts.append(alert)
+            overflow = len(self.alerts) - self.max_alerts
+            if overflow > 0:
+                del self.alerts[:overflow]
+                self.alerts_dropped += overflow
+
+    def take_alerts(self) -> List[Dict]:
+        """取走当前全部待推送告警 (加锁整体换出，与监控线程的追加、丢弃互不丢失)"""
+        with self._alerts_lock:
+            alerts, self.alerts = self.alerts, []
+        return alerts
+
     def get_monitored_stocks(self) -> List[str]:
         mydb, cursor = connect_to_db()
         if not mydb:
@@ -85,129 +154,253 @@ class MonitorService:
             mydb.close()
 
     def scan_stock(self, stock_code: str):
-        timeframes = self.config['monitor']['timeframes']
-        for tf in timeframes:
+        # 按扫描计划中该股票的周期与检测器扫描 ('tick' 为盘口异动)
+        for tf, detectors in self.plan.scan_items(stock_code).items():
+            self.scan_item(stock_code, tf, detectors)
+
+    def scan_item(self, stock_code: str, tf: str, detectors=None):
+        """扫描单只股票的单个周期 ('tick' 表示盘口)；detectors 为 None 时按扫描计划"""
+        if detectors is None:
+            detectors = self.plan.detectors(stock_code, tf)
+        if tf == 'tick':
             try:
-                df = self.client.get_kline(stock_code, tf)
-                if df.empty or len(df) < 2:
-                    continue
-                
-                # 准确性优化：丢弃最后一根尚未收盘的 K 线，确保计算基于“已收盘”数据
-                # 在实时行情中，最后一根 K 线的 close 是变动的，会导致 TD9 信号反复出现/消失
-                df_stable = df.iloc[:-1].copy()
-                if len(df_stable) < 13: # TD9 至少需要 13 根
-                    continue
-
-                # 获取稳定最后一根 K 线的时间戳
-                raw_time = df_stable['time'].iloc[-1]
-                if isinstance(raw_time, (int, float, np.integer)):
-                    ts = raw_time / 1000 if raw_time > 1e11 else raw_time
-                    current_bar_time = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    current_bar_time = str(raw_time)
-                
-                # TD9 (使用稳定 K 线)
-                td_signals = calculate_td_sequential(df_stable)
-                last_stable_close = df_stable['close'].iloc[-1]
-                if td_signals['buy_9']:
-                    self._save_signal(stock_code, tf, 'TD低9', last_stable_close, current_bar_time)
-                if td_signals['sell_9']:
-                    self._save_signal(stock_code, tf, 'TD高9', last_stable_close, current_bar_time)
-                
-                # Divergence (使用稳定 K 线)
-                div_signals = detect_divergence(df_stable)
-                if div_signals['bull_div']:
-                    self._save_signal(stock_code, tf, 'MACD底背离', last_stable_close, current_bar_time)
-                if div_signals['bear_div']:
-                    self._save_signal(stock_code, tf, 'MACD顶背离', last_stable_close, current_bar_time)
+                self._scan_depth_patterns(stock_code)
             except Exception as e:
-                print(f"扫描 {stock_code} {tf} 周期异常: {e}")
-        
-        # 扫描盘口异动 (Tick 级别)
+                print(f"扫描 {stock_code} 盘口异常: {e}")
+            return
         try:
-            self._scan_depth_patterns(stock_code)
+            with metrics.timer('scan_timeframe', tf):
+                self._scan_timeframe(stock_code, tf, detectors)
         except Exception as e:
-            print(f"扫描 {stock_code} 盘口异常: {e}")
+            print(f"扫描 {stock_code} {tf} 周期异常: {e}")
+
+    def _scan_timeframe(self, stock_code: str, tf: str, detectors=None):
+        """扫描单只股票单个周期的 K 线指标信号 (detectors 为 None 时计算全部)"""
+        bars = self.qmt.call_sync('get_bars', stock_code, tf)
+        if bars is None or len(bars) < 2:
+            return
+        
+        # 准确性优化：丢弃最后一根尚未收盘的 K 线，确保计算基于“已收盘”数据
+        # 在实时行情中，最后一根 K 线的 close 是变动的，会导致 TD9 信号反复出现/消失
+        # (数组视图切片，不复制数据)
+        df_stable = bars.head(len(bars) - 1)
+        if self.recorder:
+            self.recorder.record_bars(stock_code, tf, df_stable)
+        if len(df_stable) < 13: # TD9 至少需要 13 根
+            return
+
+        # 获取稳定最后一根 K 线的时间戳
+        current_bar_time = df_stable.bar_time()
+        
+        last_stable_close = df_stable.close[-1]
+
+        # 按注册顺序运行检测器 (TD9、背离...)，所需特征在这根 K 线上只计算一次
+        features = self.client.features.bind(stock_code, tf, df_stable)
+        found = []
+        for name, detector in DETECTORS.items():
+            if detectors is not None and name not in detectors:
+                continue
+            with metrics.timer(f'indicator_{name}', tf):
+                signals = detector.run(features)
+            for signal_type in signals:
+                found.append((detector, signal_type))
+                self._save_signal(stock_code, tf, signal_type, last_stable_close, current_bar_time)
+        if stock_code in self.indices:
+            self.index_signals.setdefault(stock_code, {})[tf] = {
+                'bar_time': current_bar_time,
+                'signals': [f"{tf}{d.short.get(t, t)}" for d, t in found],
+            }
 
     def _scan_depth_patterns(self, stock_code: str):
         """扫描盘口特殊数字与失衡"""
         # 获取全量 Tick
-        ticks = self.client.xt_data.get_full_tick([stock_code])
+        with metrics.timer('depth_fetch', 'tick'):
+            ticks = self.qmt.call_sync('get_full_tick', [stock_code])
         if not ticks or stock_code not in ticks:
             return
             
         tick = ticks[stock_code]
+        if self.recorder:
+            self.recorder.record_tick(stock_code, tick)
         # 从配置中读取参数 (带默认回退)
         monitor_cfg = self.config.get('monitor', {})
         target_nums = monitor_cfg.get('special_numbers', [777, 888, 999])
         gap_ratio = monitor_cfg.get('depth_gap_ratio', 0.01)
         min_vol = monitor_cfg.get('depth_min_vol', 50.0)
         
-        patterns = detect_depth_patterns(
-            tick, 
-            target_nums, 
-            gap_ratio_threshold=gap_ratio,
-            min_vol_threshold=min_vol
-        )
+        with metrics.timer('depth_detect', 'tick'):
+            patterns = detect_depth_patterns(
+                tick, 
+                target_nums, 
+                gap_ratio_threshold=gap_ratio,
+                min_vol_threshold=min_vol
+            )
         for p in patterns:
             # 信号类型直接使用算法返回的描述
             signal_type = p['desc']
             # 盘口信号使用当前时间作为标记
-            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            current_time = self._now().strftime('%Y-%m-%d %H:%M:%S')
             # 信号去重和保存
             self._save_signal(stock_code, 'tick', signal_type, p['price'], current_time)
 
+    def track_indices(self, indices: Dict[str, str]):
+        """登记领先指数 (代码 -> 名称)，之后每轮扫描计划都包含它们的 index_timeframes 周期"""
+        self.indices = dict(indices)
+        for code in list(self.index_signals):
+            if code not in self.indices:
+                del self.index_signals[code]
+
+    def index_signal_labels(self, code: str) -> Optional[List[str]]:
+        """
+        指数在各周期最近一根已收盘 K 线上的信号，如 ['1m低9', '5m底背离']
+        监控未在扫描指数 (已停止、扫描计划读取失败) 或尚无结果时返回 None，由调用方自行计算
+        """
+        by_tf = self.index_signals.get(code)
+        if (not by_tf or not self.running or self.indices_scanned_at is None
+                or time.monotonic() - self.indices_scanned_at > self.index_stale_after):
+            return None
+        return [label for tf in self.index_timeframes for label in (by_tf.get(tf) or {}).get('signals', [])]
+
+    def snapshot(self) -> Dict:
+        return {'index_signals': {code: dict(by_tf) for code, by_tf in list(self.index_signals.items())}}
+
+    def restore(self, state: Dict):
+        """载入快照中的指数信号 (只保留仍在跟踪的指数)，面板在首轮扫描完成前即可显示"""
+        for code, by_tf in (state.get('index_signals') or {}).items():
+            if code in self.indices:
+                self.index_signals.setdefault(code, by_tf)
+
+    def release_stock(self, stock_code: str):
+        """股票移出监控：退订行情并清理各级缓存，分片模式下同时通知所属分片 (领先指数仍由全市场统计使用，保留)"""
+        if stock_code in self.indices:
+            return
+        self.client.forget(stock_code)
+        if self.shards:
+            self.shards.release(stock_code)
+
+    def _release_unplanned(self, plan: ScanPlan):
+        """
+        与新的扫描计划对比：不再扫描的股票整只释放；仍在扫描但去掉了某些周期的，只释放这些周期的订阅
+        (分片进程的订阅不在主进程，按上一轮计划的差异通知所属分片)
+        """
+        needed = {code: self.client.source_periods(plan.scan_items(code)) for code in plan.items}
+        held = self.client.subscriptions.periods('monitor')
+        for code in (set(held) | set(self._planned_periods)) - set(needed):
+            self.release_stock(code)
+        for code, periods in held.items():
+            if code in needed and periods - needed[code]:
+                self.client.release_periods(code, needed[code])
+        if self.shards:
+            for code, periods in self._planned_periods.items():
+                if code in needed and periods - needed[code]:
+                    self.shards.release(code, needed[code])
+        self._planned_periods = needed
+
     def is_trading_time(self):
-        """判定当前是否处于交易时段 (V20.Final-Guard)"""
+        """判定当前是否处于交易时段 (按交易日历，排除周末与节假日)"""
         sessions = self.config.get('monitor', {}).get('trading_sessions')
         if not sessions:
             return True # 如果没配，默认全天运行
-            
-        now_str = datetime.now().strftime('%H:%M')
-        for start, end in sessions:
-            if start <= now_str <= end:
-                return True
-        return False
+        return self.client.calendar.is_trading_time(self._now())
 
     def get_status_display(self):
         """获取人性化的状态描述 (V21.Final-UX)"""
         if not self.running:
             return "已停止"
         if not self.is_trading_time():
-            return "已暂停 (非交易时段)"
+            next_open = self.client.calendar.next_session_start(self._now())
+            return f"已暂停 (非交易时段，{next_open.strftime('%m-%d %H:%M')} 开盘)"
         return "正在运行"
 
+    def _sleep(self, seconds: float):
+        """可被 stop() 打断的休眠"""
+        deadline = time.time() + seconds
+        while self.running and time.time() < deadline:
+            time.sleep(min(1, max(0.05, deadline - time.time())))
+
+    def run_cycle(self) -> int:
+        """执行一轮完整扫描，返回本轮扫描的监控股票数 (不含只作为领先指数扫描的代码，见 plan.stats())"""
+        self.last_scan_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        plan = load_plan(self.config['monitor']['timeframes'])
+        if plan is not None:
+            plan.add_indices(self.indices, self.index_timeframes)
+            self.plan = plan
+            # 已不在任何列表 / 监控股票中的代码 (或去掉的周期)：退订并清理缓存，避免长时间运行后内存只增不减
+            self._release_unplanned(plan)
+        stocks = self.plan.stocks() if plan is not None else []
+        with metrics.timer('scan_cycle'):
+            if self.scheduler:
+                self._run_scheduled(stocks)
+            elif self.shards and stocks:
+                # 分片进程没有扫描计划，按 (股票, 周期, 检测器) 下发；指数信号状态需留在主进程，在本进程扫描
+                items = [(s, tf, dets) for s in stocks for tf, dets in self.plan.scan_items(s).items()]
+                self._scan_sharded(items)
+            else:
+                for stock in stocks:
+                    if not self.running: # 在循环内部也检查，提高响应速度
+                        break
+                    try:
+                        self.scan_stock(stock)
+                    except Exception as e:
+                        print(f"扫描 {stock} 异常: {e}")
+        if plan is not None and self.indices:
+            self.indices_scanned_at = time.monotonic()
+        return sum(1 for stock in stocks if stock in self.plan.watched)
+
+    def _run_scheduled(self, stocks: List[str]):
+        """只执行已到期的 (股票, 周期)，高优先级列表与快周期优先，分批执行以便新到期任务插队"""
+        monitor_cfg = self.config['monitor']
+        pairs = [(s, tf) for s in stocks for tf in self.plan.scan_items(s)]
+        self.scheduler.sync_items(pairs, self._now(), self.plan.priority)
+        batch_size = monitor_cfg.get('schedule_batch', 50) * (self.shards.workers if self.shards else 1)
+        while self.running:
+            batch = self.scheduler.pop_due(self._now(), limit=batch_size)
+            if not batch:
+                break
+            if self.shards:
+                self._scan_sharded([(s, tf, self.plan.detectors(s, tf)) for s, tf in batch])
+            else:
+                for stock, tf in batch:
+                    self.scan_item(stock, tf)
+            done = self._now()
+            for stock, tf in batch:
+                self.scheduler.reschedule(stock, tf, done)
+
+    def _scan_sharded(self, items: List[tuple]):
+        local = [item for item in items if item[0] in self.indices]
+        remote = [item for item in items if item[0] not in self.indices]
+        if remote:
+            self.shards.run_cycle(remote, self._push_alert, self.recorder)
+        for item in local:
+            self.scan_item(*item)
+
     def run(self):
         self.running = True
         print("监控服务已启动...")
+        # 安装了 numba 时预先编译 / 加载指标缓存，避免首轮扫描承担
+        if jit.enabled():
+            print(f"指标 JIT 预热: {jit.warmup()}")
         while self.running:
-            # 交易时间判定 (V20.Final-Guard)
+            # 交易时间判定 (V20.Final-Guard)：休市时直接睡到下一个交易时段开始
+            self.client.refresh_calendar()
             if not self.is_trading_time():
                 self.status = self.get_status_display()
-                time.sleep(30)
+                self._sleep(self.client.calendar.seconds_until_open(self._now()))
                 continue
             
             self.status = self.get_status_display()
-            self.last_scan_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            stocks = self.get_monitored_stocks()
-            if not stocks:
+            if not self.run_cycle():
                 print("未发现监控中的股票，等待中...")
                 time.sleep(10)
                 continue
-                
-            for stock in stocks:
-                if not self.running: # 在循环内部也检查，提高响应速度
-                    break
-                try:
-                    self.scan_stock(stock)
-                except Exception as e:
-                    print(f"扫描 {stock} 异常: {e}")
             
             # 这里的时延也要能被中断
             interval = self.config['monitor'].get('interval', 5)
-            for _ in range(int(interval)):
-                if not self.running: break
-                time.sleep(1)
+            if self.scheduler:
+                # 自适应调度：睡到下一个任务到期 (最长一个 interval，以便及时发现新加入的股票)
+                wait = self.scheduler.seconds_until_next(self._now())
+                interval = interval if wait is None else min(wait, interval)
+            self._sleep(interval)
 
     def start(self):
         if self.running:
@@ -220,6 +413,10 @@ class MonitorService:
     def stop(self):
         self.running = False
         self.status = "Stopped"
+        if self.recorder:
+            self.recorder.flush()
+        if self.shards:
+            self.shards.stop()
         print("监控服务已停止")
 
     def update_config(self, updates: dict):
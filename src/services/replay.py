@@ -0,0 +1,199 @@
+import time
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from src.data.qmt_client import QMTClient
+from src.data.recorder import PERIODS, RecordedDay, load_day
+from src.services.monitor import MonitorService
+
+
+class ReplayXtData:
+    """
+    基于录制文件的 xtdata 替身：只暴露回放时钟之前“已发生”的数据
+    仅实现监控扫描所需的接口
+    """
+    def __init__(self, day: RecordedDay):
+        self.day = day
+        self.clock_ms = 0
+        self._ticks = {}
+        self._bars = {}  # Key: (code, period), Value: (recv_ms, time, ohlcv 矩阵)
+        bars = day.bars
+        if day.bar_count:
+            order = np.lexsort((bars['time'], bars['period'], bars['code']))
+            keys = np.stack([bars['code'][order], bars['period'][order]], axis=1)
+            starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+            ends = np.r_[starts[1:], len(order)]
+            for s, e in zip(starts, ends):
+                idx = order[s:e]
+                key = (day.codes[bars['code'][idx[0]]], PERIODS[bars['period'][idx[0]]])
+                ohlcv = np.stack([bars[f][idx] for f in ('open', 'high', 'low', 'close', 'volume')], axis=1)
+                self._bars[key] = (np.asarray(bars['recv_ms'][idx]), np.asarray(bars['time'][idx]), ohlcv)
+
+    def set_clock(self, ms: int):
+        self.clock_ms = ms
+
+    def push_tick(self, stock_code: str, row: int):
+        t = self.day.ticks
+        self._ticks[stock_code] = {
+            'time': int(t['time'][row]),
+            'lastPrice': float(t['lastPrice'][row]),
+            'lastClose': float(t['lastClose'][row]),
+            'lastVol': float(t['lastVol'][row]),
+            'volume': float(t['volume'][row]),
+            'amount': float(t['amount'][row]),
+            'bidPrice': t['bidPrice'][row].tolist(),
+            'bidVol': t['bidVol'][row].tolist(),
+            'askPrice': t['askPrice'][row].tolist(),
+            'askVol': t['askVol'][row].tolist(),
+        }
+
+    def download_history_data(self, *args, **kwargs):
+        return None
+
+    def subscribe_quote(self, *args, **kwargs):
+        return 1
+
+    def get_full_tick(self, stock_list: List[str]) -> Dict[str, Dict]:
+        return {code: self._ticks[code] for code in stock_list if code in self._ticks}
+
+    def get_market_data(self, field_list=None, stock_list=None, period='1d', count=-1, **kwargs) -> Dict:
+        field_list = field_list or ['open', 'high', 'low', 'close', 'volume']
+        stock_code = stock_list[0]
+        entry = self._bars.get((stock_code, period))
+        if entry is None:
+            return {}
+        recv_ms, times, ohlcv = entry
+        # 录制时刻晚于回放时钟的 K 线视为尚未收盘
+        n = int(np.searchsorted(recv_ms, self.clock_ms, side='right'))
+        if n == 0:
+            return {}
+        start = max(0, n - (count - 1)) if count and count > 0 else 0
+        times = times[start:n].tolist()
+        rows = ohlcv[start:n]
+        # 监控会丢弃最后一根“未收盘” K 线，这里补一根以收盘价占位的在途 K 线
+        times.append(times[-1] + 1)
+        rows = np.vstack([rows, np.repeat(rows[-1:, 3], 4).tolist() + [0.0]])
+        field_index = {'open': 0, 'high': 1, 'low': 2, 'close': 3, 'volume': 4}
+        # 与 QMT 保持一致：Index 为股票代码，Columns 为时间
+        return {
+            f: pd.DataFrame([rows[:, field_index[f]]], index=[stock_code], columns=times)
+            for f in field_list if f in field_index
+        }
+
+
+class ReplayMonitor(MonitorService):
+    """回放用监控服务：信号收集在内存中，不写数据库也不推送"""
+    def __init__(self, config_path: str, xt_data: ReplayXtData, overrides: Optional[Dict] = None):
+        client = QMTClient(config_path, xt_data=xt_data)
+        client.ticks.ttl = 0  # 回放时钟跳跃前进，快照缓存按真实时间计会取到旧 Tick
+        client.config.pop('recorder', None)
+        client.config.setdefault('monitor', {}).update(overrides or {})
+        super().__init__(config_path, None, client=client)
+        self.xt = xt_data
+        self.signals = []
+        self._seen = {}
+
+    def _now(self) -> datetime:
+        return datetime.fromtimestamp(self.xt.clock_ms / 1000)
+
+    def _save_signal(self, stock_code: str, timeframe: str, signal_type: str, price: float, bar_time: str):
+        # 与数据库保持相同的去重口径：盘口信号 1 分钟内不重复，K 线信号按 bar_time 去重
+        now = self._now()
+        if timeframe == 'tick':
+            key = (stock_code, 'tick', signal_type)
+            last = self._seen.get(key)
+            if last is not None and now - last < timedelta(minutes=1):
+                return
+            self._seen[key] = now
+        else:
+            key = (stock_code, timeframe, signal_type, bar_time)
+            if key in self._seen:
+                return
+            self._seen[key] = now
+        self.signals.append({
+            'stock_code': stock_code,
+            'timeframe': timeframe,
+            'signal_type': signal_type,
+            'price': float(price),
+            'bar_time': bar_time,
+            'timestamp': now.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+
+
+def replay_day(config_path: str, root_dir: str, day: str, overrides: Optional[Dict] = None) -> Dict:
+    """
+    将单日录制数据按录制时序喂给监控的指标与盘口逻辑 (不等待真实时间)
+    overrides 可覆盖 monitor 配置，如 {'depth_gap_ratio': 0.02, 'depth_min_vol': 500}
+    """
+    recorded = load_day(root_dir, day)
+    if recorded is None:
+        raise FileNotFoundError(f"未找到 {day} 的录制数据: {root_dir}")
+    xt = ReplayXtData(recorded)
+    monitor = ReplayMonitor(config_path, xt, overrides)
+
+    # 事件序列：(时刻, 类型, 参数)。Tick 逐条回放，K 线按 (股票, 周期, 录制时刻) 去重后回放一次
+    events = []
+    ticks = recorded.ticks
+    for row in range(recorded.tick_count):
+        events.append((int(ticks['recv_ms'][row]), 0, recorded.codes[ticks['code'][row]], row))
+    bars = recorded.bars
+    if recorded.bar_count:
+        keys = np.unique(np.stack([bars['recv_ms'], bars['code'], bars['period']], axis=1), axis=0)
+        for recv_ms, code, period in keys:
+            events.append((int(recv_ms), 1, recorded.codes[code], PERIODS[period]))
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    started = time.perf_counter()
+    for ts, kind, code, arg in events:
+        xt.set_clock(ts)
+        try:
+            if kind == 0:
+                xt.push_tick(code, arg)
+                monitor._scan_depth_patterns(code)
+            else:
+                monitor._scan_timeframe(code, arg)
+        except Exception as e:
+            print(f"回放 {code} 事件异常: {e}")
+    elapsed = time.perf_counter() - started
+
+    span = (events[-1][0] - events[0][0]) / 1000 if events else 0
+    return {
+        'day': day,
+        'ticks': recorded.tick_count,
+        'bar_events': len(events) - recorded.tick_count,
+        'elapsed': round(elapsed, 3),
+        'events_per_sec': round(len(events) / elapsed, 1) if elapsed > 0 else 0,
+        'speedup': round(span / elapsed, 1) if elapsed > 0 else 0,
+        'signal_counts': dict(Counter(s['signal_type'] for s in monitor.signals)),
+        'signals': monitor.signals,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制行情，复现/调参信号")
+    parser.add_argument('day', help="交易日 YYYYMMDD")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--root', default='data/recordings')
+    parser.add_argument('--gap-ratio', type=float, help="覆盖 depth_gap_ratio")
+    parser.add_argument('--min-vol', type=float, help="覆盖 depth_min_vol")
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.gap_ratio is not None:
+        overrides['depth_gap_ratio'] = args.gap_ratio
+    if args.min_vol is not None:
+        overrides['depth_min_vol'] = args.min_vol
+
+    report = replay_day(args.config, args.root, args.day, overrides)
+    for s in report['signals']:
+        print(f"{s['timestamp']} {s['stock_code']} {s['timeframe']} {s['signal_type']} @ {s['price']}")
+    print(f"\n回放 {report['day']}: Tick {report['ticks']} 条, K 线事件 {report['bar_events']} 个, "
+          f"耗时 {report['elapsed']}s ({report['events_per_sec']} 事件/秒, {report['speedup']}x 实时)")
+    print(f"信号统计: {report['signal_counts']}")
+
+
+if __name__ == "__main__":
+    main()
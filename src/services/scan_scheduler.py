@@ -0,0 +1,172 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.data.bar_aggregator import MORNING_OPEN, AFTERNOON_OPEN, MORNING_CLOSE, SESSION_MINUTES, _minute_to_clock
+from src.services.metrics import metrics
+
+# 周期由快到慢的优先级：同时到期时快周期先扫，负载高时 1m 不被慢周期拖后
+TIMEFRAME_RANK = {'tick': 0, '1m': 1, '5m': 2, '15m': 3, '30m': 4, '1h': 5, '1d': 6, '1w': 7, '1mon': 8}
+INTRADAY_MINUTES = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '1h': 60}
+DAY_CLOSE = 15 * 60
+
+
+def is_trading_day(day: datetime) -> bool:
+    """默认交易日判定 (仅排除周末)"""
+    return day.weekday() < 5
+
+
+def _next_trading_day(day: datetime, is_trading=is_trading_day) -> datetime:
+    day = day + timedelta(days=1)
+    while not is_trading(day):
+        day += timedelta(days=1)
+    return day
+
+
+def _session_elapsed(now: datetime) -> float:
+    """当日已经过的交易分钟数 (含秒的小数部分)，午休期间停在 120"""
+    m = now.hour * 60 + now.minute + now.second / 60.0
+    if m <= MORNING_OPEN:
+        return 0.0
+    if m <= MORNING_CLOSE:
+        return m - MORNING_OPEN
+    if m <= AFTERNOON_OPEN:
+        return SESSION_MINUTES / 2
+    return min(SESSION_MINUTES, SESSION_MINUTES / 2 + m - AFTERNOON_OPEN)
+
+
+def _at(day: datetime, minutes: int) -> datetime:
+    return day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(minutes=int(minutes))
+
+
+def next_bar_close(period: str, now: datetime, is_trading=is_trading_day) -> datetime:
+    """
+    严格晚于 now 的下一个 K 线收盘时刻 (A 股交易时段，K 线按结束时间标记)
+    - 分钟线: 如 5m 在 11:32 -> 13:05，15:00 之后 -> 下一交易日 09:35
+    - 日线 15:00；周线为本周最后一个交易日 15:00；月线为本月最后一个交易日 15:00
+    """
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period in INTRADAY_MINUTES:
+        k = INTRADAY_MINUTES[period]
+        if is_trading(today):
+            nxt = (int(_session_elapsed(now) // k) + 1) * k
+            if nxt <= SESSION_MINUTES:
+                return _at(today, _minute_to_clock(nxt))
+        return _at(_next_trading_day(today, is_trading), _minute_to_clock(k))
+
+    day = today if is_trading(today) and now < _at(today, DAY_CLOSE) else _next_trading_day(today, is_trading)
+    if period == '1d':
+        return _at(day, DAY_CLOSE)
+    # 周/月线：取 day 所在区间的最后一个交易日
+    while True:
+        nxt = _next_trading_day(day, is_trading)
+        same = nxt.isocalendar()[:2] == day.isocalendar()[:2] if period == '1w' else nxt.month == day.month
+        if not same:
+            return _at(day, DAY_CLOSE)
+        day = nxt
+
+
+class ScanScheduler:
+    """
+    按 (股票, 周期) 安排下一次扫描时间
+    - 扫描完成后，下一次到期时间 = 下一根 K 线收盘 + settle 秒 (等待 QMT 生成该 K 线)
+    - 'tick' (盘口) 按固定间隔轮询
+    - 到期任务按 (股票优先级, 周期快慢, 到期时间) 排序执行，并记录相对 K 线收盘的滞后
+    """
+    def __init__(self, settle: float = 3.0, tick_interval: float = 15.0, is_trading=is_trading_day):
+        self.settle = settle
+        self.tick_interval = tick_interval
+        self.is_trading = is_trading
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[float, int, str, str]] = []  # (到期时间戳, 周期优先级, stock, tf)
+        self._due: Dict[Tuple[str, str], float] = {}       # 当前有效的到期时间 (用于惰性删除)
+        self._close: Dict[Tuple[str, str], float] = {}     # 该次到期对应的 K 线收盘时间戳
+        self._priority: Dict[str, int] = {}                # Key: stock, Value: 所属监控列表的最高优先级
+        self.lag: Dict[str, Dict] = {}                     # Key: tf, Value: 滞后统计
+
+    def sync(self, stocks: Iterable[str], timeframes: Iterable[str], now: datetime):
+        """对齐监控列表：新增的 (股票, 周期) 立即到期，已移除的惰性删除"""
+        timeframes = list(timeframes)
+        self.sync_items([(s, tf) for s in stocks for tf in timeframes], now)
+
+    def sync_items(self, pairs: Iterable[Tuple[str, str]], now: datetime, priority: Optional[Dict[str, int]] = None):
+        """按扫描计划对齐：pairs 为需要扫描的 (股票, 周期)，priority 为股票优先级 (越大越先扫)"""
+        wanted = set(pairs)
+        with self._lock:
+            self._priority = dict(priority or {})
+            for key in [k for k in self._due if k not in wanted]:
+                self._due.pop(key, None)
+                self._close.pop(key, None)
+            ts = now.timestamp()
+            for key in wanted - self._due.keys():
+                self._push(key, ts, None)
+
+    def _push(self, key: Tuple[str, str], due: float, close: Optional[float]):
+        self._due[key] = due
+        if close is None:
+            self._close.pop(key, None)
+        else:
+            self._close[key] = close
+        heapq.heappush(self._heap, (due, TIMEFRAME_RANK.get(key[1], 99), key[0], key[1]))
+
+    def pop_due(self, now: datetime, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+        """
+        取出已到期任务，按 (股票优先级, 周期快慢, 到期时间) 排序；limit 限制本批数量，
+        其余留在队列中，下一批重新排序 (新到期的快周期任务可以插队)
+        """
+        ts = now.timestamp()
+        with self._lock:
+            ready = []
+            while self._heap and self._heap[0][0] <= ts:
+                due, rank, stock, tf = heapq.heappop(self._heap)
+                if self._due.get((stock, tf)) == due:
+                    ready.append((rank, due, stock, tf))
+            ready.sort(key=lambda r: (-self._priority.get(r[2], 0),) + r)
+            if limit is not None:
+                for rank, due, stock, tf in ready[limit:]:
+                    heapq.heappush(self._heap, (due, rank, stock, tf))
+                ready = ready[:limit]
+            for _, _, stock, tf in ready:
+                self._due.pop((stock, tf))
+                close = self._close.pop((stock, tf), None)
+                if close is not None:
+                    self._observe_lag(tf, ts - close)
+        return [(stock, tf) for _, _, stock, tf in ready]
+
+    def reschedule(self, stock: str, tf: str, now: datetime):
+        """扫描完成后安排下一次"""
+        if tf == 'tick':
+            due = now.timestamp() + self.tick_interval
+            close = due
+        else:
+            close = next_bar_close(tf, now, self.is_trading).timestamp()
+            due = close + self.settle
+        with self._lock:
+            self._push((stock, tf), due, close)
+
+    def seconds_until_next(self, now: datetime) -> Optional[float]:
+        with self._lock:
+            while self._heap and self._due.get((self._heap[0][2], self._heap[0][3])) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - now.timestamp())
+
+    def _observe_lag(self, tf: str, seconds: float):
+        seconds = max(0.0, seconds)
+        if metrics.enabled:
+            metrics.observe('bar_close_lag', seconds, tf)
+        s = self.lag.setdefault(tf, {'count': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+        s['count'] += 1
+        s['total'] += seconds
+        s['max'] = max(s['max'], seconds)
+        s['last'] = seconds
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lag = {
+                tf: {'count': s['count'], 'avg_s': round(s['total'] / s['count'], 3),
+                     'max_s': round(s['max'], 3), 'last_s': round(s['last'], 3)}
+                for tf, s in sorted(self.lag.items(), key=lambda kv: TIMEFRAME_RANK.get(kv[0], 99))
+            }
+            return {'pending': len(self._due), 'lag': lag}
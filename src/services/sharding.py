@@ -0,0 +1,200 @@
+import time
+import zlib
+import queue
+import multiprocessing as mp
+from typing import Callable, Dict, Iterable, List, Optional
+from src.data import database
+from src.services.metrics import metrics
+
+
+def shard_of(stock_code: str, workers: int) -> int:
+    """按代码哈希固定分片：同一只股票始终落在同一进程，K 线缓存与订阅保持有效"""
+    return zlib.crc32(stock_code.encode('utf-8')) % workers
+
+
+class _RecordForwarder:
+    """
+    分片进程内的录制替身：把 record_tick / record_bars 转给主进程的 TickRecorder 写盘，
+    避免多个进程写同一录制目录 (codes.txt 序号冲突、追加交错)
+    """
+    def __init__(self, shard_id: int, results):
+        self.shard_id = shard_id
+        self.results = results
+
+    def record_tick(self, stock_code: str, tick: Dict):
+        self.results.put(('record', self.shard_id, ('record_tick', (stock_code, tick))))
+
+    def record_bars(self, stock_code: str, period: str, df):
+        self.results.put(('record', self.shard_id, ('record_bars', (stock_code, period, df))))
+
+    def flush(self):
+        pass
+
+
+def _shard_worker(shard_id: int, config_path: str, db_path: str, config: Dict, db_config: Optional[Dict],
+                  xt_factory: Optional[Callable], tasks, results):
+    """
+    分片工作进程：自建 xtdata 会话 (或由 xt_factory 构造替身) 与 MonitorService，
+    按批次扫描分到的股票，信号、录制数据与阶段耗时通过 results 队列回传给主进程
+    """
+    # 在子进程内导入，避免与 monitor 模块循环依赖
+    from src.data.qmt_client import QMTClient
+    from src.services.monitor import MonitorService
+
+    if db_config is not None:
+        database.set_db_config(db_config)
+    client = QMTClient(config_path, xt_data=xt_factory() if xt_factory else None)
+    client.config.update(config)
+    client.config['monitor'] = dict(config.get('monitor', {}), workers=0, schedule='interval')
+    # 录制只在主进程写盘，工作进程转发
+    recording = (config.get('recorder') or {}).get('enabled')
+    client.config['recorder'] = dict(config.get('recorder') or {}, enabled=False)
+    monitor = MonitorService(config_path, db_path, client=client)
+    if recording:
+        monitor.recorder = _RecordForwarder(shard_id, results)
+    monitor.running = True
+    results.put(('ready', shard_id, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        if task[0] == 'release':
+            # 主进程移出股票 (keep 为 None) 或去掉了部分周期：本进程持有的订阅与缓存同样释放
+            _, code, keep = task
+            try:
+                dropped = client.forget(code) if keep is None else client.release_periods(code, keep)
+                results.put(('released', shard_id, {'code': code, 'dropped': dropped}))
+            except Exception as e:
+                print(f"[分片 {shard_id}] 释放 {code} 异常: {e}")
+            continue
+        cycle, stocks = task
+        started = time.perf_counter()
+        for item in stocks:
+            try:
+                # 整只股票 (默认清单)，或主进程按扫描计划给出的 (股票, 周期, 检测器)
+                if isinstance(item, str):
+                    monitor.scan_stock(item)
+                else:
+                    monitor.scan_item(*item)
+            except Exception as e:
+                print(f"[分片 {shard_id}] 扫描 {item} 异常: {e}")
+            while monitor.alerts:
+                results.put(('alert', shard_id, monitor.alerts.pop(0)))
+        results.put(('done', shard_id, {'cycle': cycle, 'stocks': len(stocks),
+                                        'seconds': round(time.perf_counter() - started, 4),
+                                        'metrics': metrics.export(reset=True)}))
+
+
+class ShardPool:
+    """
+    多进程分片扫描：把监控列表按代码哈希分给 N 个常驻工作进程
+    - 各进程独立持有 xtdata 会话与 K 线缓存，绕开 GIL 并行计算指标
+    - 信号由工作进程落库后经队列回传，主进程汇入 monitor.alerts 供 WebSocket 推送
+    - 录制数据与阶段耗时同样回传，由主进程统一写盘与汇总 (/api/metrics 包含各分片)
+    """
+    def __init__(self, workers: int, config_path: str, db_path: str, config: Dict,
+                 xt_factory: Optional[Callable] = None, timeout: float = 300):
+        self.workers = workers
+        self.config_path = config_path
+        self.db_path = db_path
+        self.config = config
+        self.xt_factory = xt_factory
+        self.timeout = timeout
+        # 统一使用 spawn：与 Windows (QMT 运行环境) 行为一致，也避免 fork 复制 xtdata 连接
+        self._ctx = mp.get_context('spawn')
+        self._procs = []
+        self._tasks = []
+        self._results = None
+        self._cycle = 0
+        self.last_cycle = {}    # Key: shard_id, Value: 上一轮的股票数与耗时
+        self.releases = 0       # 已下发的释放请求
+        self.released = 0       # 分片已确认的释放
+
+    @property
+    def started(self) -> bool:
+        return bool(self._procs)
+
+    def start(self):
+        if self.started:
+            return
+        self._results = self._ctx.Queue()
+        db_config = database.get_db_config()
+        for shard_id in range(self.workers):
+            tasks = self._ctx.Queue()
+            proc = self._ctx.Process(
+                target=_shard_worker, name=f'scan-shard-{shard_id}', daemon=True,
+                args=(shard_id, self.config_path, self.db_path, self.config, db_config,
+                      self.xt_factory, tasks, self._results),
+            )
+            proc.start()
+            self._procs.append(proc)
+            self._tasks.append(tasks)
+        # 等待所有进程完成初始化 (导入与 QMT 连接)，避免首轮扫描计入启动耗时
+        ready = 0
+        while ready < self.workers:
+            kind, _, _ = self._results.get(timeout=self.timeout)
+            ready += kind == 'ready'
+        print(f"分片扫描已启动: {self.workers} 个工作进程")
+
+    def partition(self, stocks: List) -> List[List]:
+        shards = [[] for _ in range(self.workers)]
+        for item in stocks:
+            stock = item if isinstance(item, str) else item[0]
+            shards[shard_of(stock, self.workers)].append(item)
+        return shards
+
+    def release(self, stock_code: str, keep: Optional[Iterable[str]] = None):
+        """通知持有该股票的分片释放订阅与缓存 (keep 为 None 时整只股票，否则只保留这些周期)"""
+        if not self.started:
+            return
+        self._tasks[shard_of(stock_code, self.workers)].put(('release', stock_code, None if keep is None else set(keep)))
+        self.releases += 1
+
+    def run_cycle(self, stocks: List, on_alert: Callable[[Dict], None], recorder=None) -> int:
+        """
+        分发一轮扫描 (股票代码或 (股票, 周期, 检测器)) 并等待所有分片完成，期间持续转发信号；
+        recorder 为主进程的 TickRecorder (录制开启时)
+        """
+        self.start()
+        self._cycle += 1
+        pending = set()
+        for shard_id, part in enumerate(self.partition(stocks)):
+            if part:
+                self._tasks[shard_id].put((self._cycle, part))
+                pending.add(shard_id)
+        deadline = time.time() + self.timeout
+        while pending:
+            try:
+                kind, shard_id, payload = self._results.get(timeout=max(0.1, deadline - time.time()))
+            except queue.Empty:
+                print(f"分片扫描超时，未完成的分片: {sorted(pending)}")
+                break
+            if kind == 'alert':
+                on_alert(payload)
+            elif kind == 'record':
+                if recorder is not None:
+                    method, args = payload
+                    getattr(recorder, method)(*args)
+            elif kind == 'released':
+                self.released += 1
+            elif kind == 'done':
+                metrics.merge(payload.pop('metrics', None) or {})
+                if payload['cycle'] == self._cycle:
+                    self.last_cycle[shard_id] = payload
+                    pending.discard(shard_id)
+        return len(stocks)
+
+    def stop(self):
+        for tasks in self._tasks:
+            tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs = []
+        self._tasks = []
+
+    def stats(self) -> Dict:
+        return {'workers': self.workers, 'started': self.started, 'shards': self.last_cycle,
+                'releases': self.releases, 'released': self.released}
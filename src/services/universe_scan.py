@@ -0,0 +1,227 @@
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.data.async_client import AsyncQMTClient
+from src.indicators.cross_section import right_align, td_last, divergence_last
+from src.services.scan_scheduler import TIMEFRAME_RANK, next_bar_close
+from src.services.metrics import metrics
+
+UNIVERSE_SECTOR = '沪深京A股'
+SIGNAL_NAMES = {'buy_9': 'TD低9', 'sell_9': 'TD高9', 'bull_div': 'MACD底背离', 'bear_div': 'MACD顶背离'}
+
+
+def _matrices(data: Dict, codes: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    把 get_market_data 的 {字段: DataFrame(Index=股票代码, Columns=时间)} 转成 stocks × bars 矩阵
+    返回 (命中的代码, 时间列, close, open)，缺失的代码直接跳过
+    """
+    close_df = data.get('close')
+    open_df = data.get('open')
+    if not isinstance(close_df, pd.DataFrame) or close_df.empty:
+        return [], np.empty(0), np.empty((0, 0)), np.empty((0, 0))
+    if not close_df.index.isin(codes).any() and close_df.columns.isin(codes).any():
+        # 部分版本返回 Index=时间、Columns=代码
+        close_df, open_df = close_df.T, open_df.T
+    found = [c for c in codes if c in close_df.index]
+    close = close_df.loc[found].to_numpy(dtype=np.float64)
+    open_ = open_df.loc[found].to_numpy(dtype=np.float64)
+    return found, close_df.columns.to_numpy(), close, open_
+
+
+class UniverseScanner:
+    """
+    全市场信号扫描：每根 K 线收盘后对全部 A 股计算 TD9 与 MACD 背离并排序
+    - 按批调用 get_market_data (一次取 batch_size 只股票的原生周期 K 线，不经过 BarCache 合成)
+      取数经 AsyncQMTClient (与监控共用 xtdata 线程池、get_market_data 并发上限与超时)，超时的批次本轮跳过
+    - 历史数据交给 DownloadScheduler 以后台优先级补下载，扫描不等待；首轮扫描只用本地已有的 K 线
+    - 每批转为 stocks × bars 矩阵，用 cross_section 的向量化指标一次算出所有股票最后一根已收盘 K 线的信号
+    - 各批由 workers 个线程并行，取数与计算互相重叠
+    - 命中按周期加权打分 (慢周期权重大)，同分按代码排序
+    """
+    def __init__(self, client, timeframes: List[str] = None, count: int = 120, batch_size: int = 500,
+                 workers: int = 4, settle: float = 3.0, qmt: Optional[AsyncQMTClient] = None):
+        self.client = client
+        self.qmt = qmt or AsyncQMTClient.from_config(client)
+        self.timeframes = list(timeframes or ['1d', '30m'])
+        self.count = count
+        self.batch_size = batch_size
+        self.workers = workers
+        self.settle = settle
+        self.running = False
+        self.thread = None
+        self.last_result = None
+        self.scans = 0
+        self.failed_batches = 0
+        self._universe = None
+        self._names = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, client, qmt: Optional[AsyncQMTClient] = None) -> 'UniverseScanner':
+        cfg = client.config.get('universe', {}) or {}
+        return cls(client, timeframes=cfg.get('timeframes'), count=cfg.get('count', 120),
+                   batch_size=cfg.get('batch_size', 500), workers=cfg.get('workers', 4),
+                   settle=client.config.get('monitor', {}).get('bar_settle_seconds', 3), qmt=qmt)
+
+    def universe(self) -> List[str]:
+        if self._universe is None:
+            self._universe = list(self.qmt.call_sync('get_stock_list_in_sector', UNIVERSE_SECTOR) or [])
+        return self._universe
+
+    def _name(self, code: str) -> str:
+        if code not in self._names:
+            detail = self.client.xt_data.get_instrument_detail(code) or {}
+            self._names[code] = detail.get('InstrumentName', '')
+        return self._names[code]
+
+    # --- 单批 ---
+    def _request_history(self, batch: List[str], period: str):
+        """
+        登记本批的历史下载 (DownloadScheduler 后台合并下载，不阻塞扫描)
+        首次按 full_history_start，之后只补上次成功以来的区间；下载失败不记为成功，下一轮重新登记
+        """
+        downloader = self.client.downloader
+        for code in batch:
+            downloader.request(code, period, background=True)
+
+    def _scan_batch(self, batch: List[str], period: str) -> Tuple[List[Dict], Dict[str, float]]:
+        timing = {}
+        started = time.perf_counter()
+        self._request_history(batch, period)
+        try:
+            # 多取一根：最后一根尚未收盘，与监控扫描一致丢弃
+            data = self.qmt.call_sync('get_market_data', field_list=['open', 'close'], stock_list=batch,
+                                      period=period, count=self.count + 1)
+        except Exception as e:
+            with self._lock:
+                self.failed_batches += 1
+            print(f"全市场扫描取 {period} 行情失败 ({len(batch)} 只): {e}")
+            data = None
+        codes, times, close, open_ = _matrices(data or {}, batch)
+        timing['fetch'] = time.perf_counter() - started
+        if not codes:
+            return [], timing
+
+        started = time.perf_counter()
+        valid = ~np.isnan(close)
+        close = right_align(close)[:, :-1]
+        open_ = right_align(open_)[:, :-1]
+        enough = (~np.isnan(close)).sum(axis=1) >= 13  # TD9 至少需要 13 根，背离沿用同一门槛
+        flags = td_last(close)
+        flags.update(divergence_last(close, open_))
+        hit_rows = np.flatnonzero(enough & np.logical_or.reduce(list(flags.values())))
+        hits = []
+        for r in hit_rows:
+            cols = np.flatnonzero(valid[r])
+            hits.append({
+                'code': codes[r],
+                'timeframe': period,
+                'signals': [SIGNAL_NAMES[k] for k in SIGNAL_NAMES if flags[k][r]],
+                'close': float(close[r, -1]),
+                'bar_time': str(times[cols[-2]]),
+            })
+        timing['compute'] = time.perf_counter() - started
+        return hits, timing
+
+    # --- 全市场 ---
+    def scan(self, timeframes: Optional[List[str]] = None, now: Optional[datetime] = None) -> Dict:
+        """扫描全市场的指定周期，返回排序后的命中列表与各阶段耗时"""
+        timeframes = list(timeframes or self.timeframes)
+        now = now or datetime.now()
+        started = time.perf_counter()
+        codes = self.universe()
+        batches = [codes[i:i + self.batch_size] for i in range(0, len(codes), self.batch_size)]
+        jobs = [(batch, tf) for tf in timeframes for batch in batches]
+        timing = {'fetch': 0.0, 'compute': 0.0}
+        hits: List[Dict] = []
+        failed = self.failed_batches
+        with metrics.timer('universe_scan'):
+            # 线程只负责编排与计算，xtdata 调用由 AsyncQMTClient 限流
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+                for batch_hits, batch_timing in pool.map(lambda job: self._scan_batch(job[0], job[1]), jobs):
+                    hits.extend(batch_hits)
+                    for stage, seconds in batch_timing.items():
+                        timing[stage] += seconds
+
+        ranked = self._rank(hits)
+        result = {
+            'time': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'timeframes': timeframes,
+            'stocks': len(codes),
+            'failed_batches': self.failed_batches - failed,
+            'hits': ranked,
+            'seconds': round(time.perf_counter() - started, 3),
+            # fetch/compute 为各批耗时之和 (并行时会大于总耗时)
+            'stages': {k: round(v, 3) for k, v in timing.items()},
+        }
+        with self._lock:
+            self.last_result = result
+            self.scans += 1
+        return result
+
+    def _rank(self, hits: List[Dict]) -> List[Dict]:
+        """按股票合并各周期命中，得分 = Σ (周期权重 × 信号数)，周期越慢权重越大"""
+        merged: Dict[str, Dict] = {}
+        fastest: Dict[str, int] = {}
+        for hit in hits:
+            item = merged.setdefault(hit['code'], {'code': hit['code'], 'signals': [], 'score': 0, 'close': hit['close']})
+            rank = TIMEFRAME_RANK.get(hit['timeframe'], 0)
+            for name in hit['signals']:
+                item['signals'].append({'timeframe': hit['timeframe'], 'type': name, 'bar_time': hit['bar_time']})
+                item['score'] += rank + 1
+            # 展示价格取命中周期中最快的那个 (最接近当前价)
+            if rank < fastest.get(hit['code'], 99):
+                fastest[hit['code']] = rank
+                item['close'] = hit['close']
+        ranked = sorted(merged.values(), key=lambda x: (-x['score'], x['code']))
+        for item in ranked:
+            item['name'] = self._name(item['code'])
+        return ranked
+
+    # --- 后台运行 ---
+    def run(self):
+        self.running = True
+        is_trading = self.client.calendar.is_trading_day
+        # 首次启动立即扫描一次，之后在每个周期的 K 线收盘 + settle 秒后扫描
+        due = {tf: datetime.now() for tf in self.timeframes}
+        while self.running:
+            now = datetime.now()
+            ready = [tf for tf in self.timeframes if now >= due[tf]]
+            if ready:
+                try:
+                    result = self.scan(ready, now)
+                    print(f"全市场扫描 {ready}: {result['stocks']} 只，命中 {len(result['hits'])}，耗时 {result['seconds']}s")
+                except Exception as e:
+                    print(f"全市场扫描异常: {e}")
+                for tf in ready:
+                    due[tf] = datetime.fromtimestamp(next_bar_close(tf, datetime.now(), is_trading).timestamp() + self.settle)
+                continue
+            wait = min(due.values()) - now
+            deadline = time.time() + wait.total_seconds()
+            while self.running and time.time() < deadline:
+                time.sleep(min(1, max(0.05, deadline - time.time())))
+
+    def start(self):
+        if self.running:
+            return
+        self.thread = threading.Thread(target=self.run, name='universe-scan', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            last = self.last_result
+        return {
+            'timeframes': self.timeframes,
+            'scans': self.scans,
+            'failed_batches': self.failed_batches,
+            'last_time': last['time'] if last else None,
+            'last_seconds': last['seconds'] if last else None,
+            'last_hits': len(last['hits']) if last else 0,
+        }
@@ -0,0 +1,109 @@
+"""
+热启动快照
+- 定期 (warm_start.interval 秒) 与退出时，把各组件的 snapshot() 写入本地文件 (pickle，K 线为按列存储的 DataFrame)
+- 启动时在监控线程开始前读回 (restore)：首轮扫描只增量拉取自快照以来的 K 线，统计面板立即显示上次结果
+- 文件版本不符、损坏或不存在时忽略，按冷启动处理
+"""
+import os
+import pickle
+import threading
+import time
+from typing import Dict, Optional
+
+SNAPSHOT_VERSION = 1
+
+
+class WarmStart:
+    def __init__(self, path: str, components: Dict[str, object], interval: float = 300):
+        # components: 名称 -> 提供 snapshot() / restore(state) 的对象 (QMTClient、MonitorService、MarketStatsService)
+        self.path = path
+        self.components = components
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._save_lock = threading.Lock()
+        self.saves = 0
+        self.last_save: Optional[Dict] = None
+        self.last_load: Optional[Dict] = None
+
+    @classmethod
+    def from_config(cls, config: Dict, components: Dict[str, object]) -> Optional['WarmStart']:
+        cfg = config.get('warm_start') or {}
+        if not cfg.get('enabled', True):
+            return None
+        return cls(cfg.get('path', 'data/warm_start.pkl'), components, cfg.get('interval', 300))
+
+    def save(self) -> Dict:
+        """写入快照 (先写临时文件再替换，进程中途退出不会留下半个文件)"""
+        with self._save_lock:
+            started = time.perf_counter()
+            state = {'version': SNAPSHOT_VERSION, 'saved_at': time.time(),
+                     'parts': {name: obj.snapshot() for name, obj in self.components.items()}}
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+            self.saves += 1
+            self.last_save = {'seconds': round(time.perf_counter() - started, 3), 'bytes': os.path.getsize(self.path),
+                              'saved_at': state['saved_at']}
+            return self.last_save
+
+    def load(self) -> Dict:
+        """读回快照并交给各组件，返回 {loaded, seconds, age, parts}"""
+        started = time.perf_counter()
+        result = {'loaded': False, 'parts': []}
+        if not os.path.exists(self.path):
+            self.last_load = result
+            return result
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"读取热启动快照失败，按冷启动处理: {e}")
+            self.last_load = result
+            return result
+        if not isinstance(state, dict) or state.get('version') != SNAPSHOT_VERSION:
+            self.last_load = result
+            return result
+        for name, part in state.get('parts', {}).items():
+            obj = self.components.get(name)
+            if obj is None or not part:
+                continue
+            try:
+                obj.restore(part)
+                result['parts'].append(name)
+            except Exception as e:
+                print(f"载入热启动快照 {name} 失败: {e}")
+        result.update(loaded=True, seconds=round(time.perf_counter() - started, 3),
+                      age=round(time.time() - state.get('saved_at', time.time()), 1))
+        self.last_load = result
+        return result
+
+    # --- 定期保存 ---
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='warm-start', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.save()
+            except Exception as e:
+                print(f"保存热启动快照失败: {e}")
+
+    def stop(self, save: bool = True):
+        """停止定期保存；save=True 时退出前再写一次"""
+        self._stop.set()
+        if save:
+            try:
+                self.save()
+            except Exception as e:
+                print(f"保存热启动快照失败: {e}")
+
+    def stats(self) -> Dict:
+        return {'path': self.path, 'interval': self.interval, 'saves': self.saves,
+                'last_save': self.last_save, 'last_load': self.last_load}
@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from src.data.database import connect_to_db, upsert_monitored_stocks
+from src.services.watchlists import add_to_watchlist
+
+# CSV 表头中表示代码列的名称
+CODE_COLUMNS = ('code', 'stock_code', 'symbol', '代码', '股票代码', '证券代码')
+EXPORT_FIELDS = ('code', 'name', 'added_at')
+# 新股票分批订阅 / 登记下载，便于报告进度
+PREFETCH_CHUNK = 50
+
+
+def parse_import(content: str, fmt: str = 'csv') -> List[str]:
+    """
+    解析导入内容，返回代码/名称列表 (保持原顺序)
+    - json: ["600000", ...]、[{"code": ...}, ...] 或 {"codes": [...]}
+    - csv / 纯文本：有代码列表头时取该列，否则取每行第一个非空单元格
+    """
+    if fmt == 'json':
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = data.get('codes') or data.get('stocks') or []
+        if not isinstance(data, list):
+            raise ValueError("JSON 应为代码列表或 {\"codes\": [...]}")
+        items = []
+        for item in data:
+            if isinstance(item, dict):
+                item = next((item[k] for k in CODE_COLUMNS if item.get(k)), None)
+            if item is not None and str(item).strip():
+                items.append(str(item).strip())
+        return items
+
+    rows = [[cell.strip() for cell in row] for row in csv.reader(io.StringIO(content))]
+    rows = [row for row in rows if any(row)]
+    column = None
+    if rows:
+        header = [cell.lower() for cell in rows[0]]
+        column = next((header.index(name) for name in CODE_COLUMNS if name in header), None)
+        if column is not None:
+            rows = rows[1:]
+    items = []
+    for row in rows:
+        if column is not None:
+            cell = row[column] if column < len(row) else ''
+        else:
+            cell = next((c for c in row if c), '')
+        if cell:
+            items.append(cell)
+    return items
+
+
+def export_watchlist(fmt: str = 'csv') -> Tuple[str, str]:
+    """导出监控列表，返回 (内容, media_type)"""
+    mydb, cursor = connect_to_db()
+    rows = []
+    if mydb:
+        try:
+            cursor.execute("SELECT code, name, added_at FROM monitored_stocks ORDER BY added_at, code")
+            rows = [{k: (str(r[k]) if r.get(k) is not None else '') for k in EXPORT_FIELDS} for r in cursor.fetchall()]
+        finally:
+            cursor.close()
+            mydb.close()
+    if fmt == 'json':
+        return json.dumps(rows, ensure_ascii=False, indent=2), 'application/json'
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue(), 'text/csv; charset=utf-8'
+
+
+class WatchlistImporter:
+    """
+    监控列表批量导入 (后台任务，可查询进度)
+    1. resolve：按全市场对照表一次解析全部输入，或直接取 QMT 板块成分股
+    2. save：多行 upsert 一次写入 (指定 watchlist 时同时加入该命名列表)
+    3. prefetch：新加入的股票立即订阅行情并登记历史下载，首轮扫描不再冷启动
+    """
+    def __init__(self, client, periods: Optional[List[str]] = None, keep: int = 20):
+        self.client = client
+        self.periods = periods          # 需要预下载的周期；None 时读取 monitor.timeframes
+        self.keep = keep
+        self._lock = threading.Lock()
+        self.jobs: 'OrderedDict[str, Dict]' = OrderedDict()
+
+    def start(self, inputs: Optional[List[str]] = None, sector: Optional[str] = None,
+              watchlist: Optional[str] = None) -> Dict:
+        job = {
+            'id': uuid.uuid4().hex[:12], 'state': 'queued', 'source': f"板块 {sector}" if sector else '列表',
+            'watchlist': watchlist,
+            'total': len(inputs or []), 'resolved': 0, 'unresolved': [], 'inserted': 0, 'existing': 0,
+            'prefetched': 0, 'error': None, 'seconds': None,
+        }
+        with self._lock:
+            self.jobs[job['id']] = job
+            while len(self.jobs) > self.keep:
+                self.jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job, list(inputs or []), sector, watchlist),
+                         name='watchlist-import', daemon=True).start()
+        return self.get(job['id'])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job, unresolved=list(job['unresolved'])) if job else None
+
+    def _update(self, job: Dict, **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _resolve(self, job: Dict, inputs: List[str], sector: Optional[str]) -> List[Dict]:
+        instruments = self.client.instruments
+        if sector:
+            codes = list(self.client.xt_data.get_stock_list_in_sector(sector) or [])
+            if not codes:
+                raise ValueError(f"板块为空或不存在: {sector}")
+            self._update(job, total=len(codes))
+            return [{'code': code, 'name': instruments.name(code)} for code in dict.fromkeys(codes)]
+        resolved, unresolved = instruments.resolve_many(inputs)
+        self._update(job, unresolved=unresolved)
+        return resolved
+
+    def _run(self, job: Dict, inputs: List[str], sector: Optional[str], watchlist: Optional[str] = None):
+        started = time.perf_counter()
+        try:
+            if self.client.xt_data is None:
+                raise RuntimeError("QMT 未连接")
+            self._update(job, state='resolve')
+            rows = self._resolve(job, inputs, sector)
+            self._update(job, state='save', resolved=len(rows))
+
+            saved = upsert_monitored_stocks(rows)
+            if saved is None:
+                raise RuntimeError("数据库连接失败")
+            inserted, existing = saved
+            if watchlist and add_to_watchlist(watchlist, rows, register=False) is None:
+                raise RuntimeError(f"监控列表不存在: {watchlist}")
+            self._update(job, state='prefetch', inserted=len(inserted), existing=len(existing))
+
+            periods = self.periods or self.client.config.get('monitor', {}).get('timeframes', [])
+            for i in range(0, len(inserted), PREFETCH_CHUNK):
+                chunk = inserted[i:i + PREFETCH_CHUNK]
+                self.client.prefetch(chunk, periods)
+                self._update(job, prefetched=job['prefetched'] + len(chunk))
+            self._update(job, state='done')
+        except Exception as e:
+            print(f"批量导入失败: {e}")
+            self._update(job, state='error', error=str(e))
+        finally:
+            self._update(job, seconds=round(time.perf_counter() - started, 3))
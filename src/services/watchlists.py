@@ -0,0 +1,245 @@
+"""
+命名监控列表 (watchlist)
+- 每个列表有自己的周期集合、检测器集合与扫描优先级，例如：
+  「日内异动」只看盘口 (depth)，「长线」只看 1d/1w 的 TD9
+- 扫描计划 = 各启用列表的并集：同一只股票在多个列表中时周期与检测器取并集，优先级取最大
+- 只在 monitored_stocks 中、不属于任何列表的股票保持原有行为：config 中全部周期 + 全部检测器 + 盘口
+"""
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from src.data.database import connect_to_db, upsert_monitored_stocks
+from src.services.scan_scheduler import TIMEFRAME_RANK
+from src.indicators.detectors import DETECTORS as KLINE_REGISTRY
+
+TIMEFRAMES = tuple(tf for tf in TIMEFRAME_RANK if tf != 'tick')
+DEPTH_ONLY = frozenset(('depth',))
+# 领先指数 (全市场统计面板) 排在所有监控列表之前扫描
+INDEX_PRIORITY = 1000
+
+
+def detector_names() -> Tuple[str, ...]:
+    """可选检测器：注册表中的 K 线检测器 (运行时可新增) 与盘口检测器 depth (对应扫描项 'tick')"""
+    return tuple(KLINE_REGISTRY) + ('depth',)
+
+
+def _split(text: Optional[str]) -> List[str]:
+    return [part.strip() for part in (text or '').split(',') if part.strip()]
+
+
+def _validate(values: Iterable[str], allowed: Iterable[str], label: str) -> List[str]:
+    values = list(dict.fromkeys(str(v).strip() for v in values if str(v).strip()))
+    unknown = [v for v in values if v not in allowed]
+    if unknown:
+        raise ValueError(f"不支持的{label}: {', '.join(unknown)}")
+    if not values:
+        raise ValueError(f"至少需要一个{label}")
+    return values
+
+
+class ScanPlan:
+    """
+    一轮扫描的工作清单：股票 -> {扫描项 (周期或 'tick'): 检测器集合}
+    未登记的股票 (例如分片进程收到的旧式整只股票任务) 按默认清单扫描
+    """
+    def __init__(self, default_timeframes: Iterable[str]):
+        self.all_kline = frozenset(KLINE_REGISTRY)
+        self.default = {tf: self.all_kline for tf in default_timeframes}
+        self.default['tick'] = DEPTH_ONLY
+        self.items: Dict[str, Dict[str, FrozenSet[str]]] = {}
+        self.priority: Dict[str, int] = {}
+        self.lists = 0
+        self.indices = 0
+        self.watched: Set[str] = set()      # 监控列表 / 监控股票中的代码 (不含只作为领先指数扫描的)
+
+    def add(self, stock: str, timeframes: Iterable[str], detectors: Iterable[str], priority: int = 0):
+        self._merge(stock, timeframes, detectors, priority)
+        self.watched.add(stock)
+
+    def _merge(self, stock: str, timeframes: Iterable[str], detectors: Iterable[str], priority: int):
+        detectors = frozenset(detectors)
+        items = self.items.setdefault(stock, {})
+        kline = detectors & self.all_kline
+        if kline:
+            for tf in timeframes:
+                items[tf] = items.get(tf, frozenset()) | kline
+        if 'depth' in detectors:
+            items['tick'] = DEPTH_ONLY
+        self.priority[stock] = max(priority, self.priority.get(stock, priority))
+
+    def add_indices(self, codes: Iterable[str], timeframes: Iterable[str]):
+        """领先指数：只在指定周期上运行 K 线检测器 (与同名监控股票合并，不重复扫描)"""
+        timeframes = list(timeframes)
+        for code in codes:
+            self._merge(code, timeframes, self.all_kline, INDEX_PRIORITY)
+            self.indices += 1
+
+    def add_default(self, stock: str):
+        self.items[stock] = dict(self.default)
+        self.priority.setdefault(stock, 0)
+        self.watched.add(stock)
+
+    def stocks(self) -> List[str]:
+        """需要扫描的股票，优先级高的在前 (同优先级保持加入顺序)"""
+        order = sorted(enumerate(self.items), key=lambda p: (-self.priority.get(p[1], 0), p[0]))
+        return [stock for _, stock in order if self.items[stock]]
+
+    def scan_items(self, stock: str) -> Dict[str, FrozenSet[str]]:
+        items = self.items.get(stock)
+        return self.default if items is None else items
+
+    def detectors(self, stock: str, tf: str) -> FrozenSet[str]:
+        return self.scan_items(stock).get(tf, frozenset())
+
+    def stats(self) -> Dict:
+        return {'lists': self.lists, 'indices': self.indices,
+                'stocks': sum(1 for stock in self.stocks() if stock in self.watched),
+                'items': sum(len(items) for items in self.items.values())}
+
+
+def load_plan(default_timeframes: Iterable[str]) -> Optional[ScanPlan]:
+    """从数据库读取监控列表并生成扫描计划；数据库不可用时返回 None"""
+    mydb, cursor = connect_to_db()
+    if not mydb:
+        return None
+    try:
+        plan = ScanPlan(default_timeframes)
+        cursor.execute("SELECT code FROM monitored_stocks ORDER BY added_at, code")
+        codes = [row['code'] for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT ws.code, w.timeframes, w.detectors, w.priority, w.enabled
+            FROM watchlist_stocks ws
+            JOIN watchlists w ON ws.watchlist_id = w.id
+            JOIN monitored_stocks m ON ws.code = m.code
+        """)
+        members = cursor.fetchall()
+        cursor.execute("SELECT COUNT(*) AS n FROM watchlists WHERE enabled = 1")
+        plan.lists = cursor.fetchone()['n']
+    finally:
+        cursor.close()
+        mydb.close()
+
+    grouped: Dict[str, List[Dict]] = {}
+    for row in members:
+        grouped.setdefault(row['code'], []).append(row)
+    for code in codes:
+        rows = grouped.get(code)
+        if not rows:
+            plan.add_default(code)
+            continue
+        # 只属于已停用列表的股票不扫描
+        plan.items.setdefault(code, {})
+        for row in rows:
+            if row['enabled']:
+                plan.add(code, _split(row['timeframes']), _split(row['detectors']), int(row['priority'] or 0))
+    return plan
+
+
+def list_watchlists() -> List[Dict]:
+    mydb, cursor = connect_to_db()
+    if not mydb:
+        return []
+    try:
+        cursor.execute("""
+            SELECT w.id, w.name, w.timeframes, w.detectors, w.priority, w.enabled, COUNT(ws.code) AS stocks
+            FROM watchlists w
+            LEFT JOIN watchlist_stocks ws ON ws.watchlist_id = w.id
+            GROUP BY w.id, w.name, w.timeframes, w.detectors, w.priority, w.enabled
+            ORDER BY w.priority DESC, w.name
+        """)
+        rows = cursor.fetchall()
+        for row in rows:
+            row['timeframes'] = _split(row['timeframes'])
+            row['detectors'] = _split(row['detectors'])
+            row['enabled'] = bool(row['enabled'])
+        return rows
+    finally:
+        cursor.close()
+        mydb.close()
+
+
+def save_watchlist(name: str, timeframes: Iterable[str] = (), detectors: Optional[Iterable[str]] = None,
+                   priority: int = 0, enabled: bool = True) -> bool:
+    """新建或更新列表 (按名称)，detectors 为 None 表示全部；参数不合法时抛出 ValueError，数据库不可用返回 False"""
+    name = (name or '').strip()
+    if not name:
+        raise ValueError("列表名称不能为空")
+    detectors = _validate(detector_names() if detectors is None else detectors, detector_names(), '检测器')
+    # 只有盘口检测器时可以不指定周期
+    timeframes = _validate(timeframes, TIMEFRAMES, '周期') if set(detectors) & set(KLINE_REGISTRY) else \
+        [tf for tf in timeframes if tf in TIMEFRAMES]
+    mydb, cursor = connect_to_db()
+    if not mydb:
+        return False
+    try:
+        cursor.execute("""
+            INSERT INTO watchlists (name, timeframes, detectors, priority, enabled) VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE timeframes = VALUES(timeframes), detectors = VALUES(detectors),
+                priority = VALUES(priority), enabled = VALUES(enabled)
+        """, (name, ','.join(timeframes), ','.join(detectors), int(priority), 1 if enabled else 0))
+        mydb.commit()
+        return True
+    finally:
+        cursor.close()
+        mydb.close()
+
+
+def delete_watchlist(name: str) -> bool:
+    """删除列表及其成员关系 (股票仍保留在 monitored_stocks 中，按默认清单扫描)"""
+    mydb, cursor = connect_to_db()
+    if not mydb:
+        return False
+    try:
+        cursor.execute("SELECT id FROM watchlists WHERE name = %s", (name,))
+        row = cursor.fetchone()
+        if not row:
+            return False
+        cursor.execute("DELETE FROM watchlist_stocks WHERE watchlist_id = %s", (row['id'],))
+        cursor.execute("DELETE FROM watchlists WHERE id = %s", (row['id'],))
+        mydb.commit()
+        return True
+    finally:
+        cursor.close()
+        mydb.close()
+
+
+def add_to_watchlist(name: str, rows: List[Dict], register: bool = True) -> Optional[int]:
+    """
+    把已解析的股票 ([{code, name}]) 加入列表；register 时同时登记到 monitored_stocks
+    返回新加入该列表的数量；列表不存在或数据库不可用时返回 None
+    """
+    if register and upsert_monitored_stocks(rows) is None:
+        return None
+    mydb, cursor = connect_to_db()
+    if not mydb:
+        return None
+    try:
+        cursor.execute("SELECT id FROM watchlists WHERE name = %s", (name,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute("SELECT code FROM watchlist_stocks WHERE watchlist_id = %s", (row['id'],))
+        existing = {r['code'] for r in cursor.fetchall()}
+        new = list(dict.fromkeys(r['code'] for r in rows if r['code'] not in existing))
+        if new:
+            cursor.executemany("INSERT INTO watchlist_stocks (watchlist_id, code) VALUES (%s, %s)",
+                               [(row['id'], code) for code in new])
+        mydb.commit()
+        return len(new)
+    finally:
+        cursor.close()
+        mydb.close()
+
+
+def remove_from_watchlist(name: str, code: str) -> bool:
+    mydb, cursor = connect_to_db()
+    if not mydb:
+        return False
+    try:
+        cursor.execute("""
+            DELETE FROM watchlist_stocks
+            WHERE code = %s AND watchlist_id IN (SELECT id FROM watchlists WHERE name = %s)
+        """, (code, name))
+        mydb.commit()
+        return cursor.rowcount > 0
+    finally:
+        cursor.close()
+        mydb.close()
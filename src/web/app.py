@@ -1,68 +1,188 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, Response
 import json
 import asyncio
 import os
-from src.services.monitor import MonitorService
-from src.services.market_stats import MarketStatsService
-from src.data.database import connect_to_db
-
-app = FastAPI()
+import re
+import time
+import threading
+import yaml
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Callable, Optional
+try:
+    import psutil
+except ImportError:     # 可选依赖：没有时内存报告退回 resource 模块的峰值 RSS
+    psutil = None
+# 只导入轻量模块：监控、统计等服务 (pandas / numpy / numba / xtquant) 在服务器开始接受连接后于后台构造
+from src.services.warm_start import WarmStart
+from src.data.database import connect_to_db, fetch_signal_page
+from src.services.metrics import metrics
+from src.web.assets import AssetStore
+from src.web.ws_protocol import (PROTOCOL_VERSION, SnapshotChannel, encode, alerts_message,
+                                 market_snapshot, quotes_snapshot, parse_client_message)
 
 # 获取基础路径
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 CONFIG_PATH = os.path.join(BASE_DIR, "config.yaml")
 DB_PATH = os.path.join(BASE_DIR, "data", "qmt_jk.db")
 
-# 初始化监控服务
-monitor = MonitorService(CONFIG_PATH, DB_PATH)
-monitor.start()
+# 页面与静态文件：内存缓存 + 预压缩，修改后自动重新加载 (不依赖后台服务，启动后立即可用)
+STATIC_DIR = os.path.join(BASE_DIR, "src", "web", "static")
+TEMPLATE_DIR = os.path.join(BASE_DIR, "src", "web", "templates")
+assets = AssetStore(STATIC_DIR, TEMPLATE_DIR)
 
-# 初始化全市场统计服务
-market_stats_service = MarketStatsService(monitor.client)
-current_market_stats = {}
 
-# 静态文件
-STATIC_DIR = os.path.join(BASE_DIR, "src", "web", "static")
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+def build_services(web: 'WebState'):
+    """
+    构造并启动监控、全市场统计、全市场扫描与导入服务 (在线程中执行，较重的依赖在此首次导入)
+    应用已开始退出 (web.stopping) 时不再启动任何服务
+    """
+    from src.services.monitor import MonitorService
+    from src.services.market_stats import MarketStatsService
+    from src.services.universe_scan import UniverseScanner
+    from src.services.watchlist_io import WatchlistImporter
+
+    # 初始化监控服务
+    service = web.monitor_factory() if web.monitor_factory else MonitorService(web.config_path, web.db_path)
+
+    # 初始化全市场统计服务
+    # 指数信号由监控扫描在 K 线收盘后计算 (与监控股票共用 K 线缓存与特征缓存)，统计面板只读取结果
+    stats = MarketStatsService(service.client, service.index_signal_labels)
+    service.track_indices(stats.index_names())
+    if web.stopping.is_set():
+        # 已构造的服务不会交给 lifespan 清理：在此停止 (分片进程、录制器与 xtdata 线程池)
+        service.stop()
+        service.qmt.shutdown()
+        return
+
+    # 热启动：在监控线程开始前载入上次的 K 线缓存、代码表、下载记录与统计结果，之后定期保存
+    warm_start = WarmStart.from_config(service.config, {'client': service.client, 'monitor': service, 'market': stats})
+    if warm_start:
+        print(f"热启动快照: {warm_start.load()}")
+        warm_start.start()
+    web.warm_start = warm_start
+    service.start()
+    web.monitor = service
+    web.current_market_stats = stats.last_stats
+
+    # 全市场信号扫描 (universe.enabled 时随服务启动，否则可通过接口手动触发)
+    web.universe_scanner = UniverseScanner.from_config(service.client, service.qmt)
+    if service.config.get('universe', {}).get('enabled'):
+        web.universe_scanner.start()
+
+    # 监控列表批量导入 (后台解析、写库与预下载)
+    web.importer = WatchlistImporter(service.client)
+    web.market_stats_service = stats
+
+
+def _web(request: Request) -> 'WebState':
+    return request.app.state.web
+
+
+def _require_services(request: Request):
+    startup = _web(request).startup
+    if startup['state'] != 'ready':
+        raise HTTPException(status_code=503, detail="服务启动中" if startup['state'] == 'starting' else startup['error'])
+
+
+# 页面、静态文件、WebSocket 与状态接口不依赖后台服务；其余接口在服务就绪后才可用
+router = APIRouter()
+api = APIRouter(dependencies=[Depends(_require_services)])
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, channels: Optional[dict] = None):
+        self.channels = channels if channels is not None else {}
         self.active_connections: list[WebSocket] = []
+        self.versions: dict = {}    # Key: websocket, Value: 协议版本 (1 旧版逐条预警 / 2 增量快照)
+        self.messages = 0
+        self.bytes_sent = 0         # 压缩前的字节数 (permessage-deflate 由 WebSocket 服务器完成)
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, version: int = 1):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.versions[websocket] = version
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        self.versions.pop(websocket, None)
+
+    def has_clients(self, version: int) -> bool:
+        return any(v == version for v in self.versions.values())
+
+    async def send(self, connection: WebSocket, message: str) -> bool:
+        try:
+            await connection.send_text(message)
+        except Exception:
+            # 如果发送失败，说明连接已失效，移除它
+            self.disconnect(connection)
+            return False
+        self.messages += 1
+        self.bytes_sent += len(message.encode('utf-8'))
+        return True
 
-    async def broadcast(self, message: str):
+    async def broadcast(self, message: str, version: int = 1):
         # 使用副本迭代，防止在广播过程中连接列表发生变化
         for connection in list(self.active_connections):
-            try:
-                await connection.send_text(message)
-            except Exception:
-                # 如果发送失败，说明连接已失效，移除它
-                self.disconnect(connection)
+            if self.versions.get(connection) == version:
+                await self.send(connection, message)
 
-manager = ConnectionManager()
+    def stats(self) -> dict:
+        versions = list(self.versions.values())
+        return {
+            'clients': {f'v{v}': versions.count(v) for v in sorted(set(versions))},
+            'messages': self.messages,
+            'bytes': self.bytes_sent,
+            'channels': {name: ch.seq for name, ch in self.channels.items()},
+        }
+
+
+class WebState:
+    """
+    一个应用实例的运行状态 (挂在 app.state.web 上，同一进程中的多个应用实例互不影响)
+    - 后台服务：由 lifespan 在服务器开始接受连接后构造 (见 build_services)，就绪前 API 返回 503
+    - WebSocket 连接与 v2 快照频道 (全市场统计与监控列表行情，只推送变化的字段，定期发送关键帧)
+    """
+    def __init__(self, config_path: str, db_path: str, monitor_factory: Optional[Callable], ws_config: dict):
+        self.config_path = config_path
+        self.db_path = db_path
+        self.monitor_factory = monitor_factory
+        self.monitor = None
+        self.market_stats_service = None
+        self.universe_scanner = None
+        self.importer = None
+        self.warm_start = None
+        self.current_market_stats = {}
+        self.startup = {'state': 'starting', 'seconds': None, 'error': None}
+        self.stopping = threading.Event()     # lifespan 退出时置位，构造线程据此不再启动服务
+        self.ws_config = ws_config
+        self.channels = {name: SnapshotChannel(name, ws_config.get('keyframe_every', 20)) for name in ('market', 'quotes')}
+        self.manager = ConnectionManager(self.channels)
+
+
+async def publish(web: WebState, name: str, snapshot: dict):
+    message = web.channels[name].update(snapshot)
+    if message:
+        await web.manager.broadcast(encode(message), version=PROTOCOL_VERSION)
 
 # 背景任务：定期检查并广播预警
-async def alert_broadcaster():
+async def alert_broadcaster(web: WebState):
+    monitor, manager = web.monitor, web.manager
     while True:
         try:
             if monitor.alerts:
-                alert = monitor.alerts.pop(0)
-                await manager.broadcast(json.dumps(alert))
+                # 取走当前全部预警 (积压超过 max_pending_alerts 时监控线程已丢弃最早的)，同一轮的多条合并为一帧
+                batch = monitor.take_alerts()
+                for alert in batch:
+                    await manager.broadcast(json.dumps(alert))
+                await manager.broadcast(encode(alerts_message(batch)), version=PROTOCOL_VERSION)
         except Exception as e:
             print(f"广播预警异常: {e}")
         await asyncio.sleep(0.5) # 提高检查频率到 0.5 秒
 
-@app.get("/api/stocks")
-async def get_stocks():
+@api.get("/api/stocks")
+async def get_stocks(web: WebState = Depends(_web)):
     mydb, cursor = connect_to_db()
     if not mydb:
         return []
@@ -72,7 +192,7 @@ async def get_stocks():
         
         # 获取实时行情
         codes = [s['code'] for s in stocks]
-        rt_data = monitor.client.get_realtime_data(codes)
+        rt_data = await web.monitor.qmt.get_realtime_data(codes)
         
         for s in stocks:
             data = rt_data.get(s['code'], {'price': 0, 'change_pct': 0})
@@ -84,14 +204,17 @@ async def get_stocks():
         cursor.close()
         mydb.close()
 
-@app.post("/api/stocks")
-async def add_stock(stock: dict):
+@api.post("/api/stocks")
+async def add_stock(stock: dict, web: WebState = Depends(_web)):
     input_str = stock.get('code', '').strip()
     if not input_str:
         return {"status": "error", "message": "Input is required"}
     
     # 使用 QMTClient 解析代码和名称
-    resolved = monitor.client.resolve_stock_code(input_str)
+    try:
+        resolved = await web.monitor.qmt.resolve_stock_code(input_str)
+    except TimeoutError as e:
+        return {"status": "error", "message": str(e)}
     if not resolved:
         return {"status": "error", "message": f"无法识别股票: {input_str}"}
     
@@ -111,14 +234,17 @@ async def add_stock(stock: dict):
         cursor.close()
         mydb.close()
 
-@app.delete("/api/stocks/{code}")
-async def delete_stock(code: str):
+@api.delete("/api/stocks/{code}")
+async def delete_stock(code: str, web: WebState = Depends(_web)):
     mydb, cursor = connect_to_db()
     if not mydb:
         return {"status": "error", "message": "DB connection failed"}
     try:
         cursor.execute("DELETE FROM monitored_stocks WHERE code = %s", (code,))
+        cursor.execute("DELETE FROM watchlist_stocks WHERE code = %s", (code,))
         mydb.commit()
+        # 立即退订并清理缓存 (其余移出列表的股票在下一轮扫描开始时清理)
+        web.monitor.release_stock(code)
         return {"status": "success"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -126,108 +252,327 @@ async def delete_stock(code: str):
         cursor.close()
         mydb.close()
 
-@app.get("/api/signals")
-async def get_signals():
-    mydb, cursor = connect_to_db()
-    if not mydb:
-        return []
+@api.post("/api/stocks/import")
+async def import_stocks(body: dict, watchlist: str = None, web: WebState = Depends(_web)):
+    """
+    批量导入：{"codes": [...]}、{"sector": "QMT 板块名"} 或 {"content": "...", "format": "csv|json"}
+    可带 "watchlist" 同时加入该命名列表；立即返回任务，进度见 GET /api/stocks/import/{job_id}
+    """
+    from src.services.watchlist_io import parse_import
+    from src.services.watchlists import list_watchlists
+    watchlist = watchlist or (body.get('watchlist') or '').strip() or None
+    if watchlist and watchlist not in {w['name'] for w in list_watchlists()}:
+        return {"status": "error", "message": f"监控列表不存在: {watchlist}"}
+    sector = (body.get('sector') or '').strip()
+    codes = body.get('codes')
+    if isinstance(codes, str):
+        # 字符串按逗号 / 空白分隔
+        codes = [c for c in re.split(r'[\s,，]+', codes) if c]
+    elif codes is not None and not isinstance(codes, list):
+        return {"status": "error", "message": "codes 应为代码列表"}
     try:
-        # 关联监控表以获取名称
-        cursor.execute("""
-            SELECT s.*, m.name 
-            FROM signal_history s
-            LEFT JOIN monitored_stocks m ON s.stock_code = m.code 
-            ORDER BY s.timestamp DESC 
-            LIMIT 100
-        """)
-        return cursor.fetchall()
-    finally:
-        cursor.close()
-        mydb.close()
+        inputs = codes or parse_import(body.get('content') or '', body.get('format') or 'csv')
+    except ValueError as e:
+        return {"status": "error", "message": f"无法解析导入内容: {e}"}
+    if not sector and not inputs:
+        return {"status": "error", "message": "没有可导入的代码"}
+    return {"status": "accepted",
+            "job": web.importer.start(None if sector else [str(x) for x in inputs], sector or None, watchlist)}
+
+@api.get("/api/stocks/import/{job_id}")
+async def import_progress(job_id: str, web: WebState = Depends(_web)):
+    job = web.importer.get(job_id)
+    if job is None:
+        return {"status": "error", "message": "任务不存在"}
+    return {"status": "success", "job": job}
+
+@api.get("/api/stocks/export")
+async def export_stocks(format: str = 'csv'):
+    from src.services.watchlist_io import export_watchlist
+    fmt = 'json' if format == 'json' else 'csv'
+    content, media_type = export_watchlist(fmt)
+    return Response(content, media_type=media_type,
+                    headers={'Content-Disposition': f'attachment; filename="watchlist.{fmt}"'})
+
+@api.get("/api/watchlists")
+async def get_watchlists():
+    from src.services.watchlists import list_watchlists
+    return list_watchlists()
+
+@api.post("/api/watchlists")
+async def upsert_watchlist(body: dict):
+    """新建/修改命名列表：{"name", "timeframes": [...], "detectors": ["td9", "divergence", "depth"], "priority", "enabled"}"""
+    from src.services.watchlists import save_watchlist
+    try:
+        ok = save_watchlist(body.get('name'), body.get('timeframes') or [], body.get('detectors') or None,
+                            int(body.get('priority') or 0), bool(body.get('enabled', True)))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success"} if ok else {"status": "error", "message": "DB connection failed"}
+
+@api.delete("/api/watchlists/{name}")
+async def remove_watchlist(name: str):
+    from src.services.watchlists import delete_watchlist
+    if not delete_watchlist(name):
+        return {"status": "error", "message": f"监控列表不存在: {name}"}
+    return {"status": "success"}
+
+@api.post("/api/watchlists/{name}/stocks")
+async def add_watchlist_stocks(name: str, body: dict, web: WebState = Depends(_web)):
+    # 与批量导入相同 (后台解析、写库与预下载)，同时加入该列表
+    return await import_stocks(body, watchlist=name, web=web)
 
-@app.get("/api/status")
-async def get_status():
+@api.delete("/api/watchlists/{name}/stocks/{code}")
+async def remove_watchlist_stock(name: str, code: str):
+    from src.services.watchlists import remove_from_watchlist
+    if not remove_from_watchlist(name, code):
+        return {"status": "error", "message": f"{code} 不在列表 {name} 中"}
+    return {"status": "success"}
+
+@api.get("/api/signals")
+async def get_signals(before_id: int = None, limit: int = 100):
+    # 键集分页：前端滚动到底部时带上已加载的最小 id 继续取更早的信号
+    return fetch_signal_page(before_id, limit)
+
+@router.get("/api/status")
+async def get_status(web: WebState = Depends(_web)):
     # 强制重新读取一次配置，确保 interval 是最新的
-    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-        import yaml
+    with open(web.config_path, 'r', encoding='utf-8') as f:
         latest_config = yaml.safe_load(f)
         interval = latest_config.get('monitor', {}).get('interval', 5)
-        monitor.config = latest_config # 同步给 monitor 实例
-        
+    if web.monitor is None or web.startup['state'] != 'ready':
+        # 后台服务尚未就绪：页面先显示启动状态
+        return {"status": "服务启动中" if web.startup['state'] == 'starting' else "启动失败", "starting": True,
+                "startup": web.startup, "last_scan_time": None, "stock_count": '-', "interval": interval}
+    web.monitor.config = latest_config # 同步给 monitor 实例
+
     return {
-        "status": monitor.get_status_display(),
-        "last_scan_time": monitor.last_scan_time,
-        "stock_count": len(monitor.get_monitored_stocks()),
-        "interval": interval
+        "status": web.monitor.get_status_display(),
+        "last_scan_time": web.monitor.last_scan_time,
+        "stock_count": len(web.monitor.get_monitored_stocks()),
+        "interval": interval,
+        "metrics": metrics.summary()[:6],
+        "downloads": web.monitor.client.downloader.stats(),
+        "bar_store": web.monitor.client.bar_store.stats(),
+        "shards": web.monitor.shards.stats() if web.monitor.shards else None,
+        "schedule": web.monitor.scheduler.stats() if web.monitor.scheduler else None,
+        "plan": web.monitor.plan.stats(),
+        "features": web.monitor.client.features.stats(),
+        "calendar": web.monitor.client.calendar.stats(),
+        "universe": web.universe_scanner.stats(),
+        "xtdata": web.monitor.qmt.stats(),
+        "quotes": web.monitor.client.ticks.stats(),
+        "ws": web.manager.stats(),
+        "assets": assets.stats(),
+        "warm_start": web.warm_start.stats() if web.warm_start else None,
+        "startup": web.startup
     }
 
-@app.get("/api/market_stats")
-async def get_market_stats():
-    return current_market_stats
+def _process_rss() -> dict:
+    if psutil is not None:
+        return {'rss': psutil.Process().memory_info().rss}
+    try:
+        import resource
+    except ImportError:
+        return {}
+    # Linux 上 ru_maxrss 单位为 KB
+    return {'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+@api.get("/api/memory")
+async def get_memory(web: WebState = Depends(_web)):
+    """内存报告：订阅数、各级缓存规模与待推送告警，便于发现长时间运行后的增长"""
+    return dict(
+        web.monitor.client.memory_stats(),
+        alerts={'pending': len(web.monitor.alerts), 'max_pending': web.monitor.max_alerts,
+                'dropped': web.monitor.alerts_dropped},
+        plan=web.monitor.plan.stats(),
+        index_signals=len(web.monitor.index_signals),
+        ws=web.manager.stats(),
+        assets=assets.stats(),
+        process=_process_rss(),
+    )
+
+@api.get("/api/metrics")
+async def get_metrics(web: WebState = Depends(_web)):
+    # Prometheus 文本格式
+    text = (metrics.render_prometheus() + web.monitor.client.downloader.render_prometheus()
+            + web.monitor.qmt.render_prometheus())
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
 
-@app.post("/api/config")
-async def update_config(config: dict):
-    success = monitor.update_config(config)
+@api.get("/api/market_stats")
+async def get_market_stats(web: WebState = Depends(_web)):
+    return web.current_market_stats
+
+@api.get("/api/universe")
+async def get_universe(limit: int = 100, web: WebState = Depends(_web)):
+    result = web.universe_scanner.last_result
+    if not result:
+        return {"status": "empty", "hits": []}
+    return dict(result, hits=result['hits'][:limit])
+
+@api.post("/api/universe/scan")
+async def scan_universe(timeframes: str = None, limit: int = 100, web: WebState = Depends(_web)):
+    try:
+        result = await web.monitor.qmt.run('universe_scan', web.universe_scanner.scan,
+                                       timeframes.split(',') if timeframes else None)
+    except TimeoutError as e:
+        return {"status": "error", "message": str(e)}
+    return dict(result, hits=result['hits'][:limit])
+
+@api.post("/api/config")
+async def update_config(config: dict, web: WebState = Depends(_web)):
+    success = web.monitor.update_config(config)
     if success:
         return {"status": "success"}
     else:
         return {"status": "error", "message": "Failed to update config"}
 
-@app.post("/api/monitor/start")
-async def start_monitor():
-    monitor.start()
+@api.post("/api/monitor/start")
+async def start_monitor(web: WebState = Depends(_web)):
+    web.monitor.start()
     return {"status": "success"}
 
-@app.post("/api/monitor/stop")
-async def stop_monitor():
-    monitor.stop()
+@api.post("/api/monitor/stop")
+async def stop_monitor(web: WebState = Depends(_web)):
+    web.monitor.stop()
     return {"status": "success"}
 
-@app.get("/")
-async def get():
-    template_path = os.path.join(BASE_DIR, "src", "web", "templates", "index.html")
-    with open(template_path, "r", encoding="utf-8") as f:
-        return HTMLResponse(f.read())
+@router.get("/")
+async def get(request: Request):
+    return assets.page_response("index.html", request.headers)
+
+@router.get("/static/{path:path}")
+async def get_static(path: str, request: Request, v: str = None):
+    return assets.static_response(path, v, request.headers)
 
-@app.websocket("/ws/alerts")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+@router.websocket("/ws/alerts")
+async def websocket_endpoint(websocket: WebSocket, v: int = 1):
+    version = PROTOCOL_VERSION if v >= PROTOCOL_VERSION else 1
+    web = websocket.app.state.web
+    await web.manager.connect(websocket, version)
     try:
+        if version == PROTOCOL_VERSION:
+            # 新连接先收到各频道的关键帧
+            for channel in web.channels.values():
+                keyframe = channel.keyframe()
+                if keyframe:
+                    await web.manager.send(websocket, encode(keyframe))
         while True:
-            # 保持连接，监听可能的客户端消息（虽然目前不需要）
-            await websocket.receive_text()
+            message = parse_client_message(await websocket.receive_text())
+            # 客户端发现 seq 不连续时请求关键帧重新同步
+            if version == PROTOCOL_VERSION and message and message.get('type') == 'resync':
+                targets = [web.channels[message['ch']]] if message.get('ch') in web.channels else web.channels.values()
+                for channel in targets:
+                    keyframe = channel.keyframe()
+                    if keyframe:
+                        await web.manager.send(websocket, encode(keyframe))
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        web.manager.disconnect(websocket)
     except Exception:
-        manager.disconnect(websocket)
+        web.manager.disconnect(websocket)
+
+# 背景任务：监控列表行情推送 (只在有 v2 客户端时取数，休市时不再轮询)
+async def quotes_updater(web: WebState):
+    monitor, manager = web.monitor, web.manager
+    interval = web.ws_config.get('quote_interval', 5)
+    while True:
+        try:
+            if manager.has_clients(PROTOCOL_VERSION) and (monitor.is_trading_time() or web.channels['quotes'].state is None):
+                codes = monitor.get_monitored_stocks()
+                rt_data = await monitor.qmt.get_realtime_data(codes) if codes else {}
+                if rt_data or not codes:
+                    await publish(web, 'quotes', quotes_snapshot(rt_data))
+        except Exception as e:
+            print(f"行情推送异常: {e}")
+        await asyncio.sleep(interval)
 
 # 背景任务：全市场统计更新
-async def market_stats_updater():
-    global current_market_stats
+async def market_stats_updater(web: WebState):
+    monitor = web.monitor
     is_first_update = True
     while True:
         try:
             # 交易时间判定 (V21.Final-UX: 首次启动允许更新一次以初始化界面)
             if not monitor.is_trading_time() and not is_first_update:
-                await asyncio.sleep(60)
+                # 休市：按交易日历睡到下一个交易时段 (分段等待，日历跨日后会刷新)
+                wait = monitor.client.calendar.seconds_until_open(datetime.now())
+                await asyncio.sleep(min(max(wait, 1), 3600))
                 continue
                 
-            # 使用 to_thread 避免同步调用阻塞异步事件循环
-            stats = await asyncio.to_thread(market_stats_service.update_stats)
+            # 在 xtdata 线程池中执行并限时，QMT 卡住时本轮跳过而不是一直等待
+            stats = await monitor.qmt.run('market_stats', web.market_stats_service.update_stats)
             if stats:
-                current_market_stats = stats
+                web.current_market_stats = stats
+                await publish(web, 'market', market_snapshot(stats))
                 is_first_update = False # 成功初始化后标记
         except Exception as e:
             print(f"统计更新异常: {e}")
         await asyncio.sleep(15) # 每15秒统计一次
 
-@app.on_event("startup")
-async def startup_event():
-    # 启动背景广播任务
-    asyncio.create_task(alert_broadcaster())
-    # 启动全市场统计任务
-    asyncio.create_task(market_stats_updater())
+async def start_services(web: WebState, tasks: list):
+    """服务器已开始接受连接后执行：在线程中构造服务，完成后启动推送任务 (应用已开始退出时不再启动)"""
+    started = time.perf_counter()
+    startup = web.startup
+    try:
+        await asyncio.to_thread(build_services, web)
+    except Exception as e:
+        startup.update(state='failed', error=f"服务启动失败: {e}")
+        print(startup['error'])
+        return
+    if web.stopping.is_set():
+        return
+    startup.update(state='ready', seconds=round(time.perf_counter() - started, 3))
+    print(f"后台服务已就绪 ({startup['seconds']}s)")
+    # 快照中的统计结果作为 market 频道初始状态，新连接立即收到关键帧
+    if web.current_market_stats:
+        web.channels['market'].update(market_snapshot(web.current_market_stats))
+    # 启动背景广播任务、全市场统计任务与监控列表行情推送
+    tasks += [asyncio.create_task(alert_broadcaster(web)),
+              asyncio.create_task(market_stats_updater(web)),
+              asyncio.create_task(quotes_updater(web))]
+
+
+def create_app(config_path: str = CONFIG_PATH, db_path: str = DB_PATH,
+               monitor_factory: Optional[Callable] = None) -> FastAPI:
+    """
+    构造 Web 应用：lifespan 启动时只创建后台任务就立即返回 (服务器随即开始接受连接)，
+    监控等服务在后台构造；退出时先等构造线程结束 (不再启动新服务)，再停止服务并保存热启动快照
+    运行状态保存在 app.state.web (WebState)，同一进程可创建多个互不影响的应用实例
+    monitor_factory: 返回 MonitorService 的函数 (测试与基准测试注入离线替身)，None 时按配置连接 QMT
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    web = WebState(config_path, db_path, monitor_factory, config.get('ws') or {})
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        tasks = []
+        build = asyncio.create_task(start_services(web, tasks))
+        yield
+        # 构造线程无法取消：通知它不再启动服务并等待结束，之后的清理才能覆盖它启动的全部服务
+        web.stopping.set()
+        try:
+            await build
+        except Exception as e:
+            print(f"等待后台服务构造结束异常: {e}")
+        for task in tasks:
+            task.cancel()
+        if web.monitor is not None:
+            web.monitor.stop()
+        if web.universe_scanner is not None:
+            web.universe_scanner.stop()
+        if web.warm_start:
+            await asyncio.to_thread(web.warm_start.stop)
+
+    application = FastAPI(lifespan=lifespan)
+    application.state.web = web
+    application.include_router(router)
+    application.include_router(api)
+    return application
+
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_per_message_deflate=True)
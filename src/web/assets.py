@@ -0,0 +1,187 @@
+"""
+页面与静态资源的缓存发送
+- 文件只在首次请求或修改时间变化时读取，同时预先生成 gzip / brotli 压缩版本 (brotli 为可选依赖)
+- 响应带 ETag / Last-Modified，条件请求返回 304；按 Accept-Encoding 选择压缩版本
+- 模板中的 {{ static:路径 }} 替换为带内容哈希的地址 (/static/路径?v=哈希)，
+  带正确哈希的静态资源可被浏览器长期缓存，文件内容变化后地址随之变化
+"""
+import os
+import re
+import gzip
+import time
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Tuple
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MEDIA_TYPES = {
+    '.html': 'text/html; charset=utf-8', '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8', '.json': 'application/json',
+    '.svg': 'image/svg+xml', '.png': 'image/png', '.ico': 'image/x-icon', '.woff2': 'font/woff2',
+}
+# 这些类型已经是压缩格式，不再 gzip
+_COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+_MIN_COMPRESS = 256
+_STATIC_TAG = re.compile(r'\{\{\s*static:([^}\s]+)\s*\}\}')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+class CachedFile:
+    """一个文件的内存副本：原始内容、压缩版本、ETag 与修改时间"""
+    def __init__(self, body: bytes, mtime: float, media_type: str):
+        self.body = body
+        self.mtime = mtime
+        self.media_type = media_type
+        self.digest = hashlib.sha1(body).hexdigest()[:16]
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.variants: Dict[str, bytes] = {'identity': body}
+        if len(body) >= _MIN_COMPRESS and media_type.startswith(_COMPRESSIBLE):
+            # mtime=0：相同内容生成相同的压缩结果
+            self.variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(body, quality=11)
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest}"' if encoding == 'identity' else f'"{self.digest}-{encoding}"'
+
+
+def _choose_encoding(entry: CachedFile, accept: str) -> str:
+    accepted = {part.split(';')[0].strip().lower() for part in (accept or '').split(',')}
+    for encoding in ('br', 'gzip'):
+        if encoding in entry.variants and encoding in accepted:
+            return encoding
+    return 'identity'
+
+
+def _not_modified(entry: CachedFile, headers: Mapping[str, str]) -> bool:
+    if_none_match = headers.get('if-none-match')
+    if if_none_match:
+        # 任一压缩版本的 ETag 都表示内容相同
+        tags = {tag.strip().lstrip('W/') for tag in if_none_match.split(',')}
+        return '*' in tags or any(entry.etag(enc) in tags for enc in ('identity', 'gzip', 'br'))
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(entry.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def respond(entry: CachedFile, headers: Mapping[str, str], cache_control: str = REVALIDATE) -> Response:
+    """按请求头返回 200 (选定的压缩版本) 或 304"""
+    encoding = _choose_encoding(entry, headers.get('accept-encoding', ''))
+    out = {'ETag': entry.etag(encoding), 'Last-Modified': entry.last_modified,
+           'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if _not_modified(entry, headers):
+        return Response(status_code=304, headers=out)
+    if encoding != 'identity':
+        out['Content-Encoding'] = encoding
+    return Response(entry.variants[encoding], media_type=entry.media_type, headers=out)
+
+
+class AssetStore:
+    """
+    模板与 static 目录的缓存
+    - 每个文件的 stat 至多每 check_interval 秒一次，修改时间或大小变化时重新读取并压缩
+    - 页面渲染结果依赖模板与其引用的资源哈希，任一变化都会重新渲染
+    """
+    def __init__(self, static_dir: str, template_dir: str, url_prefix: str = '/static',
+                 check_interval: float = 1.0):
+        self.static_dir = os.path.realpath(static_dir)
+        self.template_dir = os.path.realpath(template_dir)
+        self.url_prefix = url_prefix
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[CachedFile, Tuple[float, int], float]] = {}   # Key: 路径, Value: (文件, (mtime, size), 上次检查时刻)
+        self._pages: Dict[str, Tuple[tuple, CachedFile]] = {}
+        self.loads = 0
+
+    def _load(self, path: str, media_type: Optional[str] = None) -> Optional[CachedFile]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._files.get(path)
+            if cached and now - cached[2] < self.check_interval:
+                return cached[0]
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._files.pop(path, None)
+            return None
+        stamp = (st.st_mtime, st.st_size)
+        if cached and cached[1] == stamp:
+            entry = cached[0]
+        else:
+            with open(path, 'rb') as f:
+                body = f.read()
+            media_type = media_type or MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+            entry = CachedFile(body, st.st_mtime, media_type)
+            self.loads += 1
+        with self._lock:
+            self._files[path] = (entry, stamp, now)
+        return entry
+
+    def _static_path(self, rel: str) -> Optional[str]:
+        path = os.path.realpath(os.path.join(self.static_dir, rel))
+        # 拒绝 ../ 等越出 static 目录的路径
+        if not path.startswith(self.static_dir + os.sep):
+            return None
+        return path
+
+    def static(self, rel: str) -> Optional[CachedFile]:
+        path = self._static_path(rel)
+        return self._load(path) if path else None
+
+    def url(self, rel: str) -> str:
+        entry = self.static(rel)
+        version = f"?v={entry.digest[:10]}" if entry else ''
+        return f"{self.url_prefix}/{rel}{version}"
+
+    def page(self, name: str) -> Optional[CachedFile]:
+        """渲染模板 (替换静态资源地址)，结果按模板与资源的版本缓存"""
+        template = self._load(os.path.join(self.template_dir, name), MEDIA_TYPES['.html'])
+        if template is None:
+            return None
+        text = template.body.decode('utf-8')
+        refs = _STATIC_TAG.findall(text)
+        key = (template.digest,) + tuple(self.url(rel) for rel in refs)
+        with self._lock:
+            cached = self._pages.get(name)
+            if cached and cached[0] == key:
+                return cached[1]
+        urls = dict(zip(refs, key[1:]))
+        body = _STATIC_TAG.sub(lambda m: urls[m.group(1)], text).encode('utf-8')
+        # Last-Modified 取模板与所引用资源中最新的修改时间
+        mtime = max([template.mtime] + [e.mtime for e in map(self.static, refs) if e is not None])
+        entry = CachedFile(body, mtime, MEDIA_TYPES['.html'])
+        with self._lock:
+            self._pages[name] = (key, entry)
+        return entry
+
+    def static_response(self, rel: str, version: Optional[str], headers: Mapping[str, str]) -> Response:
+        entry = self.static(rel)
+        if entry is None:
+            return Response(status_code=404)
+        # 带当前哈希的地址内容不会再变，可长期缓存；其他请求每次校验
+        immutable = version is not None and entry.digest.startswith(version) and len(version) >= 8
+        return respond(entry, headers, IMMUTABLE if immutable else REVALIDATE)
+
+    def page_response(self, name: str, headers: Mapping[str, str]) -> Response:
+        entry = self.page(name)
+        if entry is None:
+            return Response(status_code=404)
+        return respond(entry, headers, REVALIDATE)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'files': len(self._files), 'pages': len(self._pages), 'loads': self.loads,
+                    'brotli': brotli is not None}
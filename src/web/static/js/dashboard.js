@@ -0,0 +1,575 @@
+const statusDiv = document.getElementById('status');
+const lastScanDiv = document.getElementById('last-scan');
+const sysStatusSpan = document.getElementById('sys-status');
+const sysCountSpan = document.getElementById('sys-count');
+const stockTable = document.getElementById('stock-table').querySelector('tbody');
+const signalBox = document.querySelector('.signal-container');
+const signalTable = document.getElementById('signal-table').querySelector('tbody');
+const alertSound = document.getElementById('alert-sound');
+
+// 增量渲染：元素只创建一次，之后只改变化的文本/样式，不再整块重建 innerHTML
+function setText(el, v) {
+    v = String(v);
+    if (el.textContent !== v) el.textContent = v;
+}
+function setStyle(el, prop, v) {
+    if (el.style[prop] !== v) el.style[prop] = v;
+}
+
+// 渲染耗时：每次更新的脚本 + 强制布局时间，滚动窗口统计 (window.__renderStats，基准模式读取)
+const RENDER_SAMPLES = 200;
+const renderSamples = {};
+function timed(name, fn) {
+    const t0 = performance.now();
+    fn();
+    void document.body.offsetHeight; // 把本次更新引起的样式/布局计算算进来
+    const list = renderSamples[name] || (renderSamples[name] = []);
+    list.push(performance.now() - t0);
+    if (list.length > RENDER_SAMPLES) list.shift();
+}
+function renderStats() {
+    const out = {};
+    for (const [name, list] of Object.entries(renderSamples)) {
+        const sorted = list.slice().sort((a, b) => a - b);
+        out[name] = {
+            n: list.length,
+            avg: +(list.reduce((a, b) => a + b, 0) / list.length).toFixed(2),
+            p95: +sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * 0.95))].toFixed(2),
+            max: +sorted[sorted.length - 1].toFixed(2),
+        };
+    }
+    return out;
+}
+window.__renderStats = renderStats;
+function showRenderStats() {
+    const stats = renderStats();
+    setText(document.getElementById('render-stats'), Object.entries(stats)
+        .map(([name, s]) => `${name} ${s.avg}/${s.p95}/${s.max}`).join('  ·  ') || '-');
+}
+
+// WebSocket (协议 v2：快照频道按 seq 应用增量，seq 不连续时请求关键帧；预警按帧批量到达)
+const channelState = {};
+const channelSeq = {};
+const resyncPending = {};
+let wsLive = false;
+
+// 补丁：字典递归合并，其他值整体替换；"$del" 列出本层被删除的键 (null 是普通的值)
+function applyPatch(state, patch) {
+    for (const k of patch['$del'] || []) delete state[k];
+    for (const [k, v] of Object.entries(patch)) {
+        if (k === '$del') continue;
+        if (typeof v === 'object' && !Array.isArray(v) && state[k] && typeof state[k] === 'object' && !Array.isArray(state[k])) applyPatch(state[k], v);
+        else state[k] = v;
+    }
+    return state;
+}
+
+function onChannel(ch, st) {
+    if (ch === 'market' && st.timestamp) {
+        timed('market', () => renderMarket(Object.assign({}, st, { leading: Object.values(st.leading || {}) })));
+    } else if (ch === 'quotes') {
+        timed('stocks', () => renderQuotes(st));
+    }
+    showRenderStats();
+}
+
+function onAlerts(items) {
+    let isBuy;
+    items.forEach(s => { isBuy = addSignalRow(s); });
+    // 一帧内的多条预警：最多弹出 3 条，其余合并为一条提示
+    items.slice(0, 3).forEach(s => showToast(s, s.cls === 'signal-buy'));
+    if (items.length > 3) {
+        showToast({ name: '信号提醒', stock_code: 'INFO', timeframe: '批量', display_type: `另有 ${items.length - 3} 条信号，见下方列表` }, isBuy);
+    }
+    if (items.length) alertSound.play();
+}
+
+function connectWS() {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const ws = new WebSocket(`${protocol}//${window.location.host}/ws/alerts?v=2`);
+    ws.onopen = () => { wsLive = true; statusDiv.innerText = '实时连接: 正常'; statusDiv.style.color = '#2ecc71'; };
+    ws.onclose = () => {
+        wsLive = false;
+        for (const ch of Object.keys(channelSeq)) delete channelSeq[ch];
+        statusDiv.innerText = '实时连接: 断开 (重连中...)'; statusDiv.style.color = '#ff4d4d'; setTimeout(connectWS, 3000);
+    };
+    ws.onmessage = (e) => {
+        const msg = JSON.parse(e.data);
+        if (msg.v !== 2) { onAlerts([msg]); return; }
+        if (msg.type === 'alerts') { onAlerts(msg.items); return; }
+        if (msg.type === 'key') {
+            channelState[msg.ch] = msg.data;
+            channelSeq[msg.ch] = msg.seq;
+            resyncPending[msg.ch] = false;
+        } else if (msg.type === 'delta') {
+            if (channelSeq[msg.ch] === undefined || msg.seq !== channelSeq[msg.ch] + 1) {
+                if (!resyncPending[msg.ch]) { resyncPending[msg.ch] = true; ws.send(JSON.stringify({ type: 'resync', ch: msg.ch })); }
+                return;
+            }
+            applyPatch(channelState[msg.ch], msg.data);
+            channelSeq[msg.ch] = msg.seq;
+        } else return;
+        onChannel(msg.ch, channelState[msg.ch]);
+    };
+}
+
+// --- 系统状态 ---
+function renderStatus(sData) {
+    const statusText = sData.status || '未知';
+    setText(sysStatusSpan, statusText);
+    if (statusText === '正在运行') setStyle(sysStatusSpan, 'color', '#2ecc71');
+    else if (statusText.includes('暂停') || sData.starting) setStyle(sysStatusSpan, 'color', '#f1c40f');
+    else setStyle(sysStatusSpan, 'color', '#ff4d4d');
+    setText(sysCountSpan, sData.stock_count);
+    setText(lastScanDiv, '上次扫描: ' + (sData.last_scan_time || '-'));
+
+    const intervalInp = document.getElementById('scan-interval');
+    if (document.activeElement !== intervalInp && intervalInp.value != sData.interval) intervalInp.value = sData.interval;
+
+    // 分阶段耗时摘要 (完整数据见 /api/metrics)
+    if (sData.metrics && sData.metrics.length) {
+        setText(document.getElementById('stage-metrics'), sData.metrics
+            .map(m => `${m.stage} ${m.avg_ms}/${m.p95_ms}`).join('  ·  '));
+    }
+
+    const btn = document.getElementById('btn-toggle');
+    const isActive = statusText === '正在运行' || statusText.includes('暂停');
+    setText(btn, isActive ? '停止监控' : '启动监控');
+    const cls = isActive ? 'ui-btn btn-danger' : 'ui-btn btn-success';
+    if (btn.className !== cls) btn.className = cls;
+}
+
+// --- 监控列表：按代码复用行，只改现价/涨跌，顺序变化时移动已有节点 ---
+const stockRows = new Map(); // Key: code, Value: {row, name, price, pct, added}
+function createStockRow(s) {
+    const row = document.createElement('tr');
+    row.innerHTML = `
+        <td></td><td></td>
+        <td style="font-weight:bold;"></td>
+        <td style="font-weight:bold;"></td>
+        <td style="font-size:0.8em; color:#666;"></td>
+        <td><button style="background:none; border:none; color:#e74c3c; cursor:pointer;">删除</button></td>
+    `;
+    const td = row.cells;
+    td[0].textContent = s.code;
+    td[5].firstElementChild.onclick = () => delStock(s.code);
+    return { row, name: td[1], price: td[2], pct: td[3], added: td[4] };
+}
+function setQuote(r, price, pct) {
+    const color = pct > 0 ? '#ff4d4d' : (pct < 0 ? '#2ecc71' : '#aaa');
+    setText(r.price, price.toFixed(2));
+    setText(r.pct, pct.toFixed(2) + '%');
+    setStyle(r.price, 'color', color);
+    setStyle(r.pct, 'color', color);
+}
+// 行情频道：{代码: {p: 现价, c: 涨跌幅}}，只更新已在列表中的行
+function renderQuotes(quotes) {
+    for (const [code, q] of Object.entries(quotes)) {
+        const r = stockRows.get(code);
+        if (r) setQuote(r, q.p, q.c);
+    }
+}
+function renderStocks(stocks) {
+    const seen = new Set();
+    let anchor = stockTable.firstChild;
+    stocks.forEach(s => {
+        let r = stockRows.get(s.code);
+        if (!r) { r = createStockRow(s); stockRows.set(s.code, r); }
+        seen.add(s.code);
+        setText(r.name, s.name || '-');
+        setQuote(r, s.price, s.change_pct);
+        setText(r.added, s.added_at);
+        if (r.row !== anchor) stockTable.insertBefore(r.row, anchor);
+        else anchor = anchor.nextSibling;
+    });
+    for (const [code, r] of stockRows) {
+        if (!seen.has(code)) { r.row.remove(); stockRows.delete(code); }
+    }
+    // 接口返回的价格可能比推送频道旧，以频道状态为准
+    if (wsLive && channelState.quotes) renderQuotes(channelState.quotes);
+}
+
+// --- 指数动能卡片：按指数名复用 ---
+const leadingContainer = document.getElementById('leading-container');
+const leadingCards = new Map(); // Key: name, Value: 卡片内各元素
+function createLeadingCard(item) {
+    const card = document.createElement('div');
+    card.className = 'stat-card';
+    card.innerHTML = `
+            <div class="stat-label" style="font-size:0.85em; color:#888;"></div>
+            <div class="stat-val">
+                <span class="white-line"></span>
+                <span style="opacity:0.2; margin:0 2px;">/</span>
+                <span class="yellow-line"></span>
+            </div>
+            <div style="font-size:0.7em; margin-top:5px; display:flex; align-items:center; justify-content:space-between; font-weight:600;">
+                <span style="display:flex; align-items:center; gap:2px;"><span></span> <span></span></span>
+                <span></span>
+            </div>
+            <div class="signal-area"><div class="signal-badge" style="font-size:0.65em; padding:2px 6px; display:none;"></div></div>
+        `;
+    card.querySelector('.stat-label').textContent = item.name;
+    const foot = card.children[2];
+    const dir = foot.children[0];
+    return {
+        card, white: card.querySelector('.white-line'), yellow: card.querySelector('.yellow-line'),
+        dir, dirText: dir.children[0], arrow: dir.children[1], pct: foot.children[1],
+        badge: card.querySelector('.signal-badge'),
+    };
+}
+function renderLeading(leading) {
+    // 确定性只取 4 个，形成整齐矩阵
+    const items = Array.isArray(leading) ? leading.slice(0, 4) : [];
+    const seen = new Set();
+    let anchor = leadingContainer.firstElementChild;
+    items.forEach(item => {
+        let c = leadingCards.get(item.name);
+        if (!c) { c = createLeadingCard(item); leadingCards.set(item.name, c); }
+        seen.add(item.name);
+        const isUp = item.dir === 'up';
+        const color = isUp ? 'var(--buy-color)' : 'var(--sell-color)';
+        setText(c.white, item.white);
+        setText(c.yellow, item.yellow);
+        setText(c.dirText, isUp ? '动能向上' : '动能向下');
+        setText(c.arrow, isUp ? '↑' : '↓');
+        const arrowCls = isUp ? 'arrow-up' : 'arrow-down';
+        if (c.arrow.className !== arrowCls) c.arrow.className = arrowCls;
+        setStyle(c.dir, 'color', color);
+        setStyle(c.pct, 'color', color);
+        setText(c.pct, item.diff_pct + '%');
+        const signals = item.signals && item.signals.length ? item.signals.join(' | ') : '';
+        setText(c.badge, signals);
+        setStyle(c.badge, 'display', signals ? '' : 'none');
+        if (c.card !== anchor) leadingContainer.insertBefore(c.card, anchor);
+        else anchor = anchor.nextElementSibling;
+    });
+    for (const [name, c] of leadingCards) {
+        if (!seen.has(name)) { c.card.remove(); leadingCards.delete(name); }
+    }
+}
+
+// --- 涨跌分布图：11 根柱子只建一次，之后只改高度与计数 ---
+const DIST_BUCKETS = [
+    { lbl: '>9%', k: 'up_limit', c: 'up-bg' }, { lbl: '7-9', k: 'up_7_10', c: 'up-bg' },
+    { lbl: '5-7', k: 'up_5_7', c: 'up-bg' }, { lbl: '2-5', k: 'up_2_5', c: 'up-bg' },
+    { lbl: '0-2', k: 'up_0_2', c: 'up-bg' }, { lbl: '平', k: 'zero', c: 'flat-bg' },
+    { lbl: '-2-0', k: 'down_0_2', c: 'down-bg' }, { lbl: '-5-2', k: 'down_2_5', c: 'down-bg' },
+    { lbl: '-7-5', k: 'down_5_7', c: 'down-bg' }, { lbl: '-9-7', k: 'down_7_10', c: 'down-bg' },
+    { lbl: '<-9%', k: 'down_limit', c: 'down-bg' }
+];
+let distCols = null;
+function buildDistChart() {
+    const distChart = document.getElementById('dist-chart');
+    distCols = DIST_BUCKETS.map(it => {
+        const barBgColor = it.c === 'up-bg' ? '#ff4d4d' : (it.c === 'down-bg' ? '#2ecc71' : '#555');
+        const col = document.createElement('div');
+        col.className = 'dist-col';
+        col.innerHTML = `
+                <div class="dist-cnt"></div>
+                <div class="dist-bar ${it.c}" style="height:0%; width:100%; min-width:8px; max-width:24px; box-shadow: 0 0 10px ${barBgColor}33;"></div>
+                <div class="dist-lbl">${it.lbl}</div>
+            `;
+        distChart.appendChild(col);
+        return { cnt: col.children[0], bar: col.children[1] };
+    });
+}
+function renderMarket(mData) {
+    setText(document.getElementById('market-update-time'), mData.timestamp);
+    renderLeading(mData.leading);
+
+    setText(document.getElementById('cnt-up'), mData.counts.up);
+    setText(document.getElementById('cnt-flat'), mData.counts.flat);
+    setText(document.getElementById('cnt-down'), mData.counts.down);
+
+    const d = mData.distribution;
+    if (!distCols) buildDistChart();
+    const values = DIST_BUCKETS.map(it => d[it.k] || 0);
+    const maxVal = Math.max(...values, 10);
+    values.forEach((v, i) => {
+        setText(distCols[i].cnt, v || '');
+        setStyle(distCols[i].bar, 'height', `${(v / maxVal) * 100}%`);
+    });
+}
+
+// 数据加载：实时连接正常时行情与全市场统计由推送更新，监控列表只在增删后或每分钟刷新一次
+const STOCK_LIST_REFRESH_MS = 60000;
+let stockListAt = 0;
+async function refresh(forceList = false) {
+    try {
+        // 1. 系统状态
+        const sData = await (await fetch('/api/status')).json();
+        timed('status', () => renderStatus(sData));
+        if (sData.starting) return; // 后台服务启动中，其余接口尚不可用
+
+        // 2. 股票列表
+        if (forceList || !wsLive || Date.now() - stockListAt > STOCK_LIST_REFRESH_MS) {
+            const stocks = await (await fetch('/api/stocks')).json();
+            stockListAt = Date.now();
+            timed('stocks', () => renderStocks(stocks));
+        }
+
+        // 3. 市场统计
+        if (!wsLive || !channelState.market) {
+            const mData = await (await fetch('/api/market_stats')).json();
+            if (mData.timestamp) timed('market', () => renderMarket(mData));
+        }
+        showRenderStats();
+    } catch (err) { console.error(err); }
+}
+
+// --- 信号表：虚拟滚动，只渲染可视区域内的行 ---
+// 内存中最多保留 MAX_SIGNALS 条 (新信号在前)，更早的历史滚动到底部时按 before_id 分页加载
+const SIGNAL_ROW_H = 32;      // 与 #signal-table tbody tr 的固定行高一致
+const SIGNAL_OVERSCAN = 6;
+const SIGNAL_PAGE = 100;
+const MAX_SIGNALS = 2000;
+const SIGNAL_MAP = { 'DIV_BULL': 'MACD底背离', 'DIV_BEAR': 'MACD顶背离', 'TD9_BUY': 'TD低9', 'TD9_SELL': 'TD高9' };
+const signals = [];
+const signalIds = new Set();
+let signalHasMore = true;
+let signalLoading = false;
+let signalFrame = 0;
+// 上下占位行撑出未渲染部分的高度，滚动条与全量渲染时一致
+const [topSpacer, bottomSpacer] = [0, 1].map(() => {
+    const row = signalTable.insertRow();
+    row.className = 'spacer';
+    row.insertCell().colSpan = 5;
+    return row;
+});
+const signalPool = []; // 复用的可视行 (tr + 5 个 td)
+
+function classifySignal(s) {
+    const type = SIGNAL_MAP[s.signal_type] || s.signal_type;
+    // 判定信号类别 (V25.Final-VisualLayer)
+    const isWatch = type.includes('挂单');
+    const isBuy = !isWatch && /买|低|底|BULL|BUY/.test(type);
+    s.display_type = type;
+    s.is_watch = isWatch;
+    s.cls = isWatch ? 'signal-watch' : (isBuy ? 'signal-buy' : 'signal-sell');
+    return isBuy;
+}
+
+function renderSignals() {
+    signalFrame = 0;
+    const head = signalTable.parentElement.tHead.offsetHeight;
+    const viewH = signalBox.clientHeight || 500;
+    const first = Math.max(0, Math.floor((signalBox.scrollTop - head) / SIGNAL_ROW_H) - SIGNAL_OVERSCAN);
+    const last = Math.min(signals.length, first + Math.ceil(viewH / SIGNAL_ROW_H) + 2 * SIGNAL_OVERSCAN);
+    const count = last - first;
+    while (signalPool.length < count) {
+        const row = document.createElement('tr');
+        for (let i = 0; i < 5; i++) row.insertCell();
+        signalPool.push(row);
+    }
+    for (let i = 0; i < signalPool.length; i++) {
+        const row = signalPool[i];
+        if (i >= count) { if (row.parentNode) row.remove(); continue; }
+        const s = signals[first + i];
+        const td = row.cells;
+        setText(td[0], s.timestamp || s.added_at || '');
+        setText(td[1], s.name || s.stock_code);
+        setText(td[2], s.timeframe);
+        setText(td[3], s.display_type);
+        if (td[3].className !== s.cls) td[3].className = s.cls;
+        setText(td[4], s.price);
+        if (!row.parentNode) signalTable.insertBefore(row, bottomSpacer);
+    }
+    setStyle(topSpacer.cells[0], 'height', `${first * SIGNAL_ROW_H}px`);
+    setStyle(bottomSpacer.cells[0], 'height', `${(signals.length - last) * SIGNAL_ROW_H}px`);
+}
+function scheduleSignals() {
+    if (!signalFrame) signalFrame = requestAnimationFrame(() => timed('signals', renderSignals));
+}
+
+function addSignalRow(s) {
+    const isBuy = classifySignal(s);
+    if (s.id != null) {
+        if (signalIds.has(s.id)) return isBuy;
+        signalIds.add(s.id);
+    }
+    signals.unshift(s);
+    if (signals.length > MAX_SIGNALS) {
+        const dropped = signals.pop();
+        signalIds.delete(dropped.id);
+    }
+    // 用户正在翻看历史时保持可视内容不跳动
+    if (signalBox.scrollTop > 0) signalBox.scrollTop += SIGNAL_ROW_H;
+    scheduleSignals();
+    return isBuy;
+}
+
+async function loadHistory(beforeId) {
+    if (signalLoading || !signalHasMore) return;
+    signalLoading = true;
+    try {
+        const query = beforeId != null ? `?limit=${SIGNAL_PAGE}&before_id=${beforeId}` : `?limit=${SIGNAL_PAGE}`;
+        const page = await (await fetch('/api/signals' + query)).json();
+        signalHasMore = page.length === SIGNAL_PAGE;
+        page.forEach(s => {
+            if (signalIds.has(s.id) || signals.length >= MAX_SIGNALS) return;
+            classifySignal(s);
+            signalIds.add(s.id);
+            signals.push(s);
+        });
+        scheduleSignals();
+    } catch (err) { console.error(err); }
+    signalLoading = false;
+}
+
+signalBox.addEventListener('scroll', () => {
+    scheduleSignals();
+    // 接近底部时加载更早的一页
+    if (signalBox.scrollTop + signalBox.clientHeight >= signalBox.scrollHeight - SIGNAL_ROW_H * 5) {
+        const ids = signals.map(s => s.id).filter(id => id != null);
+        if (ids.length && signals.length < MAX_SIGNALS) loadHistory(Math.min(...ids));
+    }
+}, { passive: true });
+
+function showToast(s, isBuy) {
+    const t = document.createElement('div');
+    t.className = 'toast';
+
+    // 背景色分层
+    if (s.is_watch) t.style.backgroundColor = '#b7950b'; // 观察色(深黄)
+    else if (isBuy !== undefined) t.style.backgroundColor = isBuy ? '#d32f2f' : '#27ae60';
+
+    const timeStr = s.timestamp ? s.timestamp.split(' ')[1] : '';
+    t.innerHTML = `
+        <div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:4px; border-bottom:1px solid rgba(255,255,255,0.1); padding-bottom:4px;">
+            <b>${s.is_watch ? '行情观察' : '信号提醒'}</b>
+            <span style="font-size:0.8em; opacity:0.9;">${timeStr}</span>
+        </div>
+        ${s.name || s.stock_code} (${s.timeframe}) - ${s.display_type || s.signal_type}<br>
+        <small style="opacity:0.6; margin-top:4px; display:block;">点击关闭</small>
+    `;
+    t.onclick = () => { t.style.opacity = '0'; setTimeout(() => t.remove(), 200); };
+    document.getElementById('alert-toast').appendChild(t);
+}
+
+// 操作
+async function toggleMonitor() {
+    const status = sysStatusSpan.innerText;
+    const isClosing = status === '正在运行' || status.includes('暂停');
+    const action = isClosing ? 'stop' : 'start';
+
+    // 点击启动且处于非交易时间，给予温情提示
+    if (action === 'start') {
+        const now = new Date();
+        const hour = now.getHours();
+        const min = now.getMinutes();
+        const timeStr = `${hour.toString().padStart(2, '0')}:${min.toString().padStart(2, '0')}`;
+
+        // 粗略判断（实际交由后端严谨判定，前端只负责提示）
+        const isOffTime = (timeStr < '09:15' || (timeStr > '11:35' && timeStr < '12:55') || timeStr > '15:10');
+        if (isOffTime) {
+            showToast({ name: '系统提示', timeframe: 'UX', display_type: '已预约启动：当前非交易时段，系统将自动进入静默休眠，待开盘后自动唤醒。', stock_code: 'INFO' }, false);
+        }
+    }
+
+    await fetch(`/api/monitor/${action}`, { method: 'POST' });
+    refresh();
+}
+
+async function addStock() {
+    const code = document.getElementById('stock-input').value.trim();
+    if (!code) return;
+    const res = await fetch('/api/stocks', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ code }) });
+    if (res.ok) { document.getElementById('stock-input').value = ''; refresh(true); }
+}
+
+// 批量导入：提交后轮询任务进度，完成后刷新监控列表
+async function importStocks() {
+    const content = document.getElementById('import-content').value.trim();
+    const sector = document.getElementById('import-sector').value.trim();
+    const watchlist = document.getElementById('import-watchlist').value.trim();
+    if (!content && !sector) return;
+    const format = /^\s*[\[{]/.test(content) ? 'json' : 'csv';
+    const progress = document.getElementById('import-progress');
+    const res = await (await fetch('/api/stocks/import', {
+        method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ content, format, sector, watchlist })
+    })).json();
+    if (res.status !== 'accepted') { progress.textContent = res.message; return; }
+    const STAGES = { queued: '排队', resolve: '解析代码', save: '写入', prefetch: '订阅/预下载', done: '完成', error: '失败' };
+    let job = res.job;
+    while (true) {
+        let text = `${STAGES[job.state] || job.state}: 识别 ${job.resolved}/${job.total}，新增 ${job.inserted}，已存在 ${job.existing}`;
+        if (job.state === 'prefetch' || job.state === 'done') text += `，预下载 ${job.prefetched}/${job.inserted}`;
+        if (job.unresolved.length) text += `，无法识别 ${job.unresolved.length} 个: ${job.unresolved.slice(0, 5).join(' ')}`;
+        if (job.error) text += ` (${job.error})`;
+        progress.textContent = text;
+        if (job.state === 'done' || job.state === 'error') break;
+        await new Promise(r => setTimeout(r, 500));
+        job = (await (await fetch(`/api/stocks/import/${job.id}`)).json()).job;
+        if (!job) return;
+    }
+    if (job.state === 'done') { document.getElementById('import-content').value = ''; refresh(true); }
+}
+
+async function delStock(code) {
+    if (confirm('删除 ' + code + '?')) { await fetch(`/api/stocks/${code}`, { method: 'DELETE' }); refresh(true); }
+}
+
+async function saveConfig() {
+    const interval = parseInt(document.getElementById('scan-interval').value);
+    await fetch('/api/config', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ interval }) });
+    alert('保存成功');
+}
+
+// --- 渲染基准：?bench=500 用合成数据驱动同一套渲染函数，不连接后端 ---
+function runBench(n, frames = 300) {
+    const rand = (lo, hi) => lo + Math.random() * (hi - lo);
+    const stocks = Array.from({ length: n }, (_, i) => ({
+        code: String(600000 + i) + '.SH', name: '样本' + i, price: rand(5, 50), change_pct: 0,
+        added_at: '2024-01-01 09:30:00',
+    }));
+    const names = ['上证指数', '深证成指', '创业板指', '科创50'];
+    let frame = 0;
+    const step = () => {
+        // 每帧约 1/3 的股票价格变化，模拟刷新；顺序偶尔打乱
+        stocks.forEach(s => {
+            if (Math.random() < 0.33) { s.price *= 1 + rand(-0.01, 0.01); s.change_pct = rand(-10, 10); }
+        });
+        if (frame % 50 === 49) stocks.reverse();
+        timed('stocks', () => renderStocks(stocks));
+        const dist = {};
+        DIST_BUCKETS.forEach(b => { dist[b.k] = Math.floor(rand(0, 800)); });
+        timed('market', () => renderMarket({
+            timestamp: new Date().toTimeString().slice(0, 8),
+            leading: names.map(name => ({
+                name, white: rand(-5, 5).toFixed(2), yellow: rand(-5, 5).toFixed(2),
+                dir: Math.random() < 0.5 ? 'up' : 'down', diff_pct: rand(-1, 1).toFixed(2),
+                signals: Math.random() < 0.2 ? ['TD低9'] : [],
+            })),
+            counts: { up: 2000, flat: 300, down: 2700 },
+            distribution: dist,
+        }));
+        for (let i = 0; i < 5; i++) {
+            const s = stocks[Math.floor(rand(0, n))];
+            addSignalRow({
+                id: frame * 5 + i + 1, stock_code: s.code, name: s.name, timeframe: '5m',
+                signal_type: Math.random() < 0.5 ? 'TD9_BUY' : 'DIV_BEAR', price: s.price.toFixed(2),
+                timestamp: new Date().toISOString().replace('T', ' ').slice(0, 19),
+            });
+        }
+        if (frame % 10 === 0) signalBox.scrollTop = rand(0, signalBox.scrollHeight);
+        showRenderStats();
+        if (++frame < frames) { requestAnimationFrame(step); return; }
+        const stats = renderStats();
+        const worst = Math.max(...Object.values(stats).map(s => s.p95));
+        console.log('render bench', n, stats);
+        setText(statusDiv, `渲染基准 ${n} 只: P95 ${worst.toFixed(2)}ms ${worst <= 16 ? '≤' : '>'} 16ms`);
+        setStyle(statusDiv, 'color', worst <= 16 ? '#2ecc71' : '#ff4d4d');
+    };
+    requestAnimationFrame(step);
+}
+
+// Init
+const benchSize = parseInt(new URLSearchParams(window.location.search).get('bench'));
+if (benchSize > 0) {
+    runBench(benchSize);
+} else {
+    connectWS();
+    refresh();
+    setInterval(refresh, 5000);
+    loadHistory();
+}
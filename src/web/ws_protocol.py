@@ -0,0 +1,111 @@
+"""
+仪表盘 WebSocket 协议 (v2)
+- 快照类数据 (全市场统计、监控列表行情) 按频道推送：新连接与每隔 keyframe_every 条发送完整关键帧 (type=key)，
+  其余只发送与上一条相比变化的字段 (type=delta：字典递归合并，其他值整体替换；删除的键显式列在同层的 "$del" 列表中，
+  null 是普通的值)
+- 每条快照消息带频道内递增的 seq；客户端发现 seq 不连续时发送 {"type": "resync", "ch": 频道} 请求关键帧
+- 同一轮产生的多条预警合并为一帧 (type=alerts)
+- v1 (不带 ?v=2 的旧客户端) 仍按每条预警一个 JSON 对象推送
+"""
+import copy
+import json
+from typing import Any, Dict, List, Optional
+
+PROTOCOL_VERSION = 2
+DELETE_KEY = '$del'     # 补丁中列出本层被删除键的保留键
+_MISSING = object()
+
+
+def encode(message: Dict) -> str:
+    """紧凑编码：去掉空白，中文不转义"""
+    return json.dumps(message, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def diff(prev: Dict, cur: Dict) -> Dict:
+    """返回把 prev 变为 cur 的补丁；无变化返回空字典"""
+    patch = {}
+    for key, value in cur.items():
+        old = prev.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(old, dict):
+            sub = diff(old, value)
+            if sub:
+                patch[key] = sub
+        elif old is _MISSING or old != value:
+            patch[key] = value
+    removed = [key for key in prev if key not in cur]
+    if removed:
+        patch[DELETE_KEY] = removed
+    return patch
+
+
+def apply_patch(state: Dict, patch: Dict) -> Dict:
+    """把补丁应用到 state (原地修改并返回)；与前端 applyPatch 一致"""
+    for key in patch.get(DELETE_KEY, ()):
+        state.pop(key, None)
+    for key, value in patch.items():
+        if key == DELETE_KEY:
+            continue
+        if isinstance(value, dict) and isinstance(state.get(key), dict):
+            apply_patch(state[key], value)
+        else:
+            state[key] = copy.deepcopy(value)
+    return state
+
+
+def market_snapshot(stats: Dict) -> Dict:
+    """全市场统计转为可逐字段比较的形式：leading 列表按指数名称转成字典"""
+    if not stats:
+        return {}
+    return dict(stats, leading={item['name']: item for item in stats.get('leading') or []})
+
+
+def quotes_snapshot(rt_data: Dict[str, Dict]) -> Dict[str, Dict]:
+    """监控列表行情：{代码: {p: 现价, c: 涨跌幅}}，保留两位小数，避免浮点噪声产生无意义的增量"""
+    return {code: {'p': round(d.get('price', 0), 2), 'c': round(d.get('change_pct', 0), 2)}
+            for code, d in rt_data.items()}
+
+
+class SnapshotChannel:
+    """一个快照频道的服务端状态：当前完整快照、seq 与距上一关键帧的消息数"""
+    def __init__(self, name: str, keyframe_every: int = 20):
+        self.name = name
+        self.keyframe_every = max(1, keyframe_every)
+        self.seq = 0
+        self.state: Optional[Dict] = None
+        self._since_key = 0
+
+    def keyframe(self) -> Optional[Dict]:
+        if self.state is None:
+            return None
+        return {'v': PROTOCOL_VERSION, 'type': 'key', 'ch': self.name, 'seq': self.seq, 'data': self.state}
+
+    def update(self, snapshot: Dict) -> Optional[Dict]:
+        """更新快照，返回需要广播的消息 (关键帧或增量)；与上一条相同时返回 None"""
+        snapshot = copy.deepcopy(snapshot)
+        if self.state is not None and self._since_key + 1 < self.keyframe_every:
+            patch = diff(self.state, snapshot)
+            if not patch:
+                return None
+            self.seq += 1
+            self._since_key += 1
+            self.state = snapshot
+            return {'v': PROTOCOL_VERSION, 'type': 'delta', 'ch': self.name, 'seq': self.seq, 'data': patch}
+        if self.state == snapshot:
+            return None
+        self.seq += 1
+        self._since_key = 0
+        self.state = snapshot
+        return self.keyframe()
+
+
+def alerts_message(alerts: List[Dict]) -> Dict:
+    return {'v': PROTOCOL_VERSION, 'type': 'alerts', 'items': alerts}
+
+
+def parse_client_message(text: str) -> Optional[Dict[str, Any]]:
+    """解析客户端消息 (目前只有 resync)，无法识别时返回 None"""
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None
+    return message if isinstance(message, dict) else None
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+import subprocess
+from fastapi.testclient import TestClient
+from src.data import database
+from src.web.app import create_app
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_import_is_light():
+    # 导入 Web 应用不应拉起 pandas / numpy / MySQL 驱动或监控服务
+    code = ("import sys, src.web.app; "
+            "print(sorted(m for m in ('pandas', 'numpy', 'numba', 'mysql.connector', 'src.services.monitor') "
+            "if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert out.strip().splitlines()[-1] == '[]'
+
+
+def test_serves_before_services_ready():
+    gate = threading.Event()
+    with tempfile.TemporaryDirectory() as tmp:
+        def factory():
+            from benchmarks.bench_scan import build_env
+            gate.wait(30)
+            _, monitor, _ = build_env(50, 3, 0.0, os.path.join(tmp, 'test.db'), ['1m'])
+            monitor.running = False
+            monitor.config['warm_start'] = {'enabled': False}
+            return monitor
+
+        try:
+            with TestClient(create_app(monitor_factory=factory)) as client:
+                # 服务构造期间页面与状态接口已可访问，其余接口返回 503
+                assert client.get('/').status_code == 200
+                status = client.get('/api/status').json()
+                assert status['starting'] and status['startup']['state'] == 'starting'
+                assert client.get('/api/stocks').status_code == 503
+
+                gate.set()
+                deadline = time.time() + 60
+                while client.get('/api/status').json().get('starting') and time.time() < deadline:
+                    time.sleep(0.05)
+                status = client.get('/api/status').json()
+                assert status['startup']['state'] == 'ready' and status['stock_count'] == 3
+                assert len(client.get('/api/stocks').json()) == 3
+                assert client.get('/api/memory').status_code == 200
+        finally:
+            gate.set()
+            database.set_db_config(None)
+
+
+def test_shutdown_waits_for_build_and_apps_are_isolated():
+    gate = threading.Event()
+    built = []
+    with tempfile.TemporaryDirectory() as tmp:
+        def factory():
+            from benchmarks.bench_scan import build_env
+            gate.wait(30)
+            _, monitor, _ = build_env(20, 1, 0.0, os.path.join(tmp, 'test.db'), ['1m'])
+            monitor.running = False
+            monitor.config['warm_start'] = {'enabled': False}
+            built.append(monitor)
+            return monitor
+
+        try:
+            first, second = create_app(monitor_factory=factory), create_app(monitor_factory=factory)
+            # 各应用实例的启动状态与频道互不影响
+            assert first.state.web.startup is not second.state.web.startup
+            assert first.state.web.channels['market'] is not second.state.web.channels['market']
+            with TestClient(first) as client:
+                assert client.get('/api/status').json()['starting']
+                # 退出时构造仍在进行：等待其结束，且不再启动服务
+                threading.Timer(0.3, gate.set).start()
+            assert len(built) == 1 and not hasattr(built[0], 'thread') and not built[0].running
+            # 未交给应用的服务已在构造线程中停止 (xtdata 线程池已关闭)
+            assert built[0].qmt.executor._shutdown
+            assert first.state.web.startup['state'] == 'starting' and first.state.web.monitor is None
+            assert second.state.web.startup['state'] == 'starting'
+        finally:
+            gate.set()
+            database.set_db_config(None)
+
+
+if __name__ == "__main__":
+    test_import_is_light()
+    test_serves_before_services_ready()
+    test_shutdown_waits_for_build_and_apps_are_isolated()
+    print("Web 启动测试通过")
@@ -0,0 +1,84 @@
+import os
+import gzip
+import time
+import tempfile
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from src.web.assets import AssetStore
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _client(store: AssetStore) -> TestClient:
+    # 与 app.py 相同的两个路由
+    app = FastAPI()
+
+    @app.get("/")
+    async def index(request: Request):
+        return store.page_response("index.html", request.headers)
+
+    @app.get("/static/{path:path}")
+    async def static(path: str, request: Request, v: str = None):
+        return store.static_response(path, v, request.headers)
+
+    return TestClient(app)
+
+
+def test_page_is_cached_compressed_and_revalidated():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, 'static', 'js'))
+        os.makedirs(os.path.join(tmp, 'templates'))
+        js_path = os.path.join(tmp, 'static', 'js', 'app.js')
+        page_path = os.path.join(tmp, 'templates', 'index.html')
+        with open(js_path, 'w') as f:
+            f.write('console.log(1);\n' * 50)
+        with open(page_path, 'w', encoding='utf-8') as f:
+            f.write('<html><script src="{{ static:js/app.js }}"></script>' + '监控' * 200 + '</html>')
+        store = AssetStore(os.path.join(tmp, 'static'), os.path.join(tmp, 'templates'), check_interval=0)
+        client = _client(store)
+
+        res = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        assert res.status_code == 200 and res.headers['content-encoding'] == 'gzip'
+        assert res.headers['cache-control'] == 'no-cache' and res.headers['vary'] == 'Accept-Encoding'
+        url = store.url('js/app.js')
+        assert url.startswith('/static/js/app.js?v=') and url in res.text
+        etag = res.headers['etag']
+        assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+        assert client.get('/', headers={'If-Modified-Since': res.headers['last-modified']}).status_code == 304
+        loads = store.loads
+        client.get('/')
+        assert store.loads == loads  # 未修改的文件不再读盘
+
+        # 带哈希的资源地址可长期缓存，不带或过期哈希只允许校验缓存
+        res = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert res.headers['cache-control'].endswith('immutable')
+        assert res.headers['content-type'].startswith('application/javascript')
+        raw = client.get(url, headers={'Accept-Encoding': 'identity'})
+        assert 'content-encoding' not in raw.headers and raw.text == 'console.log(1);\n' * 50
+        assert client.get('/static/js/app.js').headers['cache-control'] == 'no-cache'
+        assert client.get('/static/js/missing.js').status_code == 404
+        assert client.get('/static/%2e%2e/templates/index.html').status_code == 404
+
+        # 修改资源后页面中的地址与 ETag 都变化
+        with open(js_path, 'w') as f:
+            f.write('console.log(2);\n' * 50)
+        os.utime(js_path, (time.time() + 5, time.time() + 5))
+        res = client.get('/', headers={'If-None-Match': etag})
+        assert res.status_code == 200 and store.url('js/app.js') != url and store.url('js/app.js') in res.text
+
+
+def test_dashboard_assets_exist_and_compress():
+    store = AssetStore(os.path.join(BASE_DIR, 'src', 'web', 'static'), os.path.join(BASE_DIR, 'src', 'web', 'templates'))
+    page = store.page('index.html')
+    assert '{{' not in page.body.decode('utf-8')
+    for rel in ('css/dashboard.css', 'js/dashboard.js'):
+        entry = store.static(rel)
+        assert entry is not None and store.url(rel) in page.body.decode('utf-8')
+        assert len(entry.variants['gzip']) < len(entry.body) / 2
+        assert gzip.decompress(entry.variants['gzip']) == entry.body
+
+
+if __name__ == "__main__":
+    test_page_is_cached_compressed_and_revalidated()
+    test_dashboard_assets_exist_and_compress()
+    print("静态资源缓存测试通过")
@@ -0,0 +1,102 @@
+import time
+import asyncio
+import threading
+from src.data.fake_xtdata import FakeXtData
+from src.data.qmt_client import QMTClient
+from src.data.async_client import AsyncQMTClient
+from benchmarks.bench_scan import CONFIG_PATH
+
+
+def _client(latency=0.0):
+    xt = FakeXtData(n_stocks=50, latency={'get_full_tick': latency})
+    return xt, QMTClient(CONFIG_PATH, xt_data=xt)
+
+
+def test_identical_calls_are_coalesced():
+    xt, client = _client(latency=0.2)
+    qmt = AsyncQMTClient(client, workers=4)
+    codes = xt.get_stock_list_in_sector('沪深A股')[:5]
+
+    async def main():
+        return await asyncio.gather(*[qmt.get_realtime_data(codes) for _ in range(10)])
+
+    results = asyncio.run(main())
+    assert all(r == results[0] for r in results) and len(results[0]) == 5
+    s = qmt.stats()['methods']['get_realtime_data']
+    assert s['calls'] == 1 and s['coalesced'] == 9 and s['in_flight'] == 0
+    assert xt.calls['get_full_tick'] == 1
+
+    # 监控线程的同步调用与事件循环共用同一次在途调用
+    future = qmt.submit('get_full_tick', list(codes))
+    assert qmt.call_sync('get_full_tick', list(codes)) == future.result()
+    assert qmt.stats()['methods']['get_full_tick']['coalesced'] == 1
+    qmt.shutdown()
+
+
+def test_run_coalesces_only_identical_arguments():
+    _, client = _client()
+    qmt = AsyncQMTClient(client, workers=4)
+
+    def scan(timeframes):
+        time.sleep(0.1)
+        return list(timeframes)
+
+    async def main():
+        return await asyncio.gather(qmt.run('universe_scan', scan, ['30m', '60m']),
+                                    qmt.run('universe_scan', scan, ['1d']),
+                                    qmt.run('universe_scan', scan, ['1d']))
+
+    assert asyncio.run(main()) == [['30m', '60m'], ['1d'], ['1d']]
+    s = qmt.stats()['methods']['universe_scan']
+    assert s['calls'] == 2 and s['coalesced'] == 1
+    qmt.shutdown()
+
+
+def test_hung_call_times_out_without_blocking_others():
+    xt, client = _client()
+    release = threading.Event()
+    xt.download_history_data = lambda *a, **k: release.wait(5)   # 模拟 QMT 卡死
+    qmt = AsyncQMTClient(client, workers=4, timeout=0.2, limits={'download_history_data': 1})
+    code = xt.get_stock_list_in_sector('沪深A股')[0]
+    try:
+        started = time.perf_counter()
+        for period in ('1d', '1m', '5m'):
+            # 不同参数不合并：第一个占住限流名额，后两个等名额超时，都不会无限阻塞
+            try:
+                qmt.call_sync('download_history_data', code, period)
+                assert False, "应当超时"
+            except TimeoutError:
+                pass
+        assert time.perf_counter() - started < 2
+        # 其他接口照常可用
+        assert code in asyncio.run(qmt.get_full_tick([code]))
+        s = qmt.stats()['methods']['download_history_data']
+        assert s['timeouts'] == 3 and s['calls'] == 3
+    finally:
+        release.set()
+        qmt.shutdown()
+
+
+def test_async_timeout():
+    xt, client = _client(latency=0.5)
+    qmt = AsyncQMTClient(client, timeout=0.05)
+
+    async def main():
+        try:
+            await qmt.get_full_tick([xt.get_stock_list_in_sector('沪深A股')[0]])
+        except TimeoutError:
+            return True
+        return False
+
+    assert asyncio.run(main())
+    assert qmt.stats()['methods']['get_full_tick']['timeouts'] == 1
+    assert 'qmt_xtdata_timeouts_total{method="get_full_tick"} 1' in qmt.render_prometheus()
+    qmt.shutdown()
+
+
+if __name__ == "__main__":
+    test_identical_calls_are_coalesced()
+    test_run_coalesces_only_identical_arguments()
+    test_hung_call_times_out_without_blocking_others()
+    test_async_timeout()
+    print("异步门面测试通过")
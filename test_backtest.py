@@ -0,0 +1,56 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.indicators.td_sequential import calculate_td_sequential, td_signal_series
+from src.indicators.divergence import detect_divergence, divergence_signal_series
+from src.services.backtest import build_bar_grid, sweep_bars
+
+
+def _random_walk(seed: int, n: int = 150):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return close, close + rng.normal(0, 0.5, n)
+
+
+def test_signal_series_match_per_stock_functions():
+    # 序列版本在每个前缀上必须与监控使用的逐股函数完全一致
+    for seed in range(10):
+        close, open_ = _random_walk(seed)
+        td = td_signal_series(close)
+        div = divergence_signal_series(close, open_)
+        for t in range(1, len(close)):
+            df = pd.DataFrame({'close': close[:t + 1], 'open': open_[:t + 1]})
+            assert calculate_td_sequential(df)['buy_9'] == td['buy_9'][t]
+            assert calculate_td_sequential(df)['sell_9'] == td['sell_9'][t]
+            r = detect_divergence(df)
+            assert r['bull_div'] == div['bull_div'][t]
+            assert r['bear_div'] == div['bear_div'][t]
+
+
+def test_sweep_bars():
+    with tempfile.TemporaryDirectory() as root:
+        out_dir = os.path.join(root, '1d')
+        os.makedirs(out_dir)
+        rows = [_random_walk(seed, 120) for seed in range(6)]
+        close = np.array([r[0] for r in rows])
+        close[0, :30] = np.nan  # 上市较晚的股票左侧为空
+        np.save(os.path.join(out_dir, 'close.npy'), close)
+        np.save(os.path.join(out_dir, 'open.npy'), np.array([r[1] for r in rows]))
+        for field in ('high', 'low', 'volume'):
+            np.save(os.path.join(out_dir, f'{field}.npy'), close)
+        with open(os.path.join(out_dir, 'codes.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(f'{i:06d}.SZ' for i in range(6)) + '\n')
+
+        grid = build_bar_grid(td_lookbacks=(4,), td_counts=(9,), macd_spans=((12, 26, 9),))
+        results = sweep_bars(root, '1d', grid, horizons=(1,), workers=2)
+
+        expected = sum(int(td_signal_series(c[~np.isnan(c)])['buy_9'].sum()) for c in close)
+        got = sum(r['count'] for r in results if r['signal'] == 'TD低9')
+        assert got == expected
+
+
+if __name__ == "__main__":
+    test_signal_series_match_per_stock_functions()
+    test_sweep_bars()
+    print("回测测试通过")
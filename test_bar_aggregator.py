@@ -0,0 +1,152 @@
+import sys
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src.data.bar_aggregator import BarCache, aggregate, aggregate_intraday, aggregate_calendar
+from src.data.fake_xtdata import FakeXtData
+from src.data.qmt_client import QMTClient
+from benchmarks.bench_scan import CONFIG_PATH
+
+
+def _minute_day(day: str = '20261019', seed: int = 0) -> pd.DataFrame:
+    """一个完整交易日的 240 根 1 分钟 K 线 (结束时间标记)"""
+    times = [f"{day}{h:02d}{m:02d}00" for h, m in
+             [divmod(570 + i, 60) for i in range(1, 121)] + [divmod(780 + i, 60) for i in range(1, 121)]]
+    rng = np.random.default_rng(seed)
+    close = 10 + np.cumsum(rng.normal(0, 0.02, 240))
+    open_ = np.r_[10.0, close[:-1]]
+    return pd.DataFrame({
+        'time': times, 'open': open_, 'high': np.maximum(open_, close) + 0.01,
+        'low': np.minimum(open_, close) - 0.01, 'close': close,
+        'volume': rng.integers(100, 1000, 240).astype(float),
+    })
+
+
+def test_intraday_labels_follow_sessions():
+    df = _minute_day()
+    five = aggregate_intraday(df, 5)
+    assert len(five) == 48
+    assert five['time'].iloc[0] == '20261019093500'
+    assert '20261019113000' in set(five['time']) and '20261019130500' in set(five['time'])
+    assert five['time'].iloc[-1] == '20261019150000'
+    assert len(aggregate_intraday(df, 30)) == 8
+    hour = aggregate_intraday(df, 60)
+    assert list(hour['time'].str[8:12]) == ['1030', '1130', '1400', '1500']
+
+    # 第一根 1h = 09:31..10:30 的 60 根 1m
+    first = df.iloc[:60]
+    assert hour['open'].iloc[0] == first['open'].iloc[0]
+    assert hour['close'].iloc[0] == first['close'].iloc[-1]
+    assert hour['high'].iloc[0] == first['high'].max()
+    assert hour['low'].iloc[0] == first['low'].min()
+    assert hour['volume'].iloc[0] == first['volume'].sum()
+    # 午休不跨根：11:30 与 13:00 之后分属不同的 K 线
+    assert hour['close'].iloc[1] == df['close'].iloc[119]
+
+
+def test_epoch_time_round_trip():
+    # QMT 时间戳按本机时区 (A 股为 CST) 解释：用同样的本地时间换算构造，UTC 与 CST 下都应成立
+    df = _minute_day()
+    ms = df.assign(time=[int(datetime.strptime(t, '%Y%m%d%H%M%S').timestamp() * 1000) for t in df['time']])
+    out = aggregate_intraday(ms, 30)
+    expected = aggregate_intraday(df, 30)
+    assert len(out) == len(expected)
+    assert np.allclose(out['close'], expected['close'])
+    assert int(out['time'].iloc[0]) == int(datetime(2026, 10, 19, 10, 0).timestamp() * 1000)
+    back = [datetime.fromtimestamp(t / 1000).strftime('%Y%m%d%H%M%S') for t in out['time']]
+    assert back == list(expected['time'])
+
+
+def test_weekly_and_monthly_from_daily():
+    days = pd.bdate_range('2026-09-01', '2026-10-16')
+    close = np.arange(len(days), dtype=float) + 10
+    df = pd.DataFrame({'time': days.strftime('%Y%m%d%H%M%S'), 'open': close - 0.5, 'high': close + 1,
+                       'low': close - 1, 'close': close, 'volume': np.ones(len(days))})
+    week = aggregate_calendar(df, 'week')
+    assert week['time'].iloc[0] == '20260904000000'   # 以周内最后一个交易日标记
+    assert week['volume'].iloc[0] == 4                 # 9/1 周二 ~ 9/4 周五
+    month = aggregate_calendar(df, 'month')
+    assert list(month['time']) == ['20260930000000', '20261016000000']
+    assert month['open'].iloc[1] == df['open'].iloc[22]
+
+
+def test_client_fetches_two_feeds_per_stock():
+    # 开启合成后 8 个周期只拉取 1m 与 1d 两路基础 K 线
+    xt = FakeXtData(n_stocks=20)
+    client = QMTClient(CONFIG_PATH, xt_data=xt)
+    assert client.bar_cache is not None
+    code = xt.get_stock_list_in_sector('沪深A股')[0]
+    for tf in ['1m', '5m', '15m', '30m', '1h', '1d', '1w', '1mon']:
+        df = client.get_kline(code, tf)
+        assert len(df) == 200, tf
+    assert xt.calls['get_market_data'] == 2
+    assert client.get_kline(code, '1h')['time'].iloc[-1] == aggregate(client.bar_cache.base(code, '1m'), '1h')['time'].iloc[-1]
+
+
+def test_partial_base_refetched_after_download():
+    # 首次整段拉取早于后台历史下载完成：下载完成后整段重新拉取，合成周期不再缺历史
+    days = pd.bdate_range('2026-07-01', '2026-10-16')
+    close = np.arange(len(days), dtype=float) + 10
+    full = pd.DataFrame({'time': days.strftime('%Y%m%d%H%M%S'), 'open': close, 'high': close + 1,
+                         'low': close - 1, 'close': close, 'volume': np.ones(len(days))})
+    downloaded = set()
+    counts = []
+
+    def fetch(code, base, count):
+        counts.append(count)
+        avail = full if (code, base) in downloaded else full.iloc[-5:]
+        return avail.iloc[-count:].reset_index(drop=True)
+
+    def make():
+        cache = BarCache(fetch, daily_bars=500, ttl=60)
+        cache.has_history = lambda code, base: (code, base) in downloaded
+        return cache
+
+    cache = make()
+    assert len(cache.frame('X', '1d')) == 5 and len(cache.frame('X', '1w')) == 1
+    partial = cache.snapshot()
+    downloaded.add(('X', '1d'))
+    # ttl 内也不沿用不完整的缓存
+    assert len(cache.frame('X', '1d')) == len(full)
+    assert len(cache.frame('X', '1w')) == len(aggregate_calendar(full, 'week'))
+    fetched = len(counts)
+    cache.frame('X', '1w')
+    assert len(counts) == fetched
+
+    # 热启动：下载完成前保存的快照载入后仍整段重新拉取；完整的快照只做增量
+    restored = make()
+    restored.restore(partial)
+    assert len(restored.frame('X', '1d')) == len(full) and counts[-1] == 500
+    restored = make()
+    restored.restore(cache.snapshot())
+    restored._refreshed[('X', '1d')] -= 2 * 86400     # 两天后重启
+    assert len(restored.frame('X', '1d')) == len(full) and counts[-1] < 500
+
+
+def compare_with_qmt(stock_code: str = '600519.SH', count: int = 120):
+    """在 QMT 环境下逐周期对比本地合成结果与 QMT 原生 K 线 (需要 xtquant)"""
+    client = QMTClient(CONFIG_PATH)
+    client.downloader.download_now([stock_code], '1m')
+    client.downloader.download_now([stock_code], '1d')
+    for period in ['5m', '15m', '30m', '1h', '1w', '1mon']:
+        client.downloader.download_now([stock_code], period)
+        native = client._fetch_kline(stock_code, period, count)
+        derived = client.get_kline(stock_code, period, count)
+        merged = native.merge(derived, on='time', suffixes=('_qmt', '_local'))
+        diffs = {
+            col: int((~np.isclose(merged[f'{col}_qmt'], merged[f'{col}_local'], rtol=1e-6)).sum())
+            for col in ['open', 'high', 'low', 'close', 'volume']
+        }
+        print(f"{period}: QMT {len(native)} 根, 本地 {len(derived)} 根, 对齐 {len(merged)} 根, 不一致 {diffs}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'qmt':
+        compare_with_qmt(*sys.argv[2:3])
+    else:
+        test_intraday_labels_follow_sessions()
+        test_epoch_time_round_trip()
+        test_weekly_and_monthly_from_daily()
+        test_client_fetches_two_feeds_per_stock()
+        test_partial_base_refetched_after_download()
+        print("K 线合成测试通过")
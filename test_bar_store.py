@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from src.data.bar_store import BarStore
+from src.indicators.td_sequential import calculate_td_sequential
+from src.indicators.divergence import detect_divergence, _detect_divergence_frame, ema
+from src.data.fake_xtdata import FakeXtData
+from src.data.qmt_client import QMTClient
+from benchmarks.bench_scan import CONFIG_PATH
+
+
+def _bars(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    close = 10 + np.cumsum(rng.normal(0, 0.1, n))
+    times = np.array([f"202610{19 + i // 240:02d}{9 + i % 240 // 60:02d}{i % 60:02d}00" for i in range(n)])
+    return times, close + 0.05, close + 0.2, close - 0.2, close, rng.integers(100, 1000, n).astype(float)
+
+
+def test_views_share_store_memory():
+    store = BarStore(stocks=2, bars=8)
+    view = store.put('600000.SH', '1m', *_bars(50))
+    assert len(view) == 50 and view.text_time
+    block = store._blocks['1m']
+    assert np.shares_memory(view.close, block.data)
+    stable = view.head(len(view) - 1)
+    assert np.shares_memory(stable.close, view.close) and len(stable) == 49
+    assert stable.bar_time() == view['time'][-2]
+
+    # 超出预分配容量时按倍数扩容，已有数据保持不变
+    for i in range(5):
+        store.put(f"00000{i}.SZ", '1m', *_bars(30, seed=i))
+    assert store.grows >= 2
+    again = store.view('600000.SH', '1m')
+    assert np.array_equal(again.close, view.close)
+    assert store.view('000004.SZ', '1m', count=10).close[-1] == _bars(30, seed=4)[4][-1]
+    assert store.stats()['periods']['1m']['stocks'] == 6
+
+
+def test_array_indicators_match_dataframe():
+    # 数组版 EMA / 背离与 pandas 实现逐位一致
+    hits = 0
+    for seed in range(6):
+        rng = np.random.default_rng(seed)
+        close = 100 + np.cumsum(rng.normal(0, 1, 160))
+        open_ = close + rng.normal(0, 0.5, 160)
+        for span in (9, 12, 26):
+            assert np.array_equal(ema(close, span), pd.Series(close).ewm(span=span, adjust=False).mean().values)
+        for t in range(3, 160):
+            df = pd.DataFrame({'close': close[:t], 'open': open_[:t]})
+            expected = _detect_divergence_frame(df)
+            assert detect_divergence(df) == expected
+            hits += expected['bull_div'] + expected['bear_div']
+    assert hits > 0
+
+
+def test_scan_uses_store_views():
+    xt = FakeXtData(n_stocks=20)
+    client = QMTClient(CONFIG_PATH, xt_data=xt)
+    code = xt.get_stock_list_in_sector('沪深A股')[0]
+    for tf in ['1m', '5m', '1d']:
+        bars = client.get_bars(code, tf)
+        df = client.get_kline(code, tf)
+        assert len(bars) == len(df) == 200
+        assert list(bars['time']) == list(df['time'].astype(str))
+        assert np.array_equal(bars.close, df['close'].to_numpy())
+        stable, df_stable = bars.head(len(bars) - 1), df.iloc[:-1]
+        assert calculate_td_sequential(stable) == calculate_td_sequential(df_stable)
+        assert detect_divergence(stable) == _detect_divergence_frame(df_stable)
+    assert set(client.bar_store.stats()['periods']) == {'1m', '5m', '1d'}
+
+
+if __name__ == "__main__":
+    test_views_share_store_memory()
+    test_array_indicators_match_dataframe()
+    test_scan_uses_store_views()
+    print("K 线存储测试通过")
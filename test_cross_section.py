@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from src.indicators.cross_section import (right_align, td_setup_counts_2d, td_last, macd_2d, dea_turns,
+                                          divergence_last)
+from src.indicators.td_sequential import calculate_td_sequential, td_setup_counts
+from src.indicators.divergence import calculate_macd, _detect_divergence_frame
+
+
+def _matrix(rows: int, bars: int, seed: int = 0):
+    """随机游走矩阵，每行随机截去左侧若干根 (模拟上市时间不同)，并保留整数价位以制造相等比较"""
+    rng = np.random.default_rng(seed)
+    close = np.round(10 + np.cumsum(rng.normal(0, 0.2, (rows, bars)), axis=1), 2)
+    open_ = np.round(close + rng.normal(0, 0.1, (rows, bars)), 2)
+    start = rng.integers(0, bars - 5, rows)
+    start[: rows // 4] = 0
+    mask = np.arange(bars)[None, :] < start[:, None]
+    close[mask] = np.nan
+    open_[mask] = np.nan
+    return close, open_
+
+
+def test_right_align():
+    mat = np.array([[1.0, np.nan, 2.0, np.nan], [np.nan, np.nan, 3.0, 4.0]])
+    out = right_align(mat)
+    assert np.array_equal(out[0, 2:], [1.0, 2.0]) and np.isnan(out[0, :2]).all()
+    assert np.array_equal(out[1, 2:], [3.0, 4.0])
+
+
+def test_kernels_match_per_stock():
+    close, open_ = _matrix(400, 120)
+    up, down = td_setup_counts_2d(close)
+    diff, dea = macd_2d(close)
+    turn_up, turn_down = dea_turns(dea)
+    td = td_last(close)
+    div = divergence_last(close, open_)
+    hits = 0
+    for r in range(len(close)):
+        valid = ~np.isnan(close[r])
+        c, o = close[r, valid], open_[r, valid]
+        exp_up, exp_down = td_setup_counts(c)
+        assert np.array_equal(up[r, valid], exp_up) and np.array_equal(down[r, valid], exp_down)
+        frame = calculate_macd(pd.DataFrame({'close': c}))
+        assert np.array_equal(diff[r, valid], frame['diff'].values)
+        assert np.array_equal(dea[r, valid], frame['dea'].values)
+        d = frame['dea']
+        assert np.array_equal(turn_up[r, valid], ((d > d.shift(1)) & (d.shift(1) < d.shift(2))).values)
+        assert np.array_equal(turn_down[r, valid], ((d < d.shift(1)) & (d.shift(1) > d.shift(2))).values)
+
+        df = pd.DataFrame({'close': c, 'open': o})
+        expected_td = calculate_td_sequential(df)
+        expected_div = _detect_divergence_frame(df)
+        assert td['buy_9'][r] == expected_td['buy_9'] and td['sell_9'][r] == expected_td['sell_9']
+        assert div['bull_div'][r] == expected_div['bull_div'] and div['bear_div'][r] == expected_div['bear_div']
+        hits += sum(expected_td.values()) + sum(expected_div.values())
+    assert hits > 0
+
+
+def test_numpy_backend_forced():
+    close, open_ = _matrix(50, 60, seed=3)
+    for backend in ('numpy', 'numba'):
+        # 未安装 Numba 时 'numba' 回退 NumPy，结果不变
+        assert np.array_equal(td_setup_counts_2d(close, backend=backend)[0], td_setup_counts_2d(close)[0])
+        a = divergence_last(close, open_, backend=backend)
+        b = divergence_last(close, open_)
+        assert all(np.array_equal(a[k], b[k]) for k in a)
+
+
+if __name__ == "__main__":
+    test_right_align()
+    test_kernels_match_per_stock()
+    test_numpy_backend_forced()
+    print("截面指标测试通过")
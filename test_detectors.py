@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from src.indicators.td_sequential import calculate_td_sequential
+from src.indicators.divergence import detect_divergence
+from src.indicators.features import FeatureCache, register_feature, FEATURES
+from src.indicators.detectors import DETECTORS, Detector, register_detector
+
+
+def _frame(seed: int, n: int = 120) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 10 + np.cumsum(rng.normal(0, 0.2, n))
+    open_ = close + rng.normal(0, 0.1, n)
+    return pd.DataFrame({'time': np.arange(n) * 60000, 'open': open_, 'close': close})
+
+
+def _expected(df: pd.DataFrame):
+    td = calculate_td_sequential(df)
+    div = detect_divergence(df)
+    return ([s for s, hit in (('TD低9', td['buy_9']), ('TD高9', td['sell_9'])) if hit],
+            [s for s, hit in (('MACD底背离', div['bull_div']), ('MACD顶背离', div['bear_div'])) if hit])
+
+
+def test_detectors_match_indicator_functions():
+    cache = FeatureCache()
+    hits = 0
+    for seed in range(300):
+        df = _frame(seed)
+        if seed % 50 == 0:
+            df.loc[5, 'close'] = np.nan   # 含 NaN 的序列走 pandas 回退
+        fs = cache.bind('X', '1m', df)
+        got = (DETECTORS['td9'].run(fs), DETECTORS['divergence'].run(fs))
+        assert got == _expected(df), seed
+        hits += bool(got[0] or got[1])
+    assert hits > 0
+    assert DETECTORS['td9'].run(cache.bind('X', '1m', _frame(0, 12))) == []
+
+
+def test_features_computed_once_per_bar():
+    cache = FeatureCache(max_entries=2)
+    df = _frame(1)
+    fs = cache.bind('A', '5m', df)
+    DETECTORS['td9'].run(fs)
+    DETECTORS['divergence'].run(fs)
+    computed = cache.computed
+    # 同一根 K 线 (另一服务 / 另一次扫描) 直接命中，不再计算
+    again = cache.bind('A', '5m', df.copy())
+    DETECTORS['td9'].run(again)
+    DETECTORS['divergence'].run(again)
+    assert cache.computed == computed and cache.stats()['hits'] == 1
+    # 新 K 线 (或未收盘 K 线价格变化) 重新计算
+    moved = df.copy()
+    moved.loc[len(df) - 1, 'close'] += 0.01
+    DETECTORS['td9'].run(cache.bind('A', '5m', moved))
+    assert cache.computed > computed
+    # 历史 K 线被修正 (最后一根不变) 也重新计算
+    restated = moved.copy()
+    restated.loc[10, 'close'] *= 0.9
+    assert cache.bind('A', '5m', restated).values == {}
+    # 缓存的收盘价是独立副本，不随原数组变化
+    fs = cache.bind('A', '5m', restated)
+    close = fs['close']
+    restated.loc[0, 'close'] = -1.0
+    assert close[0] != -1.0
+    cache.bind('B', '5m', df)
+    cache.bind('C', '5m', df)
+    assert cache.stats()['entries'] == 2 and cache.stats()['evicted'] == 1
+
+
+def test_new_detector_shares_features():
+    calls = []
+
+    @register_feature('test_macd_hist')
+    def _hist(fs):
+        calls.append(1)
+        diff, dea = fs['macd']
+        return (diff - dea) * 2
+
+    class HistFlip(Detector):
+        name = 'test_hist_flip'
+        features = ('macd', 'test_macd_hist')
+
+        def detect(self, fs):
+            hist = fs['test_macd_hist']
+            return ['MACD翻红'] if hist[-2] <= 0 < hist[-1] else []
+
+    try:
+        register_detector(HistFlip())
+        cache = FeatureCache()
+        fs = cache.bind('A', '1d', _frame(7))
+        for detector in DETECTORS.values():
+            detector.run(fs)
+        # macd 只算一次，被背离与新检测器共用
+        assert set(fs.values) >= {'macd', 'test_macd_hist', 'dea_turns', 'td_counts'}
+        assert calls == [1] and cache.computed == len(fs.values)
+        try:
+            register_detector(type('Bad', (Detector,), {'name': 'bad', 'features': ('nope',)})())
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("应拒绝依赖未注册特征的检测器")
+    finally:
+        DETECTORS.pop('test_hist_flip', None)
+        FEATURES.pop('test_macd_hist', None)
+
+
+if __name__ == "__main__":
+    test_detectors_match_indicator_functions()
+    test_features_computed_once_per_bar()
+    test_new_detector_shares_features()
+    print("检测器注册表测试通过")
@@ -0,0 +1,70 @@
+import os
+import time
+import tempfile
+from src.data import database
+from src.data.database import connect_to_db
+from src.services.metrics import metrics
+from src.data.fake_xtdata import FakeXtData
+from src.data.qmt_client import QMTClient
+from benchmarks.bench_scan import build_env, CONFIG_PATH
+
+
+def test_monitor_cycle_offline():
+    # 离线替身环境下完整跑一轮扫描：K 线、盘口与 SQLite 落库
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            xt, monitor, stats = build_env(200, 5, 0.0, os.path.join(tmp, 'test.db'), ['1m', '1d'])
+            assert monitor.run_cycle() == 5
+            assert xt.calls['get_market_data'] == 10
+            assert xt.calls['get_full_tick'] == 5
+
+            result = stats.update_stats()
+            assert sum(result['counts'].values()) == 200
+            assert len(result['leading']) == 5
+
+            # 同一根 K 线的信号重复扫描不应重复入库
+            mydb, cursor = connect_to_db()
+            cursor.execute("SELECT COUNT(*) AS n FROM signal_history WHERE timeframe != 'tick'")
+            before = cursor.fetchone()['n']
+            monitor.run_cycle()
+            cursor.execute("SELECT COUNT(*) AS n FROM signal_history WHERE timeframe != 'tick'")
+            assert cursor.fetchone()['n'] == before
+            cursor.close()
+            mydb.close()
+
+            text = metrics.render_prometheus()
+            assert 'stage="kline_fetch",timeframe="1m"' in text
+            assert 'qmt_stage_seconds_count{stage="scan_cycle"' in text
+        finally:
+            database.set_db_config(None)
+
+
+def test_download_scheduler_batches_in_background():
+    xt = FakeXtData(n_stocks=50, latency={'download_history_data2': 1.0})
+    client = QMTClient(CONFIG_PATH, xt_data=xt)
+    codes = xt.get_stock_list_in_sector('沪深A股')[:20]
+
+    started = time.perf_counter()
+    for code in codes:
+        client.get_kline(code, '1d')
+    # 下载在后台进行，扫描路径不应等待下载延迟
+    assert time.perf_counter() - started < 0.5
+
+    deadline = time.time() + 5
+    while client.downloader.stats()['completed'] < len(codes) and time.time() < deadline:
+        time.sleep(0.05)
+    stats = client.downloader.stats()
+    assert stats['completed'] == len(codes)
+    assert stats['queue_depth'] == 0
+    # 同一轮扫描的请求合并为少量批次下载
+    assert xt.calls['download_history_data2'] + xt.calls['download_history_data'] <= 3
+
+    # 刷新间隔内重复请求不会再次入队
+    client.get_kline(codes[0], '1d')
+    assert client.downloader.stats()['queue_depth'] == 0
+
+
+if __name__ == "__main__":
+    test_monitor_cycle_offline()
+    test_download_scheduler_batches_in_background()
+    print("离线替身测试通过")
@@ -0,0 +1,97 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+from src.data import database
+from src.data.database import connect_to_db
+from src.indicators.detectors import DETECTORS, Detector, register_detector
+from src.services.market_stats import MarketStatsService
+from src.services.scan_scheduler import ScanScheduler
+from benchmarks.bench_scan import build_env
+
+
+class _Always(Detector):
+    """每根 K 线都给出信号，用于验证信号的发布路径"""
+    name = 'test_always'
+    min_bars = 1
+    short = {'测试信号': '测'}
+
+    def detect(self, fs):
+        return ['测试信号']
+
+
+def _expected_labels(monitor, code):
+    labels = []
+    for tf in monitor.index_timeframes:
+        bars = monitor.client.get_bars(code, tf)
+        stable = bars.head(len(bars) - 1)
+        for detector in DETECTORS.values():
+            labels += [f"{tf}{detector.short.get(t, t)}" for t in detector.run(monitor.client.features.bind(code, tf, stable))]
+    return labels
+
+
+def test_index_signals_come_from_monitor_scan():
+    with tempfile.TemporaryDirectory() as tmp:
+        register_detector(_Always())
+        try:
+            xt, monitor, _ = build_env(200, 3, 0.0, os.path.join(tmp, 'test.db'), ['1m', '1d'])
+            stats = MarketStatsService(monitor.client, monitor.index_signal_labels)
+            monitor.track_indices(stats.index_names())
+            monitor.scheduler = ScanScheduler(settle=2, tick_interval=5)
+            clock = [datetime(2026, 10, 19, 10, 0, 30)]
+            monitor._now = lambda: clock[0]
+
+            # 指数 (5 个 × 1m/5m) 随监控扫描计划一起、且排在监控股票之前扫描
+            scanned = []
+            scan_item = monitor.scan_item
+            monitor.scan_item = lambda stock, tf: (scanned.append((stock, tf)), scan_item(stock, tf))
+            # 返回值与计划中的股票数只计监控股票，指数单独统计
+            assert monitor.run_cycle() == 3
+            assert {s for s, _ in scanned[:10]} == set(stats.indices)
+            assert monitor.plan.stats()['indices'] == 5 and monitor.plan.stats()['stocks'] == 3
+            assert set(monitor.index_signals) == set(stats.indices)
+
+            # 统计面板不再拉取指数 K 线，信号与监控扫描结果一致
+            before = xt.calls['get_market_data']
+            result = stats.update_stats()
+            assert xt.calls['get_market_data'] == before
+            leading = {item['name']: item['signals'] for item in result['leading']}
+            assert leading['上证指数'][0] == '1m测' and '5m测' in leading['上证指数']
+            for code, info in stats.indices.items():
+                assert leading[info['name']] == monitor.index_signal_labels(code) == _expected_labels(monitor, code)
+
+            # 监控停止 (或扫描计划读取失败) 后结果过期，统计面板自行计算
+            monitor.running = False
+            assert monitor.index_signal_labels('000001.SH') is None
+            leading = {item['name']: item['signals'] for item in stats.update_stats()['leading']}
+            for code, info in stats.indices.items():
+                assert leading[info['name']] == _expected_labels(monitor, code)
+            monitor.running = True
+            monitor.indices_scanned_at -= monitor.index_stale_after + 1
+            assert monitor.index_signal_labels('000001.SH') is None
+
+            # 同一根 K 线内不重复计算；1m 收盘后只重算 1m
+            scanned.clear()
+            monitor.run_cycle()
+            assert not [s for s in scanned if s[0] in stats.indices]
+            clock[0] += timedelta(seconds=33)
+            monitor.run_cycle()
+            assert {tf for s, tf in scanned if s in stats.indices} == {'1m'}
+
+            # 指数信号入库 (名称取指数名)
+            mydb, cursor = connect_to_db()
+            cursor.execute("SELECT stock_code FROM signal_history WHERE stock_code IN (%s, %s, %s, %s, %s)",
+                           list(stats.indices))
+            rows = cursor.fetchall()
+            cursor.close()
+            mydb.close()
+            assert {row['stock_code'] for row in rows} == set(stats.indices)
+            names = {a['name'] for a in monitor.alerts if a['stock_code'] in stats.indices}
+            assert names == set(stats.index_names().values())
+        finally:
+            DETECTORS.pop('test_always', None)
+            database.set_db_config(None)
+
+
+if __name__ == "__main__":
+    test_index_signals_come_from_monitor_scan()
+    print("指数信号测试通过")
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from src.indicators import jit
+from src.indicators.td_sequential import calculate_td_sequential, td_setup_counts, _td_loop, _td_last_loop
+from src.indicators.divergence import ema, detect_divergence, _detect_divergence_frame, _last_turns_loop, _last_turns
+
+
+def _series(n: int, seed: int):
+    rng = np.random.default_rng(seed)
+    # 保留两位小数以制造持平 (TD 计数清零的分支)
+    close = np.round(10 + np.cumsum(rng.normal(0, 0.05, n)), 2)
+    return close, np.round(close + rng.normal(0, 0.03, n), 2)
+
+
+def _both_backends(check):
+    previous = jit.backend()
+    try:
+        for name in ('numpy', 'numba'):
+            jit.set_backend(name)
+            check()
+    finally:
+        jit.set_backend(previous)
+
+
+def test_backends_match_reference_loops():
+    def check():
+        hits = 0
+        for seed in range(8):
+            close, open_ = _series(300, seed)
+            up, down = td_setup_counts(close)
+            ref_up, ref_down = _td_loop(close, 4)
+            assert np.array_equal(up, ref_up) and np.array_equal(down, ref_down)
+            for t in range(13, 301, 3):
+                view = pd.DataFrame({'close': close[:t], 'open': open_[:t]})
+                u, d = _td_last_loop(close[:t], 4)
+                assert calculate_td_sequential(view) == {'buy_9': d == 9, 'sell_9': u == 9}
+                assert detect_divergence(view) == _detect_divergence_frame(view)
+                hits += sum(detect_divergence(view).values())
+            assert np.array_equal(ema(close, 12), pd.Series(close).ewm(span=12, adjust=False).mean().values)
+            dea = ema(ema(close, 12) - ema(close, 26), 9)
+            assert _last_turns(dea) == tuple(_last_turns_loop(dea))
+        assert hits > 0
+    _both_backends(check)
+
+
+def test_set_backend():
+    previous = jit.backend()
+    try:
+        assert jit.set_backend('numpy') == 'numpy' and not jit.enabled()
+        assert jit.set_backend('numba') == ('numba' if jit.available() else 'numpy')
+        # 单次调用可覆盖全局后端
+        assert not jit.enabled('numpy')
+    finally:
+        jit.set_backend(previous)
+
+
+if __name__ == "__main__":
+    test_backends_match_reference_loops()
+    test_set_backend()
+    print(f"JIT 后端测试通过 (numba 可用: {jit.available()})")
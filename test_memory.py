@@ -0,0 +1,144 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.data import database
+from src.data.database import connect_to_db
+from src.data.bar_aggregator import BarCache
+from src.data.tick_cache import TickCache
+from src.data.fake_xtdata import FakeXtData
+from src.data.subscriptions import SubscriptionManager
+from src.data.download_scheduler import DownloadScheduler
+from src.services.watchlists import save_watchlist, add_to_watchlist
+from benchmarks.bench_scan import build_env
+
+
+class _Client:
+    def __init__(self):
+        self.xt_data = FakeXtData(n_stocks=10)
+
+
+def test_subscriptions_refcounted():
+    client = _Client()
+    subs = SubscriptionManager(client)
+    assert subs.subscribe('A', '1m') and not subs.subscribe('A', '1m')
+    subs.subscribe('A', '1d', owner='market')
+    subs.release('A', 'monitor')
+    # market 仍在使用 A 的日线，只退订分钟线
+    assert client.xt_data.subscriptions == {('A', '1d')} and subs.holds('A')
+    assert subs.codes('monitor') == set() and subs.codes('market') == {'A'}
+    assert subs.release('A', 'market') == ['1d']
+    assert client.xt_data.subscriptions == set() and not subs.holds('A')
+    assert subs.stats()['subscribed'] == subs.stats()['unsubscribed'] == 2
+
+
+def test_removed_stock_is_released():
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            xt, monitor, _ = build_env(50, 4, 0.0, os.path.join(tmp, 'test.db'), ['1m', '5m', '1d'])
+            client = monitor.client
+            codes = xt.get_stock_list_in_sector('沪深A股')[:4]
+            assert monitor.run_cycle() == 4
+            gone = codes[0]
+            assert any(c == gone for c, _ in xt.subscriptions)
+            assert client.features.stats()['entries'] > 0
+
+            mydb, cursor = connect_to_db()
+            cursor.execute("DELETE FROM monitored_stocks WHERE code = %s", (gone,))
+            mydb.commit()
+            cursor.close()
+            mydb.close()
+            assert monitor.run_cycle() == 3
+            # 移出后退订，并从 K 线存储、合成缓存、特征缓存与下载记录中清除
+            assert not any(c == gone for c, _ in xt.subscriptions)
+            assert xt.calls['unsubscribe_quote'] > 0
+            assert gone not in client.subscriptions.codes('monitor')
+            assert all(gone not in block.rows for block in client.bar_store._blocks.values())
+            assert not any(k[0] == gone for k in client.features._entries)
+            if client.bar_cache is not None:
+                assert not any(k[0] == gone for k in client.bar_cache._base)
+            assert not any(k[0] == gone for k in client.downloader._last_attempt)
+            # 回收的行号由后加入的股票复用
+            free = sum(len(block.free) for block in client.bar_store._blocks.values())
+            assert free > 0 and client.memory_stats()['subscriptions']['stocks'] == 3
+        finally:
+            database.set_db_config(None)
+
+
+def test_removed_periods_are_released():
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            xt, monitor, _ = build_env(50, 3, 0.0, os.path.join(tmp, 'test.db'), ['1m', '1d'])
+            client = monitor.client
+            codes = xt.get_stock_list_in_sector('沪深A股')[:3]
+            assert save_watchlist('日内', ['1m', '1d'], ['td9'])
+            add_to_watchlist('日内', [{'code': c, 'name': ''} for c in codes])
+            monitor.run_cycle()
+            minute = client.source_periods(['1m']) - client.source_periods(['1d'])
+            assert minute and {(c, p) for c in codes for p in minute} <= xt.subscriptions
+            # 列表去掉 1m：只退订分钟线，日线订阅保留
+            assert save_watchlist('日内', ['1d'], ['td9'])
+            monitor.run_cycle()
+            held = {p for c, p in xt.subscriptions if c in codes}
+            assert held and not held & minute and held <= client.source_periods(['1d'])
+            assert not any(k[0] in codes and k[1] in minute for k in client.downloader._last_attempt)
+        finally:
+            database.set_db_config(None)
+
+
+def test_forget_purges_download_queue():
+    downloader = DownloadScheduler(_Client(), linger=60)
+    downloader._ensure_thread = lambda: None    # 不启动后台下载线程
+    for code, period in (('A', '1m'), ('A', '1d'), ('B', '1m')):
+        downloader.request(code, period)
+    downloader.forget('A', '1m')
+    assert downloader._queued == {('A', '1d'), ('B', '1m')} and len(downloader._heap) == 2
+    downloader.forget('A')
+    assert downloader._queued == {('B', '1m')} and [item[2] for item in downloader._heap] == ['B']
+
+
+def test_caches_bounded():
+    ticks = TickCache(lambda codes: {c: {'lastPrice': 1.0} for c in codes}, ttl=60, max_entries=3)
+    ticks.get(['A', 'B', 'C'])
+    ticks.get(['D', 'E'])
+    assert ticks.stats()['cached'] == 3 and ticks.stats()['evicted'] == 2
+    assert set(ticks.get(['C', 'D', 'E'])) == {'C', 'D', 'E'} and ticks.calls == 2
+
+    def fetch(code, period, count):
+        n = 50
+        return pd.DataFrame({'time': np.arange(n) * 86400000, 'open': np.ones(n), 'high': np.ones(n),
+                             'low': np.ones(n), 'close': np.ones(n), 'volume': np.ones(n), 'amount': np.ones(n)})
+
+    cache = BarCache(fetch, ttl=60, max_stocks=2)
+    for code in ('A', 'B', 'A', 'C'):
+        cache.base(code, '1d')
+    # B 最久未使用，被淘汰
+    assert {k[0] for k in cache._base} == {'A', 'C'}
+    stats = cache.stats()
+    assert stats['stocks'] == 2 and stats['evicted'] == 1 and stats['bytes'] > 0
+
+
+def test_pending_alerts_bounded():
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            _, monitor, _ = build_env(20, 1, 0.0, os.path.join(tmp, 'test.db'))
+            monitor.max_alerts = 5
+            for i in range(12):
+                monitor._push_alert({'id': i})
+            assert [a['id'] for a in monitor.alerts] == list(range(7, 12)) and monitor.alerts_dropped == 7
+            # 取走后队列清空，之后的告警进入新队列
+            assert [a['id'] for a in monitor.take_alerts()] == list(range(7, 12)) and monitor.alerts == []
+            monitor._push_alert({'id': 12})
+            assert [a['id'] for a in monitor.take_alerts()] == [12] and monitor.alerts_dropped == 7
+        finally:
+            database.set_db_config(None)
+
+
+if __name__ == "__main__":
+    test_subscriptions_refcounted()
+    test_removed_periods_are_released()
+    test_forget_purges_download_queue()
+    test_removed_stock_is_released()
+    test_caches_bounded()
+    test_pending_alerts_bounded()
+    print("内存上限与退订测试通过")
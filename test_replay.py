@@ -0,0 +1,54 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+import pandas as pd
+from src.data.recorder import TickRecorder, load_day
+from src.services.replay import replay_day
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yaml')
+
+
+def _make_daily_bars(n_up: int = 20) -> pd.DataFrame:
+    # 先连续上涨，再连续 9 根低于 4 根前收盘 -> 最后一根触发 TD低9
+    closes = [100 + i for i in range(n_up)] + [110 - i for i in range(9)]
+    start = datetime(2026, 1, 5)
+    times = [int((start + timedelta(days=i)).timestamp() * 1000) for i in range(len(closes))]
+    return pd.DataFrame({
+        'time': times, 'open': closes, 'high': [c + 1 for c in closes],
+        'low': [c - 1 for c in closes], 'close': closes, 'volume': [1000] * len(closes),
+    })
+
+
+def test_record_and_replay():
+    with tempfile.TemporaryDirectory() as root:
+        recorder = TickRecorder(root, flush_rows=2)
+        recorder.record_bars('000001.SZ', '1d', _make_daily_bars())
+        # 重复记录同一批 K 线不应产生重复行
+        recorder.record_bars('000001.SZ', '1d', _make_daily_bars())
+        recorder.record_tick('000001.SZ', {
+            'lastPrice': 10.0, 'lastClose': 10.0, 'lastVol': 10,
+            'bidPrice': [10.0, 9.99, 9.98, 9.97, 9.96], 'bidVol': [100, 888, 5, 5, 5],
+            'askPrice': [10.01, 10.02, 10.03, 10.04, 10.05], 'askVol': [5, 5, 5, 5, 5],
+        })
+        recorder.flush()
+
+        day = sorted(os.listdir(root))[0]
+        recorded = load_day(root, day)
+        assert recorded.codes == ['000001.SZ']
+        assert recorded.bar_count == 29
+        assert recorded.tick_count == 1
+        assert recorded.ticks['bidVol'][0].tolist() == [100, 888, 5, 5, 5]
+
+        report = replay_day(CONFIG_PATH, root, day)
+        types = report['signal_counts']
+        assert types.get('TD低9') == 1
+        assert types.get('买2挂单888') == 1
+
+        # 调参回放：移除 888 后盘口信号消失
+        report = replay_day(CONFIG_PATH, root, day, {'special_numbers': [777]})
+        assert '买2挂单888' not in report['signal_counts']
+
+
+if __name__ == "__main__":
+    test_record_and_replay()
+    print("回放测试通过")
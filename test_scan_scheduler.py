@@ -0,0 +1,73 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+from src.data import database
+from src.services.scan_scheduler import ScanScheduler, next_bar_close
+from benchmarks.bench_scan import build_env
+
+
+def _t(text: str) -> datetime:
+    return datetime.strptime(text, '%Y-%m-%d %H:%M:%S')
+
+
+def test_next_bar_close_respects_sessions():
+    assert next_bar_close('1m', _t('2026-10-19 09:20:00')) == _t('2026-10-19 09:31:00')
+    assert next_bar_close('5m', _t('2026-10-19 11:32:10')) == _t('2026-10-19 13:05:00')
+    assert next_bar_close('30m', _t('2026-10-19 11:30:00')) == _t('2026-10-19 13:30:00')
+    assert next_bar_close('1h', _t('2026-10-19 10:30:01')) == _t('2026-10-19 11:30:00')
+    assert next_bar_close('5m', _t('2026-10-16 15:00:00')) == _t('2026-10-19 09:35:00')  # 周五收盘后到下周一
+    assert next_bar_close('1d', _t('2026-10-19 15:00:00')) == _t('2026-10-20 15:00:00')
+    assert next_bar_close('1w', _t('2026-10-19 10:00:00')) == _t('2026-10-23 15:00:00')
+    assert next_bar_close('1mon', _t('2026-10-30 15:30:00')) == _t('2026-11-30 15:00:00')
+
+
+def test_fast_timeframes_first_and_lag_reported():
+    sched = ScanScheduler(settle=2, tick_interval=5)
+    now = _t('2026-10-19 10:00:30')
+    sched.sync(['A', 'B'], ['1mon', '1m', 'tick'], now)
+    first = sched.pop_due(now, limit=3)
+    assert [tf for _, tf in first] == ['tick', 'tick', '1m']
+    rest = sched.pop_due(now)
+    assert [tf for _, tf in rest] == ['1m', '1mon', '1mon']
+    for stock, tf in first + rest:
+        sched.reschedule(stock, tf, now)
+    assert sched.pop_due(now) == []
+    assert sched.seconds_until_next(now) == 5
+    # 10:01 收盘 + 2 秒 settle 后 1m 到期，月线不动
+    later = _t('2026-10-19 10:01:04')
+    due = sched.pop_due(later)
+    assert sorted(tf for _, tf in due) == ['1m', '1m', 'tick', 'tick']
+    assert sched.stats()['lag']['1m']['max_s'] == 4.0
+    # 移出监控的股票不再被调度
+    sched.sync(['A'], ['1mon', '1m', 'tick'], later)
+    assert {s for s, _ in sched.pop_due(_t('2026-11-30 15:00:10'))} == {'A'}
+
+
+def test_monitor_runs_only_due_work():
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            xt, monitor, _ = build_env(50, 4, 0.0, os.path.join(tmp, 'test.db'), ['1m', '1d'])
+            monitor.scheduler = ScanScheduler(settle=2, tick_interval=5)
+            clock = [_t('2026-10-19 10:00:30')]
+            monitor._now = lambda: clock[0]
+            scanned = []
+            scan_item = monitor.scan_item
+            monitor.scan_item = lambda stock, tf: (scanned.append(tf), scan_item(stock, tf))
+            monitor.run_cycle()
+            assert sorted(scanned) == ['1d'] * 4 + ['1m'] * 4 + ['tick'] * 4
+            assert xt.calls['get_market_data'] == 8
+            scanned.clear()
+            monitor.run_cycle()
+            assert scanned == []
+            clock[0] += timedelta(seconds=33)  # 10:01:03：1m 收盘已过，日线未到
+            monitor.run_cycle()
+            assert scanned == ['tick'] * 4 + ['1m'] * 4
+        finally:
+            database.set_db_config(None)
+
+
+if __name__ == "__main__":
+    test_next_bar_close_respects_sessions()
+    test_fast_timeframes_first_and_lag_reported()
+    test_monitor_runs_only_due_work()
+    print("自适应调度测试通过")
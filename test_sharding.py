@@ -0,0 +1,101 @@
+import os
+import tempfile
+from src.data import database
+from src.data.database import connect_to_db
+from src.data.recorder import TickRecorder, load_day
+from src.services.metrics import metrics
+from src.services.sharding import shard_of
+from benchmarks.bench_scan import build_env
+
+
+def _bar_signals():
+    mydb, cursor = connect_to_db()
+    cursor.execute("SELECT stock_code, timeframe, signal_type, bar_time FROM signal_history WHERE timeframe != 'tick'")
+    rows = {(r['stock_code'], r['timeframe'], r['signal_type'], r['bar_time']) for r in cursor.fetchall()}
+    cursor.close()
+    mydb.close()
+    return rows
+
+
+def _run(workers: int, tmp: str):
+    xt, monitor, _ = build_env(60, 30, 0.0, os.path.join(tmp, f'w{workers}.db'), ['1m', '5m', '1d'], workers)
+    try:
+        assert monitor.run_cycle() == 30
+        return _bar_signals(), monitor
+    finally:
+        monitor.stop()
+
+
+def test_sharded_cycle_matches_single_process():
+    # 分片扫描与单进程扫描产生相同的 K 线信号，且信号回传到主进程的 alerts
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            single, _ = _run(0, tmp)
+            sharded, monitor = _run(2, tmp)
+        finally:
+            database.set_db_config(None)
+    assert single and sharded == single
+    bar_alerts = {a['stock_code'] for a in monitor.alerts if a['timeframe'] != 'tick'}
+    assert bar_alerts == {s[0] for s in sharded}
+    assert set(monitor.shards.last_cycle) == {0, 1}
+
+
+def test_removed_stock_released_in_shard():
+    # 分片进程持有的订阅与缓存同样释放：移出的股票发给所属分片
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            xt, monitor, _ = build_env(60, 30, 0.0, os.path.join(tmp, 'rel.db'), ['1m', '1d'], 2)
+            try:
+                assert monitor.run_cycle() == 30
+                gone = monitor.plan.stocks()[0]
+                mydb, cursor = connect_to_db()
+                cursor.execute("DELETE FROM monitored_stocks WHERE code = %s", (gone,))
+                mydb.commit()
+                cursor.close()
+                mydb.close()
+                assert monitor.run_cycle() == 29
+                stats = monitor.shards.stats()
+                assert stats['releases'] == stats['released'] == 1
+            finally:
+                monitor.stop()
+        finally:
+            database.set_db_config(None)
+
+
+def test_shards_forward_recording_and_metrics():
+    # 录制只由主进程写盘 (同一目录不被多个进程写乱)，各分片的阶段耗时汇总到主进程
+    with tempfile.TemporaryDirectory() as tmp:
+        rec_dir = os.path.join(tmp, 'recordings')
+        try:
+            xt, monitor, _ = build_env(60, 30, 0.0, os.path.join(tmp, 'rec.db'), ['1m', '1d'], 2)
+            monitor.config['recorder'] = {'enabled': True, 'path': rec_dir}
+            monitor.recorder = TickRecorder(rec_dir)
+            metrics.reset()
+            try:
+                assert monitor.run_cycle() == 30
+            finally:
+                monitor.stop()
+        finally:
+            database.set_db_config(None)
+        days = os.listdir(rec_dir)
+        assert len(days) == 1
+        day = load_day(rec_dir, days[0])
+        watched = set(xt.get_stock_list_in_sector('沪深A股')[:30])
+        assert len(day.codes) == len(set(day.codes)) and set(day.codes) <= watched
+        assert day.bar_count > 0
+        stages = {row['stage']: row['count'] for row in metrics.summary()}
+        assert stages.get('indicator_td9', 0) > 0
+
+
+def test_shard_assignment_is_stable():
+    codes = [f"{600000 + i}.SH" for i in range(100)]
+    assert [shard_of(c, 4) for c in codes] == [shard_of(c, 4) for c in codes]
+    assert len({shard_of(c, 4) for c in codes}) == 4
+
+
+if __name__ == "__main__":
+    test_sharded_cycle_matches_single_process()
+    test_removed_stock_released_in_shard()
+    test_shards_forward_recording_and_metrics()
+    test_shard_assignment_is_stable()
+    print("分片扫描测试通过")
@@ -0,0 +1,50 @@
+import os
+import tempfile
+from src.data import database
+from src.data.database import connect_to_db, fetch_signal_page
+
+
+def _seed(n: int):
+    mydb, cursor = connect_to_db()
+    cursor.execute("INSERT INTO monitored_stocks (code, name) VALUES (%s, %s)", ('600000.SH', '浦发银行'))
+    for i in range(n):
+        cursor.execute('''
+            INSERT INTO signal_history (stock_code, timeframe, signal_type, price, bar_time)
+            VALUES (%s, %s, %s, %s, %s)
+        ''', ('600000.SH' if i % 2 else '000001.SZ', '5m', 'TD9_BUY', 10.0 + i, f'2026-10-19 10:{i % 60:02d}:00'))
+    mydb.commit()
+    cursor.close()
+    mydb.close()
+
+
+def test_signal_pages_walk_back_without_gaps():
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            database.set_db_config({'backend': 'sqlite', 'path': os.path.join(tmp, 'test.db')})
+            _seed(250)
+            first = fetch_signal_page(limit=100)
+            assert len(first) == 100
+            assert first[0]['id'] == 250 and first[-1]['id'] == 151
+            # 关联出名称，未在监控表中的股票名称为空
+            assert {row['name'] for row in first} == {'浦发银行', None}
+
+            ids = [row['id'] for row in first]
+            before = first[-1]['id']
+            while True:
+                page = fetch_signal_page(before, 100)
+                if not page:
+                    break
+                ids.extend(row['id'] for row in page)
+                before = page[-1]['id']
+            assert ids == list(range(250, 0, -1))
+
+            # 页大小限制在 1..MAX_SIGNAL_PAGE
+            assert len(fetch_signal_page(limit=0)) == 1
+            assert len(fetch_signal_page(limit=10 ** 6)) == 250
+        finally:
+            database.set_db_config(None)
+
+
+if __name__ == "__main__":
+    test_signal_pages_walk_back_without_gaps()
+    print("信号历史分页测试通过")
@@ -0,0 +1,103 @@
+import time
+import threading
+from src.data.tick_cache import TickCache
+from src.data.fake_xtdata import FakeXtData
+from src.data.qmt_client import QMTClient
+from benchmarks.bench_scan import CONFIG_PATH
+
+
+def test_concurrent_overlapping_requests_share_one_call():
+    xt = FakeXtData(n_stocks=50, latency={'get_full_tick': 0.2})
+    client = QMTClient(CONFIG_PATH, xt_data=xt)
+    codes = xt.get_stock_list_in_sector('沪深A股')[:6]
+    results = {}
+
+    def request(name, stock_list):
+        results[name] = client.get_full_tick(stock_list)
+
+    # 监控请求单只，统计请求全部，两个页面请求同一列表：只应有一次 xtdata 调用
+    first = threading.Thread(target=request, args=('stats', codes))
+    first.start()
+    while not client.ticks._inflight:
+        time.sleep(0.001)
+    others = [threading.Thread(target=request, args=(name, lst))
+              for name, lst in (('monitor', codes[:1]), ('tab1', codes[2:5]), ('tab2', codes[2:5]))]
+    for t in others:
+        t.start()
+    for t in [first] + others:
+        t.join()
+
+    assert xt.calls['get_full_tick'] == 1
+    assert list(results['stats']) == codes and list(results['tab1']) == codes[2:5]
+    assert results['monitor'][codes[0]] is results['stats'][codes[0]]
+    s = client.ticks.stats()
+    assert s['calls'] == 1 and s['coalesced'] == 7 and s['fetched'] == 6
+
+
+def test_ttl_and_realtime_data():
+    xt = FakeXtData(n_stocks=20)
+    client = QMTClient(CONFIG_PATH, xt_data=xt)
+    now = [0.0]
+    client.ticks.clock = lambda: now[0]
+    codes = xt.get_stock_list_in_sector('沪深A股')[:3]
+    data = client.get_realtime_data(codes)
+    assert set(data) == set(codes)
+    client.get_realtime_data(codes)
+    client.get_full_tick(codes[:1])
+    assert xt.calls['get_full_tick'] == 1 and client.ticks.stats()['hits'] == 4
+    now[0] = 1.5   # 超过 ttl 后重新请求
+    client.get_full_tick(codes)
+    assert xt.calls['get_full_tick'] == 2
+
+    client.ticks.ttl = 0   # 不缓存：串行请求每次都取
+    client.get_full_tick(codes)
+    assert xt.calls['get_full_tick'] == 3
+
+
+def test_fetch_error_releases_waiters():
+    calls = []
+
+    def fetch(codes):
+        calls.append(codes)
+        raise RuntimeError("QMT 断开")
+
+    cache = TickCache(fetch)
+    try:
+        cache.get(['600000.SH'])
+        assert False
+    except RuntimeError:
+        pass
+    assert not cache._inflight and cache.stats()['cached'] == 0
+
+
+
+def test_waiters_time_out_on_hung_fetch():
+    release = threading.Event()
+    now = [0.0]
+
+    def fetch(codes):
+        if 'B' in codes:
+            release.wait(5)     # 模拟 QMT 卡住
+        return {c: {'lastPrice': now[0]} for c in codes}
+
+    cache = TickCache(fetch, ttl=1.0, clock=lambda: now[0], wait_timeout=0.1)
+    cache.get(['A'])
+    now[0] = 10.0               # A 已过期
+    hung = threading.Thread(target=cache.get, args=(['A', 'B'],))
+    hung.start()
+    while not cache._inflight:
+        time.sleep(0.001)
+    started = time.monotonic()
+    # 等待方按时返回：A 退回过期值，B 没有可用值
+    assert cache.get(['A', 'B']) == {'A': {'lastPrice': 0.0}}
+    assert time.monotonic() - started < 1 and cache.stats()['wait_timeouts'] == 2
+    release.set()
+    hung.join()
+
+
+if __name__ == "__main__":
+    test_concurrent_overlapping_requests_share_one_call()
+    test_ttl_and_realtime_data()
+    test_fetch_error_releases_waiters()
+    test_waiters_time_out_on_hung_fetch()
+    print("行情快照合并测试通过")
@@ -0,0 +1,83 @@
+import os
+import json
+import tempfile
+from datetime import datetime
+from src.data.trading_calendar import TradingCalendar
+from src.data.fake_xtdata import FakeXtData
+from src.data.bar_aggregator import BarCache
+from src.services.scan_scheduler import next_bar_close
+import pandas as pd
+
+SESSIONS = [['09:15', '11:30'], ['13:00', '15:00']]
+
+
+def _golden_week_calendar(tmp: str) -> TradingCalendar:
+    # 2026 国庆：10/1 - 10/8 休市，10/9 (周五) 开市
+    days = [d.strftime('%Y%m%d') for d in pd.bdate_range('2026-09-01', '2026-10-31')
+            if not ('2026-10-01' <= d.strftime('%Y-%m-%d') <= '2026-10-08')]
+    path = os.path.join(tmp, 'calendar.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(['# 交易日'] + days))
+    return TradingCalendar.load(path=path, sessions=SESSIONS)
+
+
+def test_holidays_and_sessions():
+    with tempfile.TemporaryDirectory() as tmp:
+        cal = _golden_week_calendar(tmp)
+    assert cal.source.startswith('file:')
+    assert not cal.is_trading_day(datetime(2026, 10, 5))
+    assert cal.is_trading_day(datetime(2026, 10, 9))
+    assert not cal.is_trading_time(datetime(2026, 10, 5, 10, 0))
+    assert cal.next_session_start(datetime(2026, 9, 30, 15, 0, 1)) == datetime(2026, 10, 9, 9, 15)
+    assert cal.seconds_until_open(datetime(2026, 10, 9, 12, 0)) == 3600
+    assert cal.phase(datetime(2026, 10, 9, 9, 20)) == 'call_auction'
+    assert cal.phase(datetime(2026, 10, 9, 9, 27)) == 'pre_open'
+    assert cal.phase(datetime(2026, 10, 9, 12, 0)) == 'break'
+    assert cal.phase(datetime(2026, 10, 9, 15, 0, 1)) == 'closed'
+    assert cal.last_session_end(datetime(2026, 10, 9, 9, 0)) == datetime(2026, 9, 30, 15, 0)
+    # 已知区间外按周一至周五
+    assert cal.is_trading_day(datetime(2027, 3, 1)) and not cal.is_trading_day(datetime(2027, 2, 28))
+    # 调度器使用日历后，节前最后一根日线之后的下一根在节后
+    assert next_bar_close('1d', datetime(2026, 9, 30, 15, 1), cal.is_trading_day) == datetime(2026, 10, 9, 15, 0)
+    assert next_bar_close('1w', datetime(2026, 9, 28, 10, 0), cal.is_trading_day) == datetime(2026, 9, 30, 15, 0)
+
+
+def test_load_from_xtdata_is_cached():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, 'trading_calendar.json')
+        xt = FakeXtData(n_stocks=10)
+        cal = TradingCalendar.load(xt, cache_path=cache, sessions=SESSIONS)
+        assert cal.source == 'xtdata' and xt.calls['get_trading_dates'] == 1
+        with open(cache, 'r', encoding='utf-8') as f:
+            assert len(json.load(f)['days']) == len(cal.days)
+        again = TradingCalendar.load(xt, cache_path=cache, sessions=SESSIONS)
+        assert again.source == 'cache' and xt.calls['get_trading_dates'] == 1
+
+
+def test_bar_cache_sleeps_while_market_closed():
+    # 区间内只有两个交易日，当前时刻必然休市
+    cal = TradingCalendar(['20260102', '20301231'], sessions=SESSIONS)
+    fetched = []
+
+    def fetch(code, period, count):
+        fetched.append(count)
+        return pd.DataFrame({'time': ['20260102150000'], 'open': [1.0], 'high': [1.0], 'low': [1.0],
+                             'close': [1.0], 'volume': [1.0]})
+
+    cache = BarCache(fetch, ttl=0)
+    cache.calendar = cal
+    cache.base('600000.SH', '1m')
+    cache.base('600000.SH', '1m')
+    assert len(fetched) == 1
+    # 上次刷新早于最近一次收盘：补拉一次后再次休眠
+    cache._refreshed[('600000.SH', '1m')] = datetime(2026, 1, 2, 14, 0).timestamp()
+    cache.base('600000.SH', '1m')
+    cache.base('600000.SH', '1m')
+    assert len(fetched) == 2
+
+
+if __name__ == "__main__":
+    test_holidays_and_sessions()
+    test_load_from_xtdata_is_cached()
+    test_bar_cache_sleeps_while_market_closed()
+    print("交易日历测试通过")
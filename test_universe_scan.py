@@ -0,0 +1,88 @@
+import time
+import pandas as pd
+from src.data.fake_xtdata import FakeXtData
+from src.data.async_client import AsyncQMTClient
+from src.data.qmt_client import QMTClient
+from src.indicators.td_sequential import calculate_td_sequential
+from src.indicators.divergence import detect_divergence
+from src.services.universe_scan import UniverseScanner, SIGNAL_NAMES
+from benchmarks.bench_scan import CONFIG_PATH
+
+
+class FailingDownloads(FakeXtData):
+    """历史下载总是失败的替身"""
+    def download_history_data2(self, stock_list, period, start_time='', end_time='', callback=None, **kwargs):
+        super().download_history_data2(stock_list, period, start_time, end_time)
+        raise RuntimeError('download failed')
+
+
+def _wait_downloads(client, timeout: float = 10):
+    deadline = time.time() + timeout
+    while (client.downloader.stats()['queue_depth'] or client.downloader.in_flight) and time.time() < deadline:
+        time.sleep(0.02)
+
+
+def _expected(xt, code: str, period: str, count: int):
+    """逐股计算 (与监控扫描相同：丢弃最后一根未收盘 K 线)"""
+    data = xt.get_market_data(field_list=['open', 'close'], stock_list=[code], period=period, count=count + 1)
+    df = pd.DataFrame({f: data[f].loc[code].to_numpy() for f in ['open', 'close']}).iloc[:-1]
+    if len(df) < 13:
+        return []
+    flags = dict(calculate_td_sequential(df))
+    flags.update(detect_divergence(df))
+    return [name for key, name in SIGNAL_NAMES.items() if flags[key]]
+
+
+def test_universe_matches_per_stock():
+    xt = FakeXtData(n_stocks=300)
+    client = QMTClient(CONFIG_PATH, xt_data=xt)
+    scanner = UniverseScanner(client, timeframes=['1d', '30m'], count=120, batch_size=64, workers=2)
+    result = scanner.scan()
+    assert result['stocks'] == 300
+
+    got = {(s['timeframe'], hit['code']): [] for hit in result['hits'] for s in hit['signals']}
+    for hit in result['hits']:
+        for s in hit['signals']:
+            got[(s['timeframe'], hit['code'])].append(s['type'])
+    expected = {}
+    for tf in ['1d', '30m']:
+        for code in scanner.universe():
+            names = _expected(xt, code, tf, 120)
+            if names:
+                expected[(tf, code)] = names
+    assert got == expected and expected
+
+    # 排序：得分降序，同分按代码
+    keys = [(-h['score'], h['code']) for h in result['hits']]
+    assert keys == sorted(keys)
+    assert all(h['name'] for h in result['hits'])
+
+    # 取数经 AsyncQMTClient 限流 (每周期 5 批)，历史由下载调度器在后台补齐
+    assert scanner.qmt.stats()['methods']['get_market_data']['calls'] == 10 and result['failed_batches'] == 0
+    _wait_downloads(client)
+    assert all(client.downloader.has_history(code, tf) for code in scanner.universe() for tf in ['1d', '30m'])
+
+
+def test_failures_are_not_recorded_as_downloaded():
+    xt = FailingDownloads(n_stocks=100, latency={'get_market_data': 0.5})
+    client = QMTClient(CONFIG_PATH, xt_data=xt)
+    # get_market_data 超时：该批本轮跳过，扫描照常返回
+    qmt = AsyncQMTClient(client, timeouts={'get_market_data': 0.05})
+    scanner = UniverseScanner(client, timeframes=['1d'], batch_size=50, workers=2, qmt=qmt)
+    result = scanner.scan()
+    assert result['failed_batches'] == 2 and result['hits'] == [] and scanner.stats()['failed_batches'] == 2
+    assert qmt.stats()['methods']['get_market_data']['timeouts'] == 2
+
+    # 下载失败不记为已下载，下一轮重新登记下载
+    _wait_downloads(client)
+    downloads = xt.calls['download_history_data2']
+    assert downloads >= 1 and not any(client.downloader.has_history(code, '1d') for code in scanner.universe())
+    scanner.scan()
+    _wait_downloads(client)
+    assert xt.calls['download_history_data2'] > downloads
+
+
+if __name__ == "__main__":
+    test_universe_matches_per_stock()
+    test_failures_are_not_recorded_as_downloaded()
+    print("全市场扫描测试通过")
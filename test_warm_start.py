@@ -0,0 +1,76 @@
+import os
+import time
+import tempfile
+from datetime import datetime
+from src.data import database
+from src.services.warm_start import WarmStart
+from benchmarks.bench_scan import build_env
+
+
+def _components(monitor, stats):
+    return {'client': monitor.client, 'monitor': monitor, 'market': stats}
+
+
+def _wait_downloads(client, timeout: float = 10):
+    """等待后台历史下载队列清空"""
+    deadline = time.time() + timeout
+    while (client.downloader.stats()['queue_depth'] or client.downloader.in_flight) and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_snapshot_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'test.db')
+        path = os.path.join(tmp, 'warm', 'warm_start.pkl')
+        try:
+            xt, monitor, stats = build_env(200, 4, 0.0, db_path, ['1m', '5m', '1d'])
+            monitor.run_cycle()
+            # 历史下载完成后的一轮扫描整段重新拉取基础 K 线，快照中的序列才是完整的
+            _wait_downloads(monitor.client)
+            monitor.run_cycle()
+            stats.update_stats()
+            monitor.client.instruments.resolve_many(['000001'])     # 加载全市场对照表
+            monitor.client.downloader._last_success[('000001.SZ', '1m')] = datetime.now()
+            saved = WarmStart(path, _components(monitor, stats)).save()
+            assert saved['bytes'] > 0 and not os.path.exists(path + '.tmp')
+
+            # 模拟重启：新的 xtdata 与服务实例
+            xt2, monitor2, stats2 = build_env(200, 4, 0.0, db_path, ['1m', '5m', '1d'])
+            result = WarmStart(path, _components(monitor2, stats2)).load()
+            assert result['loaded'] and set(result['parts']) == {'client', 'monitor', 'market'}
+            assert stats2.last_stats == stats.last_stats and stats2._sector_cache == stats._sector_cache
+            assert monitor2.client.instruments.stats() == monitor.client.instruments.stats()
+            assert monitor2.client.downloader.has_history('000001.SZ', '1m')
+            if monitor2.client.bar_cache is not None:
+                assert set(monitor2.client.bar_cache._base) == set(monitor.client.bar_cache._base)
+                fetched = []
+                fetch = monitor2.client.bar_cache.fetch
+                monitor2.client.bar_cache.fetch = lambda code, base, count: (fetched.append(count),
+                                                                              fetch(code, base, count))[1]
+                monitor2.run_cycle()
+                # 首轮扫描只增量拉取 (或休市时直接使用快照)，不再整段拉取
+                assert all(count < monitor2.client.bar_cache.max_bars['1d'] for count in fetched)
+                assert xt2.calls['get_market_data'] < xt.calls['get_market_data']
+        finally:
+            database.set_db_config(None)
+
+
+def test_bad_snapshot_ignored():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'warm_start.pkl')
+        try:
+            _, monitor, stats = build_env(20, 1, 0.0, os.path.join(tmp, 'test.db'))
+            store = WarmStart(path, _components(monitor, stats))
+            assert store.load() == {'loaded': False, 'parts': []}
+            with open(path, 'wb') as f:
+                f.write(b'not a pickle')
+            assert store.load()['loaded'] is False
+            assert stats.last_stats == {}
+        finally:
+            database.set_db_config(None)
+
+
+if __name__ == "__main__":
+    test_snapshot_round_trip()
+    test_bad_snapshot_ignored()
+    print("热启动快照测试通过")
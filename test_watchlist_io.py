@@ -0,0 +1,116 @@
+import os
+import csv
+import io
+import json
+import time
+import tempfile
+import threading
+from src.data import database
+from src.data.fake_xtdata import FakeXtData
+from src.data.qmt_client import QMTClient
+from src.services.watchlist_io import WatchlistImporter, parse_import, export_watchlist
+from benchmarks.bench_scan import CONFIG_PATH
+
+
+def _wait(importer: WatchlistImporter, job_id: str) -> dict:
+    for _ in range(500):
+        job = importer.get(job_id)
+        if job['state'] in ('done', 'error'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("导入任务未结束")
+
+
+def test_parse_import_formats():
+    assert parse_import("600000\n000001.sz\n\n浦发银行\n") == ['600000', '000001.sz', '浦发银行']
+    assert parse_import("名称,代码\n浦发银行,600000.SH\n平安银行,000001.SZ\n") == ['600000.SH', '000001.SZ']
+    assert parse_import('["600000", 1, {"code": "000001.SZ"}]', 'json') == ['600000', '1', '000001.SZ']
+    assert parse_import('{"codes": ["300001"]}', 'json') == ['300001']
+    for bad in ('5', '"600000"', '{"codes": "600000"}'):
+        try:
+            parse_import(bad, 'json')
+        except ValueError:
+            continue
+        raise AssertionError(f"未拒绝: {bad}")
+
+
+def test_single_resolve_skips_market_walk():
+    xt = FakeXtData(n_stocks=300)
+    client = QMTClient(CONFIG_PATH, xt_data=xt)
+    codes = xt.get_stock_list_in_sector('沪深京A股')
+    gate = threading.Event()
+    walks = []
+    sector_list = xt.get_stock_list_in_sector
+
+    def slow_sector_list(sector):
+        walks.append(sector)
+        gate.wait(10)
+        return sector_list(sector)
+
+    xt.get_stock_list_in_sector = slow_sector_list
+    try:
+        # 对照表在后台加载，单个代码直接查询
+        assert client.resolve_stock_code(codes[0])['code'] == codes[0]
+        assert client.resolve_stock_code(codes[1].split('.')[0])['code'] == codes[1]
+        assert xt.calls['get_instrument_detail'] <= 3 and client.instruments.loaded_on is None
+        # 并发的批量解析等待同一次加载
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.instruments.resolve_many(codes[:5])))
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        gate.set()
+        for t in threads:
+            t.join()
+        assert len(walks) == 1 and all(len(r[0]) == 5 for r in results)
+    finally:
+        gate.set()
+
+
+def test_bulk_import_resolves_once_upserts_and_prefetches():
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            database.set_db_config({'backend': 'sqlite', 'path': os.path.join(tmp, 'test.db')})
+            xt = FakeXtData(n_stocks=300)
+            client = QMTClient(CONFIG_PATH, xt_data=xt)
+            importer = WatchlistImporter(client, periods=['1d', '5m'])
+            codes = xt.get_stock_list_in_sector('沪深京A股')
+            name = xt.instruments[codes[2]]['InstrumentName']
+            inputs = [codes[0], codes[0].split('.')[0], codes[1].lower(), name, '999999', '不存在的股票']
+
+            job = _wait(importer, importer.start(inputs)['id'])
+            assert job['state'] == 'done', job
+            assert job['resolved'] == 3 and job['inserted'] == 3 and job['existing'] == 0
+            assert job['unresolved'] == ['999999', '不存在的股票']
+            # 新股票已订阅 Tick 并登记下载 (本地合成的 5m 登记其基础周期 1m)
+            assert {(c, 'tick') for c in codes[:3]} <= xt.subscriptions
+            base = '1m' if client.bar_cache is not None else '5m'
+            assert {(c, p) for c in codes[:3] for p in ('1d', base)} <= set(client.downloader._last_attempt)
+            # 全市场对照表只加载一次，之后解析不再逐个查询
+            detail_calls = xt.calls['get_instrument_detail']
+            job = _wait(importer, importer.start(codes[:5])['id'])
+            assert job['inserted'] == 2 and job['existing'] == 3
+            assert xt.calls['get_instrument_detail'] == detail_calls
+
+            # 按板块导入
+            job = _wait(importer, importer.start(sector='创业板')['id'])
+            assert job['state'] == 'done' and job['total'] == len(xt.sectors['创业板'])
+            assert _wait(importer, importer.start(sector='不存在')['id'])['state'] == 'error'
+
+            text, media_type = export_watchlist('csv')
+            rows = list(csv.DictReader(io.StringIO(text)))
+            assert media_type.startswith('text/csv') and len(rows) == 5 + len(xt.sectors['创业板'])
+            assert {r['code'] for r in rows} >= set(codes[:5])
+            exported = json.loads(export_watchlist('json')[0])
+            assert exported[0]['name'] and set(exported[0]) == {'code', 'name', 'added_at'}
+            # 导出的 CSV 可以直接再导入
+            assert parse_import(text) == [r['code'] for r in rows]
+        finally:
+            database.set_db_config(None)
+
+
+if __name__ == "__main__":
+    test_parse_import_formats()
+    test_single_resolve_skips_market_walk()
+    test_bulk_import_resolves_once_upserts_and_prefetches()
+    print("批量导入导出测试通过")
@@ -0,0 +1,88 @@
+import os
+import tempfile
+from datetime import datetime
+from collections import Counter
+from src.data import database
+from src.indicators.detectors import DETECTORS
+from src.services.scan_scheduler import ScanScheduler
+from src.services.watchlists import (save_watchlist, add_to_watchlist, delete_watchlist, remove_from_watchlist,
+                                     list_watchlists, load_plan)
+from benchmarks.bench_scan import build_env
+
+
+def test_save_watchlist_validates():
+    for args in [('', ['1d'], ['td9']), ('x', ['2d'], ['td9']), ('x', ['1d'], ['macd']), ('x', [], ['td9'])]:
+        try:
+            save_watchlist(*args)
+        except ValueError:
+            continue
+        raise AssertionError(f"应拒绝 {args}")
+
+
+def test_plan_follows_watchlists():
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            xt, monitor, _ = build_env(50, 6, 0.0, os.path.join(tmp, 'test.db'), ['1m', '5m', '1d', '1w'])
+            codes = xt.get_stock_list_in_sector('沪深A股')[:6]
+            rows = [{'code': c, 'name': xt.instruments[c]['InstrumentName']} for c in codes]
+            assert save_watchlist('日内异动', [], ['depth'], priority=10)
+            assert save_watchlist('长线', ['1d', '1w'], ['td9'])
+            assert add_to_watchlist('日内异动', rows[4:6]) == 2
+            assert add_to_watchlist('长线', rows[:2] + rows[5:6]) == 3
+            assert add_to_watchlist('长线', rows[:1]) == 0
+            assert add_to_watchlist('不存在', rows[:1]) is None
+            assert {w['name']: w['stocks'] for w in list_watchlists()} == {'日内异动': 2, '长线': 3}
+
+            plan = load_plan(['1m', '5m', '1d', '1w'])
+            # 高优先级列表的股票先扫；codes[2:4] 不属于任何列表，按默认清单 (4 个周期 + 盘口)
+            assert plan.stocks()[:2] == [codes[4], codes[5]]
+            assert set(plan.scan_items(codes[0])) == {'1d', '1w'}
+            assert plan.detectors(codes[0], '1d') == {'td9'}
+            assert set(plan.scan_items(codes[4])) == {'tick'}
+            assert set(plan.scan_items(codes[5])) == {'1d', '1w', 'tick'}
+            assert set(plan.scan_items(codes[2])) == {'1m', '5m', '1d', '1w', 'tick'}
+            assert plan.stats() == {'lists': 2, 'indices': 0, 'stocks': 6, 'items': 2 + 2 + 5 + 5 + 1 + 3}
+
+            scanned = []
+            scan_item = monitor.scan_item
+            monitor.scan_item = lambda stock, tf, dets=None: (scanned.append((stock, tf)), scan_item(stock, tf, dets))
+            divergence_calls = []
+            divergence = DETECTORS['divergence']
+            divergence.run = lambda fs: (divergence_calls.append(1), type(divergence).run(divergence, fs))[1]
+            try:
+                assert monitor.run_cycle() == 6
+            finally:
+                del divergence.run
+            # 每轮工作量与计划一致：18 个扫描项，背离只在默认清单的 8 个周期上计算
+            assert len(scanned) == 18
+            assert [s for s, _ in scanned[:2]] == [codes[4], codes[5]]
+            per_stock = Counter(s for s, _ in scanned)
+            assert [per_stock[c] for c in codes] == [2, 2, 5, 5, 1, 3]
+            # 启用 K 线聚合时 5m/1w 由 1m/1d 合成，只拉基础周期
+            assert xt.calls['get_market_data'] == (14 if monitor.client.bar_cache is None else 7)
+            assert len(divergence_calls) == 8
+
+            # 停用或删除列表、移出成员后计划随之变化
+            assert save_watchlist('日内异动', [], ['depth'], priority=10, enabled=False)
+            plan = load_plan(['1m'])
+            assert codes[4] not in plan.stocks() and set(plan.scan_items(codes[5])) == {'1d', '1w'}
+            assert remove_from_watchlist('长线', codes[0])
+            assert delete_watchlist('日内异动')
+            plan = load_plan(['1m'])
+            assert set(plan.scan_items(codes[0])) == set(plan.scan_items(codes[4])) == {'1m', 'tick'}
+        finally:
+            database.set_db_config(None)
+
+
+def test_scheduler_priority_first():
+    sched = ScanScheduler(settle=2, tick_interval=5)
+    now = datetime(2026, 10, 19, 10, 0, 30)
+    sched.sync_items([('A', '1m'), ('A', 'tick'), ('B', '1d')], now, {'B': 5})
+    assert sched.pop_due(now) == [('B', '1d'), ('A', 'tick'), ('A', '1m')]
+
+
+if __name__ == "__main__":
+    test_save_watchlist_validates()
+    test_plan_follows_watchlists()
+    test_scheduler_priority_first()
+    print("命名监控列表测试通过")
@@ -0,0 +1,76 @@
+import copy
+import json
+from src.web.ws_protocol import (SnapshotChannel, diff, apply_patch, encode, market_snapshot, quotes_snapshot,
+                                 parse_client_message)
+from benchmarks.bench_ws import run_benchmark
+
+
+def test_merge_patch_round_trip():
+    prev = {'a': 1, 'b': {'x': 1, 'y': 2, 'w': 0}, 'c': [1, 2], 'gone': 'x', 'n': 5}
+    cur = {'a': 1, 'b': {'x': 1, 'y': 3, 'z': {'k': 1}}, 'c': [1, 2, 3], 'new': '名称', 'n': None}
+    patch = diff(prev, cur)
+    # 删除显式列在 $del 中，None 是普通的值
+    assert patch == {'b': {'y': 3, 'z': {'k': 1}, '$del': ['w']}, 'c': [1, 2, 3], 'new': '名称', 'n': None,
+                     '$del': ['gone']}
+    assert apply_patch(copy.deepcopy(prev), patch) == cur
+    assert apply_patch(copy.deepcopy(prev), json.loads(encode(patch))) == cur
+    assert diff(cur, cur) == {}
+    # 紧凑编码，中文不转义
+    assert encode({'n': '名称', 'v': [1, 2]}) == '{"n":"名称","v":[1,2]}'
+
+
+def test_channel_deltas_keyframes_and_resync():
+    ch = SnapshotChannel('quotes', keyframe_every=3)
+    client = {}
+    seqs = []
+
+    def receive(message):
+        if message['type'] == 'key':
+            client.clear()
+            client.update(copy.deepcopy(message['data']))
+        else:
+            assert message['seq'] == seqs[-1] + 1
+            apply_patch(client, json.loads(encode(message))['data'])
+        seqs.append(message['seq'])
+
+    snaps = [quotes_snapshot({'A': {'price': 10.0, 'change_pct': 1.0}, 'B': {'price': 5.0, 'change_pct': -1.0}})]
+    snaps.append(quotes_snapshot({'A': {'price': 10.1, 'change_pct': 2.0}, 'B': {'price': 5.0, 'change_pct': -1.0}}))
+    snaps.append(quotes_snapshot({'A': {'price': 10.1, 'change_pct': 2.0}}))
+    snaps.append(quotes_snapshot({'A': {'price': 10.2, 'change_pct': 3.0}, 'C': {'price': 1.0, 'change_pct': 0.0}}))
+    types = []
+    for snap in snaps:
+        message = ch.update(snap)
+        types.append(message['type'])
+        receive(message)
+        assert client == snap
+    # 第一条与每隔 keyframe_every 条为关键帧，增量只含变化的股票
+    assert types == ['key', 'delta', 'delta', 'key']
+    assert ch.update(snaps[-1]) is None
+    assert ch.keyframe()['seq'] == seqs[-1] and ch.keyframe()['data'] == snaps[-1]
+    assert parse_client_message('{"type": "resync", "ch": "quotes"}') == {'type': 'resync', 'ch': 'quotes'}
+    assert parse_client_message('not json') is None
+
+
+def test_market_snapshot_diffs_leading_by_name():
+    ch = SnapshotChannel('market')
+    stats = {'timestamp': '10:00:00', 'counts': {'up': 1, 'down': 2, 'flat': 3},
+             'leading': [{'name': '上证指数', 'white': 1.0, 'signals': []}, {'name': '科创50', 'white': 2.0, 'signals': []}]}
+    ch.update(market_snapshot(stats))
+    stats = copy.deepcopy(stats)
+    stats['timestamp'] = '10:00:15'
+    stats['leading'][1]['white'] = 2.5
+    assert ch.update(market_snapshot(stats))['data'] == {'timestamp': '10:00:15', 'leading': {'科创50': {'white': 2.5}}}
+
+
+def test_delta_protocol_cuts_bytes_per_client():
+    result = run_benchmark(n_stocks=500, minutes=3)
+    assert result['after']['raw_kb_per_min'] < result['before']['raw_kb_per_min'] / 3
+    assert result['after']['deflate_kb_per_min'] < result['after']['raw_kb_per_min']
+
+
+if __name__ == "__main__":
+    test_merge_patch_round_trip()
+    test_channel_deltas_keyframes_and_resync()
+    test_market_snapshot_diffs_leading_by_name()
+    test_delta_protocol_cuts_bytes_per_client()
+    print("WebSocket 协议测试通过")